@@ -6,25 +6,50 @@
 # V 2.1
 # ---------------------------------------------------------------------------
 
-import sys, os, shutil, copy, glob
+import sys, os, shutil, copy, glob, time
 import logging
-import urllib3
 import socket
 import json, csv
 import os
 from unidecode import unidecode
-try:
-    import arcpy
-except ImportError:
-    print("ArcGIS não encontrado. Usando mock para desenvolvimento.")
-    from arcpy_mock import arcpy
-from datetime import datetime
-from logger import logger as log
+
+# GEOMETRY ENGINE
+GEOMETRY_ENGINE = os.environ.get("LHASA_GEOMETRY_ENGINE", "ARCPY").upper() # ARCPY | SHAPELY | RASTER
+
+if GEOMETRY_ENGINE in ("SHAPELY", "RASTER"):
+    from motor_shapely import arcpy
+else:
+    try:
+        import arcpy
+    except ImportError:
+        print("ArcGIS não encontrado. Usando mock para desenvolvimento.")
+        from arcpy_mock import arcpy
+from datetime import datetime, timedelta
+from logger import logger as log, configurar as configurarLog
+from limiares import obter_tabela
+from publicacao_sde import calcular_alteracoes, aplicar_alteracoes
+from instrumentacao import execucao, etapa, contar, contar_feicoes, observar
+from perfil import perfilar, extrair_opcao
+
+# Módulos pesados (numpy, shapely, urllib3, pandas, folium) só são importados
+# quando a etapa que os usa roda: o -h e o início do nowcast ficam rápidos.
+def exportar_camada(*args, **kwargs):
+    from saida_vetorial import exportar_camada as exportar
+    return exportar(*args, **kwargs)
+
+def exportar_tiles(*args, **kwargs):
+    from tiles_vetoriais import exportar_tiles as exportar
+    return exportar(*args, **kwargs)
+
+def analisar_raster(*args, **kwargs):
+    from motor_raster import analisar
+    return analisar(*args, **kwargs)
 
 # EXTERNAL SERVICES ENDPOINTS
 RAIN_URL = "http://websempre.rio.rj.gov.br/json/chuvas?queryTime=" #API antiga - mantida como fallback
-INMET_STATIONS_URL = "https://apitempo.inmet.gov.br/estacoes/T" # API do INMET para estações
-INMET_DATA_URL = "https://apitempo.inmet.gov.br/estacao/dados/" # API do INMET para dados meteorológicos
+INMET_BASE_URL = os.environ.get("INMET_BASE_URL", "https://apitempo.inmet.gov.br/") # pode apontar para o inmet_stub.py local
+INMET_STATIONS_URL = INMET_BASE_URL.rstrip("/") + "/estacoes/T" # API do INMET para estações
+INMET_DATA_URL = INMET_BASE_URL.rstrip("/") + "/estacao/dados/" # API do INMET para dados meteorológicos
 
 # WORKSPACE PATH
 PROJECT_PATH = os.path.dirname(__file__)
@@ -38,11 +63,13 @@ HISTORIC_DATA_PATH = os.path.join(WKSP, "history")
 
 # LOGGING SETUP
 # LOG_FILE = os.path.join(PROJECT_PATH, "logs\\" + datetime.now().strftime("%Y%m%d") +".log")
-LOG_FILE = os.path.join(PROJECT_PATH, "logs\\" + "LHASA_RIO" +".log")
-LOG_LEVEL = logging.DEBUG
+LOG_FILE = os.path.join(PROJECT_PATH, "logs", "LHASA_RIO.log")
+LOG_LEVEL = os.environ.get("LHASA_LOG_LEVEL", "DEBUG") # DEBUG | INFO | WARNING | ERROR
 LOG_TO_FILE = True
 LOG_TO_CONSOLE = True
+LOG_JSON = os.environ.get("LHASA_LOG_JSON", "0") == "1" # uma linha JSON por mensagem
 LOG_SUFIX = "[LHASA-RIO]"
+RELATORIO_EXECUCAO = os.path.join(PROJECT_PATH, "logs", "LHASA_RIO_execucoes.jsonl") # uma linha JSON por etapa e por execução
 
 OUTPUT_TO_SDE = True #como não tem "site" salvar em pasta .gdb
 DATE_SEPARATOR = "/" #as datas serão formatadas com barras
@@ -57,6 +84,21 @@ LYR_IN_PZ = os.path.join(WKSP, "datagis.rio.rj.gov.br@Geotecnia.sde\\geotecnia.g
 #LYR_IN_SZ = os.path.join(WKSP, "10.70.23.17@GEORIO.sde\\GEORIO.DBO.Susceptibilidade_RJ")
 LYR_IN_SZ = os.path.join(WKSP, "datagis.rio.rj.gov.br@Geotecnia.sde\\geotecnia.gisadmin.Susceptibilidade_RJ")
 
+OUT_EXPOSICAO = os.path.join(WKSP, "input", "RJ_LHASA_NOWCAST.gpkg") # saída para script de exposição (.gpkg | .fgb)
+TILES_OUT = os.path.join(WKSP, "output", "RJ_LHASA_NOWCAST.mbtiles") # tiles vetoriais da camada de perigo (.mbtiles | diretório)
+TILES_ZOOM_MIN = 9
+TILES_ZOOM_MAX = 14
+
+RASTER_RESOLUCAO = 10.0 # tamanho do pixel no motor RASTER (unidades do SRC da suscetibilidade)
+RASTER_CACHE = os.path.join(WKSP, "input", "raster") # grades pré-calculadas (.npy mapeados em memória)
+RASTER_TAMANHO_TILE = 1024 # pixels por lado de cada tile processado
+RASTER_PROCESSOS = None # processos do pool (None = todos os núcleos)
+
+if GEOMETRY_ENGINE in ("SHAPELY", "RASTER"): # sem SDE/GDB: camadas de entrada e saída em arquivos locais
+    LYR_IN_PZ = os.path.join(WKSP, "input", "RJ_ZONA_PLUVIOMETRICA.geojson")
+    LYR_IN_SZ = os.path.join(WKSP, "input", "RJ_SUSCEPTIBILIDADE.geojson")
+    SDE_WKSP_OUT = os.path.join(WKSP, "output", "RJ_LHASA_NOWCAST.geojson")
+
 LYR_OUT_LHASA_NOW = os.path.join(WKSP, "LHASA-DATA.gdb\\RJ_LHASA_AGORA")
 LYR_OUT_LHASA_HISTORICAL = os.path.join(WKSP, "LHASA-DATA.gdb\\RJ_LHASA_HISTORICO")
 
@@ -77,6 +119,12 @@ LYR_PRC_LHASA_NOW = "RJ_LHASA_AGORA"
 
 FLD_RISCO = "PERIGO"
 
+# THRESHOLD TABLE (limiares.json)
+MODELO_LIMIARES = "lhasa"
+CAMPOS_LIMIARES = {"h01": "NM_H01", "h24": "NM_H24", "h96": "NM_H96"}
+
+DAEMON_INTERVAL = 15 * 60 # segundos entre execuções no modo daemon (-d)
+
 # FIELD DEFINITION
 # LYR_PZ_FLDS = ["SHAPE@JSON","NM_CODIGO","TX_ESTACAO","TX_ENDERECO"]
 LYR_PZ_FLDS = ["SHAPE@JSON","Cod","Est","Endereço"]
@@ -125,6 +173,7 @@ TPL_PH_ITEM = { # PLUVIOMETER HISTORICAL DATA ITEM
 ARR_HD = [] # Historical Data
 ARR_PZ = [] # Pluviometric Zones
 ARR_PD = [] # Pluviometric Data
+ARR_INMET = [] # Estações do INMET carregadas no nowcast (reaproveitadas pelos mapas)
 ARR_ST = [ # Pluviometric Stations Definition
     {"PZ_CODE":  1, "PZ_NAME": "VIDIGAL", "PZ_FILE_NAME": "vidigal"},
     {"PZ_CODE":  2, "PZ_NAME": "URCA", "PZ_FILE_NAME": "urca"},
@@ -175,9 +224,6 @@ def initialize():
     # arcpy.env.scratchWorkspace = "D:\\LHASA-RIO\\2.1\\data\\LHASA-PROCESS.gdb"
 
     DH = datetime.today()
-    logging.basicConfig(filename=LOG_FILE, filemode="a+", level=LOG_LEVEL, 
-                        format='%(asctime)s %(levelname)s %(message)s',
-                        datefmt='%d/%m/%Y %H:%M:%S')
 
     MIN = int(DH.strftime('%M'))
     if (MIN >= 0 and MIN <= 15): MIN = "00"
@@ -195,11 +241,12 @@ def initialize():
 #         # print(LOG_SUFIX + " | " + message)
 
 def loadHistoricalData(year=None, month=None, dayFrom=None, dayTo=None, hourFrom=None, hourTo=None):
-    log.info("#01 | CARGA DE DADOS DAS ESTACOES PLUVIOMETRICAS")
+    log.info(etapa("#01 | CARGA DE DADOS DAS ESTACOES PLUVIOMETRICAS"))
     loadPluviometricZones()
     log.info("      Dados carregados para " + str(len(ARR_PZ)) + " estacoes")
+    contar(linhas=len(ARR_PZ))
 
-    log.info("#02 | CARGA DE DADOS HISTORICOS DE CHUVA")
+    log.info(etapa("#02 | CARGA DE DADOS HISTORICOS DE CHUVA"))
 
     if arcpy.Exists(arcpy.env.scratchWorkspace + "\\" + TBL_PRC_CHUVA_HISTORICA) == True:
         arcpy.Delete_management(arcpy.env.scratchWorkspace + "\\" + TBL_PRC_CHUVA_HISTORICA)
@@ -214,9 +261,9 @@ def loadHistoricalData(year=None, month=None, dayFrom=None, dayTo=None, hourFrom
     for i in files:
         loadedFiles += 1
 
-        log.info("      + ARQUIVO: " + str(i) + " | " + str(int((loadedFiles / float(len(files))) * 100)) + "%")
+        log.info("      + ARQUIVO: %s | %d%%", i, int((loadedFiles / float(len(files))) * 100))
 
-        fileName = str(i).replace(HISTORIC_DATA_PATH + "\\", "")
+        fileName = os.path.basename(i)
         filePeriod = fileName.split("_")[len(fileName.split("_")) - 2]
         fileYear = filePeriod[:4]
         fileMonth = filePeriod[-2:]
@@ -226,7 +273,7 @@ def loadHistoricalData(year=None, month=None, dayFrom=None, dayTo=None, hourFrom
         
         if (SDI == None): 
             log.error("        [ERRO] ESTACAO NAO LOCALIZADA")
-            shutil.move(i, HISTORIC_DATA_PATH + "\\ERROR\\" + fileName)
+            shutil.move(i, os.path.join(HISTORIC_DATA_PATH, "ERROR", fileName))
             continue
 
         if (month != None and fileMonth != month):
@@ -251,7 +298,7 @@ def loadHistoricalData(year=None, month=None, dayFrom=None, dayTo=None, hourFrom
             del cursorSPH
 
             # log("        CARREGANDO DADOS...")
-            with open(i, "rb") as fileHD:
+            with open(i, "r", encoding="latin-1") as fileHD:
                 lineCount = 0
                 for lineHD in fileHD:
                     lineCount += 1
@@ -352,15 +399,16 @@ def loadHistoricalData(year=None, month=None, dayFrom=None, dayTo=None, hourFrom
                                                 del cursorIPH
 
                 fileHD.close()
+                contar(linhas=lineCount)
             
             # log("        [OK] CARGA CONCLUIDA...")
             # shutil.move(i, HISTORIC_DATA_PATH + "\\LOADED\\" + fileName)
         else:
             log.error("        [ERRO] ESTACAO NAO LOCALIZADA")
-            shutil.move(i, HISTORIC_DATA_PATH + "\\ERROR\\" + fileName)
+            shutil.move(i, os.path.join(HISTORIC_DATA_PATH, "ERROR", fileName))
 
     log.info("")
-    log.info("#03 | ASSOCIANDO ZONA PLUVIOMETRICA A DADO DE CHUVA")
+    log.info(etapa("#03 | ASSOCIANDO ZONA PLUVIOMETRICA A DADO DE CHUVA"))
 
     if arcpy.Exists(arcpy.env.scratchWorkspace + "\\" + LYR_PRC_LHASA_HISTORICAL) == True:
         arcpy.Delete_management(arcpy.env.scratchWorkspace + "\\" + LYR_PRC_LHASA_HISTORICAL)
@@ -420,7 +468,7 @@ def loadHistoricalData(year=None, month=None, dayFrom=None, dayTo=None, hourFrom
             
                 itemHDCount += 1
         
-        log.info("      + " + str(PHD_ITEM["NM_CODIGO"]).zfill(2) + " | " + str(PHD_ITEM["TX_ESTACAO"]) + " | " + str(PHD_ITEM["DATA"]) + " | " + str(PHD_ITEM["HORA"]))
+        log.info("      + %02d | %s | %s | %s", PHD_ITEM["NM_CODIGO"], PHD_ITEM["TX_ESTACAO"], PHD_ITEM["DATA"], PHD_ITEM["HORA"])
         # log("        + " + str(PHD_ITEM["M15"]) + " | " + str(PHD_ITEM["DH_M15"]))
         # log("        + " + str(PHD_ITEM["H01"]) + " | " + str(PHD_ITEM["DH_H01"]))
         # log("        + " + str(PHD_ITEM["H04"]) + " | " + str(PHD_ITEM["DH_H04"]))
@@ -448,22 +496,25 @@ def loadHistoricalData(year=None, month=None, dayFrom=None, dayTo=None, hourFrom
                 PHD_ITEM["DH_H96"]
             ))
         del cursorIPH
+        contar(feicoes=1)
     
     return
 
 def loadNowData():
     log.info("")
 
-    log.info("#01 | CARGA DE DADOS DAS ESTACOES PLUVIOMETRICAS")
+    log.info(etapa("#01 | CARGA DE DADOS DAS ESTACOES PLUVIOMETRICAS"))
     loadPluviometricZones()
     log.info("      Dados carregados para " + str(len(ARR_PZ)) + " estacoes")
+    contar(linhas=len(ARR_PZ))
 
     log.info("")
-    log.info("#02 | CARGA DE DADOS ATUAIS DE CHUVA")
+    log.info(etapa("#02 | CARGA DE DADOS ATUAIS DE CHUVA"))
     loadPluviometricData()
+    contar(linhas=len(ARR_PD))
 
     log.info("")
-    log.info("#03 | ASSOCIANDO ZONA PLUVIOMETRICA A DADO DE CHUVA")
+    log.info(etapa("#03 | ASSOCIANDO ZONA PLUVIOMETRICA A DADO DE CHUVA"))
 
     if arcpy.Exists(arcpy.env.scratchWorkspace + "\\" + LYR_PRC_LHASA_NOW) == True:
         arcpy.Delete_management(arcpy.env.scratchWorkspace + "\\" + LYR_PRC_LHASA_NOW)
@@ -514,35 +565,71 @@ def loadNowData():
                     PZ["NM_H96"],
                     PZ["NM_MES"]
                 ))
+                contar(feicoes=1)
 
             log.info("      " + ("0" + str(PZ["NM_CODIGO"]) if (PZ["NM_CODIGO"] < 10) else str(PZ["NM_CODIGO"])) + " | " + str(PZ["TX_ESTACAO"]).upper() + " | " + str(PZ["DT_COLETA"]) + ": " + ("---" if PD == None else "CARREGADO..."))
     
     del cursorIPZ
 
     return
-def loadPluviometricDataINMET():
-    """Carrega dados meteorológicos das estações do INMET no Rio de Janeiro"""
+def _chuvaInmet(registros):
+    """(h01, h24) das observações horárias do INMET: a última leitura de CHUVA e a
+    soma das leituras nas 24h até ela (DT_MEDICAO + HR_MEDICAO; sem horário, as
+    últimas 24 leituras). None quando nenhuma observação traz CHUVA"""
+    leituras = []
+    for registro in registros if isinstance(registros, list) else [registros]:
+        try:
+            mm = float(str(registro['CHUVA']).replace(',', '.'))
+        except (KeyError, TypeError, ValueError):
+            continue # sem CHUVA (ou "null"): não vira 0 mm
+        try:
+            momento = datetime.strptime(registro['DT_MEDICAO'] + registro['HR_MEDICAO'][:4], '%Y-%m-%d%H%M')
+        except (KeyError, TypeError, ValueError):
+            momento = None
+        leituras.append((momento, mm))
+    if not leituras:
+        return None
+    if all(momento is not None for momento, _ in leituras):
+        leituras.sort(key=lambda leitura: leitura[0])
+        inicio = leituras[-1][0] - timedelta(hours=24)
+        janela = [mm for momento, mm in leituras if momento > inicio]
+    else:
+        janela = [mm for _, mm in leituras[-24:]]
+    return leituras[-1][1], round(sum(janela), 2)
+
+def loadPluviometricDataINMET(base_url=None):
+    """Carrega dados meteorológicos das estações do INMET no Rio de Janeiro
+    base_url substitui a base da API (ex.: servidor local do inmet_stub.py)"""
     global ARR_PD
     del ARR_PD[:]
+    del ARR_INMET[:]
 
+    stations_url, data_base_url = INMET_STATIONS_URL, INMET_DATA_URL
+    if base_url:
+        stations_url = base_url.rstrip("/") + "/estacoes/T"
+        data_base_url = base_url.rstrip("/") + "/estacao/dados/"
+
+    import urllib3
     socket.setdefaulttimeout(120)
     http = urllib3.PoolManager()
     
     try:
         # Primeiro, obter lista de estações de MG
         log.info("Carregando estações do INMET para Minas Gerais...")
-        stations_response = http.request("GET", INMET_STATIONS_URL)
+        stations_response = http.request("GET", stations_url)
         stations_data = json.loads(stations_response.data)
         
         # Filtrar apenas estações de Minas Gerais operantes
         mg_stations = [station for station in stations_data 
                       if station['SG_ESTADO'] == 'MG' and station['CD_SITUACAO'] == 'Operante']
         
+        ARR_INMET.extend(mg_stations)
         log.info(f"Encontradas {len(mg_stations)} estações operantes em MG")
         
         # Para cada estação, tentar obter dados meteorológicos
         DH = datetime.today()
         date_str = DH.strftime('%Y-%m-%d')
+        start_str = (DH - timedelta(days=1)).strftime('%Y-%m-%d') # ontem e hoje: cobre as 24h
         
         for station in mg_stations:
             try:
@@ -550,7 +637,7 @@ def loadPluviometricDataINMET():
                 station_name = station['DC_NOME']
                 
                 # Construir URL para dados da estação (últimas 24h)
-                data_url = f"{INMET_DATA_URL}{date_str}/{date_str}/{station_code}"
+                data_url = f"{data_base_url}{start_str}/{date_str}/{station_code}"
                 
                 log.info(f"Buscando dados para {station_code}: {station_name}")
                 
@@ -558,8 +645,11 @@ def loadPluviometricDataINMET():
                 data_response = http.request("GET", data_url)
                 if data_response.status == 200:
                     station_data = json.loads(data_response.data)
+                    chuva = _chuvaInmet(station_data) if station_data else None
+                    if station_data and chuva is None:
+                        log.info(f"Sem leituras de chuva para {station_name}")
                     
-                    if station_data:  # Se há dados disponíveis
+                    if chuva is not None:  # Se há dados de chuva disponíveis
                         # Processar dados e adicionar ao array
                         processed_data = {
                             'name': station_name,
@@ -579,20 +669,8 @@ def loadPluviometricDataINMET():
                             }
                         }
                         
-                        # Processar dados de precipitação se disponível
-                        if station_data:
-                            latest_data = station_data[-1] if isinstance(station_data, list) else station_data
-                            
-                            # Extrair dados de precipitação (INMET usa CHUVA)
-                            if 'CHUVA' in latest_data:
-                                precip = latest_data['CHUVA']
-                                if precip and precip != '':
-                                    try:
-                                        precip_value = float(precip.replace(',', '.'))
-                                        processed_data['data']['h01'] = precip_value
-                                        processed_data['data']['h24'] = precip_value
-                                    except:
-                                        pass
+                        # Precipitação (INMET usa CHUVA, em mm por hora): última hora e acumulado de 24h
+                        processed_data['data']['h01'], processed_data['data']['h24'] = chuva
                         
                         ARR_PD.append(processed_data)
                         log.info(f"Dados carregados para {station_name}")
@@ -619,13 +697,14 @@ def loadPluviometricDataOld():
     NOWCALL = DH.strftime('%Y%m%d_%H%M')
     
     log.info(" URL: " + (RAIN_URL + NOWCALL))
+    import urllib3
     http = urllib3.PoolManager()
     pluviometersData = http.request("GET", RAIN_URL + NOWCALL)
     ARR_PD = json.loads(pluviometersData.data)["objects"]
 
-def loadPluviometricData():
+def loadPluviometricData(base_url=None):
     """Função principal que tenta INMET primeiro, depois fallback"""
-    loadPluviometricDataINMET()
+    loadPluviometricDataINMET(base_url)
 
 def loadPluviometricZones():
     global ARR_PZ
@@ -680,7 +759,7 @@ def findStationDefinition(stationCode=0, stationName="", stationFileName=""):
     searchField = "PZ_FILE_NAME" if stationFileName != "" else ("PZ_NAME" if stationName != "" else ("PZ_CODE" if stationCode != 0 else None))
     searchedValue = stationFileName if stationFileName != "" else (stationName if stationName != "" else (stationCode if stationCode != 0 else None))
    
-    SD_ITEMS = [SD for SD in ARR_ST if SD[searchField].encode('utf-8').upper() == searchedValue.upper()]
+    SD_ITEMS = [SD for SD in ARR_ST if str(SD[searchField]).upper() == str(searchedValue).upper()]
     return SD_ITEMS[0] if (len(SD_ITEMS) > 0) else None
 
 def doAnalysis(dataType="", startDate=None, endDate=None, startTime=None, endTime=None):
@@ -693,79 +772,84 @@ def doAnalysis(dataType="", startDate=None, endDate=None, startTime=None, endTim
         # arcpy.MakeFeatureLayer_management(LYR_OUT_LHASA_NOW, LYR_PRC_VOLUME_CHUVA)
         LYR_PRC_VOLUME_CHUVA = arcpy.env.scratchWorkspace + "\\" + LYR_PRC_LHASA_NOW
 
-    log.info("#01 | SELECIONANDO AREAS DE RISCO")
-    arcpy.Select_analysis(LYR_IN_SZ, LYR_PRC_A_AREAS_DE_RISCO, "gridcode IN (2,3)")
+    if (GEOMETRY_ENGINE == "RASTER"):
+        log.info(etapa("#01 | CALCULANDO PERIGO NA GRADE DE SUSCETIBILIDADE (RASTER)"))
+        if (dataType == "N"):
+            camposGrupo = "NM_CODIGO;TX_ESTACAO;DT_COLETA;PERIGO"
+        elif (dataType == "H"):
+            camposGrupo = "NM_CODIGO;TX_ESTACAO;DT_COLETA;DH_H01;DH_H04;DH_H24;DH_H96;PERIGO"
+        resumo = analisar_raster(arcpy, LYR_PRC_VOLUME_CHUVA, LYR_IN_SZ, GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, obter_tabela().modelo(MODELO_LIMIARES), CAMPOS_LIMIARES, camposGrupo, "NM_M15 MAX;NM_H01 MAX;NM_H04 MAX;NM_H24 MAX;NM_H96 MAX", RASTER_RESOLUCAO, RASTER_CACHE, tamanho_tile=RASTER_TAMANHO_TILE, processos=RASTER_PROCESSOS)
+        contar(linhas=resumo["pixels"])
+        contar_feicoes(arcpy, GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE)
+        log.info("      " + str(resumo["pixels_perigo"]) + " pixels com perigo | " + str(resumo["pixels"]) + " pixels na grade | " + str(resumo["zonas"]) + " zonas | " + str(resumo["tiles"]) + " tiles em " + str(resumo["processos"]) + " processos")
+    else:
+        log.info(etapa("#01 | SELECIONANDO AREAS DE RISCO"))
+        arcpy.Select_analysis(LYR_IN_SZ, LYR_PRC_A_AREAS_DE_RISCO, "gridcode IN (2,3)")
+        contar_feicoes(arcpy, LYR_PRC_A_AREAS_DE_RISCO)
     
-    log.info("")
-    log.info("#02 | RELACIONANDO VOLUME E AREA DE RISCO")
-    # arcpy.Intersect_analysis(LYR_OUT_LHASA_NOW + " #;" + LYR_PRC_A_AREAS_DE_RISCO + " #", LYR_PRC_B_VOLUME_VS_RISCO, "ALL", "", "INPUT")
-    arcpy.Intersect_analysis(LYR_PRC_VOLUME_CHUVA + " #;" + LYR_PRC_A_AREAS_DE_RISCO + " #", LYR_PRC_B_VOLUME_VS_RISCO, "ALL", "", "INPUT")
+        log.info("")
+        log.info(etapa("#02 | RELACIONANDO VOLUME E AREA DE RISCO"))
+        # arcpy.Intersect_analysis(LYR_OUT_LHASA_NOW + " #;" + LYR_PRC_A_AREAS_DE_RISCO + " #", LYR_PRC_B_VOLUME_VS_RISCO, "ALL", "", "INPUT")
+        arcpy.Intersect_analysis(LYR_PRC_VOLUME_CHUVA + " #;" + LYR_PRC_A_AREAS_DE_RISCO + " #", LYR_PRC_B_VOLUME_VS_RISCO, "ALL", "", "INPUT")
+        contar_feicoes(arcpy, LYR_PRC_B_VOLUME_VS_RISCO)
     
-    log.info("")
-    log.info("#03 | CRIANDO CAMPO DE RISCO")
-    arcpy.AddField_management(LYR_PRC_B_VOLUME_VS_RISCO, FLD_RISCO, "TEXT", "", "", "20", "nivel_perigo", "NULLABLE", "NON_REQUIRED", "")
+        log.info("")
+        log.info(etapa("#03 | CRIANDO CAMPO DE RISCO"))
+        arcpy.AddField_management(LYR_PRC_B_VOLUME_VS_RISCO, FLD_RISCO, "TEXT", "", "", "20", "nivel_perigo", "NULLABLE", "NON_REQUIRED", "")
 
-    log.info("")
-    log.info("#04 | CALCULANDO CAMPO DE RISCO")
-    code_block = """def NivelPerigo(susceptibilidade, h01, h24, h96):
-    if((h01 >= 50 and h01 < 70) or (h24 >= 140 and h24 < 185) or ((h96 >= 185 and h96 < 255) and (h24 >= 55 and h24 < 100))):
-        if(susceptibilidade == 1): # BAIXA
-            return "SEM PERIGO"
-        elif(susceptibilidade == 2): # MEDIA
-            return "MODERADO"
-        elif(susceptibilidade == 3): # ALTA
-            return "ALTO"
-    elif((h01 >= 70) or (h24 >= 185) or (h96 >= 255 and h24 >= 100)): 
-        if(susceptibilidade == 1): # BAIXA
-            return "SEM PERIGO"
-        elif(susceptibilidade == 2): # MEDIA
-            return "MUITO ALTO"
-        elif(susceptibilidade == 3): # ALTA
-            return "CRITICO"
-    else:
-        # SEM CHUVA
-        return "BAIXO"
-    """
-#paramos aqui 29/04/2025   
-    arcpy.CalculateField_management(LYR_PRC_B_VOLUME_VS_RISCO, "PERIGO", "NivelPerigo( !gridcode!, !NM_H01!, !NM_H24!, !NM_H96! )", "PYTHON",code_block)
-    log.info("")
-    log.info("#05 | SELECIONANDO AREAS DE PERIGO")
-    arcpy.Select_analysis(LYR_PRC_B_VOLUME_VS_RISCO, LYR_PRC_C_AREAS_PERIGO, "gridcode IN (2,3)")
+        log.info("")
+        log.info(etapa("#04 | CALCULANDO CAMPO DE RISCO"))
+        # Limiares vêm da tabela versionada (limiares.json), compilada em tabela de consulta
+        modeloLimiares = obter_tabela().modelo(MODELO_LIMIARES)
+        code_block = modeloLimiares.gerar_code_block()
+        arcpy.CalculateField_management(LYR_PRC_B_VOLUME_VS_RISCO, "PERIGO", modeloLimiares.expressao_arcpy(CAMPOS_LIMIARES), "PYTHON", code_block)
+        contar_feicoes(arcpy, LYR_PRC_B_VOLUME_VS_RISCO)
+        log.info("")
+        log.info(etapa("#05 | SELECIONANDO AREAS DE PERIGO"))
+        arcpy.Select_analysis(LYR_PRC_B_VOLUME_VS_RISCO, LYR_PRC_C_AREAS_PERIGO, "gridcode IN (2,3)")
+        contar_feicoes(arcpy, LYR_PRC_C_AREAS_PERIGO)
 
-    log.info("")
-    arcpy.Delete_management(GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE)
-    if (dataType == "N"): 
-        log.info("#06 | AGREGANDO FEICOES SEMELHANTES")
-        arcpy.Dissolve_management(LYR_PRC_C_AREAS_PERIGO, GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, "NM_CODIGO;TX_ESTACAO;DT_COLETA;PERIGO", "NM_M15 MAX;NM_H01 MAX;NM_H04 MAX;NM_H24 MAX;NM_H96 MAX", "MULTI_PART", "DISSOLVE_LINES")
-    elif (dataType == "H"): 
-        arcpy.Dissolve_management(LYR_PRC_C_AREAS_PERIGO, GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, "NM_CODIGO;TX_ESTACAO;DT_COLETA;DH_H01;DH_H04;DH_H24;DH_H96;PERIGO", "NM_M15 MAX;NM_H01 MAX;NM_H04 MAX;NM_H24 MAX;NM_H96 MAX", "MULTI_PART", "DISSOLVE_LINES")
+        log.info("")
+        arcpy.Delete_management(GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE)
+        if (dataType == "N"): 
+            log.info(etapa("#06 | AGREGANDO FEICOES SEMELHANTES"))
+            arcpy.Dissolve_management(LYR_PRC_C_AREAS_PERIGO, GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, "NM_CODIGO;TX_ESTACAO;DT_COLETA;PERIGO", "NM_M15 MAX;NM_H01 MAX;NM_H04 MAX;NM_H24 MAX;NM_H96 MAX", "MULTI_PART", "DISSOLVE_LINES")
+        elif (dataType == "H"): 
+            arcpy.Dissolve_management(LYR_PRC_C_AREAS_PERIGO, GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, "NM_CODIGO;TX_ESTACAO;DT_COLETA;DH_H01;DH_H04;DH_H24;DH_H96;PERIGO", "NM_M15 MAX;NM_H01 MAX;NM_H04 MAX;NM_H24 MAX;NM_H96 MAX", "MULTI_PART", "DISSOLVE_LINES")
+        contar_feicoes(arcpy, GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE)
 
     try:
         log.info("")
-        log.info("#07 | GERANDO SHAPEFILE PARA SCRIPT DE EXPOSICAO")
-        current_folder = os.path.dirname(__file__)
-        rio_shpfl = os.path.join(current_folder, "data\\input\\RJ_LHASA_NOWCAST.shp")
-        if arcpy.Exists(rio_shpfl):
-            arcpy.management.Delete(rio_shpfl)
+        log.info(etapa("#07 | GERANDO SAIDA VETORIAL PARA SCRIPT DE EXPOSICAO"))
+        # arcpy.management.CopyFeatures(GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, rio_shpfl)
+        contar(feicoes=exportar_camada(arcpy, GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, OUT_EXPOSICAO))
+    except Exception as error:
+        log.error("Erro ao gerar saida vetorial do LHASA")
+        log.error(str(error))
 
-        arcpy.management.CopyFeatures(GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, rio_shpfl)
+    try:
+        resumo = exportar_tiles(arcpy, GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, TILES_OUT, TILES_ZOOM_MIN, TILES_ZOOM_MAX)
+        log.info("      TILES VETORIAIS: " + str(resumo["gerados"]) + " gerados | " + str(resumo["inalterados"]) + " inalterados | " + str(resumo["removidos"]) + " removidos")
     except Exception as error:
-        log.error("Erro ao gerar shapefile de saida do LHASA")
-        log.error(error.message)
+        log.error("Erro ao gerar tiles vetoriais do LHASA")
+        log.error(str(error))
 
     if(OUTPUT_TO_SDE == True):
         log.info("")
-        log.info("#08 | LIMPANDO DADO DE SAIDA NO SDE")
-        # arcpy.DeleteFeatures_management(SDE_WKSP_OUT)
-        arcpy.management.DeleteFeatures(SDE_WKSP_OUT)
+        log.info(etapa("#08 | COMPARANDO COM A SAIDA ATUAL NO SDE"))
+        # arcpy.management.DeleteFeatures(SDE_WKSP_OUT)
+        alteracoes = calcular_alteracoes(arcpy, GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, SDE_WKSP_OUT)
+        contar(feicoes=len(alteracoes["inserir"]) + len(alteracoes["atualizar"]) + len(alteracoes["remover"]) + alteracoes["inalteradas"])
 
         log.info("")
-        log.info("#09 | GERANDO SAIDA NO SDE")
-        # arcpy.Append_management(GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, SDE_WKSP_OUT, "TEST", "", "")
-        arcpy.management.Append(GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, SDE_WKSP_OUT,"TEST", "", "")
+        log.info(etapa("#09 | APLICANDO ALTERACOES NO SDE"))
+        # arcpy.management.Append(GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE, SDE_WKSP_OUT,"TEST", "", "")
+        resumo = aplicar_alteracoes(arcpy, SDE_WKSP_OUT, alteracoes)
+        contar(feicoes=resumo["inseridas"] + resumo["atualizadas"] + resumo["removidas"])
+        log.info("      " + str(resumo["inseridas"]) + " inseridas | " + str(resumo["atualizadas"]) + " atualizadas | " + str(resumo["removidas"]) + " removidas | " + str(resumo["inalteradas"]) + " inalteradas")
     
         log.info("")
-        log.info("#10 | APAGANDO DADOS DE PROCESSAMENTO")
+        log.info(etapa("#10 | APAGANDO DADOS DE PROCESSAMENTO"))
         # arcpy.Delete_management(GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE)
         arcpy.management.Delete(GDB_WKSP_OUT + "\\RJ_LHASA_" + dataType + "_" + OUT_FILE)
 
@@ -843,13 +927,82 @@ def historicalcast(startDate, endDate, startTime, endTime):
 
     return
 
+def historicalMap(startDate, endDate, startTime, endTime):
+    # Mapa animado do período: leituras horárias do histórico (todas as horas
+    # dos dias do período) em quadros por hora, gravados em um único HTML
+    log.info("")
+    log.info("---- MAPA HISTORICO ANIMADO ----")
+
+    try:
+        dateFrom = datetime.strptime(startDate + " " + startTime, "%d/%m/%Y %H:%M:%S")
+        dateTo = datetime.strptime(endDate + " " + endTime, "%d/%m/%Y %H:%M:%S")
+    except ValueError:
+        log.error(" ERRO | PERÍODO INVÁLIDO. FORMATO: DD/MM/AAAA HH:MM:SS")
+        return None
+    if (dateFrom.year != dateTo.year or dateFrom.month != dateTo.month):
+        log.error(" ERRO | PERÍODO INVÁLIDO. A CONSULTA HISTÓRICA DEVE MANTER DADOS DO MESMO MÊS.")
+        return None
+    if (dateFrom > dateTo):
+        log.error(" ERRO | PERÍODO INVÁLIDO. O INÍCIO DEVE SER ANTERIOR AO TÉRMINO.")
+        return None
+
+    loadHistoricalData(dateFrom.strftime("%Y"), dateFrom.strftime("%m"), dateFrom.strftime("%d"), dateTo.strftime("%d"), "00", "23")
+
+    log.info("")
+    log.info(etapa("#14 | GERANDO MAPA HISTORICO ANIMADO"))
+    from mapa_historico import gerar_mapa_historico
+    modelo = obter_tabela().modelo(MODELO_LIMIARES)
+    campos = ["NM_CODIGO", "DT_COLETA"] + [CAMPOS_LIMIARES[variavel] for variavel in modelo.variaveis]
+    with arcpy.da.SearchCursor(arcpy.env.scratchWorkspace + "\\" + TBL_PRC_CHUVA_HISTORICA, campos) as cursorSPH:
+        readings = [(row[0], row[1], dict(zip(modelo.variaveis, row[2:]))) for row in cursorSPH]
+    contar(linhas=len(readings))
+    # Zonas reprojetadas pelo próprio arcpy para WGS84 (o mapa é Leaflet): sem pyproj
+    with arcpy.da.SearchCursor(LYR_IN_PZ, LYR_PZ_FLDS[:3], spatial_reference=arcpy.SpatialReference(4326)) as cursorPZ:
+        zones = [(int(row[1]), unidecode(row[2].upper()), row[0]) for row in cursorPZ]
+
+    mapFile = gerar_mapa_historico(zones, readings, modelo, dateFrom, dateTo)
+    if mapFile is None:
+        log.error("      Nenhuma leitura no período")
+    else:
+        log.info("      Mapa histórico gerado: " + mapFile)
+    return mapFile
+
+def generateMaps():
+    # #11 e #12: os dois mapas usam as estações já carregadas pelo nowcast
+    # (busca a lista no INMET uma única vez quando não houver) e a chuva
+    # acumulada em 24h das leituras, para a grade de chuva
+    from mapas import gerar_todos_mapas
+    from grade_chuva import pontos_chuva
+    gerar_todos_mapas(ARR_INMET or None, chuva=pontos_chuva(ARR_PD))
+
+    return
+
+def daemon(interval=DAEMON_INTERVAL):
+    # Execução contínua do nowcast: a tabela de limiares é relida a cada ciclo
+    # quando o arquivo muda, sem reiniciar o processo
+    while True:
+        try:
+            if obter_tabela().recarregar_se_alterado():
+                log.info("TABELA DE LIMIARES RECARREGADA | VERSAO " + str(obter_tabela().versao))
+
+            with execucao("nowcast", RELATORIO_EXECUCAO, interval):
+                initialize()
+                nowcast()
+                generateMaps()
+        except Exception as e:
+            log.error("ERRO NO CICLO DO DAEMON: " + str(e))
+
+        waitTime = interval - (time.time() % interval)
+        log.info("")
+        log.info("PROXIMA EXECUCAO EM " + str(int(waitTime)) + " SEGUNDOS")
+        time.sleep(waitTime)
+
 if __name__ == "__main__":
 
-    # log = log(os.path.dirname(__file__), LOG_SUFIX, "LHASA")
-    # log = logging()
-    log = logging.getLogger(__name__)
-    file_handler = logging.FileHandler(LOG_FILE)
-    log.addHandler(file_handler)
+    # --profile=cpu|mem|sample: perfis gravados ao lado do relatório de execuções
+    profileMode, sys.argv[1:] = extrair_opcao(sys.argv[1:])
+
+    configurarLog(LOG_LEVEL, LOG_FILE if LOG_TO_FILE else None, LOG_TO_CONSOLE, LOG_JSON, raiz=True)
     log.info("--------------------------------")
     log.info("ANALISE DE RISCO DE DESLIZAMENTO")
     log.info("--------------------------------")
@@ -862,32 +1015,27 @@ if __name__ == "__main__":
     #     # loadHistoricalData("2019","01")
     # elif (sys.argv[1] == "-h"):
 
-    if (sys.argv[1] == "-h"):
-        historicalcast(str(sys.argv[2]), str(sys.argv[3]), str(sys.argv[4]), str(sys.argv[5]))
-        #historicalcast("01/01/2019", "02/01/2019", "08:00:00", "20:00:00")
-    elif (sys.argv[1] == "-n"):
-        nowcast()
+    with perfilar(profileMode, os.path.dirname(RELATORIO_EXECUCAO), "LHASA_RIO") as profile:
+        observar(profile.marcar)
+        if (sys.argv[1] == "-h"):
+            with execucao("historico", RELATORIO_EXECUCAO):
+                historicalcast(str(sys.argv[2]), str(sys.argv[3]), str(sys.argv[4]), str(sys.argv[5]))
+                #historicalcast("01/01/2019", "02/01/2019", "08:00:00", "20:00:00")
+                generateMaps()
+        elif (sys.argv[1] == "-n"):
+            with execucao("nowcast", RELATORIO_EXECUCAO):
+                nowcast()
+                generateMaps()
+        elif (sys.argv[1] == "-a"):
+            with execucao("historico_animado", RELATORIO_EXECUCAO):
+                historicalMap(str(sys.argv[2]), str(sys.argv[3]), str(sys.argv[4]), str(sys.argv[5]))
+        elif (sys.argv[1] == "-d"):
+            daemon()
 
     # nowcast()
 
     log.info("")
-    log.info("#11 | GERANDO MAPA GEORREFERENCIADO")
-    try:
-        from gerar_mapa import gerar_mapa_completo
-        nome_mapa = gerar_mapa_completo()
-        log.info(f"      Mapa básico gerado: {nome_mapa}")
-    except Exception as e:
-        log.error(f"      Erro ao gerar mapa básico: {str(e)}")
-    
-    log.info("")
-    log.info("#12 | GERANDO MAPA DE BOLHAS")
-    try:
-        from mapa_bolhas import gerar_mapa_bolhas_completo
-        nome_mapa_bolhas = gerar_mapa_bolhas_completo()
-        log.info(f"      Mapa de bolhas gerado: {nome_mapa_bolhas}")
-    except Exception as e:
-        log.error(f"      Erro ao gerar mapa de bolhas: {str(e)}")
-    
-    log.info("")
+    for profileFile in profile.arquivos:
+        log.info("PERFIL GRAVADO: " + profileFile)
     log.info("---- PROCESSO FINALIZADO ----")
     log.info("")
@@ -1,42 +1,409 @@
 # Mock do arcpy para desenvolvimento sem ArcGIS
 # Substitui funcionalidades básicas para evitar erros de importação
+# Tabelas e feições ficam em memória (linhas como dicionários), com cursores,
+# filtro WHERE e as ferramentas de geoprocessamento usadas pelo LHASA RIO.
+# Operações geométricas (interseção e união) usam o motor_shapely se disponível.
 
-class MockArcPy:
-    def __init__(self):
-        self.env = MockEnv()
-        self.da = MockDA()
-        self.management = MockManagement()
-    
-    def SetLogHistory(self, value):
-        pass
-    
-    def Exists(self, path):
+import os
+import re
+
+CAMPO_GEOMETRIA = "SHAPE"
+
+# ---------------------------------------------------------------------------
+# Cláusulas WHERE (subconjunto SQL usado pelo LHASA RIO)
+# ---------------------------------------------------------------------------
+
+_TOKENS_WHERE = re.compile(r"\s*(?:(?P<texto>'(?:[^']|'')*')|(?P<numero>-?\d+(?:\.\d+)?)|(?P<operador><>|!=|<=|>=|=|<|>)|(?P<simbolo>[(),])|(?P<nome>[A-Za-z_][A-Za-z0-9_\.]*))")
+
+def _tokenizar(where):
+    tokens, posicao = [], 0
+    where = where.strip()
+    while posicao < len(where):
+        achado = _TOKENS_WHERE.match(where, posicao)
+        if not achado or achado.end() == posicao:
+            raise ValueError(f"Cláusula WHERE inválida: {where!r}")
+        tipo = achado.lastgroup
+        valor = achado.group(tipo)
+        if tipo == "texto":
+            valor = valor[1:-1].replace("''", "'")
+        elif tipo == "numero":
+            valor = float(valor) if "." in valor else int(valor)
+        elif tipo == "nome" and valor.upper() in ("AND", "OR", "NOT", "LIKE", "IN", "IS", "NULL"):
+            tipo, valor = "palavra", valor.upper()
+        tokens.append((tipo, valor))
+        posicao = achado.end()
+    return tokens
+
+def _like_para_regex(padrao):
+    partes = []
+    for caractere in padrao:
+        partes.append(".*" if caractere == "%" else "." if caractere == "_" else re.escape(caractere))
+    return re.compile("".join(partes), re.DOTALL)
+
+def _comparar(operador, a, b):
+    if a is None or b is None:
         return False
-    
-    def Delete_management(self, path):
-        pass
-    
-    def CreateTable_management(self, *args):
-        pass
-    
-    def CopyFeatures_management(self, *args):
-        pass
-    
-    def Select_analysis(self, *args):
-        pass
-    
-    def Intersect_analysis(self, *args):
-        pass
-    
-    def AddField_management(self, *args):
+    try:
+        if operador == "=":
+            return a == b
+        if operador in ("<>", "!="):
+            return a != b
+        if operador == "<":
+            return a < b
+        if operador == ">":
+            return a > b
+        if operador == "<=":
+            return a <= b
+        return a >= b
+    except TypeError:
+        return False
+
+class _ParserWhere:
+    """Parser descendente recursivo: OR > AND > NOT > comparação"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.posicao = 0
+
+    def _atual(self):
+        return self.tokens[self.posicao] if self.posicao < len(self.tokens) else (None, None)
+
+    def _consumir(self, tipo=None, valor=None):
+        atual = self._atual()
+        if (tipo and atual[0] != tipo) or (valor is not None and atual[1] != valor):
+            raise ValueError(f"Cláusula WHERE inválida perto de {atual[1]!r}")
+        self.posicao += 1
+        return atual
+
+    def analisar(self):
+        filtro = self._ou()
+        if self.posicao != len(self.tokens):
+            raise ValueError(f"Cláusula WHERE inválida perto de {self._atual()[1]!r}")
+        return filtro
+
+    def _ou(self):
+        termos = [self._e()]
+        while self._atual() == ("palavra", "OR"):
+            self._consumir()
+            termos.append(self._e())
+        return termos[0] if len(termos) == 1 else (lambda v, t=termos: any(f(v) for f in t))
+
+    def _e(self):
+        termos = [self._nao()]
+        while self._atual() == ("palavra", "AND"):
+            self._consumir()
+            termos.append(self._nao())
+        return termos[0] if len(termos) == 1 else (lambda v, t=termos: all(f(v) for f in t))
+
+    def _nao(self):
+        if self._atual() == ("palavra", "NOT"):
+            self._consumir()
+            interno = self._nao()
+            return lambda v: not interno(v)
+        return self._comparacao()
+
+    def _operando(self):
+        tipo, valor = self._consumir()
+        if tipo == "nome":
+            return lambda v, campo=valor: v(campo)
+        if tipo in ("texto", "numero"):
+            return lambda v, constante=valor: constante
+        raise ValueError(f"Operando inválido na cláusula WHERE: {valor!r}")
+
+    def _comparacao(self):
+        if self._atual() == ("simbolo", "("):
+            self._consumir()
+            interno = self._ou()
+            self._consumir("simbolo", ")")
+            return interno
+
+        esquerda = self._operando()
+        tipo, valor = self._atual()
+        negado = False
+        if (tipo, valor) == ("palavra", "NOT"):
+            self._consumir()
+            negado = True
+            tipo, valor = self._atual()
+
+        if tipo == "operador":
+            self._consumir()
+            direita = self._operando()
+            return lambda v: _comparar(valor, esquerda(v), direita(v))
+        if (tipo, valor) == ("palavra", "LIKE"):
+            self._consumir()
+            regex = _like_para_regex(self._consumir("texto")[1])
+            return lambda v: (esquerda(v) is not None and bool(regex.fullmatch(str(esquerda(v))))) != negado
+        if (tipo, valor) == ("palavra", "IN"):
+            self._consumir()
+            self._consumir("simbolo", "(")
+            valores = [self._consumir()[1]]
+            while self._atual() == ("simbolo", ","):
+                self._consumir()
+                valores.append(self._consumir()[1])
+            self._consumir("simbolo", ")")
+            return lambda v: (esquerda(v) in valores) != negado
+        if (tipo, valor) == ("palavra", "IS"):
+            self._consumir()
+            negado = self._atual() == ("palavra", "NOT")
+            if negado:
+                self._consumir()
+            self._consumir("palavra", "NULL")
+            return lambda v: (esquerda(v) is None) != negado
+        raise ValueError(f"Cláusula WHERE inválida perto de {valor!r}")
+
+def compilar_where(where):
+    """Compila a cláusula WHERE em função filtro(leitor_de_campo) -> bool"""
+    if where is None or str(where).strip() in ("", "1=1"):
+        return None
+    return _ParserWhere(_tokenizar(str(where))).analisar()
+
+# ---------------------------------------------------------------------------
+# Tabelas e cursores em memória
+# ---------------------------------------------------------------------------
+
+class Tabela:
+    """Tabela ou classe de feições em memória (linhas como dicionários)"""
+
+    def __init__(self, campos=None):
+        self.campos = []
+        self._indice_campos = {}
+        self.linhas = []
+        for campo in campos or []:
+            self.adicionar_campo(campo)
+
+    def adicionar_campo(self, campo):
+        if campo.upper() not in self._indice_campos:
+            self.campos.append(campo)
+            self._indice_campos[campo.upper()] = campo
+        return self._indice_campos[campo.upper()]
+
+    def nome_campo(self, campo):
+        """Nome real do campo (busca sem diferenciar maiúsculas)"""
+        return self._indice_campos.get(campo.upper(), campo)
+
+    def leitor(self, linha):
+        """Função campo -> valor usada pelos filtros WHERE"""
+        return lambda campo: linha.get(self.nome_campo(campo))
+
+    def filtrar(self, where):
+        filtro = compilar_where(where)
+        if filtro is None:
+            return list(self.linhas)
+        return [linha for linha in self.linhas if filtro(self.leitor(linha))]
+
+    def copia(self, linhas=None):
+        nova = Tabela(self.campos)
+        nova.linhas = [dict(linha) for linha in (self.linhas if linhas is None else linhas)]
+        return nova
+
+def _resolver_campos(tabela, campos, criar=False):
+    """Traduz tokens de campo (SHAPE@JSON, OID@...) em (nome, formato)"""
+    if isinstance(campos, str):
+        campos = [c.strip() for c in campos.split(";")] if campos != "*" else list(tabela.campos)
+    resolvidos = []
+    for campo in campos:
+        nome, _, formato = campo.partition("@")
+        if formato == "OID":
+            resolvidos.append((nome, "OID"))
+            continue
+        if formato or campo.upper() == CAMPO_GEOMETRIA:
+            nome = CAMPO_GEOMETRIA
+        nome = tabela.adicionar_campo(nome) if criar else tabela.nome_campo(nome)
+        resolvidos.append((nome, formato.upper() if formato else None))
+    return resolvidos
+
+class MockCursor:
+    """Cursor de leitura com filtro WHERE; pode ser iterado mais de uma vez"""
+
+    def __init__(self, motor, caminho, campos, where=None, *args, **kwargs):
+        self._motor = motor
+        self._caminho = caminho
+        self._tabela = motor._obter(caminho)
+        self._campos = _resolver_campos(self._tabela, campos)
+        self._filtro = compilar_where(where)
+        self.fields = [c if f is None else f"{c}@{f}" for c, f in self._campos]
+
+    def _linhas(self):
+        for indice, linha in enumerate(list(self._tabela.linhas)):
+            if self._filtro is None or self._filtro(self._tabela.leitor(linha)):
+                yield indice, linha
+
+    def _ler(self, linha, indice):
+        valores = []
+        for nome, formato in self._campos:
+            if formato == "OID":
+                valores.append(indice)
+            elif nome == CAMPO_GEOMETRIA:
+                valores.append(self._motor._ler_geometria(linha.get(nome), formato))
+            else:
+                valores.append(linha.get(nome))
+        return valores
+
+    def _escrever(self, linha, valores):
+        for (nome, formato), valor in zip(self._campos, valores):
+            if formato == "OID":
+                continue
+            linha[nome] = self._motor._escrever_geometria(valor) if nome == CAMPO_GEOMETRIA else valor
+
+    def __iter__(self):
+        for indice, linha in self._linhas():
+            yield tuple(self._ler(linha, indice))
+
+    def next(self):
+        if not hasattr(self, "_iterador"):
+            self._iterador = iter(self)
+        return next(self._iterador)
+
+    __next__ = next
+
+    def reset(self):
+        if hasattr(self, "_iterador"):
+            del self._iterador
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+class MockUpdateCursor(MockCursor):
+    """Cursor de atualização: updateRow/deleteRow sobre a linha corrente"""
+
+    def __init__(self, motor, caminho, campos, where=None, *args, **kwargs):
+        super().__init__(motor, caminho, campos, where)
+        self._atual = None
+        self._excluidas = set()
+        self._alterado = False
+
+    def __iter__(self):
+        try:
+            for indice, linha in self._linhas():
+                self._atual = linha
+                yield self._ler(linha, indice)
+        finally:
+            self._compactar()
+
+    def updateRow(self, valores):
+        self._escrever(self._atual, valores)
+        self._alterado = True
+
+    def deleteRow(self):
+        self._excluidas.add(id(self._atual))
+        self._alterado = True
+
+    def _compactar(self):
+        if self._excluidas:
+            self._tabela.linhas = [l for l in self._tabela.linhas if id(l) not in self._excluidas]
+            self._excluidas = set()
+        if self._alterado:
+            self._motor._persistir(self._caminho)
+            self._alterado = False
+
+    def __exit__(self, *args):
+        self._compactar()
+        return False
+
+class MockInsertCursor(MockCursor):
+    """Cursor de inserção; novos campos passam a fazer parte do esquema"""
+
+    def __init__(self, motor, caminho, campos, *args, **kwargs):
+        self._motor = motor
+        self._caminho = caminho
+        self._tabela = motor._obter(caminho, criar=True)
+        self._campos = _resolver_campos(self._tabela, campos, criar=True)
+        self.fields = list(campos)
+        self._alterado = False
+
+    def __iter__(self):
+        return iter([])
+
+    def insertRow(self, valores):
+        linha = dict.fromkeys(self._tabela.campos)
+        self._escrever(linha, valores)
+        self._tabela.linhas.append(linha)
+        self._alterado = True
+        return len(self._tabela.linhas) - 1
+
+    def __exit__(self, *args):
+        if self._alterado:
+            self._motor._persistir(self._caminho)
+            self._alterado = False
+        return False
+
+    def __del__(self):
+        try:
+            self.__exit__()
+        except Exception:
+            pass
+
+class MockEditor:
+    """Sessão de edição: desfaz as alterações do workspace se ocorrer erro"""
+
+    def __init__(self, motor, workspace):
+        self._motor = motor
+        self._prefixo = motor._chave(workspace)
+        self._copia = None
+        self.isEditing = False
+
+    def startEditing(self, with_undo=True, multiuser_mode=True):
+        self._copia = {chave: (tabela, [dict(l) for l in tabela.linhas], list(tabela.campos))
+                       for chave, tabela in self._motor._tabelas.items() if chave.startswith(self._prefixo)}
+        self.isEditing = True
+
+    def stopEditing(self, save_changes=True):
+        if not save_changes:
+            for chave, (tabela, linhas, campos) in self._copia.items():
+                tabela.linhas = linhas
+                tabela.campos, tabela._indice_campos = campos, {c.upper(): c for c in campos}
+                self._motor._tabelas[chave] = tabela
+                self._motor._persistir(chave)
+        self._copia = None
+        self.isEditing = False
+
+    def startOperation(self):
         pass
-    
-    def CalculateField_management(self, *args):
+
+    def stopOperation(self):
         pass
-    
-    def Dissolve_management(self, *args):
+
+    def abortOperation(self):
         pass
 
+    def __enter__(self):
+        self.startEditing()
+        return self
+
+    def __exit__(self, tipo, *args):
+        self.stopEditing(save_changes=tipo is None)
+        return False
+
+class MockField:
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+
+class MockSpatialReference:
+    """Só identifica o sistema; o mock não reprojeta (as feições de teste já estão nele)"""
+
+    def __init__(self, codigo):
+        self.factoryCode = codigo
+
+class MockResult:
+    """Resultado de ferramenta: valores de saída como texto, como no arcpy"""
+
+    def __init__(self, *saidas):
+        self.saidas = [str(s) for s in saidas]
+
+    def getOutput(self, indice):
+        return self.saidas[indice]
+
+    def __getitem__(self, indice):
+        return self.saidas[indice]
+
+# ---------------------------------------------------------------------------
+# Interface arcpy
+# ---------------------------------------------------------------------------
+
 class MockEnv:
     def __init__(self):
         self.overwriteOutput = True
@@ -45,46 +412,253 @@ class MockEnv:
         self.scratchWorkspace = "in_memory"
 
 class MockDA:
-    def SearchCursor(self, *args, **kwargs):
-        return MockCursor()
-    
-    def UpdateCursor(self, *args, **kwargs):
-        return MockCursor()
-    
-    def InsertCursor(self, *args, **kwargs):
-        return MockCursor()
+    def __init__(self, motor):
+        self._motor = motor
+
+    def SearchCursor(self, caminho, campos, where=None, *args, **kwargs):
+        return MockCursor(self._motor, caminho, campos, where)
+
+    def UpdateCursor(self, caminho, campos, where=None, *args, **kwargs):
+        return MockUpdateCursor(self._motor, caminho, campos, where)
+
+    def InsertCursor(self, caminho, campos, *args, **kwargs):
+        return MockInsertCursor(self._motor, caminho, campos)
+
+    def Editor(self, workspace, *args):
+        return MockEditor(self._motor, workspace)
 
 class MockManagement:
-    def Delete(self, path):
-        pass
-    
-    def CopyFeatures(self, *args):
-        pass
-    
-    def DeleteFeatures(self, path):
-        pass
-    
-    def Append(self, *args):
-        pass
+    def __init__(self, motor):
+        self._motor = motor
 
-class MockCursor:
-    def __enter__(self):
-        return self
-    
-    def __exit__(self, *args):
-        pass
-    
-    def insertRow(self, row):
-        pass
-    
-    def deleteRow(self):
+    def Delete(self, caminho, *args):
+        self._motor.Delete_management(caminho)
+
+    def CopyFeatures(self, origem, destino, *args):
+        self._motor.CopyFeatures_management(origem, destino)
+
+    def DeleteFeatures(self, caminho):
+        tabela = self._motor._obter(caminho, criar=True)
+        tabela.linhas = []
+        self._motor._persistir(caminho)
+
+    def Append(self, origens, destino, schema_type="TEST", *args):
+        tabela_destino = self._motor._obter(destino, criar=True)
+        for origem in (origens if isinstance(origens, (list, tuple)) else str(origens).split(";")):
+            tabela_origem = self._motor._obter(origem)
+            for campo in tabela_origem.campos:
+                tabela_destino.adicionar_campo(campo)
+            for linha in tabela_origem.linhas:
+                nova = dict.fromkeys(tabela_destino.campos)
+                nova.update({tabela_destino.nome_campo(c): v for c, v in linha.items()})
+                tabela_destino.linhas.append(nova)
+        self._motor._persistir(destino)
+
+class MockArcPy:
+    """Subconjunto do arcpy com tabelas e feições mantidas em memória"""
+
+    def __init__(self):
+        self.env = MockEnv()
+        self.da = MockDA(self)
+        self.management = MockManagement(self)
+        self._tabelas = {}
+
+    # -- armazenamento -------------------------------------------------------
+
+    def _caminho(self, caminho):
+        caminho = str(caminho).strip()
+        for variavel in ("%scratchworkspace%", "%scratchWorkspace%"):
+            caminho = caminho.replace(variavel, self.env.scratchWorkspace)
+        return caminho.replace("\\", os.sep) if os.sep == "/" else caminho
+
+    def _chave(self, caminho):
+        return self._caminho(caminho).replace("\\", "/").lower()
+
+    def _obter(self, caminho, criar=False):
+        chave = self._chave(caminho)
+        if chave not in self._tabelas:
+            if not criar:
+                raise RuntimeError(f"ERROR 000732: Dataset {caminho} does not exist or is not supported")
+            self._tabelas[chave] = Tabela()
+        return self._tabelas[chave]
+
+    def _gravar(self, caminho, tabela):
+        self._tabelas[self._chave(caminho)] = tabela
+        self._persistir(caminho)
+
+    def _persistir(self, caminho):
         pass
-    
-    def reset(self):
+
+    def _ler_geometria(self, valor, formato):
+        return valor
+
+    def _escrever_geometria(self, valor):
+        return valor
+
+    def _unir_geometrias(self, geometrias):
+        try:
+            from motor_shapely import unir_geometrias
+        except ImportError:
+            return geometrias[0] if geometrias else None
+        return unir_geometrias(geometrias)
+
+    def carregar(self, caminho, linhas, campos=None):
+        """Registra dados prontos (lista de dicionários) como tabela ou camada"""
+        if not isinstance(linhas, Tabela):
+            tabela = Tabela(campos)
+            for linha in linhas:
+                for campo in linha:
+                    tabela.adicionar_campo(campo)
+            tabela.linhas = [dict(dict.fromkeys(tabela.campos), **linha) for linha in linhas]
+            linhas = tabela
+        self._tabelas[self._chave(caminho)] = linhas
+        return linhas
+
+    def SetLogHistory(self, value):
         pass
-    
-    def __iter__(self):
-        return iter([])
+
+    def SpatialReference(self, codigo):
+        return MockSpatialReference(codigo)
+
+    def Exists(self, caminho):
+        return self._chave(caminho) in self._tabelas
+
+    def Delete_management(self, caminho, *args):
+        self._tabelas.pop(self._chave(caminho), None)
+
+    def ListFields(self, caminho, *args):
+        tabela = self._obter(caminho)
+        campos = []
+        for campo in tabela.campos:
+            valor = next((l[campo] for l in tabela.linhas if l.get(campo) is not None), None)
+            if campo == CAMPO_GEOMETRIA:
+                tipo = "Geometry"
+            elif isinstance(valor, int):
+                tipo = "Integer"
+            elif isinstance(valor, float):
+                tipo = "Double"
+            elif hasattr(valor, "isoformat"):
+                tipo = "Date"
+            else:
+                tipo = "String"
+            campos.append(MockField(campo, tipo))
+        return campos
+
+    def GetCount_management(self, caminho):
+        return MockResult(len(self._obter(caminho).linhas))
+
+    def CreateTable_management(self, caminho, nome, template=None, *args):
+        campos = self._obter(template).campos if template and self.Exists(template) else []
+        self._gravar(os.path.join(self._caminho(caminho), nome), Tabela(campos))
+
+    def CopyFeatures_management(self, origem, destino, *args):
+        tabela = self._obter(origem).copia() if self.Exists(origem) else Tabela([CAMPO_GEOMETRIA])
+        self._gravar(destino, tabela)
+
+    def AddField_management(self, tabela, campo, *args):
+        tabela = self._obter(tabela)
+        nome = tabela.adicionar_campo(campo)
+        for linha in tabela.linhas:
+            linha.setdefault(nome, None)
+
+    # -- geoprocessamento ----------------------------------------------------
+
+    def Select_analysis(self, entrada, saida, where=None):
+        tabela = self._obter(entrada)
+        self._gravar(saida, tabela.copia(tabela.filtrar(where)))
+
+    def Intersect_analysis(self, entradas, saida, join_attributes="ALL", *args):
+        """Interseção pelo motor Shapely; sem ele a saída fica vazia com o esquema combinado"""
+        zonas, areas = [self._obter(e) for e in camadas_entrada(entradas)[:2]]
+        try:
+            from motor_shapely import intersectar
+        except ImportError:
+            intersectar = lambda zonas, areas: esquema_intersecao(zonas, areas)[0]
+        self._gravar(saida, intersectar(zonas, areas))
+
+    def CalculateField_management(self, tabela, campo, expressao, expression_type="PYTHON3", code_block=""):
+        """Executa o code block e avalia a expressão (!campo!) para cada linha"""
+        caminho = tabela
+        tabela = self._obter(tabela)
+        nome = tabela.adicionar_campo(campo)
+
+        contexto = {}
+        if code_block:
+            exec(code_block, contexto)
+        campos = []
+        def substituir(achado):
+            campos.append(tabela.nome_campo(achado.group(1)))
+            return f"_valores[{len(campos) - 1}]"
+        compilada = compile(re.sub(r"!([^!]+)!", substituir, str(expressao)), "<expressao>", "eval")
+
+        for linha in tabela.linhas:
+            contexto["_valores"] = [linha.get(c) for c in campos]
+            linha[nome] = eval(compilada, contexto)
+        self._persistir(caminho)
+
+    def Dissolve_management(self, entrada, saida, dissolve_field="", statistics_fields="", multi_part="MULTI_PART", *args):
+        """Agrupa por campos, calcula as estatísticas e une as geometrias de cada grupo"""
+        tabela = self._obter(entrada)
+        campos_grupo = [tabela.nome_campo(c.strip()) for c in str(dissolve_field or "").split(";") if c.strip()]
+        estatisticas = []
+        for item in str(statistics_fields or "").split(";"):
+            if item.strip():
+                campo, tipo = item.split()
+                estatisticas.append((tabela.nome_campo(campo), tipo.upper()))
+
+        grupos = {}
+        for linha in tabela.linhas:
+            grupos.setdefault(tuple(linha.get(c) for c in campos_grupo), []).append(linha)
+
+        resultado = Tabela(campos_grupo + [f"{t}_{c}" for c, t in estatisticas] + [CAMPO_GEOMETRIA])
+        for chave, linhas in grupos.items():
+            nova = dict(zip(campos_grupo, chave))
+            for campo, tipo in estatisticas:
+                valores = [l.get(campo) for l in linhas if l.get(campo) is not None]
+                nova[f"{tipo}_{campo}"] = _estatistica(tipo, valores)
+            geometria = self._unir_geometrias([l.get(CAMPO_GEOMETRIA) for l in linhas if l.get(CAMPO_GEOMETRIA) is not None])
+            if multi_part == "SINGLE_PART" and hasattr(geometria, "geoms"):
+                for parte in geometria.geoms:
+                    resultado.linhas.append(dict(nova, **{CAMPO_GEOMETRIA: parte}))
+                continue
+            nova[CAMPO_GEOMETRIA] = geometria
+            resultado.linhas.append(nova)
+        self._gravar(saida, resultado)
+
+def camadas_entrada(entradas):
+    """Lista de camadas de "a #;b #" (formato das ferramentas de sobreposição)"""
+    if isinstance(entradas, str):
+        return [e.strip().rstrip("#").strip() for e in entradas.split(";") if e.strip()]
+    return list(entradas)
+
+def esquema_intersecao(zonas, areas):
+    """Tabela vazia com os campos das duas camadas (repetidos ganham sufixo _1)"""
+    campos_zonas = [c for c in zonas.campos if c != CAMPO_GEOMETRIA]
+    existentes = {c.upper() for c in campos_zonas}
+    renomear = {}
+    for campo in areas.campos:
+        if campo != CAMPO_GEOMETRIA:
+            renomear[campo] = campo if campo.upper() not in existentes else campo + "_1"
+    return Tabela(campos_zonas + list(renomear.values()) + [CAMPO_GEOMETRIA]), renomear
+
+def _estatistica(tipo, valores):
+    if tipo == "COUNT":
+        return len(valores)
+    if not valores:
+        return None
+    if tipo == "MAX":
+        return max(valores)
+    if tipo == "MIN":
+        return min(valores)
+    if tipo == "SUM":
+        return sum(valores)
+    if tipo == "MEAN":
+        return sum(valores) / float(len(valores))
+    if tipo == "FIRST":
+        return valores[0]
+    if tipo == "LAST":
+        return valores[-1]
+    raise ValueError(f"Estatística não suportada: {tipo}")
 
 # Instância global
 arcpy = MockArcPy()
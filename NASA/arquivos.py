@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""
+Gravação atômica de arquivos - LHASA (RIO, MG e plugin QGIS)
+O conteúdo é escrito em um temporário no mesmo diretório do destino e
+renomeado no final (os.replace): quem lê o arquivo (mapas, painel, QGIS,
+dashboards) vê a versão anterior inteira ou a nova inteira, nunca uma gravação
+pela metade. O temporário é removido se a gravação falhar.
+
+Uso:
+    gravar_atomico("relatorio.json", texto)              # str (UTF-8) ou bytes
+    gerar_atomico("zonas.gpkg", lambda temporario: ...)  # quem grava precisa do caminho
+"""
+
+import os
+import tempfile
+
+def gerar_atomico(caminho, escrever):
+    """Executa escrever(temporario), que cria o arquivo, e renomeia para o destino"""
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, prefix=".tmp_", suffix=os.path.splitext(caminho)[1])
+    os.close(descritor)
+    os.remove(temporario) # alguns gravadores (sqlite, GDAL, QGIS) não sobrescrevem arquivos
+    try:
+        escrever(temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+def gravar_atomico(caminho, dados):
+    """Grava dados (bytes, ou str em UTF-8) em caminho"""
+    if isinstance(dados, str):
+        dados = dados.encode("utf-8")
+
+    def escrever(temporario):
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(dados)
+
+    gerar_atomico(caminho, escrever)
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark - LHASA RIO
+Gera dados sintéticos na escala do Rio ou de Minas Gerais (zonas, polígonos de
+suscetibilidade, estações INMET e meses de histórico de 15 minutos no formato
+lido por loadHistoricalData), executa o pipeline com o motor Shapely e mede o
+tempo de cada etapa. O resultado é gravado em JSON para comparação entre
+versões (--comparar). A etapa "inicializacao" mede o import do LHASA_RIO em um
+interpretador novo (início a frio do CLI).
+
+Uso:
+    python benchmark.py --escala rio
+    python benchmark.py --inicializacao
+    python benchmark.py --escala mg --poligonos 50000 --comparar benchmarks/mg_anterior.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import numpy as np
+from datetime import datetime, timedelta
+
+PROJECT_PATH = os.path.dirname(os.path.abspath(__file__))
+DIRETORIO_RESULTADOS = os.path.join(PROJECT_PATH, "benchmarks")
+
+ESCALAS = {
+    "rio": {"zonas": 33, "poligonos": 20000, "estacoes": 33, "meses": 1, "limites": (-43.80, -23.08, -43.10, -22.75)},
+    "mg": {"zonas": 853, "poligonos": 200000, "estacoes": 260, "meses": 1, "limites": (-51.05, -22.92, -39.85, -14.23)},
+}
+TOLERANCIA_REGRESSAO = 0.20 # etapas 20% mais lentas que a referência são reportadas
+REPETICOES_INICIALIZACAO = 5
+# Não devem ser carregados só pelo import do LHASA_RIO (ficam para a etapa que os usa)
+MODULOS_PESADOS = ("numpy", "pandas", "shapely", "pyogrio", "folium", "matplotlib", "seaborn", "urllib3", "requests", "rasterio")
+
+# ---------------------------------------------------------------------------
+# Geradores de dados sintéticos
+# ---------------------------------------------------------------------------
+
+def _grade_caixas(quantidade, limites):
+    """Divide o retângulo em ~quantidade células (min_x, min_y, max_x, max_y)"""
+    min_x, min_y, max_x, max_y = limites
+    colunas = max(int(np.ceil(np.sqrt(quantidade * (max_x - min_x) / (max_y - min_y)))), 1)
+    linhas = max(int(np.ceil(quantidade / colunas)), 1)
+    largura, altura = (max_x - min_x) / colunas, (max_y - min_y) / linhas
+    caixas = []
+    for indice in range(quantidade):
+        linha, coluna = divmod(indice, colunas)
+        x0, y0 = min_x + coluna * largura, min_y + linha * altura
+        caixas.append((x0, y0, x0 + largura, y0 + altura))
+    return caixas
+
+def _feicao(caixa, propriedades):
+    x0, y0, x1, y1 = caixa
+    return {"type": "Feature", "properties": propriedades,
+            "geometry": {"type": "Polygon", "coordinates": [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]}}
+
+def definicoes_estacoes(quantidade):
+    """Definições de estação no formato de ARR_ST"""
+    return [{"PZ_CODE": i, "PZ_NAME": f"ESTACAO {i:04d}", "PZ_FILE_NAME": f"estacao_{i:04d}"} for i in range(1, quantidade + 1)]
+
+def gerar_zonas(caminho, quantidade, limites):
+    """Zonas pluviométricas (Cod, Est, Endereço) cobrindo o retângulo"""
+    definicoes = definicoes_estacoes(quantidade)
+    feicoes = [_feicao(c, {"Cod": d["PZ_CODE"], "Est": d["PZ_NAME"], "Endereço": f"RUA {d['PZ_CODE']}"})
+               for c, d in zip(_grade_caixas(quantidade, limites), definicoes)]
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump({"type": "FeatureCollection", "features": feicoes}, arquivo)
+    return definicoes
+
+def gerar_suscetibilidade(caminho, quantidade, limites, rng):
+    """Polígonos de suscetibilidade com gridcode 1..3"""
+    gridcodes = rng.integers(1, 4, quantidade)
+    feicoes = [_feicao(c, {"gridcode": int(g)}) for c, g in zip(_grade_caixas(quantidade, limites), gridcodes)]
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump({"type": "FeatureCollection", "features": feicoes}, arquivo)
+
+def gerar_estacoes_inmet(quantidade, limites, rng, nomes=()):
+    """Estações no formato de /estacoes/T do INMET; os primeiros nomes coincidem com as zonas"""
+    min_x, min_y, max_x, max_y = limites
+    estacoes = []
+    for indice in range(quantidade):
+        estacoes.append({
+            "CD_ESTACAO": f"A{indice:04d}",
+            "DC_NOME": nomes[indice] if indice < len(nomes) else f"INMET {indice:04d}",
+            "SG_ESTADO": "MG",
+            "CD_SITUACAO": "Operante",
+            "TP_ESTACAO": "Automatica",
+            "VL_LATITUDE": f"{rng.uniform(min_y, max_y):.6f}",
+            "VL_LONGITUDE": f"{rng.uniform(min_x, max_x):.6f}",
+            "VL_ALTITUDE": f"{rng.uniform(0, 1500):.1f}",
+        })
+    return estacoes
+
+def gerar_historico(diretorio, definicoes, ano, meses, rng):
+    """Um arquivo <estacao>_<AAAAMM>_Plv.txt por estação e mês, com leituras de 15 em 15 minutos"""
+    os.makedirs(diretorio, exist_ok=True)
+    cabecalho = ["Estacao sintetica", "", "", "Data       Hora       15 min   01 h   04 h   24 h   96 h", ""]
+    for mes in range(1, meses + 1):
+        inicio = datetime(ano, mes, 1)
+        leituras = int(((datetime(ano + (mes == 12), mes % 12 + 1, 1) - inicio).total_seconds()) // 900)
+        horarios = [(inicio + timedelta(minutes=15 * i)).strftime("%d/%m/%Y %H:%M:%S").ljust(26) for i in range(leituras)]
+        for definicao in definicoes:
+            chuva = np.round(rng.gamma(0.3, 2.0, leituras) * (rng.random(leituras) < 0.2), 1)
+            h01 = np.convolve(chuva, np.ones(4))[:leituras]
+            h04 = np.convolve(chuva, np.ones(16))[:leituras]
+            h24 = np.convolve(chuva, np.ones(96))[:leituras]
+            h96 = np.convolve(chuva, np.ones(384))[:leituras]
+            linhas = [f"{h}{a:.1f} {b:.1f} {c:.1f} {d:.1f} {e:.1f}" for h, a, b, c, d, e in zip(horarios, chuva, h01, h04, h24, h96)]
+            caminho = os.path.join(diretorio, f"{definicao['PZ_FILE_NAME']}_{ano}{mes:02d}_Plv.txt")
+            with open(caminho, "w", encoding="latin-1") as arquivo:
+                arquivo.write("\n".join(cabecalho + linhas) + "\n")
+
+# ---------------------------------------------------------------------------
+# Medição
+# ---------------------------------------------------------------------------
+
+class Cronometro:
+    """Acumula tempo (perf_counter) e número de chamadas por etapa"""
+
+    def __init__(self):
+        self.etapas = {}
+
+    @contextlib.contextmanager
+    def medir(self, nome, tolerar_erro=False):
+        """Mede o bloco; com tolerar_erro, a exceção é registrada na etapa e a execução continua"""
+        inicio = time.perf_counter()
+        etapa = self.etapas.setdefault(nome, {"segundos": 0.0, "chamadas": 0})
+        try:
+            yield
+        except Exception as erro:
+            if not tolerar_erro:
+                raise
+            etapa["erro"] = f"{type(erro).__name__}: {erro}"
+        finally:
+            etapa["segundos"] += time.perf_counter() - inicio
+            etapa["chamadas"] += 1
+
+    def envolver(self, nome, funcao):
+        def medida(*args, **kwargs):
+            with self.medir(nome):
+                return funcao(*args, **kwargs)
+        return medida
+
+@contextlib.contextmanager
+def _substituir(objeto, **valores):
+    """Troca atributos durante o bloco e restaura os originais"""
+    originais = {nome: getattr(objeto, nome) for nome in valores}
+    for nome, valor in valores.items():
+        setattr(objeto, nome, valor)
+    try:
+        yield
+    finally:
+        for nome, valor in originais.items():
+            setattr(objeto, nome, valor)
+
+@contextlib.contextmanager
+def _silencioso():
+    """Sem saída no console: print() redirecionado e logger sem o console (o resto da configuração fica)"""
+    from logger import sem_console
+    with sem_console(), contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def _versao():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_PATH, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+def medir_inicializacao(repeticoes=REPETICOES_INICIALIZACAO, motor="ARCPY"):
+    """
+    Importa o LHASA_RIO em interpretadores novos e devolve a etapa "inicializacao":
+    melhor tempo, módulos pesados carregados e os imports diretos mais lentos
+    (saída do -X importtime da última repetição)
+    """
+    codigo = ("import sys, time, json; inicio = time.perf_counter(); import LHASA_RIO; fim = time.perf_counter(); "
+              "print(json.dumps({'segundos': fim - inicio, 'pesados': sorted(m for m in %r if m in sys.modules)}))" % (MODULOS_PESADOS,))
+    ambiente = dict(os.environ, LHASA_GEOMETRY_ENGINE=motor)
+    tempos = []
+    for _ in range(repeticoes):
+        processo = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=PROJECT_PATH, env=ambiente,
+                                  capture_output=True, text=True, timeout=120, check=True)
+        medida = json.loads(processo.stdout.strip().splitlines()[-1])
+        tempos.append(medida["segundos"])
+
+    # Imports diretos do LHASA_RIO: linhas com um nível de indentação antes da linha do próprio módulo
+    diretos = {}
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, acumulado, nome = linha.split("|")
+        nome = nome[1:] # espaço depois do separador; o resto é a indentação (profundidade)
+        if not acumulado.strip().isdigit():
+            continue
+        if nome.strip() == "LHASA_RIO":
+            break
+        if not nome.startswith("   ") and nome.startswith("  "):
+            diretos[nome.strip()] = int(acumulado) / 1e6
+        elif not nome.startswith("  "):
+            diretos.clear()
+    return {"segundos": round(min(tempos), 6), "chamadas": repeticoes, "modulos_pesados": medida["pesados"],
+            "imports": dict(sorted(diretos.items(), key=lambda item: -item[1])[:10])}
+
+def executar(escala="rio", zonas=None, poligonos=None, estacoes=None, meses=None, semente=42, zoom_tiles=(6, 10), mapas=True):
+    """Executa todas as etapas e devolve o dicionário de resultados"""
+    import LHASA_RIO
+    import gerar_mapa
+    import mapa_bolhas
+    from grade_chuva import grade_chuva, pontos_chuva
+    from motor_shapely import ArcPyShapely
+    from inmet_stub import ServidorInmet
+    from camadas_geojson import RENDERIZACOES, adicionar_estacoes_geojson, adicionar_bolhas_geojson, medir_html
+
+    parametros = dict(ESCALAS[escala])
+    for nome, valor in (("zonas", zonas), ("poligonos", poligonos), ("estacoes", estacoes), ("meses", meses)):
+        if valor is not None:
+            parametros[nome] = valor
+    limites = parametros["limites"]
+    rng = np.random.default_rng(semente)
+    cronometro = Cronometro()
+    cronometro.etapas["inicializacao"] = medir_inicializacao()
+
+    with tempfile.TemporaryDirectory(prefix="lhasa_benchmark_") as diretorio:
+        caminho_zonas = os.path.join(diretorio, "zonas.geojson")
+        caminho_suscetibilidade = os.path.join(diretorio, "suscetibilidade.geojson")
+        with cronometro.medir("geracao_dados"):
+            definicoes = gerar_zonas(caminho_zonas, parametros["zonas"], limites)
+            gerar_suscetibilidade(caminho_suscetibilidade, parametros["poligonos"], limites, rng)
+            estacoes_inmet = gerar_estacoes_inmet(parametros["estacoes"], limites, rng, [d["PZ_NAME"] for d in definicoes])
+            gerar_historico(os.path.join(diretorio, "history"), definicoes[:parametros["estacoes"]], 2019, parametros["meses"], rng)
+
+        arcpy = ArcPyShapely()
+        for metodo, etapa in (("Select_analysis", "selecao"), ("Intersect_analysis", "intersecao"),
+                              ("CalculateField_management", "classificacao"), ("Dissolve_management", "dissolucao")):
+            setattr(arcpy, metodo, cronometro.envolver(etapa, getattr(arcpy, metodo)))
+
+        # Marca o fim da leitura dos arquivos: a etapa #03 começa copiando a camada histórica
+        marcas = {}
+        copiar = arcpy.CopyFeatures_management
+        def copiar_marcado(origem, destino, *args):
+            marcas.setdefault(str(destino), time.perf_counter())
+            return copiar(origem, destino, *args)
+        arcpy.CopyFeatures_management = copiar_marcado
+
+        chuva = {e["CD_ESTACAO"]: [{"CD_ESTACAO": e["CD_ESTACAO"], "CHUVA": f"{rng.gamma(0.5, 20.0):.1f}".replace(".", ",")}]
+                 for e in estacoes_inmet}
+        with ServidorInmet(estacoes_inmet, chuva) as servidor, \
+             _silencioso(), \
+             _substituir(LHASA_RIO,
+                         arcpy=arcpy,
+                         ARR_ST=definicoes,
+                         LYR_IN_PZ=caminho_zonas,
+                         LYR_IN_SZ=caminho_suscetibilidade,
+                         HISTORIC_DATA_PATH=os.path.join(diretorio, "history"),
+                         GDB_WKSP_OUT=os.path.join(diretorio, "LHASA-DATA.gdb"),
+                         SDE_WKSP_OUT=os.path.join(diretorio, "saida", "RJ_LHASA_NOWCAST.geojson"),
+                         OUT_EXPOSICAO=os.path.join(diretorio, "exposicao.gpkg"),
+                         TILES_OUT=os.path.join(diretorio, "perigo.mbtiles"),
+                         TILES_ZOOM_MIN=zoom_tiles[0],
+                         TILES_ZOOM_MAX=zoom_tiles[1],
+                         OUT_FILE="BENCHMARK",
+                         exportar_camada=cronometro.envolver("saida_vetorial", LHASA_RIO.exportar_camada),
+                         exportar_tiles=cronometro.envolver("tiles", LHASA_RIO.exportar_tiles),
+                         calcular_alteracoes=cronometro.envolver("publicacao", LHASA_RIO.calcular_alteracoes),
+                         aplicar_alteracoes=cronometro.envolver("publicacao", LHASA_RIO.aplicar_alteracoes)):
+
+            # Histórico: leitura dos arquivos (#02) e agregação por zona (#03), um mês por chamada
+            for mes in range(1, parametros["meses"] + 1):
+                marcas.clear()
+                inicio = time.perf_counter()
+                LHASA_RIO.loadHistoricalData("2019", f"{mes:02d}", "01", "31", "00", "23")
+                fim = time.perf_counter()
+                marca = next((t for d, t in marcas.items() if d.endswith(LHASA_RIO.LYR_PRC_LHASA_HISTORICAL)), fim)
+                for nome, segundos in (("historico_leitura", marca - inicio), ("historico_agregacao", fim - marca)):
+                    etapa = cronometro.etapas.setdefault(nome, {"segundos": 0.0, "chamadas": 0})
+                    etapa["segundos"] += segundos
+                    etapa["chamadas"] += 1
+
+            # Nowcast: busca no servidor local, associação às zonas e análise
+            with cronometro.medir("busca_inmet"):
+                LHASA_RIO.loadPluviometricDataINMET(servidor.url)
+            with _substituir(LHASA_RIO, loadPluviometricData=lambda: None):
+                with cronometro.medir("associacao"):
+                    LHASA_RIO.loadNowData()
+            with cronometro.medir("analise_total"):
+                LHASA_RIO.doAnalysis("N")
+
+            with cronometro.medir("metricas_bolhas"):
+                dados_bolhas = mapa_bolhas.processar_dados_para_bolhas(estacoes_inmet)
+
+            if mapas:
+                # Grade de chuva (no lugar do HeatMap): cálculo e leitura do cache
+                pontos = pontos_chuva(LHASA_RIO.ARR_PD)
+                caminho_grade = os.path.join(diretorio, "grade_chuva.png")
+                with cronometro.medir("grade_chuva", tolerar_erro=True):
+                    grade_chuva(pontos, caminho_grade)
+                with cronometro.medir("grade_chuva_cache", tolerar_erro=True):
+                    grade_chuva(pontos, caminho_grade)
+                if os.path.exists(caminho_grade):
+                    cronometro.etapas["grade_chuva"]["png_bytes"] = os.path.getsize(caminho_grade)
+
+                # Cada mapa nas duas renderizações: tempo, tamanho do HTML e objetos Leaflet individuais
+                for renderizacao in RENDERIZACOES:
+                    geojson = renderizacao == "geojson"
+                    nome = "mapa_estacoes_" + renderizacao
+                    with cronometro.medir(nome, tolerar_erro=True):
+                        mapa = gerar_mapa.criar_mapa_base()
+                        (adicionar_estacoes_geojson if geojson else gerar_mapa.adicionar_estacoes_meteorologicas)(mapa, estacoes_inmet)
+                        gerar_mapa.adicionar_areas_risco(mapa)
+                        gerar_mapa.adicionar_mapa_calor(mapa, estacoes_inmet)
+                        gerar_mapa.adicionar_legenda(mapa)
+                        mapa.save(os.path.join(diretorio, nome + ".html"))
+                    nome_bolhas = "mapa_bolhas_" + renderizacao
+                    with cronometro.medir(nome_bolhas, tolerar_erro=True):
+                        mapa = mapa_bolhas.criar_mapa_bolhas()
+                        (adicionar_bolhas_geojson if geojson else mapa_bolhas.adicionar_bolhas_ao_mapa)(mapa, dados_bolhas)
+                        mapa_bolhas.adicionar_legenda_bolhas(mapa)
+                        mapa.save(os.path.join(diretorio, nome_bolhas + ".html"))
+                    for etapa in (nome, nome_bolhas):
+                        if os.path.exists(os.path.join(diretorio, etapa + ".html")):
+                            cronometro.etapas[etapa].update(medir_html(os.path.join(diretorio, etapa + ".html")))
+
+            feicoes_saida = len(list(arcpy.da.SearchCursor(LHASA_RIO.SDE_WKSP_OUT, ["NM_CODIGO"])))
+
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "versao": _versao(),
+        "escala": escala,
+        "parametros": {k: v for k, v in parametros.items() if k != "limites"},
+        "semente": semente,
+        "ambiente": {"python": platform.python_version(), "plataforma": platform.platform(), "processadores": os.cpu_count(), "maquina": socket.gethostname()},
+        "feicoes_saida": feicoes_saida,
+        "etapas": {nome: dict(e, segundos=round(e["segundos"], 6)) for nome, e in cronometro.etapas.items()},
+    }
+
+def comparar(anterior, atual, tolerancia=TOLERANCIA_REGRESSAO):
+    """Lista (etapa, antes, depois, razão) das etapas mais lentas que a referência além da tolerância"""
+    regressoes = []
+    for nome, etapa in atual["etapas"].items():
+        antes = anterior.get("etapas", {}).get(nome, {}).get("segundos")
+        if antes and "erro" not in etapa and etapa["segundos"] > antes * (1 + tolerancia):
+            regressoes.append((nome, antes, etapa["segundos"], etapa["segundos"] / antes))
+    return regressoes
+
+def salvar(resultado, diretorio=DIRETORIO_RESULTADOS):
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"{resultado['escala']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    return caminho
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark sintético do LHASA RIO")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="rio")
+    parser.add_argument("--zonas", type=int)
+    parser.add_argument("--poligonos", type=int)
+    parser.add_argument("--estacoes", type=int)
+    parser.add_argument("--meses", type=int)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--sem-mapas", action="store_true", help="não mede a renderização dos mapas")
+    parser.add_argument("--saida", default=DIRETORIO_RESULTADOS, help="diretório dos resultados JSON")
+    parser.add_argument("--comparar", help="resultado JSON de referência")
+    parser.add_argument("--inicializacao", action="store_true", help="mede só o import do LHASA_RIO (início a frio)")
+    args = parser.parse_args(argv)
+
+    if args.inicializacao:
+        etapa = medir_inicializacao()
+        print(f"Inicialização do LHASA_RIO: {etapa['segundos']:.3f} s (melhor de {etapa['chamadas']})")
+        print("  módulos pesados carregados: " + (", ".join(etapa["modulos_pesados"]) or "nenhum"))
+        for nome, segundos in etapa["imports"].items():
+            print(f"  {nome:<22} {segundos:>10.3f} s")
+        return 1 if etapa["modulos_pesados"] else 0
+
+    resultado = executar(args.escala, args.zonas, args.poligonos, args.estacoes, args.meses, args.semente, mapas=not args.sem_mapas)
+    caminho = salvar(resultado, args.saida)
+
+    print(f"Benchmark {resultado['escala']} ({resultado['parametros']}) -> {caminho}")
+    for nome, etapa in resultado["etapas"].items():
+        print(f"  {nome:<26} {etapa['segundos']:>10.3f} s  ({etapa['chamadas']}x)"
+              + (f"  {etapa['html_bytes'] / 1024:.0f} KB, {etapa['objetos_js']} objetos JS" if "html_bytes" in etapa else "")
+              + (f"  ERRO: {etapa['erro']}" if "erro" in etapa else ""))
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as arquivo:
+            regressoes = comparar(json.load(arquivo), resultado)
+        for nome, antes, depois, razao in regressoes:
+            print(f"  REGRESSAO {nome}: {antes:.3f} s -> {depois:.3f} s ({razao:.2f}x)")
+        return 1 if regressoes else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""
+Camadas GeoJSON para os mapas - LHASA MG
+Em vez de um folium.Marker/folium.Circle por estação, cada um com o próprio
+HTML de popup embutido, as estações vão para o mapa como uma única
+FeatureCollection com propriedades curtas. Cor, raio, tooltip e popup são
+montados no navegador por uma função JS (on_each_feature) a partir das
+propriedades, com o mesmo conteúdo dos popups de marcadores individuais.
+
+Uso:
+    adicionar_estacoes_geojson(mapa, estacoes)      # gerar_mapa
+    adicionar_bolhas_geojson(mapa, dados_bolhas)    # mapa_bolhas
+    adicionar_camada_fundo(mapa, "terreno", "Terreno")
+"""
+
+import os
+import re
+import json
+import folium
+from folium.utilities import JsCode
+
+RENDERIZACOES = ("geojson", "marcadores")
+CASAS_COORDENADAS = 5 # ~1 m
+
+# Camadas de fundo: os estilos Stamen só são servidos pela Stadia com chave de API
+# (STADIA_API_KEY); sem chave, cada estilo usa um provedor equivalente que não exige chave
+STADIA_API_KEY = os.environ.get("STADIA_API_KEY")
+CAMADAS_FUNDO = {
+    "terreno": ("StamenTerrain", "OpenTopoMap"),
+    "toner": ("StamenToner", "Esri.WorldGrayCanvas"),
+}
+
+CORES_ESTACAO = {
+    'Automatica': 'blue',
+    'Convencional': 'green',
+    'Pluviometrica': 'orange'
+}
+
+# Objetos Leaflet criados um a um no HTML (marcadores/círculos individuais)
+_OBJETOS_JS = re.compile(r"\bL\.(marker|circle|circleMarker|popup)\(")
+
+def adicionar_camada_fundo(mapa, estilo, nome, chave=None):
+    """Camada de fundo do estilo (CAMADAS_FUNDO): Stamen pela Stadia com chave, senão a alternativa sem chave"""
+    stamen, alternativa = CAMADAS_FUNDO[estilo]
+    chave = chave or STADIA_API_KEY
+    if not chave:
+        return folium.TileLayer(alternativa, name=nome).add_to(mapa)
+    import xyzservices.providers as provedores
+    provedor = provedores.Stadia[stamen]
+    return folium.TileLayer(provedor.build_url() + "?api_key=" + chave, attr=provedor.html_attribution, name=nome,
+                            max_zoom=provedor.get("max_zoom", 18)).add_to(mapa)
+
+def cor_risco(risco):
+    """(cor da borda, cor de preenchimento) da bolha pelo índice de risco"""
+    if risco >= 70:
+        return 'red', '#ff4444'
+    if risco >= 50:
+        return 'orange', '#ff8800'
+    if risco >= 30:
+        return 'yellow', '#ffdd00'
+    return 'green', '#44ff44'
+
+def _feicao(lat, lon, propriedades):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [round(lon, CASAS_COORDENADAS), round(lat, CASAS_COORDENADAS)]},
+        "properties": propriedades,
+    }
+
+# ---------------------------------------------------------------------------
+# Estações (gerar_mapa)
+# ---------------------------------------------------------------------------
+
+# Propriedades: c código, n nome, t tipo, a altitude, s situação
+_JS_ESTACAO = """
+function (feature, layer) {
+    var p = feature.properties, c = feature.geometry.coordinates;
+    var cor = (%s)[p.t] || "red";
+    layer.setStyle({color: cor, fillColor: cor});
+    layer.bindTooltip(p.c + ": " + p.n);
+    layer.bindPopup(
+        '<div style="width: 250px;"><h4><b>' + p.n + '</b></h4><hr>' +
+        '<p><b>Código:</b> ' + p.c + '</p><p><b>Tipo:</b> ' + p.t + '</p>' +
+        '<p><b>Altitude:</b> ' + p.a + 'm</p>' +
+        '<p><b>Coordenadas:</b> ' + c[1].toFixed(4) + ', ' + c[0].toFixed(4) + '</p>' +
+        '<p><b>Status:</b> ' + p.s + '</p></div>', {maxWidth: 300});
+}
+""" % json.dumps(CORES_ESTACAO)
+
+def estacoes_geojson(estacoes):
+    """FeatureCollection das estações (propriedades curtas, lidas por _JS_ESTACAO)"""
+    feicoes = []
+    for estacao in estacoes:
+        try:
+            lat = float(estacao['VL_LATITUDE'])
+            lon = float(estacao['VL_LONGITUDE'])
+            feicoes.append(_feicao(lat, lon, {
+                "c": estacao['CD_ESTACAO'],
+                "n": estacao['DC_NOME'],
+                "t": estacao.get('TP_ESTACAO', 'Automatica'),
+                "a": estacao.get('VL_ALTITUDE', 'N/A'),
+                "s": estacao['CD_SITUACAO'],
+            }))
+        except (ValueError, KeyError) as e:
+            print(f"Erro ao processar estação {estacao.get('CD_ESTACAO', 'N/A')}: {e}")
+            continue
+    return {"type": "FeatureCollection", "features": feicoes}
+
+def adicionar_estacoes_geojson(mapa, estacoes, nome="Estações INMET"):
+    """Todas as estações em uma camada GeoJson (círculos coloridos pelo tipo)"""
+    colecao = estacoes_geojson(estacoes)
+    if not colecao["features"]:
+        return None
+    return folium.GeoJson(
+        colecao,
+        name=nome,
+        marker=folium.CircleMarker(radius=7, weight=2, fill=True, fill_opacity=0.8),
+        on_each_feature=JsCode(_JS_ESTACAO),
+    ).add_to(mapa)
+
+# ---------------------------------------------------------------------------
+# Bolhas (mapa_bolhas)
+# ---------------------------------------------------------------------------
+
+# Propriedades: c código, n nome, t tipo, a altitude, r risco, i importância,
+# d densidade, z raio da bolha (m), ar área de risco mais próxima (opcional).
+# Faixas de cor iguais às de cor_risco
+_JS_BOLHA = """
+function (feature, layer) {
+    var p = feature.properties, c = feature.geometry.coordinates;
+    var cores = p.r >= 70 ? ["red", "#ff4444"] : p.r >= 50 ? ["orange", "#ff8800"] : p.r >= 30 ? ["yellow", "#ffdd00"] : ["green", "#44ff44"];
+    layer.setRadius(p.z);
+    layer.setStyle({color: cores[0], fillColor: cores[1], fillOpacity: 0.6, weight: 2, opacity: 0.8});
+    layer.bindTooltip(p.c + ": " + p.n + " (Risco: " + p.r + ")");
+    var linha = function (rotulo, valor) { return '<tr><td><b>' + rotulo + ':</b></td><td>' + valor + '</td></tr>'; };
+    layer.bindPopup(
+        '<div style="width: 300px; font-family: Arial;"><h4><b>' + p.n + '</b></h4><hr>' +
+        '<table style="width:100%; font-size:12px;">' +
+        linha("Código", p.c) + linha("Tipo", p.t) + linha("Altitude", p.a + "m") +
+        linha("Coordenadas", c[1].toFixed(3) + ", " + c[0].toFixed(3)) +
+        linha("Índice de Risco", p.r + "/100") + (p.ar ? linha("Área de risco", p.ar) : "") +
+        linha("Importância", p.i + "/100") + linha("Densidade Pop.", p.d + "/100") +
+        '</table><hr><p style="font-size:11px; color:#666;"><b>Tamanho da bolha:</b> Importância regional<br>' +
+        '<b>Cor da bolha:</b> Índice de risco de deslizamento</p></div>', {maxWidth: 350});
+}
+"""
+
+def bolhas_geojson(dados_estacoes):
+    """FeatureCollection das bolhas: raio (m) pela importância, cor pelo risco (no navegador)"""
+    if not dados_estacoes:
+        return {"type": "FeatureCollection", "features": []}
+    tamanhos = [d['tamanho_bolha'] for d in dados_estacoes]
+    tamanho_min, tamanho_max = min(tamanhos), max(tamanhos)
+    amplitude = (tamanho_max - tamanho_min) or 1
+
+    feicoes = []
+    for dados in dados_estacoes:
+        # Tamanho da bolha de 10 a 50 "pixels", convertido para metros
+        tamanho_normalizado = 10 + (dados['tamanho_bolha'] - tamanho_min) / amplitude * 40
+        propriedades = {
+            "c": dados['codigo'],
+            "n": dados['nome'],
+            "t": dados['tipo'],
+            "a": round(dados['altitude']),
+            "r": round(dados['risco_index']),
+            "i": round(dados['importancia']),
+            "d": round(dados['densidade_pop']),
+            "z": round(tamanho_normalizado * 500),
+        }
+        if 'area_proxima' in dados:
+            propriedades["ar"] = f"{dados['area_proxima']} ({dados['dist_area_km']:.1f} km)"
+        feicoes.append(_feicao(dados['lat'], dados['lon'], propriedades))
+    return {"type": "FeatureCollection", "features": feicoes}
+
+def adicionar_bolhas_geojson(mapa, dados_estacoes, nome="Bolhas"):
+    """Todas as bolhas em uma camada GeoJson (folium.Circle com raio em metros)"""
+    colecao = bolhas_geojson(dados_estacoes)
+    if not colecao["features"]:
+        return None
+    return folium.GeoJson(
+        colecao,
+        name=nome,
+        marker=folium.Circle(radius=5000, fill=True),
+        on_each_feature=JsCode(_JS_BOLHA),
+    ).add_to(mapa)
+
+# ---------------------------------------------------------------------------
+# Medida
+# ---------------------------------------------------------------------------
+
+def medir_html(caminho):
+    """Tamanho do HTML e quantidade de objetos Leaflet criados individualmente"""
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        html = arquivo.read()
+    return {"html_bytes": os.path.getsize(caminho), "objetos_js": len(_OBJETOS_JS.findall(html))}
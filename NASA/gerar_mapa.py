@@ -4,25 +4,32 @@ Gerador de Mapas Georreferenciados - LHASA RIO
 Sistema de visualização das estações meteorológicas e áreas de risco
 """
 
+import os
 import folium
-import pandas as pd
-import requests
 import json
 from datetime import datetime
-import matplotlib.pyplot as plt
-import seaborn as sns
 from folium.plugins import HeatMap, MarkerCluster
 import urllib3
+from camadas_geojson import adicionar_estacoes_geojson, adicionar_camada_fundo
+from manifesto_artefatos import Manifesto
+from graficos import renderizar_graficos, nome_arquivo as nome_arquivo_grafico
+from grade_chuva import adicionar_grade_chuva
+from relatorio_estatistico import relatorio_estacoes, exportar_relatorio
+
+# pandas/matplotlib só nas estatísticas: o mapa HTML não precisa deles
 
 # Configurações do mapa
 MG_COORDS = [-18.5122, -44.5550]  # Coordenadas do centro de Minas Gerais (Belo Horizonte)
-INMET_STATIONS_URL = "https://apitempo.inmet.gov.br/estacoes/T"
+INMET_BASE_URL = os.environ.get("INMET_BASE_URL", "https://apitempo.inmet.gov.br/") # pode apontar para o inmet_stub.py local
+INMET_STATIONS_URL = INMET_BASE_URL.rstrip("/") + "/estacoes/T"
+RENDERIZACAO = os.environ.get("LHASA_MAPA_RENDERIZACAO", "geojson") # geojson (uma camada) | marcadores (um por estação)
 
-def obter_estacoes_inmet():
+def obter_estacoes_inmet(base_url=None):
     """Obtém lista de estações meteorológicas do INMET para MG"""
     try:
         http = urllib3.PoolManager()
-        response = http.request("GET", INMET_STATIONS_URL)
+        url = base_url.rstrip("/") + "/estacoes/T" if base_url else INMET_STATIONS_URL
+        response = http.request("GET", url)
         stations_data = json.loads(response.data)
         
         # Filtrar apenas estações de Minas Gerais operantes
@@ -44,8 +51,8 @@ def criar_mapa_base():
     )
     
     # Adicionar diferentes camadas de mapa
-    folium.TileLayer('Stamen Terrain', name='Terreno').add_to(mapa)
-    folium.TileLayer('Stamen Toner', name='Preto e Branco').add_to(mapa)
+    adicionar_camada_fundo(mapa, 'terreno', 'Terreno')
+    adicionar_camada_fundo(mapa, 'toner', 'Preto e Branco')
     folium.TileLayer('CartoDB positron', name='CartoDB').add_to(mapa)
     
     return mapa
@@ -147,8 +154,14 @@ def adicionar_areas_risco(mapa):
             weight=2
         ).add_to(mapa)
 
-def adicionar_mapa_calor(mapa, estacoes):
-    """Adiciona mapa de calor baseado na densidade de estações"""
+def adicionar_mapa_calor(mapa, estacoes, chuva=None):
+    """Adiciona mapa de calor baseado na densidade de estações
+    chuva: (lat, lon, mm) das leituras; com ela, a grade de chuva calculada no
+    servidor (grade_chuva.py) substitui o HeatMap do navegador"""
+    
+    if chuva:
+        adicionar_grade_chuva(mapa, chuva)
+        return
     
     # Preparar dados para o mapa de calor
     heat_data = []
@@ -193,62 +206,67 @@ def adicionar_legenda(mapa):
     
     mapa.get_root().html.add_child(folium.Element(legenda_html))
 
-def gerar_estatisticas(estacoes):
-    """Gera gráficos estatísticos das estações"""
-    
+def gerar_estatisticas(estacoes, perfil=None):
+    """Gera gráficos estatísticos das estações; devolve o arquivo (perfil: ver graficos.py)"""
     if not estacoes:
         print("Nenhuma estação encontrada para gerar estatísticas")
         return
+    return renderizar_graficos([("estatisticas_estacoes", figura_estatisticas, estacoes)], perfil)["estatisticas_estacoes"]
+
+def figura_estatisticas(estacoes):
+    """Figura 2x2 com as estatísticas das estações (salva por graficos.renderizar_graficos);
+    os números vêm do relatório calculado de uma vez (relatorio_estatistico.py)"""
+    import matplotlib.pyplot as plt
     
-    # Criar DataFrame
-    df = pd.DataFrame(estacoes)
+    relatorio = relatorio_estacoes(estacoes)
     
-    # Configurar estilo dos gráficos
-    plt.style.use('seaborn-v0_8')
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
     fig.suptitle('LHASA MG - Estatísticas das Estações INMET', fontsize=16, fontweight='bold')
     
     # Gráfico 1: Distribuição por tipo de estação
-    tipo_counts = df['TP_ESTACAO'].value_counts()
-    ax1.pie(tipo_counts.values, labels=tipo_counts.index, autopct='%1.1f%%', startangle=90)
+    tipo_counts = relatorio['contagens']['TP_ESTACAO']
+    ax1.pie(list(tipo_counts.values()), labels=list(tipo_counts), autopct='%1.1f%%', startangle=90)
     ax1.set_title('Distribuição por Tipo de Estação')
     
     # Gráfico 2: Distribuição por situação
-    situacao_counts = df['CD_SITUACAO'].value_counts()
-    ax2.bar(situacao_counts.index, situacao_counts.values, color=['green', 'red', 'orange'])
+    situacao_counts = relatorio['contagens']['CD_SITUACAO']
+    ax2.bar(list(situacao_counts), list(situacao_counts.values()), color=['green', 'red', 'orange'])
     ax2.set_title('Status das Estações')
     ax2.set_xlabel('Situação')
     ax2.set_ylabel('Quantidade')
     
     # Gráfico 3: Distribuição de altitudes
-    altitudes = pd.to_numeric(df['VL_ALTITUDE'], errors='coerce').dropna()
-    ax3.hist(altitudes, bins=10, color='skyblue', alpha=0.7, edgecolor='black')
+    histograma = relatorio['histogramas']['VL_ALTITUDE']
+    bordas = histograma['bordas']
+    ax3.bar(bordas[:-1], histograma['contagens'], width=[b - a for a, b in zip(bordas, bordas[1:])], align='edge',
+            color='skyblue', alpha=0.7, edgecolor='black')
     ax3.set_title('Distribuição de Altitudes')
     ax3.set_xlabel('Altitude (m)')
     ax3.set_ylabel('Frequência')
     
     # Gráfico 4: Top 10 estações por altitude
-    df_alt = df.copy()
-    df_alt['VL_ALTITUDE'] = pd.to_numeric(df_alt['VL_ALTITUDE'], errors='coerce')
-    top_alt = df_alt.nlargest(10, 'VL_ALTITUDE')[['DC_NOME', 'VL_ALTITUDE']]
-    ax4.barh(range(len(top_alt)), top_alt['VL_ALTITUDE'], color='lightcoral')
+    top_alt = relatorio['top']['altitude']
+    ax4.barh(range(len(top_alt)), [estacao['valor'] for estacao in top_alt], color='lightcoral')
     ax4.set_yticks(range(len(top_alt)))
-    ax4.set_yticklabels([nome[:20] + '...' if len(nome) > 20 else nome for nome in top_alt['DC_NOME']])
+    ax4.set_yticklabels([nome[:20] + '...' if len(nome) > 20 else nome for nome in (estacao['nome'] for estacao in top_alt)])
     ax4.set_title('Top 10 Estações por Altitude')
     ax4.set_xlabel('Altitude (m)')
     
-    plt.tight_layout()
-    plt.savefig('estatisticas_estacoes.png', dpi=300, bbox_inches='tight')
-    print("✅ Gráfico de estatísticas salvo como 'estatisticas_estacoes.png'")
+    fig.tight_layout()
+    return fig
 
-def gerar_mapa_completo():
-    """Função principal para gerar o mapa completo"""
+def gerar_mapa_completo(estacoes=None, base_url=None, graficos=None, chuva=None):
+    """Função principal para gerar o mapa completo
+    estacoes: lista de estações já carregada (ex.: pelo nowcast); sem ela, busca no INMET
+    graficos: lista que recebe os gráficos a renderizar em vez de renderizá-los aqui (mapas.py)
+    chuva: (lat, lon, mm) das leituras, para a grade de chuva (grade_chuva.pontos_chuva)"""
     
     print("🗺️  Gerando mapa georreferenciado LHASA MG...")
     
     # Obter estações do INMET
-    print("📡 Carregando estações meteorológicas do INMET...")
-    estacoes = obter_estacoes_inmet()
+    if estacoes is None:
+        print("📡 Carregando estações meteorológicas do INMET...")
+        estacoes = obter_estacoes_inmet(base_url)
     
     if not estacoes:
         print("❌ Não foi possível carregar as estações do INMET")
@@ -256,42 +274,63 @@ def gerar_mapa_completo():
     
     print(f"✅ {len(estacoes)} estações carregadas de Minas Gerais")
     
-    # Criar mapa base
-    print("🗺️  Criando mapa base...")
-    mapa = criar_mapa_base()
-    
-    # Adicionar estações meteorológicas
-    print("📍 Adicionando marcadores das estações...")
-    adicionar_estacoes_meteorologicas(mapa, estacoes)
-    
-    # Adicionar áreas de risco
-    print("⚠️  Adicionando áreas de risco...")
-    adicionar_areas_risco(mapa)
-    
-    # Adicionar mapa de calor
-    print("🔥 Adicionando mapa de calor...")
-    adicionar_mapa_calor(mapa, estacoes)
-    
-    # Adicionar legenda
-    print("📋 Adicionando legenda...")
-    adicionar_legenda(mapa)
-    
-    # Adicionar controle de camadas
-    folium.LayerControl().add_to(mapa)
+    # Mapa e gráficos só são gerados de novo se as estações mudaram (manifesto_artefatos.py)
+    manifesto = Manifesto()
+    hash_mapa = manifesto.hash_entradas("mapa_lhasa_mg", RENDERIZACAO, estacoes, chuva)
+    if manifesto.inalterado("mapa_lhasa_mg", hash_mapa):
+        nome_arquivo = manifesto.arquivo("mapa_lhasa_mg")
+        print(f"♻️  Estações sem alteração: mapa mantido em '{nome_arquivo}'")
+    else:
+        # Criar mapa base
+        print("🗺️  Criando mapa base...")
+        mapa = criar_mapa_base()
+        
+        # Adicionar estações meteorológicas
+        print("📍 Adicionando marcadores das estações...")
+        if RENDERIZACAO == "geojson":
+            adicionar_estacoes_geojson(mapa, estacoes)
+        else:
+            adicionar_estacoes_meteorologicas(mapa, estacoes)
+        
+        # Adicionar áreas de risco
+        print("⚠️  Adicionando áreas de risco...")
+        adicionar_areas_risco(mapa)
+        
+        # Adicionar mapa de calor
+        print("🔥 Adicionando mapa de calor...")
+        adicionar_mapa_calor(mapa, estacoes, chuva)
+        
+        # Adicionar legenda
+        print("📋 Adicionando legenda...")
+        adicionar_legenda(mapa)
+        
+        # Adicionar controle de camadas
+        folium.LayerControl().add_to(mapa)
+        
+        # Salvar mapa
+        nome_arquivo = f"mapa_lhasa_mg_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        mapa.save(nome_arquivo)
+        print(f"✅ Mapa salvo como '{nome_arquivo}'")
+        manifesto.registrar("mapa_lhasa_mg", hash_mapa, nome_arquivo)
     
-    # Salvar mapa
-    nome_arquivo = f"mapa_lhasa_mg_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-    mapa.save(nome_arquivo)
-    print(f"✅ Mapa salvo como '{nome_arquivo}'")
+    manifesto.salvar()
     
     # Gerar estatísticas
-    print("📊 Gerando estatísticas...")
-    gerar_estatisticas(estacoes)
+    estatisticas = [("estatisticas_estacoes", figura_estatisticas, estacoes)]
+    if graficos is not None:
+        graficos.extend(estatisticas)
+    else:
+        print("📊 Gerando estatísticas...")
+        renderizar_graficos(estatisticas, manifesto=manifesto)
+    
+    # Exportar relatório (JSON/CSV para os dashboards)
+    arquivo_json, arquivo_csv = exportar_relatorio(relatorio_estacoes(estacoes), "estacoes")
     
     print("\n🎉 Mapa georreferenciado gerado com sucesso!")
     print(f"📁 Arquivos gerados:")
     print(f"   - {nome_arquivo} (mapa interativo)")
-    print(f"   - estatisticas_estacoes.png (gráficos)")
+    print(f"   - {nome_arquivo_grafico('estatisticas_estacoes')} (gráficos)")
+    print(f"   - {arquivo_json}, {arquivo_csv} (relatório estatístico)")
     
     return nome_arquivo
 
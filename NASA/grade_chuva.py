@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""
+Grade de chuva acumulada - LHASA MG
+Substitui o HeatMap (Leaflet.heat), que recebia os pontos das estações e
+recalculava a superfície no navegador a cada zoom/arrasto, por uma grade
+calculada aqui com NumPy a partir da chuva acumulada de cada estação e
+publicada como uma imagem PNG sobreposta ao mapa (ImageOverlay).
+
+    idw  inverso da distância (peso 1/d^POTENCIA_IDW), padrão
+    kde  média ponderada por núcleo gaussiano (banda BANDA_KDE_KM)
+
+Pixels a mais de RAIO_MAXIMO_KM da estação mais próxima ficam transparentes.
+As linhas da grade são igualmente espaçadas em Web Mercator, a projeção do
+Leaflet, para que a imagem não fique deslocada em latitude. Os valores (mm)
+são quantizados nas classes de NIVEIS_MM e gravados em um PNG indexado (um
+byte por pixel, paleta com transparência), que fica em cache: o mapa básico e
+o mapa de bolhas usam o mesmo arquivo, e ele só é recalculado quando a chuva,
+as estações ou os parâmetros mudam.
+
+Uso:
+    pontos = pontos_chuva(ARR_PD)          # (lat, lon, mm) das leituras
+    adicionar_grade_chuva(mapa, pontos)
+"""
+
+import os
+import json
+import math
+import zlib
+import struct
+import hashlib
+import numpy as np
+
+from arquivos import gravar_atomico
+from proximidade import RAIO_TERRA_KM
+
+GRADE_ARQUIVO = os.environ.get("LHASA_GRADE_CHUVA", "grade_chuva.png") # + .json com assinatura e limites
+METODO_GRADE = os.environ.get("LHASA_GRADE_METODO", "idw") # idw | kde
+METODOS = ("idw", "kde")
+LARGURA_GRADE = 512 # pixels
+RAIO_MAXIMO_KM = 60.0
+POTENCIA_IDW = 2.0
+BANDA_KDE_KM = 20.0
+BLOCO_PIXELS = 8192 # pixels por bloco: memória ~ bloco x estações x 8 bytes
+VERSAO_GRADE = 1 # mude quando o cálculo ou a paleta mudarem
+
+# Classes de chuva acumulada (mm) e cores; abaixo da primeira classe: transparente
+NIVEIS_MM = (0.2, 1.0, 5.0, 10.0, 25.0, 50.0, 100.0)
+CORES_NIVEIS = ('#c6dbef', '#9ecae1', '#4292c6', '#2171b5', '#08519c', '#6a51a3', '#ae017e')
+OPACIDADE = 200 # 0-255
+
+KM_POR_GRAU = math.radians(RAIO_TERRA_KM)
+
+def pontos_chuva(leituras, campo="h24"):
+    """(lat, lon, mm) das leituras carregadas (ARR_PD), ignorando as incompletas:
+    leitura sem chuva (ausente, None, NaN) fica fora da grade, não vira 0 mm"""
+    pontos = []
+    for leitura in leituras:
+        try:
+            ponto = (float(leitura['latitude']), float(leitura['longitude']), float(leitura['data'][campo]))
+        except (ValueError, KeyError, TypeError):
+            continue
+        if not math.isnan(ponto[2]):
+            pontos.append(ponto)
+    return pontos
+
+def _mercator(lat):
+    return np.log(np.tan(np.pi / 4.0 + np.radians(lat) / 2.0))
+
+def _latitude(y):
+    return np.degrees(2.0 * np.arctan(np.exp(y)) - np.pi / 2.0)
+
+def limites_grade(pontos, raio_km=RAIO_MAXIMO_KM):
+    """[[sul, oeste], [norte, leste]] das estações com margem de raio_km"""
+    lat = np.array([p[0] for p in pontos])
+    lon = np.array([p[1] for p in pontos])
+    margem_lat = raio_km / KM_POR_GRAU
+    margem_lon = raio_km / (KM_POR_GRAU * math.cos(math.radians(min(np.abs(lat).max(), 89.0)))) # maior margem: latitude mais alta
+    return [[float(lat.min() - margem_lat), float(lon.min() - margem_lon)], [float(lat.max() + margem_lat), float(lon.max() + margem_lon)]]
+
+def calcular_grade(pontos, limites, largura=LARGURA_GRADE, metodo=None, raio_km=RAIO_MAXIMO_KM):
+    """Grade (linhas x largura, norte para sul) de chuva interpolada em mm; NaN fora do raio"""
+    metodo = metodo or METODO_GRADE
+    if metodo not in METODOS:
+        raise ValueError("método de grade inválido: " + str(metodo))
+    (sul, oeste), (norte, leste) = limites
+    y_sul, y_norte = _mercator(sul), _mercator(norte)
+    altura = max(1, int(round(largura * (y_norte - y_sul) / np.radians(leste - oeste))))
+
+    # Centros dos pixels: colunas em longitude, linhas em Web Mercator
+    lon_pixels = oeste + (np.arange(largura) + 0.5) * (leste - oeste) / largura
+    lat_pixels = _latitude(y_norte - (np.arange(altura) + 0.5) * (y_norte - y_sul) / altura)
+    lat_todos = np.repeat(lat_pixels, largura)
+    lon_todos = np.tile(lon_pixels, altura)
+
+    estacoes = np.asarray(pontos, dtype=float)
+    lat_estacoes, lon_estacoes, chuva = estacoes[:, 0], estacoes[:, 1], estacoes[:, 2]
+    grade = np.empty(altura * largura)
+    for inicio in range(0, len(grade), BLOCO_PIXELS):
+        bloco = slice(inicio, inicio + BLOCO_PIXELS)
+        # Distância equirretangular (km): suficiente até algumas centenas de km.
+        # Operações no próprio array (bloco x estações) para não criar temporários
+        pesos = lon_todos[bloco, None] - lon_estacoes
+        pesos *= KM_POR_GRAU * np.cos(np.radians(lat_todos[bloco, None]))
+        pesos *= pesos
+        dy = lat_todos[bloco, None] - lat_estacoes
+        dy *= KM_POR_GRAU
+        dy *= dy
+        pesos += dy # distância ao quadrado
+        dentro = pesos.min(axis=1) <= raio_km ** 2
+        if metodo == "idw":
+            np.maximum(pesos, 0.01, out=pesos)
+            if POTENCIA_IDW != 2.0:
+                pesos **= POTENCIA_IDW / 2.0
+            np.reciprocal(pesos, out=pesos)
+        else:
+            pesos *= -1.0 / (2.0 * BANDA_KDE_KM ** 2)
+            np.exp(pesos, out=pesos)
+        soma = pesos.sum(axis=1)
+        valores = (pesos @ chuva) / np.where(soma > 0, soma, 1.0)
+        grade[bloco] = np.where(dentro, valores, np.nan)
+    return grade.reshape(altura, largura)
+
+def quantizar(grade):
+    """Índice da classe de cada pixel (0 = transparente: sem dado ou abaixo de NIVEIS_MM[0])"""
+    return np.where(np.isnan(grade), 0, np.digitize(np.nan_to_num(grade), NIVEIS_MM)).astype(np.uint8)
+
+def _png_indexado(indices):
+    """PNG 8 bits com paleta (índice 0 transparente), sem dependências além do zlib"""
+    altura, largura = indices.shape
+    paleta = [0, 0, 0] + [int(cor[i:i + 2], 16) for cor in CORES_NIVEIS for i in (1, 3, 5)]
+    alfa = [0] + [OPACIDADE] * len(CORES_NIVEIS)
+    linhas = np.hstack((np.zeros((altura, 1), dtype=np.uint8), indices)).tobytes() # filtro 0 em cada linha
+
+    def bloco(tipo, dados):
+        return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados) & 0xffffffff)
+
+    return (b"\x89PNG\r\n\x1a\n" + bloco(b"IHDR", struct.pack(">IIBBBBB", largura, altura, 8, 3, 0, 0, 0)) +
+            bloco(b"PLTE", bytes(paleta)) + bloco(b"tRNS", bytes(alfa)) + bloco(b"IDAT", zlib.compress(linhas, 9)) + bloco(b"IEND", b""))
+
+def grade_chuva(pontos, caminho=None, metodo=None, largura=LARGURA_GRADE):
+    """
+    PNG da grade de chuva (do cache, se as entradas forem as mesmas).
+    Devolve {"arquivo", "limites", "recalculada"} ou None sem pontos
+    """
+    if not pontos:
+        return None
+    caminho = caminho or GRADE_ARQUIVO
+    metodo = metodo or METODO_GRADE
+    entradas = [VERSAO_GRADE, metodo, largura, RAIO_MAXIMO_KM, POTENCIA_IDW, BANDA_KDE_KM, NIVEIS_MM, CORES_NIVEIS,
+                sorted((round(lat, 5), round(lon, 5), round(mm, 2)) for lat, lon, mm in pontos)]
+    assinatura = hashlib.sha1(json.dumps(entradas).encode("utf-8")).hexdigest()
+
+    descricao = caminho + ".json"
+    try:
+        with open(descricao, "r", encoding="utf-8") as arquivo:
+            cache = json.load(arquivo)
+        if cache.get("assinatura") == assinatura and os.path.exists(caminho):
+            return {"arquivo": caminho, "limites": cache["limites"], "recalculada": False}
+    except (OSError, ValueError):
+        pass
+
+    limites = limites_grade(pontos)
+    gravar_atomico(caminho, _png_indexado(quantizar(calcular_grade(pontos, limites, largura, metodo))))
+    gravar_atomico(descricao, json.dumps({"assinatura": assinatura, "limites": limites, "metodo": metodo}))
+    return {"arquivo": caminho, "limites": limites, "recalculada": True}
+
+def legenda_html():
+    """Legenda das classes de chuva (canto inferior direito)"""
+    rotulos = [f"{a:g}-{b:g} mm" for a, b in zip(NIVEIS_MM, NIVEIS_MM[1:])] + [f"≥ {NIVEIS_MM[-1]:g} mm"]
+    itens = "".join(f'<div><span style="display:inline-block; width:12px; height:12px; background:{cor}; margin-right:4px;"></span>{rotulo}</div>'
+                    for cor, rotulo in zip(CORES_NIVEIS, rotulos))
+    return ('<div style="position: fixed; bottom: 30px; right: 10px; z-index:9999; background-color: white; '
+            'border:2px solid grey; padding: 6px; font-size:12px;"><b>Chuva acumulada</b>' + itens + '</div>')
+
+def adicionar_grade_chuva(mapa, pontos, nome="Chuva Acumulada (24h)"):
+    """Sobrepõe a grade de chuva ao mapa (ImageOverlay) com a legenda; None sem pontos"""
+    import folium
+
+    grade = grade_chuva(pontos)
+    if grade is None:
+        return None
+    folium.raster_layers.ImageOverlay(image=grade["arquivo"], bounds=grade["limites"], name=nome, opacity=1.0,
+                                      interactive=False, zindex=1).add_to(mapa)
+    mapa.get_root().html.add_child(folium.Element(legenda_html()))
+    return grade
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Renderização dos gráficos dos mapas - LHASA MG
+Os gráficos (estatisticas_estacoes, grafico_bolhas_estacoes) são montados por
+funções que devolvem a figura (figura_estatisticas, figura_dispersao_bolhas) e
+salvos aqui: sempre com o backend Agg (sem janela, funciona em servidor), em
+um pool de processos quando há mais de um gráfico, e no perfil escolhido:
+
+    relatorio   PNG 300 dpi (padrão)
+    painel      WebP 96 dpi, para dashboards (arquivos ~10x menores)
+
+A figura é sempre fechada depois de salva, também em caso de erro, para que a
+memória não cresça no modo daemon. Com um manifesto (manifesto_artefatos.py),
+gráficos com as mesmas entradas da execução anterior não são renderizados.
+
+Uso:
+    renderizar_graficos([("estatisticas_estacoes", figura_estatisticas, estacoes)], perfil="painel")
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+PERFIS = {
+    "relatorio": {"dpi": 300, "formato": "png"},
+    "painel": {"dpi": 96, "formato": "webp"},
+}
+PERFIL_GRAFICOS = os.environ.get("LHASA_GRAFICOS_PERFIL", "relatorio") # relatorio | painel
+PROCESSOS_GRAFICOS = int(os.environ.get("LHASA_GRAFICOS_PROCESSOS", "0")) or None # None = um por gráfico (até o número de núcleos)
+ESTILO = 'seaborn-v0_8'
+
+def _perfil(perfil):
+    perfil = perfil or PERFIL_GRAFICOS
+    if perfil not in PERFIS:
+        raise ValueError("perfil de gráficos inválido: " + str(perfil))
+    return PERFIS[perfil]
+
+def nome_arquivo(nome, perfil=None):
+    """Arquivo do gráfico no perfil (ex.: estatisticas_estacoes.png)"""
+    return nome + "." + _perfil(perfil)["formato"]
+
+def _renderizar(funcao, dados, arquivo, dpi, formato):
+    """Monta a figura com o backend Agg, salva e fecha (executado no pool)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    figura = None
+    try:
+        with plt.style.context(ESTILO):
+            figura = funcao(dados)
+            figura.savefig(arquivo, dpi=dpi, format=formato, bbox_inches='tight')
+    finally:
+        if figura is not None:
+            plt.close(figura)
+    return arquivo
+
+def _executar(tarefas, processos):
+    """Executa as tarefas no pool (ou no próprio processo, se houver só uma ou um único processo)"""
+    processos = min(len(tarefas), processos or os.cpu_count() or 1)
+    if processos <= 1:
+        return [_renderizar(*t) for t in tarefas]
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        return list(executor.map(_renderizar, *zip(*tarefas)))
+
+def renderizar_graficos(graficos, perfil=None, processos=None, manifesto=None):
+    """
+    graficos: lista de (nome, funcao, dados), com funcao(dados) devolvendo a
+    figura; funcao precisa ser de módulo (é enviada ao pool). Devolve
+    {nome: arquivo}; com manifesto, os gráficos inalterados são mantidos
+    """
+    configuracao = _perfil(perfil)
+    dpi, formato = configuracao["dpi"], configuracao["formato"]
+    arquivos, tarefas, hashes = {}, [], {}
+    for nome, funcao, dados in graficos:
+        arquivo = nome + "." + formato
+        if manifesto is not None:
+            hashes[arquivo] = manifesto.hash_entradas(arquivo, dpi, dados)
+            if manifesto.inalterado(arquivo, hashes[arquivo]):
+                print(f"♻️  Dados sem alteração: '{arquivo}' mantido")
+                arquivos[nome] = arquivo
+                continue
+        tarefas.append((funcao, dados, arquivo, dpi, formato))
+        arquivos[nome] = arquivo
+
+    for arquivo in _executar(tarefas, processos or PROCESSOS_GRAFICOS):
+        print(f"✅ Gráfico salvo como '{arquivo}'")
+        if manifesto is not None:
+            manifesto.registrar(arquivo, hashes[arquivo])
+    if manifesto is not None:
+        manifesto.salvar()
+    return arquivos
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+"""
+Servidor local que imita a API do INMET (apitempo.inmet.gov.br)
+Reproduz listas de estações e observações gravadas (fixtures) para medir a
+busca de dados sem acesso à rede. Latência, taxa de erros, respostas
+204/401/429 e limite de requisições por segundo são configuráveis.
+
+Rotas atendidas:
+    /estacoes/T                                   lista de estações
+    /estacao/dados/<inicio>/<fim>/<codigo>        observações (LHASA_RIO)
+    /token/estacao/<inicio>/<fim>/<codigo>/<token> observações com token (plugin)
+
+As observações gravadas são devolvidas para qualquer período pedido.
+
+Uso:
+    python inmet_stub.py --fixtures data/inmet_fixtures --porta 8765 --latencia 0.2 --limite 10
+    INMET_BASE_URL=http://127.0.0.1:8765/ python LHASA_RIO.py -n
+
+Gravação das fixtures a partir da API real:
+    python inmet_stub.py --gravar data/inmet_fixtures --data 2025-01-15 --estado MG
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import collections
+import urllib3
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+INMET_BASE_URL = "https://apitempo.inmet.gov.br/"
+ARQUIVO_ESTACOES = "estacoes.json"
+DIRETORIO_DADOS = "dados"
+CODIGOS_ERRO = (500, 502, 503)
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def carregar_fixtures(diretorio):
+    """Lê <diretorio>/estacoes.json e <diretorio>/dados/<codigo>.json"""
+    with open(os.path.join(diretorio, ARQUIVO_ESTACOES), "r", encoding="utf-8") as entrada:
+        estacoes = json.load(entrada)
+    observacoes = {}
+    pasta = os.path.join(diretorio, DIRETORIO_DADOS)
+    if os.path.isdir(pasta):
+        for nome in os.listdir(pasta):
+            if nome.endswith(".json"):
+                with open(os.path.join(pasta, nome), "r", encoding="utf-8") as entrada:
+                    observacoes[nome[:-5]] = json.load(entrada)
+    return estacoes, observacoes
+
+def salvar_fixtures(diretorio, estacoes, observacoes):
+    """Grava as fixtures no formato lido por carregar_fixtures"""
+    os.makedirs(os.path.join(diretorio, DIRETORIO_DADOS), exist_ok=True)
+    with open(os.path.join(diretorio, ARQUIVO_ESTACOES), "w", encoding="utf-8") as saida:
+        json.dump(estacoes, saida, ensure_ascii=False)
+    for codigo, dados in observacoes.items():
+        with open(os.path.join(diretorio, DIRETORIO_DADOS, f"{codigo}.json"), "w", encoding="utf-8") as saida:
+            json.dump(dados, saida, ensure_ascii=False)
+
+def gravar_da_api(diretorio, data, estado="MG", base_url=INMET_BASE_URL, token=None):
+    """Grava as estações operantes do estado e as observações do dia a partir da API"""
+    http = urllib3.PoolManager()
+    base = base_url.rstrip("/")
+    resposta = http.request("GET", f"{base}/estacoes/T")
+    estacoes = [e for e in json.loads(resposta.data)
+                if e.get("SG_ESTADO") == estado and e.get("CD_SITUACAO") == "Operante"]
+
+    observacoes = {}
+    for estacao in estacoes:
+        codigo = estacao["CD_ESTACAO"]
+        if token:
+            url = f"{base}/token/estacao/{data}/{data}/{codigo}/{token}"
+        else:
+            url = f"{base}/estacao/dados/{data}/{data}/{codigo}"
+        resposta = http.request("GET", url)
+        if resposta.status == 200 and resposta.data:
+            observacoes[codigo] = json.loads(resposta.data)
+
+    salvar_fixtures(diretorio, estacoes, observacoes)
+    return len(estacoes), len(observacoes)
+
+# ---------------------------------------------------------------------------
+# Servidor
+# ---------------------------------------------------------------------------
+
+class ServidorInmet:
+    """
+    Servidor HTTP local com as respostas da API do INMET
+
+    latencia / variacao: atraso fixo + aleatório (segundos) antes de cada resposta
+    taxa_erro: fração das requisições respondida com um dos codigos_erro
+    status_forcado: {codigo_estacao: status} (ex.: 204, 401, 429) para respostas fixas
+    limite_por_segundo: acima dele a requisição recebe 429 com Retry-After
+    tokens: se informado, /token/... com token fora da lista recebe 401
+    """
+
+    def __init__(self, estacoes, observacoes, latencia=0.0, variacao=0.0, taxa_erro=0.0,
+                 codigos_erro=CODIGOS_ERRO, status_forcado=None, limite_por_segundo=None,
+                 tokens=None, host="127.0.0.1", porta=0, semente=None):
+        self.estacoes = estacoes
+        self.observacoes = observacoes
+        self.latencia = latencia
+        self.variacao = variacao
+        self.taxa_erro = taxa_erro
+        self.codigos_erro = tuple(codigos_erro)
+        self.status_forcado = dict(status_forcado or {})
+        self.limite_por_segundo = limite_por_segundo
+        self.tokens = set(tokens) if tokens else None
+
+        self.estatisticas = {"requisicoes": 0, "status": collections.Counter(), "rotas": collections.Counter()}
+        self._aleatorio = random.Random(semente)
+        self._janela = collections.deque()
+        self._trava = threading.Lock()
+        self._thread = None
+
+        servidor = self
+        class Manipulador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, corpo, cabecalhos = servidor.responder(self.path)
+                self.send_response(status)
+                for nome, valor in cabecalhos.items():
+                    self.send_header(nome, valor)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer((host, porta), Manipulador)
+        self.servidor.daemon_threads = True
+        self.url = f"http://{host}:{self.servidor.server_address[1]}/"
+
+    @classmethod
+    def de_fixtures(cls, diretorio, **opcoes):
+        estacoes, observacoes = carregar_fixtures(diretorio)
+        return cls(estacoes, observacoes, **opcoes)
+
+    def _registrar(self, rota, status):
+        with self._trava:
+            self.estatisticas["status"][status] += 1
+            self.estatisticas["rotas"][rota] += 1
+
+    def _excedeu_limite(self):
+        if not self.limite_por_segundo:
+            return False
+        agora = time.monotonic()
+        with self._trava:
+            while self._janela and agora - self._janela[0] >= 1.0:
+                self._janela.popleft()
+            if len(self._janela) >= self.limite_por_segundo:
+                return True
+            self._janela.append(agora)
+            return False
+
+    def _sortear(self):
+        with self._trava:
+            atraso = self.latencia + (self._aleatorio.uniform(0, self.variacao) if self.variacao else 0.0)
+            erro = self._aleatorio.choice(self.codigos_erro) if self._aleatorio.random() < self.taxa_erro else None
+        return atraso, erro
+
+    def _rota(self, caminho):
+        """(rota, codigo_estacao, token) da URL pedida"""
+        partes = caminho.split("?")[0].strip("/").split("/")
+        if len(partes) == 2 and partes[0] == "estacoes":
+            return "estacoes", None, None
+        if len(partes) == 5 and partes[:2] == ["estacao", "dados"]:
+            return "dados", partes[4], None
+        if len(partes) == 6 and partes[:2] == ["token", "estacao"]:
+            return "dados", partes[4], partes[5]
+        return None, None, None
+
+    def responder(self, caminho):
+        """(status, corpo, cabeçalhos) para a URL pedida"""
+        with self._trava:
+            self.estatisticas["requisicoes"] += 1
+        rota, codigo, token = self._rota(caminho)
+
+        atraso, erro = self._sortear()
+        if atraso > 0:
+            time.sleep(atraso)
+
+        if rota is None:
+            status, corpo = 404, b""
+        elif self._excedeu_limite():
+            self._registrar(rota, 429)
+            return 429, b"", {"Retry-After": "1"}
+        elif erro:
+            status, corpo = erro, b""
+        elif self.tokens is not None and token is not None and token not in self.tokens:
+            status, corpo = 401, b""
+        elif codigo in self.status_forcado:
+            status, corpo = self.status_forcado[codigo], b""
+        elif rota == "estacoes":
+            status, corpo = 200, json.dumps(self.estacoes).encode("utf-8")
+        elif self.observacoes.get(codigo):
+            status, corpo = 200, json.dumps(self.observacoes[codigo]).encode("utf-8")
+        else:
+            status, corpo = 204, b"" # o INMET responde 204 quando não há dados no período
+
+        self._registrar(rota or "desconhecida", status)
+        cabecalhos = {"Content-Type": "application/json"} if corpo else {}
+        if status == 429:
+            cabecalhos["Retry-After"] = "1"
+        return status, corpo, cabecalhos
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *args):
+        self.parar()
+
+# ---------------------------------------------------------------------------
+# Linha de comando
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API do INMET")
+    parser.add_argument("--fixtures", help="diretório com estacoes.json e dados/<codigo>.json")
+    parser.add_argument("--gravar", metavar="DIRETORIO", help="grava fixtures a partir da API real e sai")
+    parser.add_argument("--data", default=time.strftime("%Y-%m-%d"), help="dia gravado (AAAA-MM-DD)")
+    parser.add_argument("--estado", default="MG")
+    parser.add_argument("--token", help="token da API (rota /token/...)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.0, help="atraso fixo por resposta (s)")
+    parser.add_argument("--variacao", type=float, default=0.0, help="atraso aleatório adicional máximo (s)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="fração de respostas 5xx")
+    parser.add_argument("--limite", type=float, help="requisições por segundo antes de responder 429")
+    parser.add_argument("--forcar", action="append", default=[], metavar="CODIGO=STATUS",
+                        help="status fixo para uma estação (ex.: A001=204)")
+    parser.add_argument("--semente", type=int)
+    args = parser.parse_args(argv)
+
+    if args.gravar:
+        estacoes, observacoes = gravar_da_api(args.gravar, args.data, args.estado, token=args.token)
+        print(f"{estacoes} estações e {observacoes} séries de observações gravadas em {args.gravar}")
+        return 0
+    if not args.fixtures:
+        parser.error("informe --fixtures ou --gravar")
+
+    status_forcado = {}
+    for item in args.forcar:
+        codigo, status = item.split("=")
+        status_forcado[codigo] = int(status)
+
+    servidor = ServidorInmet.de_fixtures(
+        args.fixtures, latencia=args.latencia, variacao=args.variacao, taxa_erro=args.taxa_erro,
+        status_forcado=status_forcado, limite_por_segundo=args.limite,
+        tokens=[args.token] if args.token else None, host=args.host, porta=args.porta, semente=args.semente)
+    print(f"INMET local em {servidor.url} ({len(servidor.estacoes)} estações)")
+    print(f"Use INMET_BASE_URL={servidor.url}")
+    try:
+        servidor.servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.servidor.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
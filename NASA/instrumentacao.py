@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+"""
+Instrumentação das etapas do processamento (#01 a #12)
+Para cada etapa registra tempo de relógio, tempo de CPU, pico de memória (RSS;
+no Linux, o pico da própria etapa, zerado em /proc/self/clear_refs),
+linhas e feições processadas, requisições HTTP (quantidade e bytes) e
+artefatos gerados ou reaproveitados (manifesto_artefatos.py). Cada
+etapa é gravada como uma linha JSON no relatório de execuções, seguida de uma
+linha de resumo da execução com o uso do orçamento de 15 minutos do nowcast.
+
+Uso em LHASA_RIO.py:
+    with execucao("nowcast", RELATORIO_EXECUCAO):
+        ...
+        log.info(etapa("#01 | SELECIONANDO AREAS DE RISCO"))
+        contar(feicoes=1234)
+
+Fora de uma execução, etapa() e contar() não fazem nada.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+from datetime import datetime
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+ORCAMENTO_NOWCAST = 15 * 60 # segundos entre dois ciclos do daemon
+
+def _zerar_pico_rss():
+    """Zera o pico de RSS do processo (VmHWM, Linux); False onde não é possível"""
+    try:
+        with open("/proc/self/clear_refs", "w") as arquivo:
+            arquivo.write("5")
+        return True
+    except OSError:
+        return False
+
+def _rss_pico_mb():
+    """Pico de memória residente do processo desde o início ou desde o último
+    _zerar_pico_rss() (MB); None se não houver como medir"""
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(pico / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memoria = psutil.Process().memory_info()
+    return round(getattr(memoria, "peak_wset", memoria.rss) / (1024.0 * 1024.0), 1)
+
+def _cpu_filhos():
+    """Tempo de CPU dos processos filhos já encerrados (pools do motor raster)"""
+    if resource is None:
+        return 0.0
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return uso.ru_utime + uso.ru_stime
+
+class _Medida:
+    """Contadores acumulados de uma etapa ou da execução inteira"""
+
+    def __init__(self, rotulo="", escopo="etapa"):
+        self.rotulo = rotulo
+        self.inicio = datetime.now()
+        self.relogio = time.perf_counter()
+        self.cpu = time.process_time()
+        self.cpu_filhos = _cpu_filhos()
+        self.linhas = 0
+        self.feicoes = 0
+        self.http_requisicoes = 0
+        self.http_bytes = 0
+        self.http_erros = 0
+        self.artefatos_gerados = 0
+        self.artefatos_inalterados = 0
+        self.rss_pico = None # maior pico das etapas já fechadas (só na medida da execução)
+        self.escopo_rss = escopo if _zerar_pico_rss() else "processo"
+
+    def pico_rss(self):
+        """Pico de RSS da medida: o atual e o das etapas fechadas, já que cada etapa zera o do processo"""
+        atual = _rss_pico_mb()
+        if atual is None or self.rss_pico is None:
+            return atual if atual is not None else self.rss_pico
+        return max(atual, self.rss_pico)
+
+    def registro(self):
+        artefatos = self.artefatos_gerados + self.artefatos_inalterados
+        return {
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "relogio_s": round(time.perf_counter() - self.relogio, 4),
+            "cpu_s": round(time.process_time() - self.cpu, 4),
+            "cpu_filhos_s": round(_cpu_filhos() - self.cpu_filhos, 4),
+            "rss_pico_mb": self.pico_rss(),
+            "rss_pico_escopo": self.escopo_rss, # "processo" quando o pico não pode ser zerado por etapa
+            "linhas": self.linhas,
+            "feicoes": self.feicoes,
+            "http_requisicoes": self.http_requisicoes,
+            "http_bytes": self.http_bytes,
+            "http_erros": self.http_erros,
+            "artefatos_gerados": self.artefatos_gerados,
+            "artefatos_inalterados": self.artefatos_inalterados,
+            "taxa_inalterados": round(self.artefatos_inalterados / artefatos, 4) if artefatos else None,
+        }
+
+class Instrumentacao:
+    def __init__(self):
+        self.arquivo = None
+        self.id = None
+        self.modo = None
+        self.orcamento = ORCAMENTO_NOWCAST
+        self.ordem = 0
+        self._total = None
+        self._etapa = None
+        self._trava = threading.Lock()
+        self.observadores = []
+
+    @property
+    def ativa(self):
+        return self._total is not None
+
+    def _gravar(self, registro):
+        if not self.arquivo:
+            return
+        diretorio = os.path.dirname(os.path.abspath(self.arquivo))
+        os.makedirs(diretorio, exist_ok=True)
+        with open(self.arquivo, "a", encoding="utf-8") as saida:
+            saida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    def iniciar(self, modo, arquivo=None, orcamento=ORCAMENTO_NOWCAST):
+        instalar_http()
+        self.arquivo = arquivo
+        self.modo = modo
+        self.orcamento = orcamento
+        self.id = datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + str(os.getpid())
+        self.ordem = 0
+        self._etapa = None
+        self._total = _Medida(modo, "execucao")
+
+    def observar(self, funcao):
+        """funcao(rotulo) é chamada a cada troca de etapa (ex.: perfil.marcar)"""
+        self.observadores.append(funcao)
+
+    def etapa(self, rotulo):
+        """Fecha a etapa anterior e abre a próxima; devolve o rótulo para o log"""
+        for funcao in self.observadores:
+            funcao(rotulo)
+        if self.ativa:
+            self.fechar_etapa()
+            self.ordem += 1
+            self._etapa = _Medida(rotulo)
+        return rotulo
+
+    def fechar_etapa(self):
+        if self._etapa is None:
+            return None
+        codigo, _, descricao = self._etapa.rotulo.partition("|")
+        registro = {"tipo": "etapa", "execucao": self.id, "modo": self.modo, "ordem": self.ordem,
+                    "etapa": codigo.strip(), "descricao": descricao.strip()}
+        registro.update(self._etapa.registro())
+        if self._total is not None and registro["rss_pico_mb"] is not None:
+            self._total.rss_pico = max(self._total.rss_pico or 0.0, registro["rss_pico_mb"])
+        self._etapa = None
+        self._gravar(registro)
+        return registro
+
+    def contar(self, linhas=0, feicoes=0):
+        if not self.ativa:
+            return
+        with self._trava:
+            for medida in (self._etapa, self._total):
+                if medida is not None:
+                    medida.linhas += linhas
+                    medida.feicoes += feicoes
+
+    def registrar_http(self, bytes_recebidos, erro=False):
+        if not self.ativa:
+            return
+        with self._trava:
+            for medida in (self._etapa, self._total):
+                if medida is not None:
+                    medida.http_requisicoes += 1
+                    medida.http_bytes += bytes_recebidos
+                    medida.http_erros += 1 if erro else 0
+
+    def registrar_artefato(self, inalterado):
+        """Artefato reaproveitado (entradas iguais às da execução anterior) ou gerado"""
+        if not self.ativa:
+            return
+        with self._trava:
+            for medida in (self._etapa, self._total):
+                if medida is not None:
+                    if inalterado:
+                        medida.artefatos_inalterados += 1
+                    else:
+                        medida.artefatos_gerados += 1
+
+    def finalizar(self, erro=None):
+        """Fecha a última etapa e grava o resumo da execução"""
+        if not self.ativa:
+            return None
+        self.fechar_etapa()
+        registro = {"tipo": "execucao", "execucao": self.id, "modo": self.modo, "etapas": self.ordem}
+        registro.update(self._total.registro())
+        registro["fim"] = datetime.now().isoformat(timespec="seconds")
+        registro["orcamento_s"] = self.orcamento
+        registro["uso_orcamento"] = round(registro["relogio_s"] / self.orcamento, 4) if self.orcamento else None
+        if erro is not None:
+            registro["erro"] = str(erro)
+        self._total = None
+        self._gravar(registro)
+        return registro
+
+    @contextlib.contextmanager
+    def execucao(self, modo, arquivo=None, orcamento=ORCAMENTO_NOWCAST):
+        self.iniciar(modo, arquivo, orcamento)
+        try:
+            yield self
+        except BaseException as erro:
+            self.finalizar(erro)
+            raise
+        else:
+            self.finalizar()
+
+# ---------------------------------------------------------------------------
+# HTTP: conta as requisições feitas pelo urllib3 (também usado pelo requests)
+# ---------------------------------------------------------------------------
+
+_HTTP_INSTALADO = False
+
+def instalar_http():
+    global _HTTP_INSTALADO
+    if _HTTP_INSTALADO:
+        return
+    try:
+        from urllib3.connectionpool import HTTPConnectionPool
+    except ImportError:
+        return
+    original = HTTPConnectionPool.urlopen
+
+    def urlopen(self, method, url, *args, **kwargs):
+        try:
+            resposta = original(self, method, url, *args, **kwargs)
+        except Exception:
+            instrumentacao.registrar_http(0, erro=True)
+            raise
+        tamanho = resposta.headers.get("Content-Length")
+        if tamanho is not None and tamanho.isdigit():
+            tamanho = int(tamanho)
+        elif kwargs.get("preload_content", True):
+            tamanho = len(resposta.data or b"")
+        else:
+            tamanho = 0
+        instrumentacao.registrar_http(tamanho, erro=resposta.status >= 400)
+        return resposta
+
+    HTTPConnectionPool.urlopen = urlopen
+    _HTTP_INSTALADO = True
+
+# Instância global, como o logger
+instrumentacao = Instrumentacao()
+etapa = instrumentacao.etapa
+contar = instrumentacao.contar
+execucao = instrumentacao.execucao
+observar = instrumentacao.observar
+
+def contar_feicoes(arcpy, caminho):
+    """Soma à etapa atual as feições da camada (só consulta a camada durante uma execução)"""
+    if instrumentacao.ativa:
+        instrumentacao.contar(feicoes=int(arcpy.GetCount_management(caminho)[0]))
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Tabela de Limiares de Chuva - LHASA
+Carrega a tabela versionada (limiares.json) e compila cada modelo em uma
+tabela de consulta por índice de faixa (searchsorted + lookup)
+"""
+
+import os
+import json
+import bisect
+import logging
+import itertools
+
+log = logging.getLogger(__name__)
+
+CAMINHO_LIMIARES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "limiares.json")
+
+class ModeloLimiares:
+    """Modelo de limiares compilado: faixas por variável -> classe de chuva -> perigo"""
+
+    def __init__(self, nome, definicao):
+        self.nome = nome
+        self.definicao = definicao
+        self.variaveis = list(definicao["variaveis"])
+        self.classes = definicao["classes_chuva"]
+        self.nomes_classes = [classe["nome"] for classe in self.classes]
+        # Ordem de avaliação: maior "prioridade" primeiro (empate: ordem da tabela).
+        # Decide qual classe vence quando as condições se sobrepõem; cada aplicação
+        # mantém a ordem da sua regra original (RIO: moderada antes; plugin: severa antes)
+        self.ordem = sorted(range(len(self.classes)), key=lambda i: -self.classes[i].get("prioridade", 0))
+
+        # Bordas de cada variável: todos os limites finitos citados nas condições
+        self.bordas = {}
+        for variavel in self.variaveis:
+            limites = set()
+            for classe in self.classes:
+                for condicao in classe.get("condicoes", []):
+                    if variavel in condicao:
+                        limites.update(float(v) for v in condicao[variavel] if v is not None)
+            self.bordas[variavel] = sorted(limites)
+        # numpy só é importado quando um modelo é compilado (não na importação do módulo)
+        import numpy as np
+        self.bordas_np = {v: np.asarray(b, dtype=np.float64) for v, b in self.bordas.items()}
+
+        self.tabela_classes = self._compilar_classes()
+        self._compilar_perigo(definicao["perigo"], definicao["perigo_padrao"])
+
+    def _avaliar_classe(self, valores):
+        """Avalia as regras por prioridade (primeira classe que casa vence)"""
+        for indice in self.ordem:
+            for condicao in self.classes[indice].get("condicoes", []):
+                if all(valores[v] >= (lim[0] if lim[0] is not None else float("-inf")) and
+                       (lim[1] is None or valores[v] < lim[1])
+                       for v, lim in condicao.items()):
+                    return indice
+        return 0
+
+    def _compilar_classes(self):
+        """Gera o array N-dimensional classe[faixa_v1, faixa_v2, ...]"""
+        representantes = []
+        for variavel in self.variaveis:
+            bordas = self.bordas[variavel]
+            primeira = (bordas[0] - 1.0) if bordas else 0.0
+            representantes.append([primeira] + bordas)
+
+        import numpy as np
+        formato = tuple(len(r) for r in representantes)
+        tabela = np.zeros(formato, dtype=np.uint8)
+        for indices in itertools.product(*[range(n) for n in formato]):
+            valores = {v: representantes[i][indices[i]] for i, v in enumerate(self.variaveis)}
+            tabela[indices] = self._avaliar_classe(valores)
+        return tabela
+
+    def _compilar_perigo(self, perigo, padrao):
+        """Gera a matriz perigo[gridcode, classe] com códigos para self.niveis"""
+        self.perigo = {int(g): list(niveis) for g, niveis in perigo.items()}
+        self.perigo_padrao = list(padrao)
+
+        self.niveis = []
+        for linha in list(self.perigo.values()) + [self.perigo_padrao]:
+            if len(linha) != len(self.classes):
+                raise ValueError(f"Modelo '{self.nome}': linha de perigo com {len(linha)} colunas, esperado {len(self.classes)}")
+            for nivel in linha:
+                if nivel not in self.niveis:
+                    self.niveis.append(nivel)
+
+        import numpy as np
+        self.gridcode_maximo = max(self.perigo) if self.perigo else 0
+        tabela = np.empty((self.gridcode_maximo + 2, len(self.classes)), dtype=np.int16)
+        tabela[:] = [self.niveis.index(n) for n in self.perigo_padrao]
+        for gridcode, linha in self.perigo.items():
+            tabela[gridcode] = [self.niveis.index(n) for n in linha]
+        self.tabela_perigo = tabela
+
+    # ------------------------------------------------------------------
+    # Classificação
+    # ------------------------------------------------------------------
+
+    def classe_chuva(self, **valores):
+        """Classe de chuva (índice em self.classes) para valores escalares"""
+        tabela = self.tabela_classes
+        for variavel in self.variaveis:
+            tabela = tabela[bisect.bisect_right(self.bordas[variavel], float(valores.get(variavel) or 0.0))]
+        return int(tabela)
+
+    def classificar(self, gridcode, **valores):
+        """Nível de perigo para um polígono (valores escalares)"""
+        return self.perigo.get(gridcode, self.perigo_padrao)[self.classe_chuva(**valores)]
+
+    def classe_chuva_array(self, **arrays):
+        """Classe de chuva para arrays de valores (uma busca por variável)"""
+        import numpy as np
+        indices = tuple(
+            np.searchsorted(self.bordas_np[v], np.nan_to_num(np.asarray(arrays[v], dtype=np.float64)), side="right")
+            for v in self.variaveis
+        )
+        return self.tabela_classes[indices]
+
+    def indice_gridcode(self, gridcode):
+        """Linha da matriz de perigo para cada gridcode (desconhecidos -> linha padrão)"""
+        import numpy as np
+        gridcode = np.asarray(gridcode, dtype=np.int64)
+        conhecido = np.isin(gridcode, list(self.perigo))
+        return np.where(conhecido, gridcode, self.gridcode_maximo + 1)
+
+    def classificar_array(self, gridcode, **arrays):
+        """Códigos de perigo (índices em self.niveis) para arrays de polígonos"""
+        return self.tabela_perigo[self.indice_gridcode(gridcode), self.classe_chuva_array(**arrays)]
+
+    def com_limites(self, variavel, limites):
+        """Novo modelo com os limites inferiores das classes 1..N de uma variável substituídos"""
+        definicao = json.loads(json.dumps(self.definicao))
+        limites = [float(v) for v in limites]
+        for indice, classe in enumerate(definicao["classes_chuva"][1:]):
+            superior = limites[indice + 1] if indice + 1 < len(limites) else None
+            classe["condicoes"] = [{variavel: [limites[indice], superior]}]
+        return ModeloLimiares(self.nome, definicao)
+
+    # ------------------------------------------------------------------
+    # Geração de código para ArcGIS e QGIS
+    # ------------------------------------------------------------------
+
+    def gerar_code_block(self, nome_funcao="NivelPerigo"):
+        """Code block Python para CalculateField_management com a tabela embutida"""
+        parametros = ", ".join(["susceptibilidade"] + self.variaveis)
+        valores = ", ".join(self.variaveis) + ("," if len(self.variaveis) == 1 else "")
+        return (
+            "import bisect\n"
+            f"_BORDAS = {[self.bordas[v] for v in self.variaveis]!r}\n"
+            f"_CLASSES = {self.tabela_classes.tolist()!r}\n"
+            f"_PERIGO = {self.perigo!r}\n"
+            f"_PADRAO = {self.perigo_padrao!r}\n"
+            f"def {nome_funcao}({parametros}):\n"
+            "    classe = _CLASSES\n"
+            f"    for bordas, valor in zip(_BORDAS, ({valores})):\n"
+            "        classe = classe[bisect.bisect_right(bordas, float(valor or 0.0))]\n"
+            "    return _PERIGO.get(susceptibilidade, _PADRAO)[classe]\n"
+        )
+
+    def expressao_arcpy(self, campos, campo_gridcode="gridcode", nome_funcao="NivelPerigo"):
+        """Expressão de CalculateField que chama a função do code block"""
+        argumentos = ", ".join(f"!{c}!" for c in [campo_gridcode] + [campos[v] for v in self.variaveis])
+        return f"{nome_funcao}( {argumentos} )"
+
+    def expressao_qgis(self, campos, campo_gridcode="gridcode"):
+        """Expressão CASE do QGIS equivalente às regras da tabela"""
+        def literal(nivel):
+            return "NULL" if nivel is None else "'" + str(nivel).replace("'", "''") + "'"
+
+        def perigo_da_classe(indice):
+            niveis = {g: linha[indice] for g, linha in self.perigo.items()}
+            padrao = self.perigo_padrao[indice]
+            if all(n == padrao for n in niveis.values()):
+                return literal(padrao)
+            casos = " ".join(f'WHEN "{campo_gridcode}" = {g} THEN {literal(n)}' for g, n in sorted(niveis.items()))
+            return f"CASE {casos} ELSE {literal(padrao)} END"
+
+        def condicao_sql(condicao):
+            termos = []
+            for variavel, (minimo, maximo) in condicao.items():
+                if minimo is not None:
+                    termos.append(f'"{campos[variavel]}" >= {minimo}')
+                if maximo is not None:
+                    termos.append(f'"{campos[variavel]}" < {maximo}')
+            return "(" + " AND ".join(termos) + ")"
+
+        linhas = ["CASE"]
+        for indice in self.ordem:
+            classe = self.classes[indice]
+            if classe.get("condicoes"):
+                condicoes = " OR ".join(condicao_sql(c) for c in classe["condicoes"])
+                linhas.append(f"    WHEN {condicoes} THEN {perigo_da_classe(indice)}")
+        linhas.append(f"    ELSE {perigo_da_classe(0)}")
+        linhas.append("END")
+        return "\n".join(linhas)
+
+class TabelaLimiares:
+    """Tabela versionada de limiares com recarga automática quando o arquivo muda"""
+
+    def __init__(self, caminho=CAMINHO_LIMIARES):
+        self.caminho = caminho
+        self.versao = None
+        self.modelos = {}
+        self._mtime = None
+        self.carregar()
+
+    def carregar(self):
+        """Lê e compila todos os modelos; só substitui a tabela atual se tudo compilar"""
+        mtime = os.stat(self.caminho).st_mtime_ns
+        with open(self.caminho, "r", encoding="utf-8") as arquivo:
+            if self.caminho.lower().endswith((".yaml", ".yml")):
+                import yaml
+                try:
+                    dados = yaml.safe_load(arquivo)
+                except yaml.YAMLError as e:
+                    raise ValueError(f"YAML inválido: {e}") from e
+            else:
+                dados = json.load(arquivo)
+
+        modelos = {nome: ModeloLimiares(nome, definicao) for nome, definicao in dados["modelos"].items()}
+        self.versao = dados.get("versao")
+        self.modelos = modelos
+        self._mtime = mtime
+
+    def recarregar_se_alterado(self):
+        """Recarrega a tabela se o arquivo foi modificado. Retorna True quando recarregou"""
+        try:
+            mtime = os.stat(self.caminho).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            self.carregar()
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            log.warning(f"Tabela de limiares inválida, mantendo versão {self.versao}: {e}")
+            self._mtime = mtime
+            return False
+        except OSError as e:
+            # Arquivo trocado/bloqueado durante a leitura: tenta de novo no próximo ciclo
+            log.warning(f"Tabela de limiares ilegível, mantendo versão {self.versao}: {e}")
+            return False
+        log.info(f"Tabela de limiares recarregada (versão {self.versao})")
+        return True
+
+    def modelo(self, nome):
+        return self.modelos[nome]
+
+_TABELA = None
+
+def obter_tabela():
+    """Instância global da tabela (caminho em LHASA_LIMIARES ou limiares.json)"""
+    global _TABELA
+    if _TABELA is None:
+        _TABELA = TabelaLimiares(os.environ.get("LHASA_LIMIARES", CAMINHO_LIMIARES))
+    return _TABELA
@@ -1,25 +1,181 @@
+"""
+Logger do LHASA com fila e nível
+As mensagens são entregues a uma thread de escrita por um QueueHandler, então
+console e arquivo nunca bloqueiam os laços de carga. Mensagens abaixo do nível
+configurado são descartadas antes de qualquer formatação: prefira argumentos
+no estilo %  (log.debug("linha %s", n)) em vez de concatenar strings.
+
+    from logger import logger as log, configurar
+    configurar(nivel="INFO", arquivo="logs/LHASA_RIO.log", json=True)
+    log.info("mensagem", estacao="A001", linhas=96)   # campos estruturados
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import contextlib
 import logging
+import logging.handlers
 from datetime import datetime
 
-class Logger:
+NOME = "lhasa"
+FORMATO_CONSOLE = "[%(asctime)s] [%(levelname)s] %(message)s"
+DATA_CONSOLE = "%H:%M:%S"
+FORMATO_ARQUIVO = "%(asctime)s %(levelname)s %(message)s"
+DATA_ARQUIVO = "%d/%m/%Y %H:%M:%S"
+
+class _Console(logging.StreamHandler):
+    """StreamHandler que usa o sys.stdout do momento (redirect_stdout, pytest)"""
+
     def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        
-    def info(self, message):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f"[{timestamp}] [INFO] {message}")
-        
-    def error(self, message):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f"[{timestamp}] [ERROR] {message}")
-        
-    def debug(self, message):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f"[{timestamp}] [DEBUG] {message}")
-        
-    def warning(self, message):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f"[{timestamp}] [WARNING] {message}")
-
-# Instância global do logger
-logger = Logger()
+        super().__init__(sys.stdout)
+        self.addFilter(lambda record: not getattr(record, "sem_console", False))
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, valor):
+        pass
+
+class FormatadorTexto(logging.Formatter):
+    """Texto com os campos estruturados no final (chave=valor)"""
+
+    def format(self, record):
+        texto = super().format(record)
+        campos = getattr(record, "campos", None)
+        if campos:
+            texto += " | " + " ".join(f"{chave}={valor}" for chave, valor in campos.items())
+        return texto
+
+class FormatadorJson(logging.Formatter):
+    """Uma linha JSON por mensagem"""
+
+    def format(self, record):
+        registro = {
+            "data": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "origem": record.name,
+            "mensagem": record.getMessage(),
+        }
+        registro.update(getattr(record, "campos", None) or {})
+        if record.exc_info:
+            registro["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+class _FilaHandler(logging.handlers.QueueHandler):
+    """QueueHandler que mantém os campos estruturados no registro enfileirado"""
+
+    def prepare(self, record):
+        campos = getattr(record, "campos", None)
+        record = super().prepare(record)
+        if campos:
+            record.campos = campos
+        return record
+
+class Logger:
+    def __init__(self, nome=NOME):
+        self.logger = logging.getLogger(nome)
+        self.logger.propagate = False
+        self._ouvinte = None
+        self._fila_handler = None
+
+    # -- configuração --------------------------------------------------------
+
+    def configurar(self, nivel=logging.DEBUG, arquivo=None, console=True, json=False, raiz=False):
+        """
+        Troca os destinos do log. nivel aceita número ou nome ("INFO");
+        json grava uma linha JSON por mensagem; raiz também encaminha os
+        loggers da biblioteca padrão (ex.: limiares) para os mesmos destinos.
+        """
+        self.parar()
+        if isinstance(nivel, str):
+            nivel = logging.getLevelName(nivel.upper())
+
+        destinos = []
+        if console:
+            destino = _Console()
+            destino.setFormatter(FormatadorJson() if json else FormatadorTexto(FORMATO_CONSOLE, DATA_CONSOLE))
+            destinos.append(destino)
+        if arquivo:
+            os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+            destino = logging.FileHandler(arquivo, mode="a", encoding="utf-8")
+            destino.setFormatter(FormatadorJson() if json else FormatadorTexto(FORMATO_ARQUIVO, DATA_ARQUIVO))
+            destinos.append(destino)
+
+        fila = queue.SimpleQueue()
+        self._fila_handler = _FilaHandler(fila)
+        self._ouvinte = logging.handlers.QueueListener(fila, *destinos, respect_handler_level=False)
+        self._ouvinte.start()
+
+        self.logger.setLevel(nivel)
+        self.logger.addHandler(self._fila_handler)
+        if raiz:
+            raiz_logger = logging.getLogger()
+            raiz_logger.setLevel(nivel)
+            raiz_logger.addHandler(self._fila_handler)
+        return self
+
+    @contextlib.contextmanager
+    def sem_console(self):
+        """Suspende só o console; nível, arquivo e formato continuam como configurados.
+        As mensagens são marcadas ao entrar na fila, então as que a thread de escrita
+        ainda não entregou ao sair do bloco também ficam fora do console"""
+        def marcar(record):
+            record.sem_console = True
+            return True
+
+        fila_handler = self._fila_handler
+        if fila_handler is None:
+            yield
+            return
+        fila_handler.addFilter(marcar)
+        try:
+            yield
+        finally:
+            fila_handler.removeFilter(marcar)
+
+    def parar(self):
+        """Esvazia a fila e encerra a thread de escrita"""
+        if self._fila_handler is not None:
+            self.logger.removeHandler(self._fila_handler)
+            logging.getLogger().removeHandler(self._fila_handler)
+            self._fila_handler = None
+        if self._ouvinte is not None:
+            self._ouvinte.stop()
+            for destino in self._ouvinte.handlers:
+                destino.close()
+            self._ouvinte = None
+
+    # -- mensagens -----------------------------------------------------------
+
+    def habilitado(self, nivel):
+        return self.logger.isEnabledFor(nivel)
+
+    def _log(self, nivel, mensagem, args, campos, exc_info=None):
+        if self.logger.isEnabledFor(nivel):
+            self.logger._log(nivel, mensagem, args, exc_info=exc_info, extra={"campos": campos} if campos else None)
+
+    def debug(self, mensagem, *args, **campos):
+        self._log(logging.DEBUG, mensagem, args, campos)
+
+    def info(self, mensagem, *args, **campos):
+        self._log(logging.INFO, mensagem, args, campos)
+
+    def warning(self, mensagem, *args, **campos):
+        self._log(logging.WARNING, mensagem, args, campos)
+
+    def error(self, mensagem, *args, **campos):
+        self._log(logging.ERROR, mensagem, args, campos)
+
+    def exception(self, mensagem, *args, **campos):
+        self._log(logging.ERROR, mensagem, args, campos, exc_info=True)
+
+# Instância global do logger: console, todos os níveis, até configurar() ser chamado
+logger = Logger().configurar()
+configurar = logger.configurar
+sem_console = logger.sem_console
+atexit.register(logger.parar)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+Manifesto de artefatos dos mapas - LHASA MG
+Guarda, para cada artefato (HTML dos mapas, PNG dos gráficos), o hash das
+entradas usadas para gerá-lo e o arquivo gerado. Se as estações e os valores
+forem os mesmos da execução anterior e o arquivo ainda existir, o artefato não
+é gerado de novo. Cada decisão é somada à etapa atual do relatório de execuções
+(artefatos_gerados / artefatos_inalterados).
+
+Uso:
+    manifesto = Manifesto()
+    hash_entradas = manifesto.hash_entradas("estatisticas_estacoes.png", estacoes)
+    if not manifesto.inalterado("estatisticas_estacoes.png", hash_entradas):
+        gerar_estatisticas(estacoes)
+        manifesto.registrar("estatisticas_estacoes.png", hash_entradas)
+    manifesto.salvar()
+
+Para forçar a geração de tudo, apague o arquivo do manifesto.
+"""
+
+import os
+import json
+import hashlib
+
+from arquivos import gravar_atomico
+from instrumentacao import instrumentacao
+
+MANIFESTO_ARQUIVO = os.environ.get("LHASA_MANIFESTO_MAPAS", "manifesto_mapas.json")
+VERSAO_MANIFESTO = 1 # mude quando o conteúdo dos artefatos mudar para as mesmas entradas
+
+class Manifesto:
+    def __init__(self, caminho=None):
+        self.caminho = caminho or MANIFESTO_ARQUIVO
+        self.artefatos = {}
+        self.alterado = False
+        if os.path.exists(self.caminho):
+            try:
+                with open(self.caminho, "r", encoding="utf-8") as arquivo:
+                    conteudo = json.load(arquivo)
+                if conteudo.get("versao") == VERSAO_MANIFESTO:
+                    self.artefatos = conteudo.get("artefatos", {})
+            except (ValueError, OSError, AttributeError):
+                self.artefatos = {} # manifesto inválido: tudo é gerado de novo
+
+    @staticmethod
+    def hash_entradas(*entradas):
+        """sha1 das entradas serializadas em JSON (chaves ordenadas)"""
+        texto = json.dumps(entradas, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+    def arquivo(self, artefato):
+        registro = self.artefatos.get(artefato)
+        return registro["arquivo"] if registro else None
+
+    def inalterado(self, artefato, hash_entradas):
+        """True se o artefato já foi gerado com estas entradas e o arquivo existe"""
+        registro = self.artefatos.get(artefato)
+        inalterado = bool(registro) and registro["hash"] == hash_entradas and os.path.exists(registro["arquivo"])
+        instrumentacao.registrar_artefato(inalterado)
+        return inalterado
+
+    def registrar(self, artefato, hash_entradas, arquivo=None):
+        self.artefatos[artefato] = {"hash": hash_entradas, "arquivo": arquivo or artefato}
+        self.alterado = True
+
+    def salvar(self):
+        """Grava o manifesto (temporário + os.replace) se algum artefato foi gerado"""
+        if not self.alterado:
+            return
+        gravar_atomico(self.caminho, json.dumps({"versao": VERSAO_MANIFESTO, "artefatos": self.artefatos}, ensure_ascii=False, indent=1, sort_keys=True))
+        self.alterado = False
@@ -4,26 +4,34 @@ Gerador de Mapas com Gráfico de Bolhas - LHASA MG
 Visualização avançada com bolhas proporcionais aos dados meteorológicos
 """
 
+import os
 import folium
-import pandas as pd
 import json
 import numpy as np
 from datetime import datetime
 import urllib3
 from folium.plugins import HeatMap, MarkerCluster
-import matplotlib.pyplot as plt
-import seaborn as sns
 from math import sqrt
+from camadas_geojson import adicionar_bolhas_geojson, adicionar_camada_fundo, cor_risco
+from manifesto_artefatos import Manifesto
+from graficos import renderizar_graficos, nome_arquivo as nome_arquivo_grafico
+from grade_chuva import adicionar_grade_chuva
+from relatorio_estatistico import relatorio_bolhas, exportar_relatorio, RISCO_ALTO
+
+# pandas/matplotlib/seaborn só nos gráficos e no relatório: o mapa HTML não precisa deles
 
 # Configurações do mapa
 MG_COORDS = [-18.5122, -44.5550]  # Centro de Minas Gerais
-INMET_STATIONS_URL = "https://apitempo.inmet.gov.br/estacoes/T"
+INMET_BASE_URL = os.environ.get("INMET_BASE_URL", "https://apitempo.inmet.gov.br/") # pode apontar para o inmet_stub.py local
+INMET_STATIONS_URL = INMET_BASE_URL.rstrip("/") + "/estacoes/T"
+RENDERIZACAO = os.environ.get("LHASA_MAPA_RENDERIZACAO", "geojson") # geojson (uma camada) | marcadores (um por estação)
 
-def obter_estacoes_inmet():
+def obter_estacoes_inmet(base_url=None):
     """Obtém lista de estações meteorológicas do INMET para MG"""
     try:
         http = urllib3.PoolManager()
-        response = http.request("GET", INMET_STATIONS_URL)
+        url = base_url.rstrip("/") + "/estacoes/T" if base_url else INMET_STATIONS_URL
+        response = http.request("GET", url)
         stations_data = json.loads(response.data)
         
         # Filtrar apenas estações de Minas Gerais operantes
@@ -35,75 +43,157 @@ def obter_estacoes_inmet():
         print(f"Erro ao obter estações INMET: {e}")
         return []
 
-def processar_dados_para_bolhas(estacoes):
-    """Processa dados das estações para criar métricas para as bolhas"""
-    dados_processados = []
-    
+# Áreas de alto risco em MG (baseado em histórico de deslizamentos)
+AREAS_ALTO_RISCO = [
+    ('BELO HORIZONTE', -19.9167, -43.9345),
+    ('NOVA LIMA', -19.9858, -43.8465),
+    ('OURO PRETO', -20.3856, -43.5033),
+    ('MARIANA', -20.3778, -43.4175),
+    ('SABARÁ', -19.8833, -43.8014),
+]
+PALAVRAS_ALTITUDE = ['ALTITUDE', 'SERRA', 'MONTE', 'PICO']
+
+# Catálogo de áreas de risco (CSV/JSON, ver proximidade.py): com ele o índice de
+# risco usa distâncias haversine até todas as áreas do catálogo
+AREAS_RISCO_ARQUIVO = os.environ.get("LHASA_AREAS_RISCO")
+RAIO_AREA_KM = 10       # estação dentro da área de risco
+RAIO_PROXIMO_KM = 50
+RAIO_REGIONAL_KM = 100
+
+CIDADES_GRANDES = {
+    'BELO HORIZONTE': 90,
+    'CONTAGEM': 70,
+    'UBERLÂNDIA': 60,
+    'JUIZ DE FORA': 55,
+    'BETIM': 50,
+    'MONTES CLAROS': 45,
+    'RIBEIRÃO DAS NEVES': 40,
+    'UBERABA': 35,
+    'GOVERNADOR VALADARES': 30,
+    'IPATINGA': 30,
+}
+
+def _contem(nomes, termos):
+    """Matriz estações x termos: termo aparece no nome (já em maiúsculas)"""
+    return np.char.find(nomes[:, None], np.array(termos)[None, :]) >= 0
+
+def processar_dados_para_bolhas(estacoes, indice=None):
+    """Processa dados das estações para criar métricas para as bolhas
+    As métricas são calculadas de uma vez para todas as estações (arrays NumPy);
+    o resultado é o mesmo de calcular_indice_risco/estimar_densidade_populacional
+    aplicados estação a estação. Com indice (proximidade.IndiceProximidade), o
+    índice de risco vem das áreas do catálogo (ver _indice_risco_catalogo)."""
+    validas = []
     for estacao in estacoes:
         try:
             # Dados básicos da estação
-            codigo = estacao['CD_ESTACAO']
-            nome = estacao['DC_NOME']
-            lat = float(estacao['VL_LATITUDE'])
-            lon = float(estacao['VL_LONGITUDE'])
-            altitude = float(estacao.get('VL_ALTITUDE', '0'))
-            tipo = estacao.get('TP_ESTACAO', 'Automatica')
-            
-            # Calcular métricas para as bolhas
-            # Métrica 1: Altitude (normalizada)
-            altitude_normalizada = min(altitude / 10, 100)  # Máximo 100 para visualização
-            
-            # Métrica 2: Importância regional (baseada na altitude e tipo)
-            importancia = 10
-            if altitude > 1000:
-                importancia += 20  # Estações em altitude têm mais importância
-            if 'BELO HORIZONTE' in nome.upper():
-                importancia += 30  # Capital tem mais importância
-            if tipo == 'Automatica':
-                importancia += 15  # Estações automáticas são mais modernas
-                
-            # Métrica 3: Índice de risco (baseado na localização)
-            risco_index = calcular_indice_risco(nome, lat, lon)
-            
-            # Métrica 4: Densidade populacional estimada (baseada na cidade)
-            densidade_pop = estimar_densidade_populacional(nome)
-            
-            dados_processados.append({
-                'codigo': codigo,
-                'nome': nome,
-                'lat': lat,
-                'lon': lon,
-                'altitude': altitude,
-                'altitude_normalizada': altitude_normalizada,
-                'tipo': tipo,
-                'importancia': importancia,
-                'risco_index': risco_index,
-                'densidade_pop': densidade_pop,
-                'tamanho_bolha': importancia,  # Métrica principal para tamanho da bolha
-                'cor_bolha': risco_index,      # Métrica para cor da bolha
-            })
-            
+            validas.append((
+                estacao['CD_ESTACAO'],
+                estacao['DC_NOME'],
+                float(estacao['VL_LATITUDE']),
+                float(estacao['VL_LONGITUDE']),
+                float(estacao.get('VL_ALTITUDE', '0')),
+                estacao.get('TP_ESTACAO', 'Automatica'),
+            ))
         except (ValueError, KeyError) as e:
             print(f"Erro ao processar estação {estacao.get('CD_ESTACAO', 'N/A')}: {e}")
             continue
-    
+    if not validas:
+        return []
+
+    codigos, nomes, lat, lon, altitude, tipos = zip(*validas)
+    lat, lon, altitude = np.array(lat), np.array(lon), np.array(altitude)
+    nomes_maiusculos = np.array([nome.upper() for nome in nomes])
+
+    # Métrica 1: Altitude (normalizada), máximo 100 para visualização (como min(x, 100))
+    altitude_normalizada = altitude / 10
+
+    # Métrica 2: Importância regional (baseada na altitude e tipo)
+    importancia = (10
+                   + np.where(altitude > 1000, 20, 0)  # Estações em altitude têm mais importância
+                   + np.where(np.char.find(nomes_maiusculos, 'BELO HORIZONTE') >= 0, 30, 0)  # Capital tem mais importância
+                   + np.where(np.array(tipos, dtype=object) == 'Automatica', 15, 0))  # Estações automáticas são mais modernas
+
+    # Métrica 3: Índice de risco (baseado na localização)
+    extras = {}
+    if indice is None:
+        risco_index = _indice_risco(nomes_maiusculos, lat, lon)
+    else:
+        risco_index, extras = _indice_risco_catalogo(nomes_maiusculos, lat, lon, indice)
+
+    # Métrica 4: Densidade populacional estimada (baseada na cidade)
+    densidade_pop = _densidade_populacional(nomes_maiusculos)
+
+    altitude_normalizada = [100 if valor > 100 else valor for valor in altitude_normalizada.tolist()]
+    importancia, risco_index, densidade_pop = importancia.tolist(), risco_index.tolist(), densidade_pop.tolist()
+
+    dados_processados = []
+    for i, (codigo, nome, tipo) in enumerate(zip(codigos, nomes, tipos)):
+        dados_processados.append({
+            'codigo': codigo,
+            'nome': nome,
+            'lat': validas[i][2],
+            'lon': validas[i][3],
+            'altitude': validas[i][4],
+            'altitude_normalizada': altitude_normalizada[i],
+            'tipo': tipo,
+            'importancia': importancia[i],
+            'risco_index': risco_index[i],
+            'densidade_pop': densidade_pop[i],
+            'tamanho_bolha': importancia[i],  # Métrica principal para tamanho da bolha
+            'cor_bolha': risco_index[i],      # Métrica para cor da bolha
+            **{chave: valores[i] for chave, valores in extras.items()},
+        })
+
     return dados_processados
 
+def _indice_risco(nomes, lat, lon):
+    """calcular_indice_risco para todas as estações: matriz de distâncias estações x áreas"""
+    areas = np.array([(area_lat, area_lon) for _, area_lat, area_lon in AREAS_ALTO_RISCO])
+    dist = np.sqrt((lat[:, None] - areas[None, :, 0])**2 + (lon[:, None] - areas[None, :, 1])**2)
+    bonus = np.where(dist < 0.5, 30, np.where(dist < 1.0, 15, 0))  # ~50km / ~100km
+
+    # Como no laço original, a primeira área citada no nome encerra a soma das proximidades
+    citada = _contem(nomes, [area_nome for area_nome, _, _ in AREAS_ALTO_RISCO])
+    primeira = np.where(citada.any(axis=1), citada.argmax(axis=1), len(AREAS_ALTO_RISCO))
+    consideradas = np.arange(len(AREAS_ALTO_RISCO))[None, :] < primeira[:, None]
+
+    risco = 20 + (bonus * consideradas).sum(axis=1) + np.where(citada.any(axis=1), 40, 0)
+    risco += np.where(_contem(nomes, PALAVRAS_ALTITUDE).any(axis=1), 25, 0)
+    return np.minimum(risco, 100)  # Máximo 100
+
+def _indice_risco_catalogo(nomes, lat, lon, indice):
+    """
+    Índice de risco pelo catálogo de áreas (uma consulta ao índice para todas as estações):
+    +30 por área a até RAIO_PROXIMO_KM, +15 por área a até RAIO_REGIONAL_KM e mais
+    +40 se a área mais próxima está a até RAIO_AREA_KM; +25 pelas palavras de altitude.
+    Todas as parcelas só crescem quando a estação se aproxima das áreas
+    """
+    distancias, indices = indice.mais_proximas(lat, lon, k=1)
+    proximas = indice.contar_no_raio(lat, lon, RAIO_PROXIMO_KM)
+    regionais = indice.contar_no_raio(lat, lon, RAIO_REGIONAL_KM) - proximas
+
+    risco = 20 + 30 * proximas + 15 * regionais + np.where(distancias[:, 0] <= RAIO_AREA_KM, 40, 0)
+    risco += np.where(_contem(nomes, PALAVRAS_ALTITUDE).any(axis=1), 25, 0)
+    extras = {
+        'area_proxima': [indice.nomes[i] for i in indices[:, 0].tolist()],
+        'dist_area_km': np.round(distancias[:, 0], 1).tolist(),
+        'areas_proximas': proximas.tolist(),
+    }
+    return np.minimum(risco, 100), extras
+
+def _densidade_populacional(nomes):
+    """estimar_densidade_populacional para todas as estações (primeira cidade citada no nome)"""
+    citada = _contem(nomes, list(CIDADES_GRANDES))
+    densidades = np.array(list(CIDADES_GRANDES.values()))
+    return np.where(citada.any(axis=1), densidades[citada.argmax(axis=1)], 15)  # Densidade base para cidades menores
+
 def calcular_indice_risco(nome, lat, lon):
     """Calcula índice de risco baseado na localização"""
-    # Áreas de alto risco em MG (baseado em histórico de deslizamentos)
-    areas_alto_risco = [
-        ('BELO HORIZONTE', -19.9167, -43.9345),
-        ('NOVA LIMA', -19.9858, -43.8465),
-        ('OURO PRETO', -20.3856, -43.5033),
-        ('MARIANA', -20.3778, -43.4175),
-        ('SABARÁ', -19.8833, -43.8014),
-    ]
-    
     risco = 20  # Risco base
     
     # Verificar proximidade com áreas de alto risco
-    for area_nome, area_lat, area_lon in areas_alto_risco:
+    for area_nome, area_lat, area_lon in AREAS_ALTO_RISCO:
         if area_nome in nome.upper():
             risco += 40
             break
@@ -116,27 +206,14 @@ def calcular_indice_risco(nome, lat, lon):
             risco += 15
     
     # Fator altitude (maior altitude = maior risco de deslizamento)
-    if 'ALTITUDE' in nome.upper() or any(palavra in nome.upper() for palavra in ['SERRA', 'MONTE', 'PICO']):
+    if any(palavra in nome.upper() for palavra in PALAVRAS_ALTITUDE):
         risco += 25
     
     return min(risco, 100)  # Máximo 100
 
 def estimar_densidade_populacional(nome):
     """Estima densidade populacional baseada no nome da cidade"""
-    cidades_grandes = {
-        'BELO HORIZONTE': 90,
-        'CONTAGEM': 70,
-        'UBERLÂNDIA': 60,
-        'JUIZ DE FORA': 55,
-        'BETIM': 50,
-        'MONTES CLAROS': 45,
-        'RIBEIRÃO DAS NEVES': 40,
-        'UBERABA': 35,
-        'GOVERNADOR VALADARES': 30,
-        'IPATINGA': 30,
-    }
-    
-    for cidade, densidade in cidades_grandes.items():
+    for cidade, densidade in CIDADES_GRANDES.items():
         if cidade in nome.upper():
             return densidade
     
@@ -153,8 +230,8 @@ def criar_mapa_bolhas():
     
     # Adicionar camadas diferentes
     folium.TileLayer('CartoDB positron', name='Claro').add_to(mapa)
-    folium.TileLayer('Stamen Terrain', name='Terreno').add_to(mapa)
-    folium.TileLayer('Stamen Toner', name='Escuro').add_to(mapa)
+    adicionar_camada_fundo(mapa, 'terreno', 'Terreno')
+    adicionar_camada_fundo(mapa, 'toner', 'Escuro')
     
     return mapa
 
@@ -173,19 +250,13 @@ def adicionar_bolhas_ao_mapa(mapa, dados_estacoes):
         tamanho_normalizado = 10 + (dados['tamanho_bolha'] - tamanho_min) / (tamanho_max - tamanho_min) * 40
         
         # Calcular cor baseada no risco
-        if dados['risco_index'] >= 70:
-            cor = 'red'
-            cor_fill = '#ff4444'
-        elif dados['risco_index'] >= 50:
-            cor = 'orange'
-            cor_fill = '#ff8800'
-        elif dados['risco_index'] >= 30:
-            cor = 'yellow'
-            cor_fill = '#ffdd00'
-        else:
-            cor = 'green'
-            cor_fill = '#44ff44'
+        cor, cor_fill = cor_risco(dados['risco_index'])
         
+        # Área de risco mais próxima (só com o catálogo de áreas)
+        linha_area = ""
+        if 'area_proxima' in dados:
+            linha_area = f"<tr><td><b>Área de risco:</b></td><td>{dados['area_proxima']} ({dados['dist_area_km']:.1f} km)</td></tr>"
+
         # Criar popup com informações detalhadas
         popup_html = f"""
         <div style="width: 300px; font-family: Arial;">
@@ -197,6 +268,7 @@ def adicionar_bolhas_ao_mapa(mapa, dados_estacoes):
                 <tr><td><b>Altitude:</b></td><td>{dados['altitude']:.0f}m</td></tr>
                 <tr><td><b>Coordenadas:</b></td><td>{dados['lat']:.3f}, {dados['lon']:.3f}</td></tr>
                 <tr><td><b>Índice de Risco:</b></td><td>{dados['risco_index']:.0f}/100</td></tr>
+                {linha_area}
                 <tr><td><b>Importância:</b></td><td>{dados['importancia']:.0f}/100</td></tr>
                 <tr><td><b>Densidade Pop.:</b></td><td>{dados['densidade_pop']:.0f}/100</td></tr>
             </table>
@@ -259,13 +331,19 @@ def adicionar_legenda_bolhas(mapa):
     
     mapa.get_root().html.add_child(folium.Element(legenda_html))
 
-def gerar_grafico_dispersao_bolhas(dados_estacoes):
-    """Gera gráfico de dispersão complementar"""
+def gerar_grafico_dispersao_bolhas(dados_estacoes, perfil=None):
+    """Gera gráfico de dispersão complementar; devolve o arquivo (perfil: ver graficos.py)"""
+    return renderizar_graficos([("grafico_bolhas_estacoes", figura_dispersao_bolhas, dados_estacoes)], perfil)["grafico_bolhas_estacoes"]
+
+def figura_dispersao_bolhas(dados_estacoes):
+    """Figura 2x2 de análise das bolhas (salva por graficos.renderizar_graficos)"""
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     
     df = pd.DataFrame(dados_estacoes)
     
     # Configurar o gráfico
-    plt.style.use('seaborn-v0_8')
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
     fig.suptitle('LHASA MG - Análise de Bolhas das Estações Meteorológicas', fontsize=16, fontweight='bold')
     
@@ -276,7 +354,7 @@ def gerar_grafico_dispersao_bolhas(dados_estacoes):
     ax1.set_xlabel('Altitude (m)')
     ax1.set_ylabel('Índice de Risco')
     ax1.set_title('Altitude vs Risco (tamanho = importância, cor = densidade pop.)')
-    plt.colorbar(scatter1, ax=ax1, label='Densidade Populacional')
+    fig.colorbar(scatter1, ax=ax1, label='Densidade Populacional')
     
     # Gráfico 2: Distribuição de Importância por Tipo
     tipos = df['tipo'].unique()
@@ -309,56 +387,63 @@ def gerar_grafico_dispersao_bolhas(dados_estacoes):
     # Adicionar colorbar para o gráfico 4
     sm = plt.cm.ScalarMappable(cmap=plt.cm.RdYlGn_r, norm=plt.Normalize(vmin=0, vmax=100))
     sm.set_array([])
-    cbar = plt.colorbar(sm, ax=ax4)
+    cbar = fig.colorbar(sm, ax=ax4)
     cbar.set_label('Índice de Risco')
     
-    plt.tight_layout()
-    plt.savefig('grafico_bolhas_estacoes.png', dpi=300, bbox_inches='tight')
-    print("✅ Gráfico de bolhas salvo como 'grafico_bolhas_estacoes.png'")
+    fig.tight_layout()
+    return fig
 
-def gerar_relatorio_estatistico(dados_estacoes):
-    """Gera relatório estatístico das bolhas"""
-    
-    df = pd.DataFrame(dados_estacoes)
+def gerar_relatorio_estatistico(dados_estacoes, exportar=True):
+    """Gera relatório estatístico das bolhas (relatorio_estatistico.py): imprime o
+    resumo e, com exportar, grava relatorio_bolhas.json/.csv; devolve o relatório"""
+    relatorio = relatorio_bolhas(dados_estacoes)
+    medias, top = relatorio["medias"], relatorio["top"]
     
     print("\n📊 RELATÓRIO ESTATÍSTICO DAS BOLHAS")
     print("=" * 50)
     
     print(f"\n🎯 RESUMO GERAL:")
-    print(f"   • Total de estações: {len(df)}")
-    print(f"   • Altitude média: {df['altitude'].mean():.1f}m")
-    print(f"   • Risco médio: {df['risco_index'].mean():.1f}/100")
-    print(f"   • Importância média: {df['importancia'].mean():.1f}/100")
+    print(f"   • Total de estações: {relatorio['total']}")
+    print(f"   • Altitude média: {medias['altitude']:.1f}m")
+    print(f"   • Risco médio: {medias['risco_index']:.1f}/100")
+    print(f"   • Importância média: {medias['importancia']:.1f}/100")
     
-    print(f"\n🔴 ESTAÇÕES DE ALTO RISCO (≥70):")
-    alto_risco = df[df['risco_index'] >= 70].sort_values('risco_index', ascending=False)
-    for _, estacao in alto_risco.head(5).iterrows():
-        print(f"   • {estacao['nome']}: {estacao['risco_index']:.0f}/100")
+    print(f"\n🔴 ESTAÇÕES DE ALTO RISCO (≥{RISCO_ALTO}):")
+    for estacao in top["alto_risco"]:
+        print(f"   • {estacao['nome']}: {estacao['valor']:.0f}/100")
     
     print(f"\n⭐ ESTAÇÕES MAIS IMPORTANTES:")
-    mais_importantes = df.nlargest(5, 'importancia')
-    for _, estacao in mais_importantes.iterrows():
-        print(f"   • {estacao['nome']}: {estacao['importancia']:.0f}/100")
+    for estacao in top["importancia"]:
+        print(f"   • {estacao['nome']}: {estacao['valor']:.0f}/100")
     
     print(f"\n🏔️ ESTAÇÕES EM MAIOR ALTITUDE:")
-    maior_altitude = df.nlargest(5, 'altitude')
-    for _, estacao in maior_altitude.iterrows():
-        print(f"   • {estacao['nome']}: {estacao['altitude']:.0f}m")
+    for estacao in top["altitude"]:
+        print(f"   • {estacao['nome']}: {estacao['valor']:.0f}m")
     
+    faixas = relatorio["faixas"]["risco_index"]
     print(f"\n📈 DISTRIBUIÇÃO POR RISCO:")
-    print(f"   • Baixo (0-30): {len(df[df['risco_index'] < 30])} estações")
-    print(f"   • Moderado (30-50): {len(df[(df['risco_index'] >= 30) & (df['risco_index'] < 50)])} estações")
-    print(f"   • Alto (50-70): {len(df[(df['risco_index'] >= 50) & (df['risco_index'] < 70)])} estações")
-    print(f"   • Crítico (≥70): {len(df[df['risco_index'] >= 70])} estações")
+    print(f"   • Baixo (0-30): {faixas['baixo']} estações")
+    print(f"   • Moderado (30-50): {faixas['moderado']} estações")
+    print(f"   • Alto (50-70): {faixas['alto']} estações")
+    print(f"   • Crítico (≥70): {faixas['critico']} estações")
+    
+    if exportar:
+        arquivo_json, arquivo_csv = exportar_relatorio(relatorio, "bolhas")
+        print(f"\n💾 Relatório exportado: '{arquivo_json}', '{arquivo_csv}'")
+    return relatorio
 
-def gerar_mapa_bolhas_completo():
-    """Função principal para gerar mapa com bolhas"""
+def gerar_mapa_bolhas_completo(estacoes=None, base_url=None, graficos=None, chuva=None):
+    """Função principal para gerar mapa com bolhas
+    estacoes: lista de estações já carregada (ex.: pelo nowcast); sem ela, busca no INMET
+    graficos: lista que recebe os gráficos a renderizar em vez de renderizá-los aqui (mapas.py)
+    chuva: (lat, lon, mm) das leituras, para a grade de chuva (mesmo PNG do mapa básico)"""
     
     print("🔵 Gerando mapa de bolhas LHASA MG...")
     
     # Obter dados das estações
-    print("📡 Carregando estações meteorológicas...")
-    estacoes = obter_estacoes_inmet()
+    if estacoes is None:
+        print("📡 Carregando estações meteorológicas...")
+        estacoes = obter_estacoes_inmet(base_url)
     
     if not estacoes:
         print("❌ Não foi possível carregar as estações")
@@ -368,33 +453,60 @@ def gerar_mapa_bolhas_completo():
     
     # Processar dados para bolhas
     print("⚙️ Processando dados para visualização em bolhas...")
-    dados_bolhas = processar_dados_para_bolhas(estacoes)
+    indice = None
+    if AREAS_RISCO_ARQUIVO:
+        from proximidade import IndiceProximidade
+        indice = IndiceProximidade.de_arquivo(AREAS_RISCO_ARQUIVO)
+        print(f"📍 {len(indice)} áreas de risco no catálogo ({indice.implementacao})")
+    dados_bolhas = processar_dados_para_bolhas(estacoes, indice)
     
     print(f"✅ {len(dados_bolhas)} estações processadas com métricas")
     
-    # Criar mapa
-    print("🗺️ Criando mapa base...")
-    mapa = criar_mapa_bolhas()
-    
-    # Adicionar bolhas
-    print("🔵 Adicionando bolhas proporcionais...")
-    adicionar_bolhas_ao_mapa(mapa, dados_bolhas)
-    
-    # Adicionar legenda
-    print("📋 Adicionando legenda...")
-    adicionar_legenda_bolhas(mapa)
-    
-    # Adicionar controle de camadas
-    folium.LayerControl().add_to(mapa)
+    # Mapa e gráficos só são gerados de novo se as métricas mudaram (manifesto_artefatos.py)
+    manifesto = Manifesto()
+    hash_mapa = manifesto.hash_entradas("mapa_bolhas_mg", RENDERIZACAO, dados_bolhas, chuva)
+    if manifesto.inalterado("mapa_bolhas_mg", hash_mapa):
+        nome_arquivo = manifesto.arquivo("mapa_bolhas_mg")
+        print(f"♻️  Métricas sem alteração: mapa de bolhas mantido em '{nome_arquivo}'")
+    else:
+        # Criar mapa
+        print("🗺️ Criando mapa base...")
+        mapa = criar_mapa_bolhas()
+        
+        # Grade de chuva (calculada no servidor, em cache)
+        if chuva:
+            print("🌧️ Adicionando grade de chuva...")
+            adicionar_grade_chuva(mapa, chuva)
+        
+        # Adicionar bolhas
+        print("🔵 Adicionando bolhas proporcionais...")
+        if RENDERIZACAO == "geojson":
+            adicionar_bolhas_geojson(mapa, dados_bolhas)
+        else:
+            adicionar_bolhas_ao_mapa(mapa, dados_bolhas)
+        
+        # Adicionar legenda
+        print("📋 Adicionando legenda...")
+        adicionar_legenda_bolhas(mapa)
+        
+        # Adicionar controle de camadas
+        folium.LayerControl().add_to(mapa)
+        
+        # Salvar mapa
+        nome_arquivo = f"mapa_bolhas_mg_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        mapa.save(nome_arquivo)
+        print(f"✅ Mapa de bolhas salvo como '{nome_arquivo}'")
+        manifesto.registrar("mapa_bolhas_mg", hash_mapa, nome_arquivo)
     
-    # Salvar mapa
-    nome_arquivo = f"mapa_bolhas_mg_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-    mapa.save(nome_arquivo)
-    print(f"✅ Mapa de bolhas salvo como '{nome_arquivo}'")
+    manifesto.salvar()
     
     # Gerar gráficos complementares
-    print("📊 Gerando gráficos de análise...")
-    gerar_grafico_dispersao_bolhas(dados_bolhas)
+    dispersao = [("grafico_bolhas_estacoes", figura_dispersao_bolhas, dados_bolhas)]
+    if graficos is not None:
+        graficos.extend(dispersao)
+    else:
+        print("📊 Gerando gráficos de análise...")
+        renderizar_graficos(dispersao, manifesto=manifesto)
     
     # Gerar relatório
     gerar_relatorio_estatistico(dados_bolhas)
@@ -402,7 +514,7 @@ def gerar_mapa_bolhas_completo():
     print(f"\n🎉 Mapa de bolhas gerado com sucesso!")
     print(f"📁 Arquivos gerados:")
     print(f"   - {nome_arquivo} (mapa interativo de bolhas)")
-    print(f"   - grafico_bolhas_estacoes.png (análises gráficas)")
+    print(f"   - {nome_arquivo_grafico('grafico_bolhas_estacoes')} (análises gráficas)")
     
     return nome_arquivo
 
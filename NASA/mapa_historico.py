@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+Mapa histórico animado - LHASA RIO
+Para rever um evento sem rodar o historicalcast hora a hora e abrir um HTML
+por hora: as leituras horárias do histórico (TB_CHUVA_HISTORICA) de um período
+viram quadros por hora (chuva de cada variável do modelo e classe de chuva de
+cada zona pluviométrica), calculados uma vez e gravados em um único HTML com
+controle de tempo (barra, reproduzir/pausar), no estilo do TimestampedGeoJson.
+
+As zonas vão para o HTML uma única vez (GeoJSON); os quadros são inteiros
+(chuva em décimos de mm, classe de chuva) codificados em delta: cada quadro
+guarda só as zonas que mudaram em relação à hora anterior, como pares
+[zona, diferença]. O navegador decodifica tudo ao abrir e a troca de hora é
+só uma mudança de estilo, sem servidor.
+
+Uso em LHASA_RIO.py:
+    python LHASA_RIO.py -a "DD/MM/AAAA" "DD/MM/AAAA" "HH:MM:SS" "HH:MM:SS"
+"""
+
+import json
+from datetime import timedelta
+
+import numpy as np
+
+ESCALA_CHUVA = 10 # décimos de mm
+CASAS_COORDENADAS = 5 # ~1 m
+INTERVALO_ANIMACAO = 700 # ms por hora
+VERSAO_LEAFLET = "1.9.4"
+CORES_CLASSES = ('#31a354', '#fecc5c', '#fd8d3c', '#e31a1c') # da classe "sem chuva" à mais severa
+
+def _hora(datahora):
+    return datahora.replace(minute=0, second=0, microsecond=0)
+
+def geometria_geojson(forma):
+    """GeoJSON em WGS84 da forma da zona (GeoJSON ou JSON Esri, em dict ou texto); None se vazia"""
+    import shapely
+    from shapely.geometry import mapping
+    from motor_shapely import para_geometria
+
+    if isinstance(forma, str):
+        forma = json.loads(forma)
+    geometria = para_geometria(forma)
+    if geometria is None or geometria.is_empty:
+        return None
+    referencia = (forma.get("spatialReference") or {}) if isinstance(forma, dict) else {}
+    srid = referencia.get("latestWkid") or referencia.get("wkid")
+    if srid and srid not in (4326, 4674):
+        from pyproj import Transformer
+        transformador = Transformer.from_crs(srid, 4326, always_xy=True)
+        geometria = shapely.transform(geometria, lambda xy: np.column_stack(transformador.transform(xy[:, 0], xy[:, 1])))
+    return mapping(shapely.set_precision(geometria, 10.0 ** -CASAS_COORDENADAS))
+
+def calcular_quadros(zonas, leituras, modelo, inicio=None, fim=None):
+    """
+    zonas: [(codigo, nome, forma)]; leituras: [(codigo, datahora, {variavel: mm})]
+    Devolve {"tempos", "valores": {variavel: horas x zonas}, "classes": horas x zonas}
+    com a maior leitura de cada zona em cada hora (0 sem leitura), ou None sem leituras
+    """
+    indices = {int(codigo): i for i, (codigo, _, _) in enumerate(zonas)}
+    leituras = [(indices[int(codigo)], _hora(datahora), valores) for codigo, datahora, valores in leituras
+                if int(codigo) in indices and datahora is not None]
+    if not leituras:
+        return None
+    inicio = _hora(inicio) if inicio else min(l[1] for l in leituras)
+    fim = _hora(fim) if fim else max(l[1] for l in leituras)
+    horas = int((fim - inicio).total_seconds() // 3600) + 1
+
+    valores = {v: np.zeros((horas, len(zonas))) for v in modelo.variaveis}
+    for zona, hora, leitura in leituras:
+        quadro = int((hora - inicio).total_seconds() // 3600)
+        if 0 <= quadro < horas:
+            for variavel in modelo.variaveis:
+                valor = float(leitura.get(variavel) or 0.0)
+                if valor > valores[variavel][quadro, zona]:
+                    valores[variavel][quadro, zona] = valor
+
+    return {
+        "tempos": [inicio + timedelta(hours=h) for h in range(horas)],
+        "valores": valores,
+        "classes": np.asarray(modelo.classe_chuva_array(**valores), dtype=np.int64),
+    }
+
+def codificar_delta(matriz):
+    """Quadros (horas x zonas, inteiros) -> por hora, lista plana [zona, diferença, ...] das zonas que mudaram"""
+    matriz = np.asarray(matriz, dtype=np.int64)
+    diferencas = np.diff(matriz, axis=0, prepend=np.zeros((1, matriz.shape[1]), dtype=np.int64))
+    quadros = []
+    for linha in diferencas:
+        zonas = np.flatnonzero(linha)
+        quadros.append(np.column_stack((zonas, linha[zonas])).ravel().tolist())
+    return quadros
+
+def decodificar_delta(quadros, n_zonas):
+    """Inverso de codificar_delta"""
+    matriz = np.zeros((len(quadros), n_zonas), dtype=np.int64)
+    atual = np.zeros(n_zonas, dtype=np.int64)
+    for hora, quadro in enumerate(quadros):
+        quadro = np.asarray(quadro, dtype=np.int64)
+        atual[quadro[0::2]] += quadro[1::2]
+        matriz[hora] = atual
+    return matriz
+
+def dados_mapa(zonas, quadros, modelo):
+    """Dados gravados no HTML: zonas (uma vez) e quadros codificados em delta"""
+    feicoes = []
+    for indice, (codigo, nome, forma) in enumerate(zonas):
+        geometria = geometria_geojson(forma)
+        if geometria is not None:
+            feicoes.append({"type": "Feature", "geometry": geometria, "properties": {"i": indice, "c": int(codigo), "n": nome}})
+
+    classes = len(modelo.nomes_classes)
+    cores = [CORES_CLASSES[round(i * (len(CORES_CLASSES) - 1) / max(classes - 1, 1))] for i in range(classes)]
+    perigo = modelo.definicao.get("perigo", {})
+    perigo_maximo = perigo[max(perigo, key=int)] if perigo else [None] * classes # suscetibilidade mais alta
+    return {
+        "tempos": [t.strftime("%d/%m/%Y %H:%M") for t in quadros["tempos"]],
+        "variaveis": list(modelo.variaveis),
+        "escala": ESCALA_CHUVA,
+        "classes": modelo.nomes_classes,
+        "perigo": perigo_maximo,
+        "cores": cores,
+        "n": len(zonas),
+        "zonas": {"type": "FeatureCollection", "features": feicoes},
+        "valores": {v: codificar_delta(np.rint(m * ESCALA_CHUVA)) for v, m in quadros["valores"].items()},
+        "classe": codificar_delta(quadros["classes"]),
+    }
+
+HTML_MAPA = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>LHASA RIO - Histórico %(titulo)s</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@%(leaflet)s/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@%(leaflet)s/dist/leaflet.js"></script>
+<style>
+html, body, #mapa { height: 100%%; margin: 0; }
+.caixa { position: absolute; z-index: 1000; background: white; border: 1px solid #999; padding: 6px 8px; font: 12px Arial; }
+#tempo { bottom: 20px; left: 50%%; transform: translateX(-50%%); width: 60%%; display: flex; align-items: center; gap: 8px; }
+#tempo input { flex: 1; }
+#legenda { top: 10px; right: 10px; }
+</style>
+</head>
+<body>
+<div id="mapa"></div>
+<div id="tempo" class="caixa"><button id="tocar">&#9654;</button><input id="barra" type="range" min="0" value="0" step="1"><span id="rotulo"></span></div>
+<div id="legenda" class="caixa"></div>
+<script>
+var D = %(dados)s;
+function decodificar(quadros) {
+    var atual = new Array(D.n).fill(0), saida = [];
+    quadros.forEach(function (q) {
+        atual = atual.slice();
+        for (var k = 0; k < q.length; k += 2) { atual[q[k]] += q[k + 1]; }
+        saida.push(atual);
+    });
+    return saida;
+}
+var classe = decodificar(D.classe), valores = {};
+D.variaveis.forEach(function (v) { valores[v] = decodificar(D.valores[v]); });
+
+var mapa = L.map("mapa");
+L.tileLayer("https://tile.openstreetmap.org/{z}/{x}/{y}.png", {attribution: "&copy; OpenStreetMap", maxZoom: 18}).addTo(mapa);
+var t = 0, camadas = [];
+var zonas = L.geoJSON(D.zonas, {
+    style: {weight: 1, color: "#555", fillOpacity: 0.6},
+    onEachFeature: function (feature, layer) {
+        var i = feature.properties.i;
+        camadas.push([i, layer]);
+        layer.bindTooltip(function () {
+            var c = classe[t][i], texto = "<b>" + feature.properties.n + "</b><br>" + D.tempos[t];
+            D.variaveis.forEach(function (v) { texto += "<br>" + v + ": " + (valores[v][t][i] / D.escala).toFixed(1) + " mm"; });
+            return texto + "<br>Chuva: " + D.classes[c] + (D.perigo[c] ? "<br>Perigo máximo: " + D.perigo[c] : "");
+        });
+    }
+}).addTo(mapa);
+mapa.fitBounds(zonas.getBounds());
+
+var legenda = "<b>Classe de chuva</b>";
+D.classes.forEach(function (nome, c) {
+    legenda += '<div><span style="display:inline-block; width:12px; height:12px; background:' + D.cores[c] + '; margin-right:4px;"></span>' + nome + (D.perigo[c] ? " (perigo máx. " + D.perigo[c] + ")" : "") + "</div>";
+});
+document.getElementById("legenda").innerHTML = legenda;
+
+var barra = document.getElementById("barra"), rotulo = document.getElementById("rotulo"), tocar = document.getElementById("tocar"), relogio = null;
+barra.max = D.tempos.length - 1;
+function mostrar(hora) {
+    t = hora;
+    camadas.forEach(function (par) { par[1].setStyle({fillColor: D.cores[classe[t][par[0]]]}); });
+    barra.value = t;
+    rotulo.textContent = D.tempos[t];
+}
+barra.addEventListener("input", function () { mostrar(parseInt(barra.value, 10)); });
+tocar.addEventListener("click", function () {
+    if (relogio) { clearInterval(relogio); relogio = null; tocar.innerHTML = "&#9654;"; return; }
+    tocar.innerHTML = "&#10074;&#10074;";
+    relogio = setInterval(function () { mostrar((t + 1) %% D.tempos.length); }, %(intervalo)d);
+});
+mostrar(0);
+</script>
+</body>
+</html>
+"""
+
+def gerar_mapa_historico(zonas, leituras, modelo, inicio=None, fim=None, arquivo=None):
+    """Calcula os quadros e grava o HTML animado; devolve o arquivo (None sem leituras)"""
+    quadros = calcular_quadros(zonas, leituras, modelo, inicio, fim)
+    if quadros is None:
+        return None
+    primeiro, ultimo = quadros["tempos"][0], quadros["tempos"][-1]
+    arquivo = arquivo or f"mapa_historico_{primeiro.strftime('%Y%m%d%H')}_{ultimo.strftime('%Y%m%d%H')}.html"
+    conteudo = HTML_MAPA % {
+        "titulo": primeiro.strftime("%d/%m/%Y %H:%M") + " a " + ultimo.strftime("%d/%m/%Y %H:%M"),
+        "leaflet": VERSAO_LEAFLET,
+        "intervalo": INTERVALO_ANIMACAO,
+        "dados": json.dumps(dados_mapa(zonas, quadros, modelo), ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/"),
+    }
+    with open(arquivo, "w", encoding="utf-8") as saida:
+        saida.write(conteudo)
+    return arquivo
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+Geração dos mapas das etapas #11 e #12 e dos gráficos (#13)
+A lista de estações do INMET é buscada uma única vez (ou recebida pronta do
+nowcast) e usada pelo mapa georreferenciado e pelo mapa de bolhas. Os gráficos
+dos dois mapas são renderizados juntos, em paralelo, na etapa #13 (graficos.py).
+
+Uso em LHASA_RIO.py:
+    gerar_todos_mapas(ARR_INMET or None, chuva=pontos_chuva(ARR_PD))
+
+Com LHASA_PAINEL=<diretório>, em vez dos dois HTML com data/hora no nome,
+atualiza o painel estático (painel_mapas.py): index.html gravado uma vez e
+latest.json reescrito a cada execução (LHASA_PAINEL_HISTORICO=1 guarda também
+uma cópia por data/hora em dados/).
+"""
+
+import os
+
+import gerar_mapa
+import mapa_bolhas
+from logger import logger as log
+from graficos import renderizar_graficos
+from manifesto_artefatos import Manifesto
+from instrumentacao import etapa, contar
+
+PAINEL_DIRETORIO = os.environ.get("LHASA_PAINEL") # None: HTML completos (mapa_lhasa_mg_*.html, mapa_bolhas_mg_*.html)
+PAINEL_HISTORICO = os.environ.get("LHASA_PAINEL_HISTORICO", "0") == "1"
+
+def _gerar(descricao, gerar, estacoes):
+    try:
+        arquivo = gerar(estacoes)
+        log.info(f"      {descricao} gerado: {arquivo}")
+        return arquivo
+    except Exception as e:
+        log.error(f"      Erro ao gerar {descricao.lower()}: {str(e)}")
+        return None
+
+def gerar_todos_mapas(estacoes=None, base_url=None, painel=None, chuva=None):
+    """
+    Gera o mapa georreferenciado e o mapa de bolhas a partir da mesma lista de
+    estações; sem estacoes, busca a lista no INMET uma vez para os dois.
+    Os gráficos dos dois são renderizados juntos no fim (etapa #13). chuva:
+    (lat, lon, mm) das leituras, para a grade de chuva dos dois mapas.
+    Devolve {"mapa": arquivo, "bolhas": arquivo} (None no mapa que falhou);
+    com painel (padrão: LHASA_PAINEL), {"painel": latest.json}
+    """
+    painel = painel or PAINEL_DIRETORIO
+    if painel:
+        return {"painel": atualizar_painel(painel, estacoes, base_url)}
+
+    log.info("")
+    log.info(etapa("#11 | GERANDO MAPA GEORREFERENCIADO"))
+    if estacoes is None:
+        estacoes = gerar_mapa.obter_estacoes_inmet(base_url)
+    contar(linhas=len(estacoes))
+    graficos = []
+    arquivos = {"mapa": _gerar("Mapa básico", lambda e: gerar_mapa.gerar_mapa_completo(e, graficos=graficos, chuva=chuva), estacoes)}
+
+    log.info("")
+    log.info(etapa("#12 | GERANDO MAPA DE BOLHAS"))
+    arquivos["bolhas"] = _gerar("Mapa de bolhas", lambda e: mapa_bolhas.gerar_mapa_bolhas_completo(e, graficos=graficos, chuva=chuva), estacoes)
+
+    if graficos:
+        log.info("")
+        log.info(etapa("#13 | GERANDO GRAFICOS"))
+        _gerar("Gráficos", lambda g: ", ".join(renderizar_graficos(g, manifesto=Manifesto()).values()), graficos)
+    return arquivos
+
+def atualizar_painel(diretorio, estacoes=None, base_url=None):
+    """Estações e bolhas no latest.json do painel estático (casca gravada só se mudou)"""
+    import painel_mapas
+
+    log.info("")
+    log.info(etapa("#11 | ATUALIZANDO PAINEL DE MAPAS"))
+    if estacoes is None:
+        estacoes = gerar_mapa.obter_estacoes_inmet(base_url)
+    contar(linhas=len(estacoes))
+    return _gerar("Painel de mapas", lambda e: painel_mapas.atualizar_painel(diretorio, e, historico=PAINEL_HISTORICO), estacoes)
@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+Motor Raster - LHASA RIO
+Alternativa à cadeia vetorial interseção -> classificação -> dissolução para
+camadas de suscetibilidade muito grandes. A suscetibilidade (gridcode) é
+rasterizada uma única vez em uma grade uint8 guardada em cache, as zonas
+pluviométricas em uma grade uint16 de identificadores, e o perigo de cada pixel
+sai de uma única consulta vetorizada à matriz do modelo de limiares:
+perigo = tabela_perigo[gridcode, classe_chuva[zona]].
+
+As grades ficam em arquivos .npy mapeados em memória e são processadas em tiles
+de tamanho fixo distribuídos em um pool de processos; o pico de memória depende
+do tamanho do tile e não do tamanho do estado:
+- a suscetibilidade é lida do cursor uma feição por vez e cada WKB vai para o
+  lote em disco dos tiles que toca; cada tile é rasterizado só com o seu lote;
+- as partes do perigo de uma zona são unidas e gravadas assim que terminam
+  todos os tiles que a zona cobre, sem esperar o estado inteiro.
+"""
+
+import os
+import json
+import struct
+import hashlib
+import tempfile
+from collections import deque
+import numpy as np
+import shapely
+from concurrent.futures import ProcessPoolExecutor
+
+SELECAO_GRIDCODE = (2, 3) # mesmas áreas de risco do Select_analysis "gridcode IN (2,3)"
+SEM_ZONA = 0
+TAMANHO_TILE = 1024 # pixels por lado de cada tile
+LIMITE_LOTES = 64 * 1024 * 1024 # bytes de WKB em memória antes de descarregar os lotes dos tiles no disco
+
+class Grade:
+    """Grade regular alinhada ao canto superior esquerdo (origem_x, origem_y)"""
+
+    def __init__(self, origem_x, origem_y, resolucao, linhas, colunas):
+        self.origem_x = float(origem_x)
+        self.origem_y = float(origem_y)
+        self.resolucao = float(resolucao)
+        self.linhas = int(linhas)
+        self.colunas = int(colunas)
+
+    @classmethod
+    def dos_limites(cls, limites, resolucao):
+        min_x, min_y, max_x, max_y = limites
+        colunas = max(int(np.ceil((max_x - min_x) / resolucao)), 1)
+        linhas = max(int(np.ceil((max_y - min_y) / resolucao)), 1)
+        return cls(min_x, max_y, resolucao, linhas, colunas)
+
+    @property
+    def forma(self):
+        return self.linhas, self.colunas
+
+    def parametros(self):
+        return [self.origem_x, self.origem_y, self.resolucao, self.linhas, self.colunas]
+
+    def janela(self, limites):
+        """Intervalo de linhas e colunas (fim exclusivo) cujos centros podem cair no retângulo"""
+        min_x, min_y, max_x, max_y = limites
+        c0 = max(int(np.floor((min_x - self.origem_x) / self.resolucao - 0.5)), 0)
+        c1 = min(int(np.ceil((max_x - self.origem_x) / self.resolucao - 0.5)) + 1, self.colunas)
+        l0 = max(int(np.floor((self.origem_y - max_y) / self.resolucao - 0.5)), 0)
+        l1 = min(int(np.ceil((self.origem_y - min_y) / self.resolucao - 0.5)) + 1, self.linhas)
+        return l0, l1, c0, c1
+
+    def tiles(self, tamanho=TAMANHO_TILE):
+        """Janelas (l0, l1, c0, c1) de até tamanho x tamanho pixels cobrindo a grade"""
+        for l0 in range(0, self.linhas, tamanho):
+            for c0 in range(0, self.colunas, tamanho):
+                yield l0, min(l0 + tamanho, self.linhas), c0, min(c0 + tamanho, self.colunas)
+
+    def subgrade(self, l0, l1, c0, c1):
+        return Grade(self.origem_x + c0 * self.resolucao, self.origem_y - l0 * self.resolucao, self.resolucao, l1 - l0, c1 - c0)
+
+    def tiles_da_caixa(self, limites, tamanho=TAMANHO_TILE):
+        """Índices (na ordem de tiles()) dos tiles cujos pixels podem cair no retângulo"""
+        l0, l1, c0, c1 = self.janela(limites)
+        if l0 >= l1 or c0 >= c1:
+            return []
+        por_linha = -(-self.colunas // tamanho)
+        return [tl * por_linha + tc for tl in range(l0 // tamanho, (l1 - 1) // tamanho + 1)
+                for tc in range(c0 // tamanho, (c1 - 1) // tamanho + 1)]
+
+    def limites(self):
+        return (self.origem_x, self.origem_y - self.linhas * self.resolucao,
+                self.origem_x + self.colunas * self.resolucao, self.origem_y)
+
+# ---------------------------------------------------------------------------
+# Rasterização e vetorização
+# ---------------------------------------------------------------------------
+
+def rasterizar(geometrias, valores, grade, dtype=np.uint8):
+    """Queima cada geometria com seu valor (critério do centro do pixel; a última vence)"""
+    saida = np.zeros(grade.forma, dtype=dtype)
+    try:
+        from rasterio.features import rasterize
+        from rasterio.transform import from_origin
+    except ImportError:
+        rasterize = None
+
+    if rasterize is not None:
+        formas = [(g, int(v)) for g, v in zip(geometrias, valores) if g is not None and not g.is_empty]
+        if formas:
+            transformacao = from_origin(grade.origem_x, grade.origem_y, grade.resolucao, grade.resolucao)
+            rasterize(formas, out=saida, transform=transformacao)
+        return saida
+
+    for geometria, valor in zip(geometrias, valores):
+        if geometria is None or geometria.is_empty:
+            continue
+        l0, l1, c0, c1 = grade.janela(geometria.bounds)
+        if l0 >= l1 or c0 >= c1:
+            continue
+        xs = grade.origem_x + (np.arange(c0, c1) + 0.5) * grade.resolucao
+        ys = grade.origem_y - (np.arange(l0, l1) + 0.5) * grade.resolucao
+        shapely.prepare(geometria)
+        dentro = shapely.contains_xy(geometria, xs[np.newaxis, :], ys[:, np.newaxis])
+        saida[l0:l1, c0:c1][dentro] = valor
+    return saida
+
+def vetorizar(rotulos, grade):
+    """Polígonos por rótulo (> 0): trechos contínuos de cada linha unidos por cobertura"""
+    linhas, colunas = rotulos.shape
+    plano = np.pad(rotulos, ((0, 0), (1, 1))).ravel()
+    anterior = np.concatenate([[0], plano[:-1]])
+    seguinte = np.concatenate([plano[1:], [0]])
+    inicios = np.flatnonzero((plano != 0) & (plano != anterior))
+    fins = np.flatnonzero((plano != 0) & (plano != seguinte))
+    if not len(inicios):
+        return {}
+
+    linha = inicios // (colunas + 2)
+    x0 = grade.origem_x + (inicios % (colunas + 2) - 1) * grade.resolucao
+    x1 = grade.origem_x + (fins % (colunas + 2)) * grade.resolucao
+    y1 = grade.origem_y - linha * grade.resolucao
+    caixas = shapely.box(x0, y1 - grade.resolucao, x1, y1)
+
+    valores = plano[inicios]
+    ordem = np.argsort(valores, kind="stable")
+    unicos, posicoes = np.unique(valores[ordem], return_index=True)
+    grupos = np.split(caixas[ordem], posicoes[1:])
+    return {int(r): shapely.coverage_union_all(g) for r, g in zip(unicos, grupos)}
+
+# ---------------------------------------------------------------------------
+# Trabalho por tile (executado nos processos do pool)
+# ---------------------------------------------------------------------------
+
+def _rasterizar_tile(caminho, parametros, janela, wkbs, valores):
+    """Rasteriza as geometrias que tocam o tile direto na sua janela do arquivo mapeado"""
+    l0, l1, c0, c1 = janela
+    grade = Grade(*parametros).subgrade(*janela)
+    destino = np.load(caminho, mmap_mode="r+")
+    destino[l0:l1, c0:c1] = rasterizar(shapely.from_wkb(wkbs), valores, grade, destino.dtype)
+    destino.flush()
+    del destino
+
+def _rasterizar_lote(caminho, parametros, janela, lote):
+    """_rasterizar_tile com as geometrias lidas do lote do tile (gravado por _Lotes)"""
+    with open(lote, "rb") as arquivo:
+        dados = arquivo.read()
+    wkbs, valores, posicao = [], [], 0
+    while posicao < len(dados):
+        valor, tamanho = struct.unpack_from("<iI", dados, posicao)
+        posicao += 8
+        wkbs.append(dados[posicao:posicao + tamanho])
+        valores.append(valor)
+        posicao += tamanho
+    _rasterizar_tile(caminho, parametros, janela, wkbs, valores)
+
+def _perigo_tile(caminho_gridcode, caminho_zonas, parametros, janela, consulta, classe_zona, niveis):
+    """Perigo do tile e sua vetorização; devolve {rótulo: WKB}"""
+    l0, l1, c0, c1 = janela
+    gridcode = np.load(caminho_gridcode, mmap_mode="r")[l0:l1, c0:c1]
+    zonas = np.load(caminho_zonas, mmap_mode="r")[l0:l1, c0:c1]
+    perigo = np.where(zonas != SEM_ZONA, consulta[gridcode, classe_zona[zonas]], -1)
+    rotulos = np.where(perigo >= 0, zonas.astype(np.int64) * niveis + perigo + 1, 0)
+    poligonos = vetorizar(rotulos, Grade(*parametros).subgrade(*janela))
+    return {r: shapely.to_wkb(g) for r, g in poligonos.items()}, int((perigo >= 0).sum())
+
+def _resultados(funcao, tarefas, processos):
+    """
+    Resultados na ordem das tarefas, entregues à medida que ficam prontos; no pool
+    há no máximo 2 tarefas por processo em andamento (memória limitada)
+    """
+    tarefas = list(tarefas)
+    if processos == 1 or len(tarefas) <= 1:
+        for tarefa in tarefas:
+            yield funcao(*tarefa)
+        return
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        fila = deque()
+        for tarefa in tarefas:
+            fila.append(executor.submit(funcao, *tarefa))
+            if len(fila) >= 2 * processos:
+                yield fila.popleft().result()
+        while fila:
+            yield fila.popleft().result()
+
+def _executar(funcao, tarefas, processos):
+    """Executa as tarefas no pool (ou no próprio processo, se houver só uma ou processos == 1)"""
+    return list(_resultados(funcao, tarefas, processos))
+
+class _Lotes:
+    """Geometrias de cada tile em arquivos (valor, WKB) no disco, na ordem de leitura"""
+
+    def __init__(self, diretorio, limite=None):
+        self.diretorio = diretorio
+        self.limite = limite or LIMITE_LOTES
+        self._pendentes = {}
+        self._tamanho = 0
+
+    def caminho(self, tile):
+        return os.path.join(self.diretorio, f"tile_{tile}.bin")
+
+    def adicionar(self, tiles, valor, wkb):
+        registro = struct.pack("<iI", valor, len(wkb)) + wkb
+        for tile in tiles:
+            self._pendentes.setdefault(tile, bytearray()).extend(registro)
+            self._tamanho += len(registro)
+        if self._tamanho >= self.limite:
+            self.descarregar()
+
+    def descarregar(self):
+        for tile, dados in self._pendentes.items():
+            with open(self.caminho(tile), "ab") as arquivo:
+                arquivo.write(dados)
+        self._pendentes.clear()
+        self._tamanho = 0
+
+# ---------------------------------------------------------------------------
+# Grades em cache (arquivos .npy mapeados em memória)
+# ---------------------------------------------------------------------------
+
+def _assinatura(*partes):
+    return hashlib.sha1("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()
+
+def _assinatura_conteudo(arcpy, camada, campo):
+    """
+    Conteúdo de fontes sem arquivo (SDE/GDB): número de feições e data da última
+    edição quando a camada tem editor tracking; senão sha1 das linhas (geometria
+    e campo), lidas em sequência sem guardar nada em memória
+    """
+    try:
+        descricao = arcpy.Describe(camada)
+        campo_edicao = descricao.editedAtFieldName if descricao.editorTrackingEnabled else None
+    except Exception:
+        campo_edicao = None
+    if campo_edicao:
+        contagem, ultima = 0, None
+        with arcpy.da.SearchCursor(camada, [campo_edicao]) as cursor:
+            for (editada,) in cursor:
+                contagem += 1
+                if editada is not None and (ultima is None or editada > ultima):
+                    ultima = editada
+        return f"{contagem}:{ultima}"
+
+    resumo = hashlib.sha1()
+    with arcpy.da.SearchCursor(camada, ["SHAPE@WKB", campo]) as cursor:
+        for geometria, valor in cursor:
+            resumo.update(bytes(geometria) if geometria is not None else b"-")
+            resumo.update(f"|{valor}|".encode("utf-8"))
+    return resumo.hexdigest()
+
+def _assinatura_camada(arcpy, camada, campo):
+    """Arquivos: data de modificação e tamanho; outras fontes (SDE/GDB): caminho e conteúdo"""
+    caminho = arcpy._caminho(camada) if hasattr(arcpy, "_caminho") else str(camada)
+    if os.path.isfile(caminho):
+        estado = os.stat(caminho)
+        return f"{caminho}:{estado.st_mtime_ns}:{estado.st_size}"
+    return f"{caminho}:{_assinatura_conteudo(arcpy, camada, campo)}"
+
+def _ler_cache(base, assinatura):
+    """(grade, caminho .npy) se o cache existir e corresponder à assinatura"""
+    try:
+        with open(base + ".json", "r", encoding="utf-8") as arquivo:
+            descricao = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    if descricao.get("assinatura") != assinatura or not os.path.exists(base + ".npy"):
+        return None
+    return Grade(*descricao["grade"]), base + ".npy"
+
+def _gerar_grade(base, assinatura, grade, dtype, preencher):
+    """Cria o .npy no disco e chama preencher(caminho) para rasterizá-lo tile a tile; só publica o cache quando completo"""
+    os.makedirs(os.path.dirname(os.path.abspath(base)), exist_ok=True)
+    temporario = base + ".tmp.npy"
+    mapa = np.lib.format.open_memmap(temporario, mode="w+", dtype=dtype, shape=grade.forma)
+    del mapa # os processos abrem o arquivo pelo caminho
+    preencher(temporario)
+
+    os.replace(temporario, base + ".npy")
+    with open(base + ".json", "w", encoding="utf-8") as arquivo:
+        json.dump({"assinatura": assinatura, "grade": grade.parametros(), "dtype": np.dtype(dtype).name}, arquivo)
+    return base + ".npy"
+
+def grade_suscetibilidade(arcpy, camada, resolucao, base, campo="gridcode", tamanho_tile=TAMANHO_TILE, processos=None):
+    """Grade uint8 de gridcode em <base>.npy; rasterizada só quando a camada ou a resolução mudam"""
+    assinatura = _assinatura(_assinatura_camada(arcpy, camada, campo), campo, resolucao)
+    salvo = _ler_cache(base, assinatura)
+    if salvo is not None:
+        return salvo
+
+    grade = Grade.dos_limites(_limites_camada(arcpy, camada, campo, resolucao), resolucao)
+
+    def preencher(temporario):
+        # Uma feição por vez: o WKB vai para o lote de cada tile que toca; nenhum tile vê o estado inteiro
+        with tempfile.TemporaryDirectory(prefix="lhasa_lotes_", dir=os.path.dirname(os.path.abspath(base))) as diretorio:
+            lotes = _Lotes(diretorio)
+            with arcpy.da.SearchCursor(camada, ["SHAPE@WKB", campo]) as cursor:
+                for wkb, valor in cursor:
+                    if wkb is None or valor is None:
+                        continue
+                    wkb = bytes(wkb)
+                    lotes.adicionar(grade.tiles_da_caixa(shapely.bounds(shapely.from_wkb(wkb)), tamanho_tile), int(valor), wkb)
+            lotes.descarregar()
+            tarefas = [(temporario, grade.parametros(), janela, lotes.caminho(tile))
+                       for tile, janela in enumerate(grade.tiles(tamanho_tile)) if os.path.exists(lotes.caminho(tile))]
+            _executar(_rasterizar_lote, tarefas, processos)
+
+    return grade, _gerar_grade(base, assinatura, grade, np.uint8, preencher)
+
+def _limites_camada(arcpy, camada, campo, resolucao):
+    """Extensão da camada (Describe) ou, sem ela, de uma leitura sequencial das geometrias"""
+    try:
+        extensao = arcpy.Describe(camada).extent
+        limites = (float(extensao.XMin), float(extensao.YMin), float(extensao.XMax), float(extensao.YMax))
+        if all(np.isfinite(limites)):
+            return limites
+    except Exception:
+        pass
+    limites = None
+    with arcpy.da.SearchCursor(camada, ["SHAPE@WKB", campo]) as cursor:
+        for wkb, valor in cursor:
+            if wkb is None or valor is None:
+                continue
+            caixa = shapely.bounds(shapely.from_wkb(bytes(wkb)))
+            limites = caixa if limites is None else np.concatenate((np.minimum(limites[:2], caixa[:2]), np.maximum(limites[2:], caixa[2:])))
+    return tuple(float(v) for v in limites) if limites is not None else (0.0, 0.0, resolucao, resolucao)
+
+def grade_zonas(geometrias, grade, base, tamanho_tile=TAMANHO_TILE, processos=None):
+    """Grade uint16 em <base>.npy com o índice (1..N) de cada zona; 0 fora das zonas"""
+    if len(geometrias) >= np.iinfo(np.uint16).max:
+        raise ValueError(f"Número de zonas ({len(geometrias)}) excede a grade uint16")
+    geometrias = np.asarray(geometrias, dtype=object)
+    assinatura = _assinatura(grade.parametros(), *[hashlib.sha1(shapely.to_wkb(g)).hexdigest() for g in geometrias])
+    salvo = _ler_cache(base, assinatura)
+    if salvo is not None:
+        return salvo[1]
+
+    def preencher(temporario):
+        arvore = shapely.STRtree(geometrias)
+        tarefas = []
+        for janela in grade.tiles(tamanho_tile):
+            indices = np.sort(arvore.query(shapely.box(*grade.subgrade(*janela).limites())))
+            if len(indices):
+                tarefas.append((temporario, grade.parametros(), janela, shapely.to_wkb(geometrias[indices]), [int(i) + 1 for i in indices]))
+        _executar(_rasterizar_tile, tarefas, processos)
+
+    return _gerar_grade(base, assinatura, grade, np.uint16, preencher)
+
+# ---------------------------------------------------------------------------
+# Análise
+# ---------------------------------------------------------------------------
+
+def tabela_consulta(modelo, selecao=SELECAO_GRIDCODE):
+    """Matriz [gridcode 0..255, classe de chuva] -> código de perigo (-1 fora das áreas de risco)"""
+    consulta = modelo.tabela_perigo[modelo.indice_gridcode(np.arange(256))].astype(np.int16)
+    consulta[~np.isin(np.arange(256), selecao)] = -1
+    return consulta
+
+def calcular_perigo(modelo, gridcode, zonas, classe_zona, selecao=SELECAO_GRIDCODE):
+    """Código de perigo por pixel (índice em modelo.niveis; -1 fora das áreas de risco)"""
+    return np.where(zonas != SEM_ZONA, tabela_consulta(modelo, selecao)[gridcode, classe_zona[zonas]], -1)
+
+def _campos_dissolve(grupo, estatisticas):
+    """Converte os parâmetros textuais do Dissolve ("A;B", "C MAX;D MAX") em listas"""
+    campos = [c.strip() for c in grupo.split(";") if c.strip()]
+    pares = [e.split() for e in estatisticas.split(";") if e.strip()]
+    return campos, [(c, e.upper()) for c, e in pares]
+
+def analisar(arcpy, zonas_chuva, suscetibilidade, saida, modelo, campos_limiares, campos_grupo, estatisticas,
+             resolucao, diretorio_cache=None, campo_perigo="PERIGO", tamanho_tile=TAMANHO_TILE, processos=None):
+    """Equivalente raster de Intersect + CalculateField + Select + Dissolve; grava a saída com InsertCursor"""
+    processos = processos or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory(prefix="lhasa_raster_") as temporario:
+        diretorio = diretorio_cache or temporario
+        grade, caminho_gridcode = grade_suscetibilidade(arcpy, suscetibilidade, resolucao, os.path.join(diretorio, f"suscetibilidade_{resolucao:g}"),
+                                                        tamanho_tile=tamanho_tile, processos=processos)
+
+        grupo, estatisticas = _campos_dissolve(campos_grupo, estatisticas)
+        atributos = [c for c in grupo if c.upper() != campo_perigo.upper()]
+        valores = list(dict.fromkeys(atributos + [c for c, _ in estatisticas] + list(campos_limiares.values())))
+        with arcpy.da.SearchCursor(zonas_chuva, ["SHAPE@WKB"] + valores) as cursor:
+            zonas = [(shapely.from_wkb(bytes(row[0])), dict(zip(valores, row[1:]))) for row in cursor if row[0] is not None]
+
+        caminho_zonas = grade_zonas([g for g, _ in zonas], grade, os.path.join(diretorio, f"zonas_{resolucao:g}"), tamanho_tile, processos)
+        classe_zona = np.zeros(len(zonas) + 1, dtype=np.uint8)
+        if zonas:
+            classe_zona[1:] = modelo.classe_chuva_array(**{v: [z[c] for _, z in zonas] for v, c in campos_limiares.items()})
+
+        # Tiles que cada zona cobre: a zona é unida e gravada assim que o último deles termina
+        zonas_do_tile, pendentes = {}, {}
+        for zona, (geometria, _) in enumerate(zonas, 1):
+            tiles = grade.tiles_da_caixa(geometria.bounds, tamanho_tile)
+            pendentes[zona] = len(tiles)
+            for tile in tiles:
+                zonas_do_tile.setdefault(tile, []).append(zona)
+
+        consulta, niveis = tabela_consulta(modelo), len(modelo.niveis)
+        janelas = list(grade.tiles(tamanho_tile))
+        tiles = sorted(zonas_do_tile)
+        tarefas = [(caminho_gridcode, caminho_zonas, grade.parametros(), janelas[tile], consulta, classe_zona, niveis) for tile in tiles]
+        campos_saida = ["SHAPE@"] + atributos + [campo_perigo] + [f"{e}_{c}" for c, e in estatisticas]
+        partes, pixels_perigo = {}, 0
+        arcpy.Delete_management(saida)
+        with arcpy.da.InsertCursor(saida, campos_saida) as cursor:
+            for tile, (poligonos, contagem) in zip(tiles, _resultados(_perigo_tile, tarefas, processos)):
+                pixels_perigo += contagem
+                for rotulo, wkb in poligonos.items():
+                    partes.setdefault(rotulo, []).append(wkb)
+                for zona in zonas_do_tile[tile]:
+                    pendentes[zona] -= 1
+                    if pendentes[zona]:
+                        continue
+                    linha = zonas[zona - 1][1]
+                    for codigo in range(niveis):
+                        pedacos = partes.pop(zona * niveis + codigo + 1, None)
+                        if pedacos is None:
+                            continue
+                        geometria = shapely.coverage_union_all(shapely.from_wkb(pedacos)) # tiles não se sobrepõem
+                        cursor.insertRow([geometria] + [linha[c] for c in atributos] + [modelo.niveis[codigo]] +
+                                         [linha[c] for c, _ in estatisticas])
+
+    return {"pixels": int(grade.linhas * grade.colunas), "pixels_perigo": pixels_perigo, "zonas": len(zonas),
+            "tiles": len(tarefas), "processos": processos}
@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de Geometria Shapely - LHASA RIO
+Backend sem ArcGIS para o processamento do LHASA RIO. Estende o armazenamento
+em memória do arcpy_mock com geometrias Shapely/GEOS, leitura e gravação de
+arquivos e interseção/dissolução reais (índice espacial STRtree).
+"""
+
+import os
+import re
+import json
+import numpy as np
+import shapely
+from shapely.geometry import shape, mapping, Point, Polygon, MultiPolygon, LineString, MultiLineString
+from shapely.geometry.base import BaseGeometry
+from arcpy_mock import MockArcPy, MockDA, Tabela, CAMPO_GEOMETRIA, camadas_entrada, esquema_intersecao, compilar_where
+
+EXTENSOES_ARQUIVO = (".geojson", ".json", ".gpkg", ".shp", ".fgb")
+BLOCO_LEITURA = 1 << 20 # caracteres lidos por vez do GeoJSON no cursor de leitura em sequência
+LOTE_LEITURA = 10000 # feições por leitura dos demais formatos (GeoPandas)
+CAMPO_SUSCETIBILIDADE = "gridcode" # campo das áreas de risco usado no cache de uniões
+
+# ---------------------------------------------------------------------------
+# Conversão de geometrias
+# ---------------------------------------------------------------------------
+
+def _aneis_esri_para_poligono(aneis):
+    """Converte anéis Esri JSON (externos horários, furos anti-horários) em polígono"""
+    externos, furos = [], []
+    for anel in aneis:
+        if len(anel) < 4:
+            continue
+        (furos if shapely.LinearRing(anel).is_ccw else externos).append(anel)
+    if not externos:
+        externos, furos = furos, []
+
+    poligonos = [[anel, []] for anel in externos]
+    cascas = [Polygon(anel) for anel in externos]
+    for furo in furos:
+        ponto = Point(furo[0])
+        for indice, casca in enumerate(cascas):
+            if casca.covers(ponto):
+                poligonos[indice][1].append(furo)
+                break
+
+    partes = [Polygon(casca, internos) for casca, internos in poligonos]
+    return partes[0] if len(partes) == 1 else MultiPolygon(partes)
+
+def para_geometria(valor):
+    """Converte SHAPE (Shapely, GeoJSON ou Esri JSON, em dict ou texto) em geometria Shapely"""
+    if valor is None or isinstance(valor, BaseGeometry):
+        return valor
+    if isinstance(valor, (bytes, bytearray)):
+        return shapely.from_wkb(bytes(valor))
+    if isinstance(valor, str):
+        valor = json.loads(valor)
+    if "rings" in valor:
+        return _aneis_esri_para_poligono(valor["rings"])
+    if "paths" in valor:
+        caminhos = valor["paths"]
+        return LineString(caminhos[0]) if len(caminhos) == 1 else MultiLineString(caminhos)
+    if "x" in valor and "y" in valor:
+        return Point(valor["x"], valor["y"])
+    return shape(valor)
+
+def _somente_poligonos(geometria):
+    """Mantém apenas as partes poligonais de um resultado de interseção"""
+    if geometria is None or geometria.is_empty:
+        return None
+    if geometria.geom_type in ("Polygon", "MultiPolygon"):
+        return geometria
+    if geometria.geom_type == "GeometryCollection":
+        partes = [g for g in geometria.geoms if g.geom_type in ("Polygon", "MultiPolygon")]
+        if partes:
+            return shapely.union_all(partes)
+    return None
+
+# ---------------------------------------------------------------------------
+# Leitura e escrita de arquivos
+# ---------------------------------------------------------------------------
+
+def _valor_json(valor):
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+def ler_camada(caminho):
+    """Lê GeoJSON diretamente; demais formatos via GeoPandas (se instalado)"""
+    if caminho.lower().endswith((".geojson", ".json")):
+        with open(caminho, "r", encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)
+        feicoes = dados.get("features", [])
+        campos = []
+        for feicao in feicoes:
+            for campo in (feicao.get("properties") or {}):
+                if campo not in campos:
+                    campos.append(campo)
+        tabela = Tabela(campos + [CAMPO_GEOMETRIA])
+        for feicao in feicoes:
+            linha = dict.fromkeys(tabela.campos)
+            linha.update(feicao.get("properties") or {})
+            linha[CAMPO_GEOMETRIA] = shape(feicao["geometry"]) if feicao.get("geometry") else None
+            tabela.linhas.append(linha)
+        return tabela
+
+    import geopandas
+    gdf = geopandas.read_file(caminho)
+    campos = [c for c in gdf.columns if c != gdf.geometry.name]
+    tabela = Tabela(campos + [CAMPO_GEOMETRIA])
+    geometrias = gdf.geometry.values
+    for indice, registro in enumerate(gdf[campos].to_dict("records")):
+        registro[CAMPO_GEOMETRIA] = geometrias[indice]
+        tabela.linhas.append(registro)
+    return tabela
+
+_INICIO_FEICOES = re.compile(r'"features"\s*:\s*\[')
+_SEPARADOR = re.compile(r"[\s,]*")
+
+def _feicoes_geojson(caminho, bloco=BLOCO_LEITURA):
+    """Feições de um GeoJSON decodificadas uma a uma (raw_decode) a partir de blocos do arquivo"""
+    decodificador = json.JSONDecoder()
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        texto = ""
+        while True:
+            parte = arquivo.read(bloco)
+            texto += parte
+            inicio = _INICIO_FEICOES.search(texto)
+            if inicio:
+                posicao = inicio.end()
+                break
+            if not parte:
+                return
+            texto = texto[-64:] # a chave pode estar dividida entre dois blocos
+
+        while True:
+            posicao = _SEPARADOR.match(texto, posicao).end()
+            if texto.startswith("]", posicao):
+                return
+            try:
+                feicao, posicao = decodificador.raw_decode(texto, posicao)
+            except ValueError:
+                parte = arquivo.read(bloco)
+                if not parte:
+                    if texto[posicao:].strip():
+                        raise
+                    return
+                texto, posicao = texto[posicao:] + parte, 0 # feição incompleta: lê mais um bloco
+                continue
+            yield feicao
+
+def ler_feicoes(caminho):
+    """Linhas ({campo: valor, SHAPE: geometria}) do arquivo, uma por vez, sem guardar a camada"""
+    if caminho.lower().endswith((".geojson", ".json")):
+        for feicao in _feicoes_geojson(caminho):
+            linha = dict(feicao.get("properties") or {})
+            linha[CAMPO_GEOMETRIA] = shape(feicao["geometry"]) if feicao.get("geometry") else None
+            yield linha
+        return
+
+    import geopandas
+    inicio = 0
+    while True:
+        gdf = geopandas.read_file(caminho, rows=slice(inicio, inicio + LOTE_LEITURA))
+        if len(gdf) == 0:
+            return
+        campos = [c for c in gdf.columns if c != gdf.geometry.name]
+        for registro, geometria in zip(gdf[campos].to_dict("records"), gdf.geometry.values):
+            registro[CAMPO_GEOMETRIA] = geometria
+            yield registro
+        inicio += len(gdf)
+
+def escrever_camada(tabela, caminho):
+    """Grava GeoJSON diretamente; demais formatos via GeoPandas (se instalado)"""
+    diretorio = os.path.dirname(caminho)
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    campos = [c for c in tabela.campos if c != CAMPO_GEOMETRIA]
+
+    if caminho.lower().endswith((".geojson", ".json")):
+        colecao = {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": mapping(linha[CAMPO_GEOMETRIA]) if linha.get(CAMPO_GEOMETRIA) is not None else None,
+                "properties": {c: _valor_json(linha.get(c)) for c in campos}
+            } for linha in tabela.linhas]
+        }
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(colecao, arquivo, ensure_ascii=False)
+        return
+
+    import geopandas
+    registros = [{c: linha.get(c) for c in campos} for linha in tabela.linhas]
+    geometrias = [linha.get(CAMPO_GEOMETRIA) for linha in tabela.linhas]
+    geopandas.GeoDataFrame(registros, geometry=geometrias).to_file(caminho)
+
+# ---------------------------------------------------------------------------
+# Operações geométricas
+# ---------------------------------------------------------------------------
+
+def intersectar(zonas, areas):
+    """Interseção de duas camadas usando STRtree sobre a segunda camada"""
+    resultado, renomear = esquema_intersecao(zonas, areas)
+    campos_zonas = [c for c in zonas.campos if c != CAMPO_GEOMETRIA]
+
+    geometrias_zonas = np.array([para_geometria(l.get(CAMPO_GEOMETRIA)) for l in zonas.linhas], dtype=object)
+    geometrias_areas = np.array([para_geometria(l.get(CAMPO_GEOMETRIA)) for l in areas.linhas], dtype=object)
+    if len(geometrias_zonas) == 0 or len(geometrias_areas) == 0:
+        return resultado
+
+    arvore = shapely.STRtree(geometrias_areas)
+    indices_zonas, indices_areas = arvore.query(geometrias_zonas, predicate="intersects")
+    pedacos = shapely.intersection(geometrias_zonas[indices_zonas], geometrias_areas[indices_areas])
+
+    for zona, area, pedaco in zip(indices_zonas, indices_areas, pedacos):
+        pedaco = _somente_poligonos(pedaco)
+        if pedaco is None:
+            continue
+        linha = {c: zonas.linhas[zona].get(c) for c in campos_zonas}
+        linha.update({renomear[c]: v for c, v in areas.linhas[area].items() if c != CAMPO_GEOMETRIA})
+        linha[CAMPO_GEOMETRIA] = pedaco
+        resultado.linhas.append(linha)
+    return resultado
+
+def unir_geometrias(geometrias):
+    """União (dissolve) de uma lista de geometrias"""
+    geometrias = [para_geometria(g) for g in geometrias if g is not None]
+    return shapely.union_all(geometrias) if geometrias else None
+
+class CacheUnioes:
+    """Uniões zona x áreas de risco por (zona, gridcode), calculadas uma única vez
+
+    O perigo depende só da chuva da zona e do gridcode, então a dissolução de cada
+    execução é a junção de no máximo duas uniões em cache por zona.
+    """
+
+    def __init__(self, campo=CAMPO_SUSCETIBILIDADE):
+        self.campo = campo
+        self.limpar()
+
+    def limpar(self):
+        self._areas = None      # geometrias da camada de áreas usada nas uniões
+        self._grupos = {}       # gridcode -> (STRtree, geometrias)
+        self._unioes = {}       # (WKB da zona, gridcode) -> união
+        self._combinacoes = {}  # ids das uniões -> junção (dissolve)
+        self._ids = set()
+        self.calculadas = 0
+        self.reutilizadas = 0
+
+    def aplicavel(self, areas):
+        return self.campo.upper() in {c.upper() for c in areas.campos}
+
+    def _preparar(self, areas):
+        """Reconstrói os índices apenas se as geometrias das áreas mudaram"""
+        geometrias = [l.get(CAMPO_GEOMETRIA) for l in areas.linhas]
+        if self._areas is not None and len(geometrias) == len(self._areas) and all(a is b for a, b in zip(geometrias, self._areas)):
+            return
+        self.limpar()
+        self._areas = geometrias
+        campo = areas.nome_campo(self.campo)
+        grupos = {}
+        for linha, geometria in zip(areas.linhas, geometrias):
+            if geometria is not None:
+                grupos.setdefault(linha.get(campo), []).append(para_geometria(geometria))
+        self._grupos = {g: (shapely.STRtree(lista), np.array(lista, dtype=object)) for g, lista in grupos.items()}
+
+    def uniao(self, zona, gridcode):
+        """União das interseções da zona com as áreas de um gridcode"""
+        chave = (shapely.to_wkb(zona), gridcode)
+        if chave in self._unioes:
+            self.reutilizadas += 1
+            return self._unioes[chave]
+
+        arvore, geometrias = self._grupos[gridcode]
+        indices = arvore.query(zona, predicate="intersects")
+        pedacos = [p for p in map(_somente_poligonos, shapely.intersection(zona, geometrias[indices])) if p is not None]
+        uniao = shapely.union_all(pedacos) if pedacos else None
+        self._unioes[chave] = uniao
+        if uniao is not None:
+            self._ids.add(id(uniao))
+        self.calculadas += 1
+        return uniao
+
+    def intersectar(self, zonas, areas):
+        """Interseção com uma feição por (zona, gridcode) usando as uniões em cache"""
+        self._preparar(areas)
+        resultado, renomear = esquema_intersecao(zonas, areas)
+        campos_zonas = [c for c in zonas.campos if c != CAMPO_GEOMETRIA]
+        campo = renomear[areas.nome_campo(self.campo)]
+
+        for linha_zona in zonas.linhas:
+            zona = para_geometria(linha_zona.get(CAMPO_GEOMETRIA))
+            if zona is None:
+                continue
+            for gridcode in sorted(self._grupos, key=str):
+                uniao = self.uniao(zona, gridcode)
+                if uniao is None:
+                    continue
+                linha = dict.fromkeys(resultado.campos)
+                linha.update({c: linha_zona.get(c) for c in campos_zonas})
+                linha[campo] = gridcode
+                linha[CAMPO_GEOMETRIA] = uniao
+                resultado.linhas.append(linha)
+        return resultado
+
+    def unir(self, geometrias):
+        """Junção de uniões em cache (memorizada); outras geometrias vão para union_all"""
+        if len(geometrias) == 1:
+            return geometrias[0]
+        if not geometrias or not all(id(g) in self._ids for g in geometrias):
+            return unir_geometrias(geometrias)
+        chave = tuple(sorted(id(g) for g in geometrias))
+        if chave not in self._combinacoes:
+            self._combinacoes[chave] = shapely.union_all(geometrias)
+        return self._combinacoes[chave]
+
+# ---------------------------------------------------------------------------
+# Interface arcpy
+# ---------------------------------------------------------------------------
+
+class CursorArquivo:
+    """
+    SearchCursor direto do arquivo, uma feição por vez: usado quando a camada
+    ainda não foi carregada, para que camadas grandes só de leitura (ex.: a
+    suscetibilidade no motor RASTER) não fiquem inteiras em memória
+    """
+
+    def __init__(self, motor, arquivo, campos, where=None):
+        self._motor = motor
+        self._arquivo = arquivo
+        if isinstance(campos, str):
+            campos = [c.strip() for c in campos.split(";")]
+        self._campos = []
+        for campo in campos:
+            nome, _, formato = campo.partition("@")
+            if formato or nome.upper() == CAMPO_GEOMETRIA:
+                self._campos.append((CAMPO_GEOMETRIA, formato.upper() or None))
+            else:
+                self._campos.append((nome, None))
+        self._filtro = compilar_where(where)
+        self.fields = list(campos)
+
+    def __iter__(self):
+        for linha in ler_feicoes(self._arquivo):
+            nomes = {campo.upper(): campo for campo in linha}
+            valor = lambda campo: linha.get(nomes.get(campo.upper(), campo))
+            if self._filtro is not None and not self._filtro(valor):
+                continue
+            yield tuple(self._motor._ler_geometria(linha.get(CAMPO_GEOMETRIA), formato) if nome == CAMPO_GEOMETRIA else valor(nome)
+                        for nome, formato in self._campos)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+class _DAShapely(MockDA):
+    def SearchCursor(self, caminho, campos, where=None, *args, **kwargs):
+        arquivo = self._motor._arquivo_nao_carregado(caminho)
+        if arquivo is not None and campos != "*" and "OID@" not in str(campos).upper():
+            return CursorArquivo(self._motor, arquivo, campos, where)
+        return super().SearchCursor(caminho, campos, where, *args, **kwargs)
+
+class ArcPyShapely(MockArcPy):
+    """arcpy em memória com geometrias Shapely e camadas em arquivo (GeoJSON/GeoPandas)"""
+
+    def __init__(self, cache_unioes=True):
+        super().__init__()
+        self.da = _DAShapely(self)
+        self._arquivos = {}
+        self.cache_unioes = CacheUnioes() if cache_unioes else None
+
+    def _arquivo_nao_carregado(self, caminho):
+        """Caminho do arquivo da camada se ela ainda não estiver em memória"""
+        if not self._eh_arquivo(caminho) or self._chave(caminho) in self._tabelas:
+            return None
+        arquivo = self._caminho(caminho)
+        return arquivo if os.path.exists(arquivo) else None
+
+    def _eh_arquivo(self, caminho):
+        return self._caminho(caminho).lower().endswith(EXTENSOES_ARQUIVO)
+
+    def _obter(self, caminho, criar=False):
+        chave = self._chave(caminho)
+        if chave not in self._tabelas and self._eh_arquivo(caminho):
+            arquivo = self._caminho(caminho)
+            if os.path.exists(arquivo):
+                self._tabelas[chave] = ler_camada(arquivo)
+            self._arquivos[chave] = arquivo
+        return super()._obter(caminho, criar)
+
+    def _gravar(self, caminho, tabela):
+        if self._eh_arquivo(caminho):
+            self._arquivos[self._chave(caminho)] = self._caminho(caminho)
+        super()._gravar(caminho, tabela)
+
+    def _persistir(self, caminho):
+        chave = self._chave(caminho)
+        if chave in self._arquivos and chave in self._tabelas:
+            escrever_camada(self._tabelas[chave], self._arquivos[chave])
+
+    def _ler_geometria(self, valor, formato):
+        if valor is None:
+            return None
+        if formato == "JSON":
+            return shapely.to_geojson(valor)
+        if formato == "WKB":
+            return shapely.to_wkb(valor)
+        if formato == "WKT":
+            return shapely.to_wkt(valor)
+        return valor
+
+    def _escrever_geometria(self, valor):
+        return para_geometria(valor)
+
+    def _unir_geometrias(self, geometrias):
+        if self.cache_unioes is not None:
+            return self.cache_unioes.unir(geometrias)
+        return unir_geometrias(geometrias)
+
+    def Intersect_analysis(self, entradas, saida, join_attributes="ALL", *args):
+        """Interseção por (zona, gridcode) com cache de uniões; sem gridcode, feição a feição"""
+        zonas, areas = [self._obter(e) for e in camadas_entrada(entradas)[:2]]
+        if self.cache_unioes is not None and self.cache_unioes.aplicavel(areas):
+            self._gravar(saida, self.cache_unioes.intersectar(zonas, areas))
+        else:
+            self._gravar(saida, intersectar(zonas, areas))
+
+    def Exists(self, caminho):
+        return super().Exists(caminho) or (self._eh_arquivo(caminho) and os.path.exists(self._caminho(caminho)))
+
+    def Delete_management(self, caminho, *args):
+        super().Delete_management(caminho)
+        arquivo = self._arquivos.pop(self._chave(caminho), None)
+        if arquivo and os.path.exists(arquivo):
+            os.remove(arquivo)
+
+# Instância global
+arcpy = ArcPyShapely()
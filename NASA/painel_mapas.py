@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""
+Painel de mapas estático - LHASA MG
+Alternativa aos HTML com data/hora no nome (mapa_lhasa_mg_*.html,
+mapa_bolhas_mg_*.html), que embutem todos os dados a cada execução:
+
+    <diretorio>/index.html     casca HTML/JS (Leaflet), gravada uma vez e só
+                               regravada se o conteúdo mudar
+    <diretorio>/latest.json    estações e bolhas da última execução (GeoJSON
+                               compacto), reescrito a cada ciclo de 15 minutos
+    <diretorio>/dados/*.json   cópia por data/hora (opcional)
+
+O navegador busca latest.json periodicamente e troca só os dados das camadas,
+sem recarregar a página nem o Leaflet. index.html?dados=dados/<arquivo>.json
+abre uma execução anterior. Os arquivos são gravados em temporário e
+renomeados, então o navegador nunca lê um JSON pela metade. Sirva o diretório
+por HTTP (ex.: python -m http.server); por file:// o navegador bloqueia o fetch.
+"""
+
+import os
+import json
+from datetime import datetime
+
+from arquivos import gravar_atomico
+from camadas_geojson import estacoes_geojson, bolhas_geojson, _JS_ESTACAO, _JS_BOLHA
+
+INTERVALO_ATUALIZACAO = 60 # segundos entre buscas do latest.json no navegador
+CENTRO_MAPA = [-18.5122, -44.5550] # Centro de Minas Gerais
+VERSAO_LEAFLET = "1.9.4"
+
+CASCA_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>LHASA MG - Estações e Risco</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@%(leaflet)s/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@%(leaflet)s/dist/leaflet.js"></script>
+<style>
+html, body, #mapa { height: 100%%; margin: 0; }
+#situacao { position: absolute; bottom: 20px; left: 10px; z-index: 1000; background: white;
+            border: 1px solid #999; padding: 4px 8px; font: 12px Arial; }
+</style>
+</head>
+<body>
+<div id="mapa"></div>
+<div id="situacao">Carregando...</div>
+<script>
+var mapa = L.map("mapa", {preferCanvas: true}).setView(%(centro)s, 7);
+L.tileLayer("https://tile.openstreetmap.org/{z}/{x}/{y}.png",
+            {attribution: "&copy; OpenStreetMap", maxZoom: 18}).addTo(mapa);
+L.control.scale().addTo(mapa);
+
+var estacoes = L.geoJSON(null, {
+    pointToLayer: function (feature, latlng) { return L.circleMarker(latlng, {radius: 7, weight: 2, fill: true, fillOpacity: 0.8}); },
+    onEachFeature: %(js_estacao)s
+}).addTo(mapa);
+var bolhas = L.geoJSON(null, {
+    pointToLayer: function (feature, latlng) { return L.circle(latlng, {radius: 5000, fill: true}); },
+    onEachFeature: %(js_bolha)s
+}).addTo(mapa);
+L.control.layers(null, {"Estações INMET": estacoes, "Bolhas": bolhas}).addTo(mapa);
+
+var arquivo = new URLSearchParams(location.search).get("dados") || "latest.json";
+var versao = null;
+function atualizar() {
+    fetch(arquivo + "?t=" + Date.now(), {cache: "no-store"})
+        .then(function (resposta) { return resposta.json(); })
+        .then(function (dados) {
+            if (dados.gerado_em === versao) { return; }
+            versao = dados.gerado_em;
+            estacoes.clearLayers().addData(dados.estacoes);
+            bolhas.clearLayers().addData(dados.bolhas);
+            document.getElementById("situacao").textContent =
+                "Atualizado em " + dados.gerado_em + " | " + dados.estacoes.features.length + " estações";
+        })
+        .catch(function () { document.getElementById("situacao").textContent = "Erro ao carregar " + arquivo; });
+}
+atualizar();
+if (arquivo === "latest.json") { setInterval(atualizar, %(intervalo)d * 1000); }
+</script>
+</body>
+</html>
+"""
+
+def casca_html(intervalo=INTERVALO_ATUALIZACAO):
+    return CASCA_HTML % {"leaflet": VERSAO_LEAFLET, "centro": json.dumps(CENTRO_MAPA), "intervalo": intervalo,
+                         "js_estacao": _JS_ESTACAO.strip(), "js_bolha": _JS_BOLHA.strip()}
+
+def escrever_casca(diretorio, intervalo=INTERVALO_ATUALIZACAO):
+    """Grava index.html se não existir ou se mudou; devolve True quando gravou"""
+    caminho = os.path.join(diretorio, "index.html")
+    conteudo = casca_html(intervalo)
+    if os.path.exists(caminho):
+        with open(caminho, "r", encoding="utf-8") as arquivo:
+            if arquivo.read() == conteudo:
+                return False
+    gravar_atomico(caminho, conteudo)
+    return True
+
+def escrever_dados(diretorio, estacoes, dados_bolhas, data=None, historico=False):
+    """Reescreve latest.json (e dados/<data>.json com historico); devolve o caminho do latest.json"""
+    data = data or datetime.now()
+    conteudo = json.dumps({
+        "gerado_em": data.strftime("%d/%m/%Y %H:%M"),
+        "estacoes": estacoes_geojson(estacoes),
+        "bolhas": bolhas_geojson(dados_bolhas),
+    }, ensure_ascii=False, separators=(",", ":"))
+
+    caminho = os.path.join(diretorio, "latest.json")
+    gravar_atomico(caminho, conteudo)
+    if historico:
+        gravar_atomico(os.path.join(diretorio, "dados", data.strftime("%Y%m%d_%H%M") + ".json"), conteudo)
+    return caminho
+
+def atualizar_painel(diretorio, estacoes, indice=None, data=None, historico=False):
+    """Casca (se preciso) + dados da execução; devolve o caminho do latest.json"""
+    import mapa_bolhas
+
+    if indice is None and mapa_bolhas.AREAS_RISCO_ARQUIVO:
+        from proximidade import IndiceProximidade
+        indice = IndiceProximidade.de_arquivo(mapa_bolhas.AREAS_RISCO_ARQUIVO)
+    escrever_casca(diretorio)
+    return escrever_dados(diretorio, estacoes, mapa_bolhas.processar_dados_para_bolhas(estacoes, indice), data, historico)
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+Perfis de execução sob demanda (--profile=cpu|mem|sample)
+    cpu:    cProfile; grava <base>.prof (pstats/snakeviz) e um resumo em <base>.txt
+    mem:    tracemalloc; a cada troca de etapa compara com o snapshot anterior e
+            grava as linhas que mais alocaram naquela etapa em <base>.txt,
+            mais o snapshot final em <base>.snapshot
+    sample: amostragem da pilha da thread principal a cada 5 ms; grava pilhas
+            agregadas em <base>.folded (flamegraph.pl / speedscope), com a etapa
+            como raiz, e as funções com mais amostras em <base>.txt
+
+Sem modo (None), Perfil não faz nada, então as chamadas a marcar() podem ficar
+no código sem custo.
+"""
+
+import os
+import sys
+import time
+import threading
+import tracemalloc
+import contextlib
+import collections
+from datetime import datetime
+
+MODOS = ("cpu", "mem", "sample")
+INTERVALO_AMOSTRAGEM = 0.005 # segundos entre amostras da pilha
+QUADROS_TRACEMALLOC = 10
+TOP_ALOCACOES = 15
+TOP_FUNCOES = 40
+SEM_ETAPA = "(inicio)"
+
+def extrair_opcao(argumentos):
+    """Separa --profile=<modo> (ou --profile <modo>) dos demais argumentos"""
+    modo, resto = None, []
+    iterador = iter(argumentos)
+    for argumento in iterador:
+        if argumento.startswith("--profile="):
+            modo = argumento.split("=", 1)[1]
+        elif argumento == "--profile":
+            modo = next(iterador, None)
+        else:
+            resto.append(argumento)
+    if modo is not None and modo not in MODOS:
+        raise ValueError("--profile deve ser um de: " + ", ".join(MODOS))
+    return modo, resto
+
+def _ignorar_quadro(quadro):
+    """Alocações do próprio tracemalloc e do mecanismo de import não interessam"""
+    return quadro.filename == tracemalloc.__file__ or quadro.filename.startswith("<frozen importlib")
+
+def _mb(valor):
+    return f"{valor / (1024.0 * 1024.0):.2f} MB"
+
+class Perfil:
+    def __init__(self, modo, diretorio, prefixo="perfil"):
+        if modo is not None and modo not in MODOS:
+            raise ValueError("modo de perfil inválido: " + str(modo))
+        self.modo = modo
+        self.base = None
+        if modo:
+            os.makedirs(diretorio, exist_ok=True)
+            nome = f"{prefixo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{modo}"
+            self.base = os.path.join(diretorio, nome)
+        self.arquivos = []
+        self.etapa = SEM_ETAPA
+        self._inicio_etapa = None
+        self._perfilador = None
+        self._snapshot = None
+        self._relatorio = None
+        self._pilhas = collections.Counter()
+        self._amostrando = None
+        self._thread = None
+
+    @property
+    def ativo(self):
+        return self.base is not None
+
+    def iniciar(self):
+        if not self.ativo:
+            return self
+        self._inicio_etapa = time.perf_counter()
+        if self.modo == "cpu":
+            import cProfile # pstats/cProfile só no modo cpu: não pesam no início do CLI
+            self._perfilador = cProfile.Profile()
+            self._perfilador.enable()
+        elif self.modo == "mem":
+            self._relatorio = open(self.base + ".txt", "w", encoding="utf-8")
+            tracemalloc.start(QUADROS_TRACEMALLOC)
+            self._snapshot = tracemalloc.take_snapshot()
+        elif self.modo == "sample":
+            self._amostrando = threading.Event()
+            self._thread = threading.Thread(target=self._amostrar, args=(threading.get_ident(),), daemon=True)
+            self._thread.start()
+        return self
+
+    # -- troca de etapa ------------------------------------------------------
+
+    def marcar(self, rotulo):
+        """Fecha a etapa corrente e passa a atribuir as medidas à etapa rotulo"""
+        if not self.ativo:
+            return
+        if self.modo == "mem":
+            self._comparar_memoria()
+        self.etapa = rotulo
+        self._inicio_etapa = time.perf_counter()
+
+    def _comparar_memoria(self):
+        snapshot = tracemalloc.take_snapshot()
+        atual, pico = tracemalloc.get_traced_memory()
+        diferencas = snapshot.compare_to(self._snapshot, "lineno")
+        self._snapshot = snapshot
+
+        saida = self._relatorio
+        saida.write(f"=== {self.etapa} | {time.perf_counter() - self._inicio_etapa:.2f} s | "
+                    f"alocado {_mb(atual)} | pico {_mb(pico)}\n")
+        diferencas = [d for d in diferencas if d.size_diff and not _ignorar_quadro(d.traceback[0])]
+        for diferenca in diferencas[:TOP_ALOCACOES]:
+            quadro = diferenca.traceback[0]
+            saida.write(f"  {_mb(diferenca.size_diff):>12} {diferenca.count_diff:>+9} blocos  {quadro.filename}:{quadro.lineno}\n")
+        saida.write("\n")
+        saida.flush()
+        tracemalloc.reset_peak()
+
+    # -- amostragem ----------------------------------------------------------
+
+    def _amostrar(self, thread_alvo):
+        while not self._amostrando.wait(INTERVALO_AMOSTRAGEM):
+            quadro = sys._current_frames().get(thread_alvo)
+            pilha = []
+            while quadro is not None:
+                codigo = quadro.f_code
+                pilha.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                quadro = quadro.f_back
+            pilha.append(self.etapa.replace(";", ","))
+            self._pilhas[";".join(reversed(pilha))] += 1
+
+    def _gravar_amostras(self):
+        with open(self.base + ".folded", "w", encoding="utf-8") as saida:
+            for pilha, amostras in self._pilhas.most_common():
+                saida.write(f"{pilha} {amostras}\n")
+        self.arquivos.append(self.base + ".folded")
+
+        proprias, totais, etapas = collections.Counter(), collections.Counter(), collections.Counter()
+        for pilha, amostras in self._pilhas.items():
+            funcoes = pilha.split(";")
+            etapas[funcoes[0]] += amostras
+            if len(funcoes) > 1:
+                proprias[funcoes[-1]] += amostras
+            for funcao in set(funcoes[1:]):
+                totais[funcao] += amostras
+        amostras_total = sum(self._pilhas.values())
+        total = amostras_total or 1
+        with open(self.base + ".txt", "w", encoding="utf-8") as saida:
+            saida.write(f"{amostras_total} amostras a cada {INTERVALO_AMOSTRAGEM * 1000:.0f} ms\n\n=== ETAPAS\n")
+            for nome, amostras in etapas.most_common():
+                saida.write(f"  {100.0 * amostras / total:6.1f}%  {nome}\n")
+            saida.write("\n=== FUNCOES (proprio | acumulado)\n")
+            for funcao, amostras in proprias.most_common(TOP_FUNCOES):
+                saida.write(f"  {100.0 * amostras / total:6.1f}% | {100.0 * totais[funcao] / total:6.1f}%  {funcao}\n")
+        self.arquivos.append(self.base + ".txt")
+
+    # -- fim -----------------------------------------------------------------
+
+    def parar(self):
+        """Encerra a coleta e grava os arquivos; devolve a lista de arquivos"""
+        if not self.ativo:
+            return []
+        if self.modo == "cpu" and self._perfilador is not None:
+            import pstats
+            self._perfilador.disable()
+            self._perfilador.dump_stats(self.base + ".prof")
+            with open(self.base + ".txt", "w", encoding="utf-8") as saida:
+                pstats.Stats(self._perfilador, stream=saida).sort_stats("cumulative").print_stats(TOP_FUNCOES)
+            self.arquivos += [self.base + ".prof", self.base + ".txt"]
+            self._perfilador = None
+        elif self.modo == "mem" and self._relatorio is not None:
+            self._comparar_memoria()
+            self._snapshot.dump(self.base + ".snapshot")
+            tracemalloc.stop()
+            self._relatorio.close()
+            self._relatorio = None
+            self.arquivos += [self.base + ".txt", self.base + ".snapshot"]
+        elif self.modo == "sample" and self._thread is not None:
+            self._amostrando.set()
+            self._thread.join()
+            self._thread = None
+            self._gravar_amostras()
+        return self.arquivos
+
+@contextlib.contextmanager
+def perfilar(modo, diretorio, prefixo="perfil"):
+    """Perfil ativo durante o bloco; com modo None não faz nada"""
+    perfil = Perfil(modo, diretorio, prefixo).iniciar()
+    try:
+        yield perfil
+    finally:
+        perfil.parar()
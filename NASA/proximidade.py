@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+"""
+Proximidade de áreas de risco - LHASA
+Índice espacial sobre um catálogo de áreas de risco (nome, latitude, longitude),
+de qualquer tamanho (ex.: todos os municípios com histórico de deslizamentos),
+com distância de grande círculo (haversine, em km). Para todas as estações de
+uma vez devolve as k áreas mais próximas e quantas áreas ficam dentro de um raio.
+
+Implementações, na ordem de preferência:
+    balltree: sklearn.neighbors.BallTree com metric="haversine"
+    kdtree:   scipy.spatial.cKDTree sobre pontos 3D na esfera unitária (a corda
+              cresce com a distância de grande círculo, então a ordem é a mesma)
+    numpy:    força bruta em blocos de estações, sem dependências extras: um
+              produto de matrizes entre os pontos 3D (o produto escalar decresce
+              com a distância) e haversine só para as k áreas escolhidas
+
+Catálogo em CSV (colunas nome;lat;lon, separador ; ou ,) ou JSON (lista de
+objetos com as mesmas chaves).
+"""
+
+import csv
+import json
+import numpy as np
+
+RAIO_TERRA_KM = 6371.0088
+BLOCO_FORCA_BRUTA = 2048 # estações por bloco: memória ~ bloco x áreas x 8 bytes
+IMPLEMENTACOES = ("balltree", "kdtree", "numpy")
+
+def carregar_catalogo(caminho):
+    """Lista de (nome, lat, lon) de um CSV ou JSON"""
+    with open(caminho, "r", encoding="utf-8-sig", newline="") as arquivo:
+        if caminho.lower().endswith(".json"):
+            registros = json.load(arquivo)
+        else:
+            amostra = arquivo.read(4096)
+            arquivo.seek(0)
+            registros = csv.DictReader(arquivo, delimiter=";" if amostra.count(";") > amostra.count(",") else ",")
+        return [(str(r["nome"]), float(str(r["lat"]).replace(",", ".")), float(str(r["lon"]).replace(",", ".")))
+                for r in registros]
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distância de grande círculo (km); aceita arrays com broadcasting"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2.0)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0)**2
+    return 2.0 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def _esfera(lat, lon):
+    """Pontos 3D na esfera unitária"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+def _corda(distancia_km):
+    return 2.0 * np.sin(np.minimum(distancia_km / RAIO_TERRA_KM, np.pi) / 2.0)
+
+class IndiceProximidade:
+    def __init__(self, areas, implementacao=None):
+        """areas: sequência de (nome, lat, lon); implementacao: None escolhe a melhor disponível"""
+        if not areas:
+            raise ValueError("catálogo de áreas de risco vazio")
+        self.nomes = [nome for nome, _, _ in areas]
+        self.lat = np.array([lat for _, lat, _ in areas], dtype=float)
+        self.lon = np.array([lon for _, _, lon in areas], dtype=float)
+        self.implementacao = None
+        self._arvore = None
+        self._pontos = _esfera(self.lat, self.lon).T # 3 x áreas, para a força bruta
+
+        for candidata in ((implementacao,) if implementacao else IMPLEMENTACOES):
+            if candidata not in IMPLEMENTACOES:
+                raise ValueError("implementação inválida: " + str(candidata))
+            try:
+                if candidata == "balltree":
+                    from sklearn.neighbors import BallTree
+                    self._arvore = BallTree(np.radians(np.column_stack((self.lat, self.lon))), metric="haversine")
+                elif candidata == "kdtree":
+                    from scipy.spatial import cKDTree
+                    self._arvore = cKDTree(self._pontos.T)
+            except ImportError:
+                if implementacao:
+                    raise
+                continue
+            self.implementacao = candidata
+            break
+
+    @classmethod
+    def de_arquivo(cls, caminho, implementacao=None):
+        return cls(carregar_catalogo(caminho), implementacao)
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def mais_proximas(self, lat, lon, k=1):
+        """(distancias_km, indices), ambos n_estacoes x k, da mais próxima para a mais distante"""
+        lat, lon = np.atleast_1d(np.asarray(lat, dtype=float)), np.atleast_1d(np.asarray(lon, dtype=float))
+        k = min(k, len(self))
+        if self.implementacao == "balltree":
+            distancias, indices = self._arvore.query(np.radians(np.column_stack((lat, lon))), k=k)
+            return distancias * RAIO_TERRA_KM, indices
+        if self.implementacao == "kdtree":
+            _, indices = self._arvore.query(_esfera(lat, lon), k=k)
+            indices = indices.reshape(len(lat), k)
+            return haversine_km(lat[:, None], lon[:, None], self.lat[indices], self.lon[indices]), indices
+
+        indices = np.empty((len(lat), k), dtype=np.intp)
+        estacoes = _esfera(lat, lon)
+        for inicio in range(0, len(lat), BLOCO_FORCA_BRUTA):
+            bloco = slice(inicio, inicio + BLOCO_FORCA_BRUTA)
+            afastamento = -(estacoes[bloco] @ self._pontos)
+            candidatos = np.argpartition(afastamento, k - 1, axis=1)[:, :k] if k < len(self) else np.tile(np.arange(k), (len(afastamento), 1))
+            ordem = np.argsort(np.take_along_axis(afastamento, candidatos, axis=1), axis=1, kind="stable")
+            indices[bloco] = np.take_along_axis(candidatos, ordem, axis=1)
+        return haversine_km(lat[:, None], lon[:, None], self.lat[indices], self.lon[indices]), indices
+
+    def contar_no_raio(self, lat, lon, raio_km):
+        """Quantidade de áreas a até raio_km de cada estação"""
+        lat, lon = np.atleast_1d(np.asarray(lat, dtype=float)), np.atleast_1d(np.asarray(lon, dtype=float))
+        if self.implementacao == "balltree":
+            return self._arvore.query_radius(np.radians(np.column_stack((lat, lon))), r=raio_km / RAIO_TERRA_KM, count_only=True)
+        if self.implementacao == "kdtree":
+            return np.asarray(self._arvore.query_ball_point(_esfera(lat, lon), r=_corda(raio_km), return_length=True))
+
+        contagem = np.empty(len(lat), dtype=np.intp)
+        estacoes = _esfera(lat, lon)
+        limite = np.cos(min(raio_km / RAIO_TERRA_KM, np.pi)) # produto escalar mínimo dentro do raio
+        for inicio in range(0, len(lat), BLOCO_FORCA_BRUTA):
+            bloco = slice(inicio, inicio + BLOCO_FORCA_BRUTA)
+            contagem[bloco] = (estacoes[bloco] @ self._pontos >= limite).sum(axis=1)
+        return contagem
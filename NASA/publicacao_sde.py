@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Publicação Incremental no SDE - LHASA RIO
+Compara a saída dissolvida da execução com a camada publicada, usando a chave
+(NM_CODIGO, PERIGO), e aplica só as inserções, atualizações e remoções
+necessárias dentro de uma única sessão de edição.
+
+A geometria lida do SDE volta arredondada à resolução da camada, então o WKB
+quase nunca é igual byte a byte ao da saída nova: as geometrias são comparadas
+com a tolerância XY da camada publicada (equals_exact das formas normalizadas).
+
+DT_COLETA (CAMPOS_VOLATEIS) muda a cada leitura e fica fora da comparação: uma
+zona só é regravada quando o perigo, a chuva (MAX_NM_*) ou a geometria mudam, e
+o DT_COLETA publicado passa a ser o da leitura que trouxe a última alteração.
+"""
+
+CHAVE_PUBLICACAO = ("NM_CODIGO", "PERIGO")
+CAMPO_GEOMETRIA = "SHAPE@WKB"
+TOLERANCIA_XY_PADRAO = 0.001 # m: tolerância XY padrão do ArcGIS em coordenadas métricas
+CAMPOS_VOLATEIS = ("DT_COLETA",)
+CAMPOS_IGNORADOS = ("OBJECTID", "FID", "SHAPE", "SHAPE_LENGTH", "SHAPE_AREA", "SHAPE.STLENGTH()", "SHAPE.STAREA()", "GLOBALID")
+
+def _normalizar(valor):
+    """Evita diferenças falsas entre tipos (1 x 1.0, bytearray x bytes)"""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, bytearray):
+        return bytes(valor)
+    return valor
+
+def _campos(arcpy, caminho):
+    return [c.name for c in arcpy.ListFields(caminho) if c.name.upper() not in CAMPOS_IGNORADOS and c.type not in ("OID", "Geometry", "GlobalID")]
+
+def _workspace(caminho):
+    """Workspace (pasta, .gdb ou .sde) que contém a classe de feições"""
+    caminho = str(caminho)
+    return caminho[:max(caminho.rfind("\\"), caminho.rfind("/"), 0)]
+
+def obter_tolerancia(arcpy, caminho):
+    """Tolerância XY da referência espacial da camada (padrão do ArcGIS se desconhecida)"""
+    try:
+        return float(arcpy.Describe(caminho).spatialReference.XYTolerance) or TOLERANCIA_XY_PADRAO
+    except Exception:
+        return TOLERANCIA_XY_PADRAO
+
+def geometrias_iguais(a, b, tolerancia):
+    """WKB iguais ou, com Shapely, formas normalizadas iguais dentro da tolerância"""
+    if a == b:
+        return True
+    if not isinstance(a, bytes) or not isinstance(b, bytes):
+        return False
+    try:
+        import shapely
+        return bool(shapely.equals_exact(shapely.normalize(shapely.from_wkb(a)), shapely.normalize(shapely.from_wkb(b)), tolerance=tolerancia))
+    except Exception:
+        return False # sem Shapely ou WKB inválido: tratada como alterada
+
+def _linhas_iguais(atual, nova, comparados, tolerancia):
+    """Atributos comparados iguais e geometria (último valor) igual dentro da tolerância"""
+    return all(atual[i] == nova[i] for i in comparados) and geometrias_iguais(atual[-1], nova[-1], tolerancia)
+
+def calcular_alteracoes(arcpy, origem, destino, chave=CHAVE_PUBLICACAO, tolerancia=None, volateis=CAMPOS_VOLATEIS):
+    """Diferença entre a saída nova (origem) e a camada publicada (destino)
+    tolerancia: tolerância XY para comparar geometrias (padrão: a da camada publicada)
+    volateis: campos que não contam como alteração (são gravados junto com as outras)"""
+    campos_destino = {c.upper(): c for c in _campos(arcpy, destino)} if arcpy.Exists(destino) else {}
+    campos = [c for c in _campos(arcpy, origem) if not campos_destino or c.upper() in campos_destino]
+    for campo in chave:
+        if campo.upper() not in [c.upper() for c in campos]:
+            raise ValueError(f"Campo de chave {campo} ausente na saída")
+    indices_chave = [[c.upper() for c in campos].index(campo.upper()) for campo in chave]
+    ignorados = {campo.upper() for campo in volateis}
+    comparados = [i for i, c in enumerate(campos) if c.upper() not in ignorados]
+
+    novos = {}
+    with arcpy.da.SearchCursor(origem, campos + [CAMPO_GEOMETRIA]) as cursor:
+        for row in cursor:
+            valores = tuple(_normalizar(v) for v in row)
+            novos[tuple(valores[i] for i in indices_chave)] = valores
+
+    atuais = {}
+    duplicadas = 0
+    if campos_destino:
+        with arcpy.da.SearchCursor(destino, [campos_destino[c.upper()] for c in campos] + [CAMPO_GEOMETRIA]) as cursor:
+            for row in cursor:
+                valores = tuple(_normalizar(v) for v in row)
+                chave_linha = tuple(valores[i] for i in indices_chave)
+                if chave_linha in atuais:
+                    duplicadas += 1
+                atuais.setdefault(chave_linha, valores)
+
+    if tolerancia is None:
+        tolerancia = obter_tolerancia(arcpy, destino) if campos_destino else TOLERANCIA_XY_PADRAO
+    iguais = {k for k, v in novos.items() if k in atuais and _linhas_iguais(atuais[k], v, comparados, tolerancia)}
+
+    return {
+        "campos": [campos_destino.get(c.upper(), c) for c in campos],
+        "indices_chave": indices_chave,
+        "inserir": {k: v for k, v in novos.items() if k not in atuais},
+        "atualizar": {k: v for k, v in novos.items() if k in atuais and k not in iguais},
+        "remover": {k for k in atuais if k not in novos},
+        "inalteradas": len(iguais),
+        "duplicadas": duplicadas,
+    }
+
+def aplicar_alteracoes(arcpy, destino, alteracoes):
+    """Aplica as alterações em uma sessão de edição (tudo ou nada)"""
+    campos = alteracoes["campos"] + [CAMPO_GEOMETRIA]
+    indices_chave = alteracoes["indices_chave"]
+    resumo = {"inseridas": 0, "atualizadas": 0, "removidas": 0, "inalteradas": alteracoes["inalteradas"]}
+
+    pendentes = alteracoes["atualizar"] or alteracoes["remover"] or alteracoes["duplicadas"]
+    if not (pendentes or alteracoes["inserir"]):
+        return resumo
+
+    with arcpy.da.Editor(_workspace(destino)):
+        if pendentes:
+            vistas = set()
+            with arcpy.da.UpdateCursor(destino, campos) as cursor:
+                for row in cursor:
+                    chave = tuple(_normalizar(row[i]) for i in indices_chave)
+                    if chave in alteracoes["remover"] or chave in vistas:
+                        cursor.deleteRow()
+                        resumo["removidas"] += 1
+                    elif chave in alteracoes["atualizar"]:
+                        cursor.updateRow(list(alteracoes["atualizar"][chave]))
+                        resumo["atualizadas"] += 1
+                    vistas.add(chave)
+
+        if alteracoes["inserir"]:
+            with arcpy.da.InsertCursor(destino, campos) as cursor:
+                for valores in alteracoes["inserir"].values():
+                    cursor.insertRow(valores)
+                    resumo["inseridas"] += 1
+
+    return resumo
+
+def publicar_incremental(arcpy, origem, destino, chave=CHAVE_PUBLICACAO):
+    """Publica a saída no destino aplicando apenas o que mudou"""
+    return aplicar_alteracoes(arcpy, destino, calcular_alteracoes(arcpy, origem, destino, chave))
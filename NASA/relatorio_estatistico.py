@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+Relatório estatístico das estações e das bolhas - LHASA MG
+Substitui os vários filtros sobre o DataFrame (um df[...] por faixa de risco,
+um nlargest por ranking), que só eram impressos, por um cálculo único: os
+registros são lidos uma vez para arrays NumPy e, a partir deles, saem as
+médias, as contagens por faixa (np.digitize + np.bincount), as contagens por
+categoria, os histogramas e os rankings (top-k por vários campos).
+
+O relatório é um dict pronto para JSON e é exportado em dois formatos que os
+dashboards leem direto, com nomes fixos (sobrescritos a cada execução):
+
+    <LHASA_RELATORIOS>/relatorio_<nome>.json   estrutura completa
+    <LHASA_RELATORIOS>/relatorio_<nome>.csv    uma linha por valor
+                                               (secao, chave, posicao, codigo, nome, valor)
+
+Uso:
+    relatorio = relatorio_bolhas(dados_bolhas)
+    exportar_relatorio(relatorio, "bolhas")
+"""
+
+import io
+import os
+import csv
+import json
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from arquivos import gravar_atomico
+
+RELATORIO_DIRETORIO = os.environ.get("LHASA_RELATORIOS", ".")
+TOP_K = 5
+
+# Faixas do índice de risco (0-100): bordas e rótulos
+BORDAS_RISCO = (30, 50, 70)
+FAIXAS_RISCO = ("baixo", "moderado", "alto", "critico")
+RISCO_ALTO = 70
+
+COLUNAS_CSV = ("secao", "chave", "posicao", "codigo", "nome", "valor")
+
+def _numero(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _arredondar(valor):
+    return None if valor is None or np.isnan(valor) else round(float(valor), 2)
+
+def calcular_relatorio(registros, campo_nome, campo_codigo=None, medias=(), faixas=None, contagens=(),
+                       histogramas=(), tops=()):
+    """
+    Estatísticas dos registros (lista de dicts) em uma leitura só.
+    medias: campos numéricos; faixas: {campo: (bordas, rótulos)};
+    contagens: campos de categoria; histogramas: [(campo, intervalos)];
+    tops: [(chave, campo, k, minimo)] - os k maiores valores do campo (>= minimo)
+    Campos numéricos inválidos viram NaN e ficam fora das contas daquele campo.
+    """
+    faixas = faixas or {}
+    numericos = list(dict.fromkeys(list(medias) + list(faixas) + [c for c, _ in histogramas] + [t[1] for t in tops]))
+
+    # Uma passada pelos registros: uma linha por registro, uma coluna por campo numérico
+    valores = np.empty((len(registros), len(numericos)))
+    nomes, codigos = [], []
+    categorias = {campo: Counter() for campo in contagens}
+    for i, registro in enumerate(registros):
+        valores[i] = [_numero(registro.get(campo)) for campo in numericos]
+        nomes.append(registro.get(campo_nome))
+        codigos.append(registro.get(campo_codigo) if campo_codigo else None)
+        for campo, contador in categorias.items():
+            contador[registro.get(campo)] += 1
+    colunas = {campo: valores[:, j] for j, campo in enumerate(numericos)}
+    validos = {campo: coluna[~np.isnan(coluna)] for campo, coluna in colunas.items()}
+
+    relatorio = {"total": len(registros), "medias": {}, "faixas": {}, "contagens": {}, "histogramas": {}, "top": {}}
+    for campo in medias:
+        relatorio["medias"][campo] = _arredondar(validos[campo].mean()) if len(validos[campo]) else None
+    for campo, (bordas, rotulos) in faixas.items():
+        quantidades = np.bincount(np.digitize(validos[campo], bordas), minlength=len(rotulos))
+        relatorio["faixas"][campo] = dict(zip(rotulos, quantidades.tolist()))
+    for campo, contador in categorias.items():
+        relatorio["contagens"][campo] = {str(chave): quantidade for chave, quantidade in contador.most_common()}
+    for campo, intervalos in histogramas:
+        quantidades, bordas = np.histogram(validos[campo], bins=intervalos) if len(validos[campo]) else (np.zeros(0, dtype=int), np.zeros(0))
+        relatorio["histogramas"][campo] = {"bordas": [_arredondar(b) for b in bordas], "contagens": quantidades.tolist()}
+    for chave, campo, k, minimo in tops:
+        coluna = colunas[campo]
+        candidatos = np.flatnonzero(~np.isnan(coluna) & (coluna >= (minimo if minimo is not None else -np.inf)))
+        # Ordenação estável: empates na ordem original, como no nlargest
+        ordem = candidatos[np.argsort(-coluna[candidatos], kind="stable")[:k]]
+        relatorio["top"][chave] = [{"codigo": codigos[i], "nome": nomes[i], "valor": _arredondar(coluna[i])} for i in ordem]
+    return relatorio
+
+def relatorio_bolhas(dados_bolhas, k=TOP_K):
+    """Relatório das métricas das bolhas (mapa_bolhas.processar_dados_para_bolhas)"""
+    relatorio = calcular_relatorio(
+        dados_bolhas, "nome", "codigo",
+        medias=("altitude", "risco_index", "importancia"),
+        faixas={"risco_index": (BORDAS_RISCO, FAIXAS_RISCO)},
+        tops=(("alto_risco", "risco_index", k, RISCO_ALTO), ("importancia", "importancia", k, None), ("altitude", "altitude", k, None)))
+    relatorio["gerado_em"] = datetime.now().strftime("%d/%m/%Y %H:%M")
+    return relatorio
+
+def relatorio_estacoes(estacoes, k=10, intervalos=10):
+    """Relatório das estações do INMET (tipo, situação, altitudes)"""
+    relatorio = calcular_relatorio(
+        estacoes, "DC_NOME", "CD_ESTACAO",
+        medias=("VL_ALTITUDE",),
+        contagens=("TP_ESTACAO", "CD_SITUACAO"),
+        histogramas=(("VL_ALTITUDE", intervalos),),
+        tops=(("altitude", "VL_ALTITUDE", k, None),))
+    relatorio["gerado_em"] = datetime.now().strftime("%d/%m/%Y %H:%M")
+    return relatorio
+
+def linhas_csv(relatorio):
+    """Relatório em linhas (secao, chave, posicao, codigo, nome, valor)"""
+    linhas = [("resumo", "total", "", "", "", relatorio["total"])]
+    linhas += [("media", campo, "", "", "", valor) for campo, valor in relatorio["medias"].items()]
+    for secao in ("faixas", "contagens"):
+        for campo, quantidades in relatorio[secao].items():
+            linhas += [(secao[:-1] + ":" + campo, rotulo, "", "", "", quantidade) for rotulo, quantidade in quantidades.items()]
+    for campo, histograma in relatorio["histogramas"].items():
+        bordas = histograma["bordas"]
+        linhas += [("histograma:" + campo, f"{bordas[i]}-{bordas[i + 1]}", "", "", "", quantidade)
+                   for i, quantidade in enumerate(histograma["contagens"])]
+    for chave, itens in relatorio["top"].items():
+        linhas += [("top:" + chave, "", posicao, item["codigo"], item["nome"], item["valor"]) for posicao, item in enumerate(itens, 1)]
+    return linhas
+
+def exportar_relatorio(relatorio, nome, diretorio=None):
+    """Grava relatorio_<nome>.json e relatorio_<nome>.csv (temporário + os.replace); devolve os caminhos"""
+    base = os.path.join(diretorio or RELATORIO_DIRETORIO, "relatorio_" + nome)
+    gravar_atomico(base + ".json", json.dumps(relatorio, ensure_ascii=False, indent=1))
+    texto = io.StringIO()
+    escritor = csv.writer(texto, lineterminator="\n")
+    escritor.writerow(COLUNAS_CSV)
+    escritor.writerows(("" if v is None else v for v in linha) for linha in linhas_csv(relatorio))
+    gravar_atomico(base + ".csv", texto.getvalue())
+    return base + ".json", base + ".csv"
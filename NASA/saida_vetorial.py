@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Saída Vetorial - LHASA RIO
+Grava a camada de saída em GeoPackage (sqlite3, com índice espacial R-tree) ou
+FlatGeobuf (via pyogrio/GDAL, com índice Hilbert R-tree empacotado). A escrita é
+feita em arquivo temporário e renomeada no final, para que os consumidores nunca
+leiam um arquivo pela metade.
+"""
+
+import os
+import struct
+import sqlite3
+import numpy as np
+from datetime import datetime, timezone
+
+from arquivos import gerar_atomico
+
+CAMPOS_IGNORADOS = ("OBJECTID", "FID", "SHAPE", "SHAPE_LENGTH", "SHAPE_AREA", "SHAPE.STLENGTH()", "SHAPE.STAREA()")
+
+def _wkb(geometria):
+    """WKB de SHAPE@WKB (bytes/bytearray) ou de uma geometria Shapely"""
+    if geometria is None:
+        return None
+    if isinstance(geometria, (bytes, bytearray, memoryview)):
+        return bytes(geometria)
+    if hasattr(geometria, "wkb"):
+        return geometria.wkb
+    return None
+
+def _envelope(wkb):
+    """(min_x, max_x, min_y, max_y) da geometria, se o Shapely estiver disponível"""
+    try:
+        import shapely
+    except ImportError:
+        return None
+    geometria = shapely.from_wkb(wkb)
+    if geometria.is_empty:
+        return None
+    min_x, min_y, max_x, max_y = geometria.bounds
+    return min_x, max_x, min_y, max_y
+
+def _tipo_campo(valores):
+    valor = next((v for v in valores if v is not None), None)
+    if isinstance(valor, bool) or isinstance(valor, (int, np.integer)):
+        return "INTEGER"
+    if isinstance(valor, (float, np.floating)):
+        return "REAL"
+    if isinstance(valor, datetime):
+        return "DATETIME"
+    if isinstance(valor, (bytes, bytearray)):
+        return "BLOB"
+    return "TEXT"
+
+def _utc(valor):
+    """Data/hora em UTC sem fuso; as ingênuas (arcpy) estão no horário local da máquina"""
+    return valor.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _valor_sqlite(valor):
+    if isinstance(valor, datetime):
+        return _utc(valor).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z" # o "Z" do GeoPackage exige UTC
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+def _definicao_srs(srid):
+    try:
+        from pyproj import CRS
+        return CRS.from_epsg(srid).to_wkt()
+    except Exception:
+        return "undefined"
+
+def escrever_geopackage(caminho, campos, linhas, srid=0, tabela="lhasa"):
+    """GeoPackage 1.3 com uma camada (fid, geom, campos) e índice rtree_<tabela>_geom"""
+    colunas = list(zip(*linhas)) if linhas else [[] for _ in range(len(campos) + 1)]
+    tipos = [_tipo_campo(valores) for valores in colunas[1:]]
+
+    def escrever(temporario):
+        conexao = sqlite3.connect(temporario)
+        try:
+            conexao.execute("PRAGMA application_id = 1196444487")
+            conexao.execute("PRAGMA user_version = 10300")
+            conexao.executescript("""
+                CREATE TABLE gpkg_spatial_ref_sys (srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL,
+                    organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT);
+                CREATE TABLE gpkg_contents (table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE,
+                    description TEXT DEFAULT '', last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+                    min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER);
+                CREATE TABLE gpkg_geometry_columns (table_name TEXT NOT NULL, column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL,
+                    srs_id INTEGER NOT NULL, z TINYINT NOT NULL, m TINYINT NOT NULL, CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name));
+                CREATE TABLE gpkg_extensions (table_name TEXT, column_name TEXT, extension_name TEXT NOT NULL, definition TEXT NOT NULL,
+                    scope TEXT NOT NULL, CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name));
+                INSERT INTO gpkg_spatial_ref_sys VALUES ('Undefined cartesian SRS', -1, 'NONE', -1, 'undefined', NULL);
+                INSERT INTO gpkg_spatial_ref_sys VALUES ('Undefined geographic SRS', 0, 'NONE', 0, 'undefined', NULL);
+            """)
+            if srid not in (-1, 0):
+                conexao.execute("INSERT OR REPLACE INTO gpkg_spatial_ref_sys VALUES (?, ?, 'EPSG', ?, ?, NULL)",
+                                (f"EPSG:{srid}", srid, srid, _definicao_srs(srid)))
+
+            definicoes = ", ".join(f'"{c}" {t}' for c, t in zip(campos, tipos))
+            conexao.execute(f'CREATE TABLE "{tabela}" (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom GEOMETRY' + (", " + definicoes if definicoes else "") + ")")
+            conexao.execute(f'CREATE VIRTUAL TABLE "rtree_{tabela}_geom" USING rtree(id, minx, maxx, miny, maxy)')
+
+            limites = [np.inf, -np.inf, np.inf, -np.inf]
+            marcadores = ", ".join("?" * (len(campos) + 1))
+            nomes = ", ".join(["geom"] + [f'"{c}"' for c in campos])
+            for linha in linhas:
+                wkb = _wkb(linha[0])
+                blob = None
+                envelope = _envelope(wkb) if wkb else None
+                if wkb is not None:
+                    flags = 0x01 | (0x02 if envelope else 0x00)
+                    blob = b"GP" + bytes([0, flags]) + struct.pack("<i", srid) + (struct.pack("<4d", *envelope) if envelope else b"") + wkb
+                cursor = conexao.execute(f'INSERT INTO "{tabela}" ({nomes}) VALUES ({marcadores})', [blob] + [_valor_sqlite(v) for v in linha[1:]])
+                if envelope:
+                    conexao.execute(f'INSERT INTO "rtree_{tabela}_geom" VALUES (?, ?, ?, ?, ?)', (cursor.lastrowid,) + envelope)
+                    limites = [min(limites[0], envelope[0]), max(limites[1], envelope[1]), min(limites[2], envelope[2]), max(limites[3], envelope[3])]
+
+            caixa = (limites[0], limites[2], limites[1], limites[3]) if limites[0] != np.inf else (None,) * 4
+            conexao.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, min_x, min_y, max_x, max_y, srs_id) VALUES (?, 'features', ?, ?, ?, ?, ?, ?)",
+                            (tabela, tabela) + caixa + (srid,))
+            conexao.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', 'GEOMETRY', ?, 0, 0)", (tabela, srid))
+            conexao.execute("INSERT INTO gpkg_extensions VALUES (?, 'geom', 'gpkg_rtree_index', 'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')", (tabela,))
+            conexao.commit()
+        finally:
+            conexao.close()
+
+    gerar_atomico(caminho, escrever)
+
+def escrever_flatgeobuf(caminho, campos, linhas, srid=0, tabela="lhasa"):
+    """FlatGeobuf com índice espacial (requer pyogrio)"""
+    from pyogrio.raw import write
+
+    colunas = list(zip(*linhas)) if linhas else [[] for _ in range(len(campos) + 1)]
+    geometrias = np.array([_wkb(g) for g in colunas[0]], dtype=object)
+    dados = []
+    for valores in colunas[1:]:
+        tipo = _tipo_campo(valores)
+        if tipo == "INTEGER" and None not in valores:
+            dados.append(np.array(valores, dtype=np.int64))
+        elif tipo in ("INTEGER", "REAL"):
+            dados.append(np.array([np.nan if v is None else v for v in valores], dtype=np.float64))
+        elif tipo == "DATETIME":
+            dados.append(np.array([np.datetime64("NaT") if v is None else np.datetime64(_utc(v), "ms") for v in valores]))
+        else:
+            dados.append(np.array([None if v is None else str(v) for v in valores], dtype=object))
+
+    def escrever(temporario):
+        write(temporario, geometrias, dados, list(campos), layer=tabela, driver="FlatGeobuf", geometry_type="Unknown",
+              crs=f"EPSG:{srid}" if srid > 0 else None, layer_options={"SPATIAL_INDEX": "YES"})
+
+    gerar_atomico(caminho, escrever)
+
+def escrever_saida(caminho, campos, linhas, srid=0):
+    """Grava no formato indicado pela extensão (.gpkg ou .fgb)"""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".gpkg":
+        return escrever_geopackage(caminho, campos, linhas, srid)
+    if extensao == ".fgb":
+        return escrever_flatgeobuf(caminho, campos, linhas, srid)
+    raise ValueError(f"Formato de saída não suportado: {extensao}")
+
+def obter_srid(arcpy, caminho):
+    """Código EPSG da camada (0 quando desconhecido)"""
+    try:
+        return int(arcpy.Describe(caminho).spatialReference.factoryCode or 0)
+    except Exception:
+        return 0
+
+def exportar_camada(arcpy, origem, destino, srid=None):
+    """Lê a camada com SearchCursor (SHAPE@WKB) e grava a saída vetorial"""
+    campos = [c.name for c in arcpy.ListFields(origem) if c.name.upper() not in CAMPOS_IGNORADOS and c.type not in ("OID", "Geometry", "GlobalID")]
+    with arcpy.da.SearchCursor(origem, ["SHAPE@WKB"] + campos) as cursor:
+        linhas = [tuple(row) for row in cursor]
+    escrever_saida(destino, campos, linhas, obter_srid(arcpy, origem) if srid is None else srid)
+    return len(linhas)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do arcpy_mock em memória (cursores, WHERE e ferramentas de tabela)
+"""
+
+import LHASA_RIO
+from arcpy_mock import MockArcPy, compilar_where
+
+def test_where():
+    filtro = compilar_where("NM_CODIGO = 3 AND DATA LIKE '__/01/2019' OR gridcode IN (2,3)")
+    assert filtro({"NM_CODIGO": 3, "DATA": "15/01/2019", "gridcode": 1}.get)
+    assert not filtro({"NM_CODIGO": 3, "DATA": "15/02/2019", "gridcode": 1}.get)
+    assert filtro({"NM_CODIGO": 1, "DATA": None, "gridcode": 2}.get)
+    assert compilar_where("1=1") is None
+
+def test_cursores_e_tabelas():
+    arcpy = MockArcPy()
+    arcpy.CreateTable_management("in_memory", "TB", None)
+    assert arcpy.Exists("%scratchworkspace%\\TB")
+
+    with arcpy.da.InsertCursor("in_memory\\TB", ["NM_CODIGO", "NM_H01"]) as cursor:
+        for codigo in range(10):
+            cursor.insertRow((codigo % 3, float(codigo)))
+
+    with arcpy.da.UpdateCursor("in_memory\\TB", ["NM_CODIGO", "NM_H01"], "NM_CODIGO = 0") as cursor:
+        for row in cursor:
+            if row[1] == 0:
+                cursor.deleteRow()
+            else:
+                cursor.updateRow([row[0], row[1] * 10])
+
+    cursor = arcpy.da.SearchCursor("in_memory\\TB", ["NM_H01"], "NM_CODIGO = 0")
+    assert [row[0] for row in cursor] == [30.0, 60.0, 90.0]
+    cursor.reset()
+    assert len(list(cursor)) == 3
+
+    arcpy.CopyFeatures_management("in_memory\\TB", "in_memory\\COPIA")
+    arcpy.Delete_management("in_memory\\TB")
+    assert not arcpy.Exists("in_memory\\TB")
+    assert len(list(arcpy.da.SearchCursor("in_memory\\COPIA", ["NM_CODIGO"]))) == 9
+
+def test_carga_historica(tmp_path, monkeypatch):
+    arcpy = MockArcPy()
+    arcpy.carregar("zonas", [{"SHAPE": None, "Cod": 5, "Est": "Santa Teresa", "Endereço": "Rua A"}])
+
+    linhas = ["cabecalho"] * 5
+    for minuto, h01 in (("00", 1.0), ("15", 7.5), ("30", 3.0), ("45", 2.0)):
+        linhas.append(f"15/01/2019 10:{minuto}:00".ljust(26) + f"0.2 {h01} 4.0 30.0 60.0")
+    (tmp_path / "santa_teresa_201901_Plv.txt").write_text("\n".join(linhas) + "\n", encoding="latin-1")
+
+    monkeypatch.setattr(LHASA_RIO, "arcpy", arcpy)
+    monkeypatch.setattr(LHASA_RIO, "LYR_IN_PZ", "zonas")
+    monkeypatch.setattr(LHASA_RIO, "HISTORIC_DATA_PATH", str(tmp_path))
+
+    LHASA_RIO.loadHistoricalData("2019", "01", "15", "15", "08", "12")
+
+    campos = ["NM_CODIGO", "NM_H01", "DH_H01", "NM_H96"]
+    linhas = list(arcpy.da.SearchCursor("in_memory\\" + LHASA_RIO.LYR_PRC_LHASA_HISTORICAL, campos))
+    assert linhas == [(5, 7.5, "15/01/2019 10:15:00", 60.0)]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do benchmark sintético (benchmark.py)
+"""
+
+import benchmark
+
+def test_benchmark_em_escala_minima(tmp_path):
+    resultado = benchmark.executar("rio", zonas=4, poligonos=40, estacoes=4, meses=1, zoom_tiles=(0, 2), mapas=False)
+    etapas = resultado["etapas"]
+    for etapa in ("historico_leitura", "historico_agregacao", "busca_inmet", "classificacao", "dissolucao"):
+        assert etapa in etapas and "erro" not in etapas[etapa]
+    assert resultado["feicoes_saida"] > 0
+
+    caminho = benchmark.salvar(resultado, str(tmp_path))
+    assert caminho.endswith(".json")
+
+    lento = dict(resultado, etapas={nome: dict(e, segundos=e["segundos"] * 2 + 1) for nome, e in etapas.items()})
+    assert {nome for nome, *_ in benchmark.comparar(resultado, lento)} == set(etapas)
+    assert benchmark.comparar(resultado, resultado) == []
+
+def test_inicializacao_sem_modulos_pesados():
+    etapa = benchmark.medir_inicializacao(repeticoes=1)
+    assert etapa["modulos_pesados"] == []
+    assert etapa["segundos"] > 0 and "logger" in etapa["imports"]
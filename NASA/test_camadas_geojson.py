@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes das camadas GeoJSON dos mapas (camadas_geojson.py)
+"""
+
+import random
+
+import gerar_mapa
+import mapa_bolhas
+import camadas_geojson
+from camadas_geojson import adicionar_estacoes_geojson, adicionar_bolhas_geojson, estacoes_geojson, bolhas_geojson, medir_html
+
+def _estacoes(quantidade):
+    rng = random.Random(5)
+    return [{"CD_ESTACAO": f"A{i:03d}", "DC_NOME": f"ESTACAO {i}", "CD_SITUACAO": "Operante",
+             "VL_LATITUDE": str(rng.uniform(-22.0, -15.0)), "VL_LONGITUDE": str(rng.uniform(-50.0, -40.0)),
+             "VL_ALTITUDE": str(round(rng.uniform(300, 1500), 1)), "TP_ESTACAO": rng.choice(["Automatica", "Convencional"])}
+            for i in range(quantidade)]
+
+def test_feicoes():
+    estacoes = _estacoes(3) + [{"CD_ESTACAO": "X", "DC_NOME": "SEM COORDENADAS", "CD_SITUACAO": "Operante"}]
+    feicoes = estacoes_geojson(estacoes)["features"]
+    assert len(feicoes) == 3 and feicoes[0]["properties"]["c"] == "A000"
+    assert feicoes[0]["geometry"]["coordinates"] == [round(float(estacoes[0]["VL_LONGITUDE"]), 5), round(float(estacoes[0]["VL_LATITUDE"]), 5)]
+
+    bolhas = bolhas_geojson(mapa_bolhas.processar_dados_para_bolhas(estacoes[:3]))["features"]
+    assert {f["properties"]["z"] for f in bolhas} <= set(range(5000, 25001))
+    assert bolhas_geojson([]) == {"type": "FeatureCollection", "features": []}
+
+def test_camadas_de_fundo_sem_chave(monkeypatch):
+    monkeypatch.setattr(camadas_geojson, "STADIA_API_KEY", None)
+    for mapa in (gerar_mapa.criar_mapa_base(), mapa_bolhas.criar_mapa_bolhas()):
+        html = mapa.get_root().render()
+        assert "stadiamaps" not in html and "opentopomap" in html
+    monkeypatch.setattr(camadas_geojson, "STADIA_API_KEY", "chave")
+    assert "stamen_terrain/{z}/{x}/{y}.png?api_key=chave" in gerar_mapa.criar_mapa_base().get_root().render()
+
+def test_html_menor_que_marcadores(tmp_path):
+    estacoes = _estacoes(300)
+    dados = mapa_bolhas.processar_dados_para_bolhas(estacoes)
+    medidas = {}
+    for nome, criar, adicionar, entrada in (("estacoes", gerar_mapa.criar_mapa_base, gerar_mapa.adicionar_estacoes_meteorologicas, estacoes),
+                                            ("estacoes_geojson", gerar_mapa.criar_mapa_base, adicionar_estacoes_geojson, estacoes),
+                                            ("bolhas", mapa_bolhas.criar_mapa_bolhas, mapa_bolhas.adicionar_bolhas_ao_mapa, dados),
+                                            ("bolhas_geojson", mapa_bolhas.criar_mapa_bolhas, adicionar_bolhas_geojson, dados)):
+        mapa = criar()
+        adicionar(mapa, entrada)
+        mapa.save(str(tmp_path / (nome + ".html")))
+        medidas[nome] = medir_html(str(tmp_path / (nome + ".html")))
+
+    assert medidas["estacoes"]["objetos_js"] >= 600 and medidas["estacoes_geojson"]["objetos_js"] == 0
+    assert medidas["estacoes_geojson"]["html_bytes"] * 5 < medidas["estacoes"]["html_bytes"]
+    assert medidas["bolhas_geojson"]["html_bytes"] * 5 < medidas["bolhas"]["html_bytes"]
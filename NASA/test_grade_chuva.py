@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes da grade de chuva (grade_chuva.py)
+"""
+
+import numpy as np
+from PIL import Image
+
+import grade_chuva
+
+PONTOS = [(-19.92, -43.94, 30.0), (-20.38, -43.50, 0.0), (-19.47, -44.24, 8.0), (-21.76, -43.35, 60.0)]
+
+def test_idw_e_kde(tmp_path):
+    limites = grade_chuva.limites_grade(PONTOS)
+    for metodo in grade_chuva.METODOS:
+        grade = grade_chuva.calcular_grade(PONTOS, limites, largura=200, metodo=metodo)
+        assert np.nanmin(grade) >= 0.0 and np.nanmax(grade) <= 60.0 + 1e-9
+        assert np.isnan(grade[0, 0]) # canto longe das estações: transparente
+    grade = grade_chuva.calcular_grade(PONTOS, limites, largura=400, metodo="idw")
+    (sul, oeste), (norte, leste) = limites
+    coluna = int((-43.94 - oeste) / (leste - oeste) * 400)
+    linha = int((grade_chuva._mercator(norte) - grade_chuva._mercator(-19.92)) / (grade_chuva._mercator(norte) - grade_chuva._mercator(sul)) * grade.shape[0])
+    assert abs(grade[linha, coluna] - 30.0) < 3.0 # pixel da estação: valor da estação
+
+def test_png_em_cache(tmp_path):
+    caminho = str(tmp_path / "grade.png")
+    primeira = grade_chuva.grade_chuva(PONTOS, caminho, largura=128)
+    imagem = Image.open(caminho)
+    assert primeira["recalculada"] and imagem.mode == "P" and imagem.width == 128
+    indices = np.asarray(imagem)
+    assert indices.max() == 6 and (indices == 0).any() # classe 50-100 mm e pixels transparentes
+
+    assert not grade_chuva.grade_chuva(list(reversed(PONTOS)), caminho, largura=128)["recalculada"]
+    assert grade_chuva.grade_chuva(PONTOS[:3], caminho, largura=128)["recalculada"]
+    assert grade_chuva.grade_chuva([], caminho) is None
+    assert grade_chuva.pontos_chuva([{"latitude": "-19.9", "longitude": "-43.9", "data": {"h24": 4.2}}, {"latitude": "x"},
+                                     {"latitude": "-20.0", "longitude": "-44.0", "data": {"h24": None}}]) == [(-19.9, -43.9, 4.2)]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes da renderização dos gráficos (graficos.py)
+"""
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+import gerar_mapa
+import mapa_bolhas
+from graficos import renderizar_graficos
+from test_inmet_stub import ESTACOES
+
+def _graficos():
+    estacoes = [dict(e, TP_ESTACAO="Automatica" if i % 2 else "Convencional", VL_ALTITUDE=str(800 + 100 * i)) for i, e in enumerate(ESTACOES)]
+    return [("estatisticas_estacoes", gerar_mapa.figura_estatisticas, estacoes),
+            ("grafico_bolhas_estacoes", mapa_bolhas.figura_dispersao_bolhas, mapa_bolhas.processar_dados_para_bolhas(estacoes))]
+
+def test_pool_no_perfil_painel(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    arquivos = renderizar_graficos(_graficos(), perfil="painel", processos=2)
+    assert arquivos == {"estatisticas_estacoes": "estatisticas_estacoes.webp", "grafico_bolhas_estacoes": "grafico_bolhas_estacoes.webp"}
+    for arquivo in arquivos.values():
+        assert (tmp_path / arquivo).read_bytes()[8:12] == b"WEBP"
+
+def test_agg_e_figuras_fechadas(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    abertas = set(plt.get_fignums())
+    arquivos = renderizar_graficos(_graficos(), perfil="relatorio", processos=1)
+    assert matplotlib.get_backend().lower() == "agg"
+    assert set(plt.get_fignums()) == abertas
+    assert (tmp_path / arquivos["estatisticas_estacoes"]).read_bytes()[:4] == b"\x89PNG"
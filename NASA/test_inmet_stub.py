@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do servidor local da API do INMET (inmet_stub.py)
+"""
+
+import json
+import urllib3
+
+import LHASA_RIO
+import gerar_mapa
+from inmet_stub import ServidorInmet, carregar_fixtures, salvar_fixtures
+
+ESTACOES = [
+    {"CD_ESTACAO": "A001", "DC_NOME": "ESTACAO A", "SG_ESTADO": "MG", "CD_SITUACAO": "Operante", "VL_LATITUDE": "-19.9", "VL_LONGITUDE": "-43.9"},
+    {"CD_ESTACAO": "A002", "DC_NOME": "ESTACAO B", "SG_ESTADO": "MG", "CD_SITUACAO": "Operante", "VL_LATITUDE": "-18.9", "VL_LONGITUDE": "-44.9"},
+    {"CD_ESTACAO": "A003", "DC_NOME": "ESTACAO C", "SG_ESTADO": "MG", "CD_SITUACAO": "Operante", "VL_LATITUDE": "-17.9", "VL_LONGITUDE": "-45.9"},
+]
+OBSERVACOES = {"A001": [{"CD_ESTACAO": "A001", "CHUVA": "12,5"}], "A002": [{"CD_ESTACAO": "A002", "CHUVA": "3,0"}]}
+
+def test_loaders_com_base_url(tmp_path):
+    salvar_fixtures(str(tmp_path), ESTACOES, OBSERVACOES)
+    with ServidorInmet.de_fixtures(str(tmp_path), status_forcado={"A002": 401}) as servidor:
+        LHASA_RIO.loadPluviometricDataINMET(servidor.url)
+        assert [(d["code"], d["data"]["h01"]) for d in LHASA_RIO.ARR_PD] == [("A001", 12.5)]
+        assert len(gerar_mapa.obter_estacoes_inmet(servidor.url)) == 3
+
+    status = servidor.estatisticas["status"]
+    assert status[200] == 3 and status[401] == 1 and status[204] == 1 # A003 sem observações
+    assert carregar_fixtures(str(tmp_path)) == (ESTACOES, OBSERVACOES)
+
+def test_chuva_acumulada_em_24h():
+    horarias = [{"DT_MEDICAO": "2025-01-14", "HR_MEDICAO": "0900", "CHUVA": "9,0"}, # fora das 24h
+                {"DT_MEDICAO": "2025-01-14", "HR_MEDICAO": "1100", "CHUVA": "2,5"},
+                {"DT_MEDICAO": "2025-01-15", "HR_MEDICAO": "0000", "CHUVA": None},
+                {"DT_MEDICAO": "2025-01-15", "HR_MEDICAO": "1000", "CHUVA": "1,0"}]
+    assert LHASA_RIO._chuvaInmet(horarias) == (1.0, 3.5)
+    assert LHASA_RIO._chuvaInmet([{"CHUVA": "1,5"}, {"CHUVA": "2,0"}]) == (2.0, 3.5)
+    assert LHASA_RIO._chuvaInmet([{"DT_MEDICAO": "2025-01-15", "HR_MEDICAO": "1000", "CHUVA": None}]) is None
+
+def test_limite_por_segundo_e_token():
+    with ServidorInmet(ESTACOES, OBSERVACOES, limite_por_segundo=2, tokens=["segredo"]) as servidor:
+        http = urllib3.PoolManager(retries=False)
+        respostas = [http.request("GET", servidor.url + "estacoes/T") for _ in range(3)]
+        assert [r.status for r in respostas] == [200, 200, 429]
+        assert respostas[-1].headers["Retry-After"] == "1"
+
+    with ServidorInmet(ESTACOES, OBSERVACOES, tokens=["segredo"], taxa_erro=1.0, codigos_erro=(503,)) as servidor:
+        assert http.request("GET", servidor.url + "token/estacao/2025-01-15/2025-01-15/A001/outro").status == 503
+
+    with ServidorInmet(ESTACOES, OBSERVACOES, tokens=["segredo"]) as servidor:
+        assert http.request("GET", servidor.url + "token/estacao/2025-01-15/2025-01-15/A001/outro").status == 401
+        resposta = http.request("GET", servidor.url + "token/estacao/2025-01-15/2025-01-15/A001/segredo")
+        assert json.loads(resposta.data) == OBSERVACOES["A001"]
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes da instrumentação das etapas (instrumentacao.py)
+"""
+
+import json
+
+import LHASA_RIO
+from instrumentacao import execucao, etapa, contar
+from inmet_stub import ServidorInmet
+from motor_shapely import ArcPyShapely
+from test_motor_shapely import _preparar_nowcast
+from test_inmet_stub import ESTACOES, OBSERVACOES
+
+def _ler(caminho):
+    return [json.loads(linha) for linha in caminho.read_text(encoding="utf-8").splitlines()]
+
+def test_relatorio_do_nowcast(tmp_path, monkeypatch):
+    _preparar_nowcast(tmp_path, monkeypatch, ArcPyShapely(cache_unioes=False))
+    relatorio = tmp_path / "execucoes.jsonl"
+    with execucao("nowcast", str(relatorio)):
+        LHASA_RIO.nowcast()
+
+    registros = _ler(relatorio)
+    etapas, resumo = registros[:-1], registros[-1]
+    assert [r["etapa"] for r in etapas] == ["#01", "#02", "#03", "#01", "#02", "#03", "#04", "#05", "#06", "#07", "#08", "#09", "#10"]
+    assert [r["ordem"] for r in etapas] == list(range(1, 14))
+    assert etapas[0]["descricao"] == "CARGA DE DADOS DAS ESTACOES PLUVIOMETRICAS" and etapas[0]["linhas"] == 2
+    assert etapas[1]["linhas"] == 2 # leituras de chuva
+    assert etapas[3]["feicoes"] == 3 # áreas de risco (gridcode 2 e 3)
+    assert etapas[8]["feicoes"] == 3 # feições dissolvidas
+    assert all(r["relogio_s"] >= 0 and r["cpu_s"] >= 0 for r in registros)
+    # Pico de RSS por etapa onde dá para zerá-lo (Linux); o da execução é o maior deles
+    assert {r["rss_pico_escopo"] for r in etapas} <= {"etapa", "processo"}
+    assert resumo["rss_pico_escopo"] in ("execucao", "processo")
+    assert resumo["rss_pico_mb"] >= max(r["rss_pico_mb"] for r in etapas)
+
+    assert resumo["tipo"] == "execucao" and resumo["etapas"] == 13
+    assert resumo["feicoes"] == sum(r["feicoes"] for r in etapas)
+    assert 0 <= resumo["uso_orcamento"] < 1
+
+def test_http_e_erro(tmp_path):
+    relatorio = tmp_path / "execucoes.jsonl"
+    try:
+        with ServidorInmet(ESTACOES, OBSERVACOES) as servidor, execucao("nowcast", str(relatorio)):
+            etapa("#02 | CARGA DE DADOS ATUAIS DE CHUVA")
+            LHASA_RIO.loadPluviometricDataINMET(servidor.url)
+            contar(linhas=len(LHASA_RIO.ARR_PD))
+            raise RuntimeError("falha simulada")
+    except RuntimeError:
+        pass
+
+    carga, resumo = _ler(relatorio)
+    assert carga["http_requisicoes"] == 4 # lista de estações + 3 estações
+    assert carga["http_bytes"] > 0 and carga["linhas"] == 2
+    assert resumo["erro"] == "falha simulada"
+    assert etapa("#03 | FORA DE EXECUCAO") == "#03 | FORA DE EXECUCAO"
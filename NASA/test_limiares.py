@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes da tabela de limiares compilada (limiares.py)
+"""
+
+import os
+import re
+import json
+import itertools
+
+import pytest
+
+from limiares import TabelaLimiares, CAMINHO_LIMIARES
+
+CAMINHO_PLUGIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Plugin", "limiares.json")
+
+def NivelPerigo(susceptibilidade, h01, h24, h96):
+    """Regra original do code block do LHASA RIO (referência)"""
+    if((h01 >= 50 and h01 < 70) or (h24 >= 140 and h24 < 185) or ((h96 >= 185 and h96 < 255) and (h24 >= 55 and h24 < 100))):
+        if(susceptibilidade == 1):
+            return "SEM PERIGO"
+        elif(susceptibilidade == 2):
+            return "MODERADO"
+        elif(susceptibilidade == 3):
+            return "ALTO"
+    elif((h01 >= 70) or (h24 >= 185) or (h96 >= 255 and h24 >= 100)):
+        if(susceptibilidade == 1):
+            return "SEM PERIGO"
+        elif(susceptibilidade == 2):
+            return "MUITO ALTO"
+        elif(susceptibilidade == 3):
+            return "CRITICO"
+    else:
+        return "BAIXO"
+
+# Expressão original do plugin QGIS (Plugin/LHASA_MG.py, antes da tabela de limiares)
+EXPRESSAO_PLUGIN = '''
+CASE
+    WHEN ("NM_H01" >= 70) OR ("NM_H24" >= 185) OR ("NM_H96" >= 255 AND "NM_H24" >= 100) THEN
+        CASE
+            WHEN "gridcode" = 2 THEN 'MUITO ALTO'
+            WHEN "gridcode" = 3 THEN 'CRITICO'
+            ELSE 'SEM PERIGO'
+        END
+    WHEN ("NM_H01" >= 50 AND "NM_H01" < 70) OR ("NM_H24" >= 140 AND "NM_H24" < 185) OR ("NM_H96" >= 185 AND "NM_H96" < 255 AND "NM_H24" >= 55 AND "NM_H24" < 100) THEN
+        CASE
+            WHEN "gridcode" = 2 THEN 'MODERADO'
+            WHEN "gridcode" = 3 THEN 'ALTO'
+            ELSE 'SEM PERIGO'
+        END
+    ELSE 'BAIXO'
+END
+'''
+
+def _python(tokens, i, fim):
+    """Traduz tokens de uma expressão QGIS (CASE/WHEN, AND/OR, comparações) para Python"""
+    partes = []
+    while tokens[i] not in fim:
+        token = tokens[i]
+        if token == "CASE":
+            ramos, senao, i = [], "None", i + 1
+            while tokens[i] == "WHEN":
+                condicao, i = _python(tokens, i + 1, {"THEN"})
+                valor, i = _python(tokens, i + 1, {"WHEN", "ELSE", "END"})
+                ramos.append((condicao, valor))
+            if tokens[i] == "ELSE":
+                senao, i = _python(tokens, i + 1, {"END"})
+            for condicao, valor in reversed(ramos):
+                senao = f"(({valor}) if ({condicao}) else {senao})"
+            partes.append(senao)
+        elif token.startswith('"'):
+            partes.append(f"v[{token}]")
+        else:
+            partes.append({"AND": "and", "OR": "or", "NULL": "None", "=": "=="}.get(token, token))
+        i += 1
+    return " ".join(partes), i
+
+def compilar_qgis(expressao):
+    """Função valores -> resultado da expressão QGIS"""
+    tokens = re.findall(r'"[^"]*"|\'[^\']*\'|>=|<=|[=<>()]|[\w.]+', expressao) + ["<fim>"]
+    return eval("lambda v: " + _python(tokens, 0, {"<fim>"})[0])
+
+VALORES = [0, 49.9, 50, 54, 55, 69, 70, 99, 100, 139, 140, 184, 185, 254, 255, 300]
+
+def test_modelo_lhasa_equivale_regra_original():
+    modelo = TabelaLimiares().modelo("lhasa")
+    code_block = {}
+    exec(modelo.gerar_code_block(), code_block)
+
+    casos = list(itertools.product([0, 1, 2, 3], VALORES, VALORES, VALORES))
+    for g, h01, h24, h96 in casos:
+        esperado = NivelPerigo(g, h01, h24, h96)
+        assert modelo.classificar(g, h01=h01, h24=h24, h96=h96) == esperado
+        assert code_block["NivelPerigo"](g, h01, h24, h96) == esperado
+
+    g, h01, h24, h96 = zip(*casos)
+    codigos = modelo.classificar_array(g, h01=h01, h24=h24, h96=h96)
+    assert [modelo.niveis[c] for c in codigos] == [NivelPerigo(*c) for c in casos]
+    assert modelo.classificar(3, h01=80, h24=150, h96=0) == "ALTO" # RIO: moderada vence a severa
+
+def test_expressao_qgis_equivale_expressao_original_do_plugin():
+    modelo = TabelaLimiares(CAMINHO_PLUGIN).modelo("lhasa")
+    original = compilar_qgis(EXPRESSAO_PLUGIN)
+    expressao = compilar_qgis(modelo.expressao_qgis({"h01": "NM_H01", "h24": "NM_H24", "h96": "NM_H96"}))
+    for g, h01, h24, h96 in itertools.product([0, 1, 2, 3, 4], VALORES, VALORES, VALORES):
+        valores = {"gridcode": g, "NM_H01": h01, "NM_H24": h24, "NM_H96": h96}
+        esperado = original(valores)
+        assert expressao(valores) == esperado
+        assert modelo.classificar(g, h01=h01, h24=h24, h96=h96) == esperado
+    assert modelo.classificar(3, h01=80, h24=150, h96=0) == "CRITICO" # severa vence a moderada
+    assert modelo.classificar(5, h01=80, h24=0, h96=0) == "SEM PERIGO"
+
+def test_modelo_chuva_24h_com_limites_da_interface():
+    modelo = TabelaLimiares().modelo("chuva_24h").com_limites("chuva_24h", [30, 60, 90])
+    assert modelo.classificar(3, chuva_24h=29) == "BAIXO"
+    assert modelo.classificar(3, chuva_24h=30) == "MODERADO"
+    assert modelo.classificar(2, chuva_24h=60) == "MODERADO"
+    assert modelo.classificar(2, chuva_24h=90) == "MUITO_ALTO"
+    assert modelo.classificar(1, chuva_24h=500) == "BAIXO"
+
+def test_recarga_quando_arquivo_muda(tmp_path):
+    caminho = tmp_path / "limiares.json"
+    with open(CAMINHO_LIMIARES, encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    caminho.write_text(json.dumps(dados), encoding="utf-8")
+
+    tabela = TabelaLimiares(str(caminho))
+    assert not tabela.recarregar_se_alterado()
+
+    dados["versao"] = "teste"
+    dados["modelos"]["lhasa"]["classes_chuva"][1]["condicoes"][0]["h01"] = [50, 60]
+    dados["modelos"]["lhasa"]["classes_chuva"][2]["condicoes"][0]["h01"] = [60, None]
+    caminho.write_text(json.dumps(dados), encoding="utf-8")
+    os.utime(caminho, ns=(1, 1))
+
+    assert tabela.recarregar_se_alterado()
+    assert tabela.versao == "teste"
+    assert tabela.modelo("lhasa").classificar(3, h01=65, h24=0, h96=0) == "CRITICO"
+
+    # Arquivo inválido mantém a última tabela válida
+    caminho.write_text("{", encoding="utf-8")
+    os.utime(caminho, ns=(2, 2))
+    assert not tabela.recarregar_se_alterado()
+    assert tabela.versao == "teste"
+
+    # Arquivo ilegível (aqui, trocado por um diretório) também mantém a tabela
+    caminho.unlink()
+    caminho.mkdir()
+    assert not tabela.recarregar_se_alterado()
+    assert tabela.versao == "teste"
+
+def test_recarga_ignora_yaml_invalido(tmp_path):
+    pytest.importorskip("yaml")
+    caminho = tmp_path / "limiares.yaml"
+    with open(CAMINHO_LIMIARES, encoding="utf-8") as arquivo:
+        caminho.write_text(arquivo.read(), encoding="utf-8") # JSON também é YAML válido
+
+    tabela = TabelaLimiares(str(caminho))
+    versao = tabela.versao
+    caminho.write_text("modelos: [lhasa: {\n", encoding="utf-8")
+    os.utime(caminho, ns=(1, 1))
+    assert not tabela.recarregar_se_alterado()
+    assert tabela.versao == versao
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do logger com fila (logger.py)
+"""
+
+import json
+
+from logger import logger, configurar, sem_console
+
+class _Contador:
+    formatacoes = 0
+
+    def __str__(self):
+        _Contador.formatacoes += 1
+        return "valor"
+
+def test_nivel_json_e_arquivo(tmp_path):
+    arquivo = tmp_path / "logs" / "LHASA_RIO.log"
+    try:
+        configurar("INFO", str(arquivo), console=False, json=True)
+        logger.debug("descartada %s", _Contador())
+        assert _Contador.formatacoes == 0 # a mensagem DEBUG nunca foi formatada
+        logger.info("carga %s", _Contador(), estacao="A001", linhas=96)
+        logger.warning("100% sem argumentos")
+        logger.parar() # esvazia a fila
+    finally:
+        configurar()
+
+    registros = [json.loads(l) for l in arquivo.read_text(encoding="utf-8").splitlines()]
+    assert [(r["nivel"], r["mensagem"]) for r in registros] == [("INFO", "carga valor"), ("WARNING", "100% sem argumentos")]
+    assert registros[0]["estacao"] == "A001" and registros[0]["linhas"] == 96
+
+def test_texto_no_console(capsys):
+    try:
+        configurar("DEBUG")
+        logger.info("#01 | %s", "SELECIONANDO AREAS DE RISCO", feicoes=3)
+        logger.parar()
+    finally:
+        configurar()
+    saida = capsys.readouterr().out
+    assert "[INFO] #01 | SELECIONANDO AREAS DE RISCO | feicoes=3" in saida
+
+def test_sem_console_mantem_arquivo_e_nivel(tmp_path, capsys):
+    arquivo = tmp_path / "LHASA_RIO.log"
+    try:
+        configurar("INFO", str(arquivo))
+        with sem_console():
+            logger.info("silenciosa")
+            logger.debug("abaixo do nivel")
+        logger.info("de volta")
+        logger.parar()
+    finally:
+        configurar()
+    saida = capsys.readouterr().out
+    assert "de volta" in saida and "silenciosa" not in saida
+    linhas = arquivo.read_text(encoding="utf-8").splitlines()
+    assert [l.split(" INFO ")[1] for l in linhas] == ["silenciosa", "de volta"]
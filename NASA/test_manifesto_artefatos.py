@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do manifesto de artefatos dos mapas (manifesto_artefatos.py)
+"""
+
+import json
+
+import gerar_mapa
+from instrumentacao import execucao, etapa
+from test_inmet_stub import ESTACOES
+
+def test_artefatos_inalterados_nao_sao_gerados(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    graficos = []
+    def estatisticas(estacoes):
+        import matplotlib.pyplot as plt
+        graficos.append(estacoes)
+        return plt.figure(figsize=(1, 1))
+    monkeypatch.setattr(gerar_mapa, "figura_estatisticas", estatisticas)
+    relatorio = str(tmp_path / "execucoes.jsonl")
+
+    with execucao("teste", relatorio):
+        etapa("#11 | GERANDO MAPA GEORREFERENCIADO")
+        primeiro = gerar_mapa.gerar_mapa_completo(ESTACOES)
+        segundo = gerar_mapa.gerar_mapa_completo([dict(e) for e in ESTACOES]) # mesmas estações
+        alteradas = [dict(e) for e in ESTACOES]
+        alteradas[0]["CD_SITUACAO"] = "Pane"
+        terceiro = gerar_mapa.gerar_mapa_completo(alteradas)
+
+    assert segundo == primeiro and len(graficos) == 2
+    assert (tmp_path / terceiro).exists() and (tmp_path / "manifesto_mapas.json").exists()
+    with open(relatorio, encoding="utf-8") as arquivo:
+        registros = [json.loads(linha) for linha in arquivo]
+    assert registros[0]["artefatos_gerados"] == 4 and registros[0]["artefatos_inalterados"] == 2
+    assert registros[-1]["taxa_inalterados"] == round(2 / 6, 4)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes das métricas das bolhas (mapa_bolhas.py)
+"""
+
+import random
+
+import mapa_bolhas
+
+NOMES = ["BELO HORIZONTE", "Nova Lima", "OURO PRETO (SERRA)", "MARIANA", "SABARÁ", "CONTAGEM", "Uberlândia",
+         "JUIZ DE FORA", "MONTES CLAROS", "PICO DO ITABIRITO", "ALTITUDE 1", "IPATINGA", "CAETE", "VICOSA"]
+
+def _referencia(estacoes):
+    """Laço original, estação a estação"""
+    dados = []
+    for estacao in estacoes:
+        try:
+            codigo, nome = estacao['CD_ESTACAO'], estacao['DC_NOME']
+            lat, lon = float(estacao['VL_LATITUDE']), float(estacao['VL_LONGITUDE'])
+            altitude = float(estacao.get('VL_ALTITUDE', '0'))
+            tipo = estacao.get('TP_ESTACAO', 'Automatica')
+        except (ValueError, KeyError):
+            continue
+        importancia = 10 + (20 if altitude > 1000 else 0) + (30 if 'BELO HORIZONTE' in nome.upper() else 0) + (15 if tipo == 'Automatica' else 0)
+        risco = mapa_bolhas.calcular_indice_risco(nome, lat, lon)
+        dados.append({'codigo': codigo, 'nome': nome, 'lat': lat, 'lon': lon, 'altitude': altitude,
+                      'altitude_normalizada': min(altitude / 10, 100), 'tipo': tipo, 'importancia': importancia,
+                      'risco_index': risco, 'densidade_pop': mapa_bolhas.estimar_densidade_populacional(nome),
+                      'tamanho_bolha': importancia, 'cor_bolha': risco})
+    return dados
+
+def test_metricas_iguais_ao_laco():
+    rng = random.Random(7)
+    estacoes = []
+    for i in range(300):
+        estacao = {"CD_ESTACAO": f"A{i:03d}", "DC_NOME": rng.choice(NOMES) + ("" if i % 3 else " - NORTE"),
+                   "VL_LATITUDE": str(round(rng.uniform(-21.0, -19.0), 4)), "VL_LONGITUDE": str(round(rng.uniform(-44.5, -43.0), 4)),
+                   "VL_ALTITUDE": str(round(rng.uniform(400, 1600), 1)), "TP_ESTACAO": rng.choice(["Automatica", "Convencional"])}
+        if i % 50 == 0:
+            del estacao["VL_ALTITUDE"], estacao["TP_ESTACAO"]
+        estacoes.append(estacao)
+    estacoes[1]["VL_LATITUDE"] = "n/d" # inválida: ignorada nos dois
+    estacoes[2]["VL_ALTITUDE"] = "2500" # altitude normalizada limitada a 100
+    del estacoes[3]["CD_ESTACAO"]
+
+    dados = mapa_bolhas.processar_dados_para_bolhas(estacoes)
+    assert dados == _referencia(estacoes)
+    assert [type(v) for v in dados[1].values()] == [type(v) for v in _referencia(estacoes)[1].values()]
+    assert len(dados) == 298 and mapa_bolhas.processar_dados_para_bolhas([]) == []
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do mapa histórico animado (mapa_historico.py)
+"""
+
+import json
+
+import LHASA_RIO
+import mapa_historico
+from arcpy_mock import MockArcPy
+
+def _quadrado(x, y):
+    return json.dumps({"type": "Polygon", "coordinates": [[[x, y], [x + 0.01, y], [x + 0.01, y + 0.01], [x, y + 0.01], [x, y]]]})
+
+def _arquivo(pasta, estacao, h01_por_hora):
+    linhas = ["cabecalho"] * 5
+    for hora, h01 in h01_por_hora.items():
+        for minuto, fator in (("00", 0.5), ("15", 1.0), ("30", 0.25), ("45", 0.1)):
+            linhas.append(f"15/01/2019 {hora}:{minuto}:00".ljust(26) + f"0.2 {h01 * fator} 4.0 10.0 60.0")
+    (pasta / f"{estacao}_201901_Plv.txt").write_text("\n".join(linhas) + "\n", encoding="latin-1")
+
+def test_quadros_do_historico(tmp_path, monkeypatch):
+    arcpy = MockArcPy()
+    arcpy.carregar("zonas", [{"SHAPE": _quadrado(-43.2, -22.9), "Cod": 5, "Est": "Santa Teresa", "Endereço": "Rua A"},
+                             {"SHAPE": _quadrado(-43.1, -22.9), "Cod": 2, "Est": "Urca", "Endereço": "Rua B"}])
+    historico = tmp_path / "history"
+    historico.mkdir()
+    _arquivo(historico, "santa_teresa", {"10": 10.0, "11": 80.0, "12": 80.0})
+    _arquivo(historico, "urca", {"10": 5.0, "11": 5.0, "12": 60.0})
+    monkeypatch.setattr(LHASA_RIO, "arcpy", arcpy)
+    monkeypatch.setattr(LHASA_RIO, "LYR_IN_PZ", "zonas")
+    monkeypatch.setattr(LHASA_RIO, "HISTORIC_DATA_PATH", str(historico))
+    monkeypatch.chdir(tmp_path)
+
+    arquivo = LHASA_RIO.historicalMap("15/01/2019", "15/01/2019", "10:00:00", "12:00:00")
+    assert arquivo == "mapa_historico_2019011510_2019011512.html"
+    html = (tmp_path / arquivo).read_text(encoding="utf-8")
+    dados = json.loads(html.split("var D = ", 1)[1].split(";\n", 1)[0])
+
+    assert dados["tempos"] == ["15/01/2019 10:00", "15/01/2019 11:00", "15/01/2019 12:00"]
+    assert [f["properties"]["n"] for f in dados["zonas"]["features"]] == ["SANTA TERESA", "URCA"]
+    h01 = mapa_historico.decodificar_delta(dados["valores"]["h01"], dados["n"])
+    assert h01.tolist() == [[100, 50], [800, 50], [800, 600]] # décimos de mm, máximo de cada hora
+    assert dados["valores"]["h01"][2] == [1, 550] # só a zona que mudou
+    classes = mapa_historico.decodificar_delta(dados["classe"], dados["n"])
+    assert classes.tolist() == [[0, 0], [2, 0], [2, 1]] # SEVERA a partir de 70 mm, MODERADA de 50 a 70
+    assert dados["classe"][2] == [1, 1]
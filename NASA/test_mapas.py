@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes da geração conjunta dos mapas (mapas.py)
+"""
+
+import LHASA_RIO
+import gerar_mapa
+import mapa_bolhas
+from mapas import gerar_todos_mapas
+from inmet_stub import ServidorInmet
+from test_inmet_stub import ESTACOES, OBSERVACOES
+
+def _registrar(monkeypatch):
+    recebidas = {}
+    def mapa(estacoes, graficos=None, chuva=None):
+        recebidas["mapa"] = estacoes
+        return "mapa.html"
+    def bolhas(estacoes, graficos=None, chuva=None):
+        recebidas["bolhas"] = estacoes
+        raise RuntimeError("falha simulada")
+    monkeypatch.setattr(gerar_mapa, "gerar_mapa_completo", mapa)
+    monkeypatch.setattr(mapa_bolhas, "gerar_mapa_bolhas_completo", bolhas)
+    return recebidas
+
+def test_lista_buscada_uma_vez(monkeypatch):
+    recebidas = _registrar(monkeypatch)
+    with ServidorInmet(ESTACOES, OBSERVACOES) as servidor:
+        arquivos = gerar_todos_mapas(base_url=servidor.url)
+
+    assert servidor.estatisticas["rotas"]["estacoes"] == 1
+    assert recebidas["mapa"] is recebidas["bolhas"] and len(recebidas["mapa"]) == 3
+    assert arquivos == {"mapa": "mapa.html", "bolhas": None}
+
+def test_estacoes_do_nowcast(monkeypatch):
+    recebidas = _registrar(monkeypatch)
+    with ServidorInmet(ESTACOES, OBSERVACOES) as servidor:
+        LHASA_RIO.loadPluviometricDataINMET(servidor.url)
+        requisicoes = servidor.estatisticas["requisicoes"]
+        LHASA_RIO.generateMaps()
+        assert servidor.estatisticas["requisicoes"] == requisicoes # nenhuma nova busca
+
+    assert recebidas["mapa"] == ESTACOES and recebidas["bolhas"] == ESTACOES
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do motor raster (motor_raster.py)
+"""
+
+import tracemalloc
+
+import numpy as np
+from shapely.geometry import box
+
+import LHASA_RIO
+from motor_shapely import ArcPyShapely, ler_camada
+from arcpy_mock import MockArcPy
+import motor_raster
+from limiares import TabelaLimiares
+from motor_raster import Grade, rasterizar, vetorizar, grade_suscetibilidade
+from test_motor_shapely import ESPERADO, _preparar_nowcast, _resultado, _gravar_geojson
+
+def test_rasterizar_e_vetorizar():
+    grade = Grade(0, 4, 1, 4, 6)
+    valores = rasterizar([box(0, 0, 4, 4), box(2, 1, 6, 3)], [1, 2], grade)
+    assert valores.tolist() == [[1, 1, 1, 1, 0, 0], [1, 1, 2, 2, 2, 2], [1, 1, 2, 2, 2, 2], [1, 1, 1, 1, 0, 0]]
+
+    poligonos = vetorizar(valores.astype(np.int64), grade)
+    assert poligonos[1].area == 12 and poligonos[2].equals(box(2, 1, 6, 3))
+
+def test_nowcast_raster(tmp_path, monkeypatch):
+    saida = _preparar_nowcast(tmp_path, monkeypatch, ArcPyShapely())
+    monkeypatch.setattr(LHASA_RIO, "GEOMETRY_ENGINE", "RASTER")
+    monkeypatch.setattr(LHASA_RIO, "RASTER_RESOLUCAO", 1.0)
+    monkeypatch.setattr(LHASA_RIO, "RASTER_CACHE", str(tmp_path / "raster"))
+    monkeypatch.setattr(LHASA_RIO, "RASTER_TAMANHO_TILE", 7) # grade 20x10 -> 6 tiles
+    monkeypatch.setattr(LHASA_RIO, "RASTER_PROCESSOS", 2)
+
+    LHASA_RIO.nowcast()
+    assert _resultado(saida) == ESPERADO
+    assert (tmp_path / "raster" / "suscetibilidade_1.npy").exists()
+
+    LHASA_RIO.nowcast() # grades lidas do cache
+    assert _resultado(saida) == ESPERADO
+
+def _pico_tracemalloc(funcao):
+    tracemalloc.start()
+    try:
+        funcao()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def test_nowcast_raster_le_a_suscetibilidade_em_sequencia(tmp_path, monkeypatch):
+    arcpy = ArcPyShapely()
+    saida = _preparar_nowcast(tmp_path, monkeypatch, arcpy)
+    # Suscetibilidade com 5.000 feições (quadrados de 0,2) no lugar das 4 do teste do nowcast
+    suscetibilidade = tmp_path / "suscetibilidade.geojson"
+    _gravar_geojson(suscetibilidade, [(box(x / 5, y / 5, (x + 1) / 5, (y + 1) / 5), {"gridcode": 1 + (y >= 15) + (y >= 30)})
+                                      for x in range(100) for y in range(50)])
+    monkeypatch.setattr(LHASA_RIO, "GEOMETRY_ENGINE", "RASTER")
+    monkeypatch.setattr(LHASA_RIO, "RASTER_RESOLUCAO", 0.2)
+    monkeypatch.setattr(LHASA_RIO, "RASTER_CACHE", str(tmp_path / "raster"))
+    monkeypatch.setattr(LHASA_RIO, "RASTER_PROCESSOS", 1)
+    monkeypatch.setattr(motor_raster, "LIMITE_LOTES", 1 << 18)
+
+    camada_inteira = _pico_tracemalloc(lambda: ler_camada(str(suscetibilidade)))
+    nowcast = _pico_tracemalloc(LHASA_RIO.nowcast)
+    assert arcpy._arquivo_nao_carregado(str(suscetibilidade)) # lida pelo cursor, nunca carregada no motor
+    assert nowcast < camada_inteira / 2
+    assert {codigo for codigo, _ in _resultado(saida)} == {1, 2}
+
+def test_cache_da_suscetibilidade_editada_no_sde(tmp_path):
+    arcpy = MockArcPy()
+    camada = "dados.sde\\RJ_SUSCEPTIBILIDADE"
+    arcpy.carregar(camada, [{"SHAPE": box(0, 0, 4, 4).wkb, "gridcode": 2}, {"SHAPE": box(4, 0, 8, 4).wkb, "gridcode": 1}])
+    base = str(tmp_path / "suscetibilidade_1")
+
+    grade, caminho = grade_suscetibilidade(arcpy, camada, 1.0, base)
+    assert np.load(caminho)[:, :4].max() == 2
+    assert grade_suscetibilidade(arcpy, camada, 1.0, base)[1] == caminho # sem edição: cache
+
+    arcpy.carregar(camada, [{"SHAPE": box(0, 0, 4, 4).wkb, "gridcode": 3}, {"SHAPE": box(4, 0, 8, 4).wkb, "gridcode": 1}])
+    _, caminho = grade_suscetibilidade(arcpy, camada, 1.0, base)
+    assert np.load(caminho)[:, :4].max() == 3 # camada editada: grade refeita
+
+SUSCETIBILIDADE = [(box(0, 0, 20, 3), 1), (box(0, 3, 20, 6), 2), (box(0, 6, 9, 10), 3), (box(9, 6, 20, 10), 3), (box(5, 2, 15, 8), 2)]
+
+def test_suscetibilidade_rasterizada_por_lotes_de_tile(tmp_path, monkeypatch):
+    monkeypatch.setattr(motor_raster, "LIMITE_LOTES", 200) # descarrega os lotes no disco várias vezes
+    arcpy = MockArcPy()
+    arcpy.carregar("susc", [{"SHAPE": g.wkb, "gridcode": v} for g, v in SUSCETIBILIDADE])
+
+    grade, caminho = grade_suscetibilidade(arcpy, "susc", 1.0, str(tmp_path / "s"), tamanho_tile=3, processos=1)
+    esperado = rasterizar([g for g, _ in SUSCETIBILIDADE], [v for _, v in SUSCETIBILIDADE], grade)
+    assert np.array_equal(np.load(caminho), esperado) # mesma ordem de queima: a última feição vence
+    assert not any(p.name.startswith("lhasa_lotes_") for p in tmp_path.iterdir())
+
+def test_zona_gravada_quando_seus_tiles_terminam(tmp_path, monkeypatch):
+    arcpy = MockArcPy()
+    arcpy.carregar("susc", [{"SHAPE": g.wkb, "gridcode": v} for g, v in SUSCETIBILIDADE[:4]])
+    arcpy.carregar("zonas", [{"SHAPE": box(0, 0, 10, 10).wkb, "NM_CODIGO": 1, "NM_H01": 80.0, "NM_H24": 0.0, "NM_H96": 0.0},
+                             {"SHAPE": box(10, 0, 20, 10).wkb, "NM_CODIGO": 2, "NM_H01": 10.0, "NM_H24": 0.0, "NM_H96": 0.0}])
+    eventos = []
+    perigo_tile = motor_raster._perigo_tile
+    def registrar(*args):
+        eventos.append(("tile", len(arcpy._obter("saida").linhas) if arcpy.Exists("saida") else 0))
+        return perigo_tile(*args)
+    monkeypatch.setattr(motor_raster, "_perigo_tile", registrar)
+
+    modelo = TabelaLimiares().modelo("lhasa")
+    resumo = motor_raster.analisar(arcpy, "zonas", "susc", "saida", modelo, LHASA_RIO.CAMPOS_LIMIARES, "NM_CODIGO;PERIGO", "NM_H01 MAX",
+                                   1.0, str(tmp_path), tamanho_tile=7, processos=1)
+    saida = {(l["NM_CODIGO"], l["PERIGO"]): l["SHAPE"].area for l in arcpy._obter("saida").linhas}
+    assert saida == {(1, "MUITO ALTO"): 30, (1, "CRITICO"): 40, (2, "BAIXO"): 70}
+    assert resumo["tiles"] == 6
+    assert eventos[-1] == ("tile", 2) # zona 1 já gravada antes do último tile
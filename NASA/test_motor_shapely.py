@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do motor de geometria Shapely (motor_shapely.py)
+"""
+
+import json
+
+from shapely.geometry import box, mapping
+
+import LHASA_RIO
+from motor_shapely import ArcPyShapely, para_geometria
+
+def _gravar_geojson(caminho, feicoes):
+    colecao = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": mapping(geometria), "properties": propriedades}
+        for geometria, propriedades in feicoes
+    ]}
+    caminho.write_text(json.dumps(colecao), encoding="utf-8")
+
+def test_geometria_esri_com_furo():
+    esri = {"rings": [[[0, 0], [0, 10], [10, 10], [10, 0], [0, 0]], [[2, 2], [8, 2], [8, 8], [2, 8], [2, 2]]]}
+    assert para_geometria(json.dumps(esri)).area == 100 - 36
+
+def _preparar_nowcast(tmp_path, monkeypatch, arcpy):
+    zonas = tmp_path / "zonas.geojson"
+    _gravar_geojson(zonas, [
+        (box(0, 0, 10, 10), {"Cod": 1, "Est": "Estacao A", "Endereço": "Rua A"}),
+        (box(10, 0, 20, 10), {"Cod": 2, "Est": "Estacao B", "Endereço": "Rua B"}),
+    ])
+    suscetibilidade = tmp_path / "suscetibilidade.geojson"
+    _gravar_geojson(suscetibilidade, [
+        (box(0, 0, 20, 3), {"gridcode": 1}),
+        (box(0, 3, 20, 6), {"gridcode": 2}),
+        (box(0, 6, 9, 10), {"gridcode": 3}),
+        (box(9, 6, 20, 10), {"gridcode": 3}),
+    ])
+    saida = tmp_path / "saida" / "RJ_LHASA_NOWCAST.geojson"
+
+    def dados(nome, h01):
+        return {"name": nome, "read_at": "2025-01-15T10:00:00-03:00", "data": {
+            "m15": 0, "h01": h01, "h02": 0, "h03": 0, "h04": 0, "h24": 0, "h96": 0, "mes": 0}}
+
+    def carregar_chuva():
+        LHASA_RIO.ARR_PD[:] = [dados("ESTACAO A", 80), dados("ESTACAO B", 10)]
+
+    monkeypatch.setattr(LHASA_RIO, "arcpy", arcpy)
+    monkeypatch.setattr(LHASA_RIO, "loadPluviometricData", carregar_chuva)
+    monkeypatch.setattr(LHASA_RIO, "LYR_IN_PZ", str(zonas))
+    monkeypatch.setattr(LHASA_RIO, "LYR_IN_SZ", str(suscetibilidade))
+    monkeypatch.setattr(LHASA_RIO, "GDB_WKSP_OUT", str(tmp_path / "LHASA-DATA.gdb"))
+    monkeypatch.setattr(LHASA_RIO, "SDE_WKSP_OUT", str(saida))
+    monkeypatch.setattr(LHASA_RIO, "OUT_EXPOSICAO", str(tmp_path / "exposicao.gpkg"))
+    monkeypatch.setattr(LHASA_RIO, "TILES_OUT", str(tmp_path / "perigo.mbtiles"))
+    monkeypatch.setattr(LHASA_RIO, "TILES_ZOOM_MIN", 0)
+    monkeypatch.setattr(LHASA_RIO, "TILES_ZOOM_MAX", 4)
+    monkeypatch.setattr(LHASA_RIO, "OUT_FILE", "20250115_100000")
+
+    return saida
+
+def _resultado(saida):
+    feicoes = json.loads(saida.read_text(encoding="utf-8"))["features"]
+    assert all(f["properties"]["MAX_NM_H01"] in (80, 10) for f in feicoes)
+    return {(f["properties"]["NM_CODIGO"], f["properties"]["PERIGO"]): para_geometria(f["geometry"]).area for f in feicoes}
+
+ESPERADO = {(1, "MUITO ALTO"): 30, (1, "CRITICO"): 40, (2, "BAIXO"): 70}
+
+def test_nowcast_de_ponta_a_ponta(tmp_path, monkeypatch):
+    saida = _preparar_nowcast(tmp_path, monkeypatch, ArcPyShapely(cache_unioes=False))
+    LHASA_RIO.nowcast()
+    assert _resultado(saida) == ESPERADO
+    assert (tmp_path / "exposicao.gpkg").exists()
+    assert (tmp_path / "perigo.mbtiles").exists()
+
+def test_nowcast_com_cache_de_unioes(tmp_path, monkeypatch):
+    arcpy = ArcPyShapely()
+    saida = _preparar_nowcast(tmp_path, monkeypatch, arcpy)
+    LHASA_RIO.nowcast()
+    assert _resultado(saida) == ESPERADO
+    calculadas = arcpy.cache_unioes.calculadas
+    assert calculadas == 4 # 2 zonas x gridcodes 2 e 3
+
+    LHASA_RIO.nowcast()
+    assert _resultado(saida) == ESPERADO
+    assert arcpy.cache_unioes.calculadas == calculadas
+    assert arcpy.cache_unioes.reutilizadas == calculadas
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do painel de mapas estático (painel_mapas.py)
+"""
+
+import os
+import json
+from datetime import datetime
+
+import gerar_mapa
+import mapa_bolhas
+import painel_mapas
+from mapas import gerar_todos_mapas
+from test_inmet_stub import ESTACOES
+
+def test_casca_uma_vez_e_dados_incrementais(tmp_path):
+    diretorio = str(tmp_path)
+    painel_mapas.atualizar_painel(diretorio, ESTACOES, data=datetime(2025, 1, 15, 10, 0))
+    casca = os.path.join(diretorio, "index.html")
+    modificado = os.stat(casca).st_mtime_ns
+
+    caminho = painel_mapas.atualizar_painel(diretorio, ESTACOES[:2], data=datetime(2025, 1, 15, 10, 15), historico=True)
+    assert os.stat(casca).st_mtime_ns == modificado and not painel_mapas.escrever_casca(diretorio)
+    with open(caminho, encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    assert dados["gerado_em"] == "15/01/2025 10:15"
+    assert len(dados["estacoes"]["features"]) == 2 and len(dados["bolhas"]["features"]) == 2
+    assert os.listdir(os.path.join(diretorio, "dados")) == ["20250115_1015.json"]
+    assert sorted(os.listdir(diretorio)) == ["dados", "index.html", "latest.json"] # sem temporários
+
+def test_modo_painel_nos_mapas(tmp_path, monkeypatch):
+    def completo(estacoes):
+        raise AssertionError("HTML completo gerado no modo painel")
+    monkeypatch.setattr(gerar_mapa, "gerar_mapa_completo", completo)
+    monkeypatch.setattr(mapa_bolhas, "gerar_mapa_bolhas_completo", completo)
+
+    arquivos = gerar_todos_mapas(ESTACOES, painel=str(tmp_path))
+    assert arquivos == {"painel": os.path.join(str(tmp_path), "latest.json")}
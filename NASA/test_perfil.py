@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes dos perfis de execução (perfil.py)
+"""
+
+import os
+import time
+import pstats
+
+import pytest
+
+from perfil import perfilar, extrair_opcao
+
+def _trabalho():
+    dados = [str(i) * 20 for i in range(20000)]
+    fim = time.perf_counter() + 0.05
+    while time.perf_counter() < fim:
+        sum(len(d) for d in dados[:1000])
+    return dados
+
+def test_extrair_opcao():
+    assert extrair_opcao(["-n", "--profile=cpu"]) == ("cpu", ["-n"])
+    assert extrair_opcao(["--profile", "mem", "-h", "01/01/2019"]) == ("mem", ["-h", "01/01/2019"])
+    assert extrair_opcao(["-n"]) == (None, ["-n"])
+    with pytest.raises(ValueError):
+        extrair_opcao(["--profile=gpu"])
+
+def test_perfis(tmp_path):
+    with perfilar(None, str(tmp_path)) as perfil:
+        perfil.marcar("#01 | NADA")
+    assert perfil.arquivos == [] and os.listdir(tmp_path) == []
+
+    arquivos = {}
+    for modo in ("cpu", "mem", "sample"):
+        with perfilar(modo, str(tmp_path), "LHASA_RIO") as perfil:
+            perfil.marcar("#01 | CARGA")
+            dados = _trabalho()
+            perfil.marcar("#02 | ANALISE")
+            del dados
+        assert all(os.path.exists(a) for a in perfil.arquivos)
+        arquivos[modo] = {os.path.splitext(a)[1]: a for a in perfil.arquivos}
+
+    assert pstats.Stats(arquivos["cpu"][".prof"]).total_calls > 0
+
+    memoria = open(arquivos["mem"][".txt"], encoding="utf-8").read()
+    assert "=== #01 | CARGA" in memoria and "=== #02 | ANALISE" in memoria
+    assert "test_perfil.py" in memoria.split("=== #02")[0] # alocações da lista de _trabalho
+
+    pilhas = open(arquivos["sample"][".folded"], encoding="utf-8").read().splitlines()
+    assert pilhas and any(p.startswith("#01 | CARGA;") and "_trabalho" in p for p in pilhas)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do índice de proximidade de áreas de risco (proximidade.py)
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+import mapa_bolhas
+from proximidade import IndiceProximidade, IMPLEMENTACOES, carregar_catalogo, haversine_km
+
+@pytest.mark.parametrize("implementacao", IMPLEMENTACOES)
+def test_consultas_iguais_a_forca_bruta(implementacao):
+    rng = np.random.default_rng(3)
+    areas = [(f"AREA {i}", rng.uniform(-22.9, -14.2), rng.uniform(-51.0, -39.9)) for i in range(500)]
+    lat, lon = rng.uniform(-22.9, -14.2, 3000), rng.uniform(-51.0, -39.9, 3000)
+    matriz = haversine_km(lat[:, None], lon[:, None], np.array([a[1] for a in areas])[None, :], np.array([a[2] for a in areas])[None, :])
+
+    assert round(float(haversine_km(0, 0, 0, 1)), 3) == 111.195 # 1 grau no equador
+    try:
+        indice = IndiceProximidade(areas, implementacao)
+    except ImportError as e: # aparece como "skipped" no resumo: balltree precisa do scikit-learn, kdtree do scipy
+        pytest.skip(f"{implementacao} não testado: {e}")
+    distancias, indices = indice.mais_proximas(lat, lon, k=4)
+    assert np.allclose(distancias, np.sort(matriz, axis=1)[:, :4])
+    assert np.allclose(np.take_along_axis(matriz, indices, axis=1), distancias)
+    assert np.array_equal(indice.contar_no_raio(lat, lon, 60.0), (matriz <= 60.0).sum(axis=1))
+    assert indice.mais_proximas(lat[:2], lon[:2], k=900)[1].shape == (2, 500)
+
+def test_catalogo_e_indice_de_risco(tmp_path):
+    (tmp_path / "areas.csv").write_text("nome;lat;lon\nOURO PRETO;-20,3856;-43,5033\nMARIANA;-20,3778;-43,4175\n", encoding="utf-8")
+    (tmp_path / "areas.json").write_text(json.dumps([{"nome": "OURO PRETO", "lat": -20.3856, "lon": -43.5033},
+                                                      {"nome": "MARIANA", "lat": -20.3778, "lon": -43.4175}]), encoding="utf-8")
+    areas = carregar_catalogo(str(tmp_path / "areas.csv"))
+    assert areas == carregar_catalogo(str(tmp_path / "areas.json"))
+
+    estacoes = [
+        {"CD_ESTACAO": "A1", "DC_NOME": "OURO PRETO", "VL_LATITUDE": "-20.39", "VL_LONGITUDE": "-43.50"}, # dentro da área
+        {"CD_ESTACAO": "A2", "DC_NOME": "ITABIRITO", "VL_LATITUDE": "-20.25", "VL_LONGITUDE": "-43.80"},  # ~35 km das duas
+        {"CD_ESTACAO": "A3", "DC_NOME": "SERRA AZUL", "VL_LATITUDE": "-19.90", "VL_LONGITUDE": "-44.30"}, # 99 km de uma, 106 km da outra
+        {"CD_ESTACAO": "A4", "DC_NOME": "MONTES CLAROS", "VL_LATITUDE": "-16.73", "VL_LONGITUDE": "-43.86"},
+    ]
+    dados = mapa_bolhas.processar_dados_para_bolhas(estacoes, IndiceProximidade(areas))
+    assert [d["risco_index"] for d in dados] == [100, 80, 60, 45] # dentro da área: +40 além das duas a até 50 km
+    assert [d["area_proxima"] for d in dados[:2]] == ["OURO PRETO", "OURO PRETO"]
+    assert [d["areas_proximas"] for d in dados] == [2, 2, 0, 0]
+    assert "area_proxima" not in mapa_bolhas.processar_dados_para_bolhas(estacoes)[0]
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes da publicação incremental no SDE (publicacao_sde.py)
+"""
+
+import pytest
+
+from arcpy_mock import MockArcPy
+from publicacao_sde import calcular_alteracoes, aplicar_alteracoes, publicar_incremental
+
+SDE = "dados.sde\\RJ_LHASA_NOWCAST"
+SAIDA = "LHASA-DATA.gdb\\RJ_LHASA_N"
+
+def _linha(codigo, perigo, h01, shape="A"):
+    return {"NM_CODIGO": codigo, "PERIGO": perigo, "MAX_NM_H01": h01, "SHAPE": shape}
+
+def _publicado(arcpy):
+    return sorted(arcpy.da.SearchCursor(SDE, ["NM_CODIGO", "PERIGO", "MAX_NM_H01", "SHAPE@"]))
+
+def test_aplica_somente_alteracoes():
+    arcpy = MockArcPy()
+    arcpy.carregar(SDE, [_linha(1, "BAIXO", 5.0), _linha(2, "ALTO", 60.0), _linha(3, "CRITICO", 80.0), _linha(3, "CRITICO", 80.0)])
+    arcpy.carregar(SAIDA, [_linha(1, "BAIXO", 5), _linha(2, "ALTO", 65.0), _linha(4, "MODERADO", 55.0, "B")])
+
+    resumo = publicar_incremental(arcpy, SAIDA, SDE)
+
+    assert resumo == {"inseridas": 1, "atualizadas": 1, "removidas": 2, "inalteradas": 1}
+    assert _publicado(arcpy) == [(1, "BAIXO", 5.0, "A"), (2, "ALTO", 65.0, "A"), (4, "MODERADO", 55.0, "B")]
+    assert publicar_incremental(arcpy, SAIDA, SDE)["inalteradas"] == 3
+
+def test_erro_desfaz_sessao_de_edicao():
+    arcpy = MockArcPy()
+    arcpy.carregar(SDE, [_linha(1, "BAIXO", 5.0), _linha(2, "ALTO", 60.0)])
+    arcpy.carregar(SAIDA, [_linha(1, "BAIXO", 5.0)])
+    alteracoes = calcular_alteracoes(arcpy, SAIDA, SDE)
+    assert alteracoes["remover"] == {(2, "ALTO")}
+    alteracoes["inserir"] = {("x",): None} # falha depois de remover a linha 2
+
+    with pytest.raises(TypeError):
+        aplicar_alteracoes(arcpy, SDE, alteracoes)
+    assert _publicado(arcpy) == [(1, "BAIXO", 5.0, "A"), (2, "ALTO", 60.0, "A")]
+
+def test_geometria_arredondada_pelo_sde_nao_e_alteracao():
+    import shapely
+    from shapely.geometry import Polygon
+    from shapely.affinity import translate
+
+    calculada = Polygon([(683000.123456, 7465000.987654), (683100.5, 7465000.25), (683100.333333, 7465100.666666)])
+    publicada = shapely.set_precision(calculada, 0.0001) # resolução do SDE
+    movida = translate(calculada, 0.5)
+    arcpy = MockArcPy()
+    arcpy.carregar(SDE, [_linha(1, "ALTO", 60.0, publicada.wkb), _linha(2, "ALTO", 60.0, publicada.wkb)])
+    arcpy.carregar(SAIDA, [_linha(1, "ALTO", 60.0, calculada.wkb), _linha(2, "ALTO", 60.0, movida.wkb)])
+    assert publicada.wkb != calculada.wkb
+
+    alteracoes = calcular_alteracoes(arcpy, SAIDA, SDE)
+    assert alteracoes["inalteradas"] == 1
+    assert list(alteracoes["atualizar"]) == [(2, "ALTO")]
+
+def test_nova_leitura_sem_mudanca_nao_e_alteracao():
+    arcpy = MockArcPy()
+    arcpy.carregar(SDE, [dict(_linha(1, "ALTO", 60.0), DT_COLETA="2025-01-15 10:00"), dict(_linha(2, "BAIXO", 0.0), DT_COLETA="2025-01-15 10:00")])
+    arcpy.carregar(SAIDA, [dict(_linha(1, "ALTO", 62.5), DT_COLETA="2025-01-15 10:15"), dict(_linha(2, "BAIXO", 0.0), DT_COLETA="2025-01-15 10:15")])
+
+    resumo = publicar_incremental(arcpy, SAIDA, SDE)
+    assert resumo == {"inseridas": 0, "atualizadas": 1, "removidas": 0, "inalteradas": 1}
+    # A zona com chuva nova leva a leitura atual; a outra mantém a da última alteração
+    assert sorted(arcpy.da.SearchCursor(SDE, ["NM_CODIGO", "DT_COLETA"])) == [(1, "2025-01-15 10:15"), (2, "2025-01-15 10:00")]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes do relatório estatístico (relatorio_estatistico.py)
+"""
+
+import csv
+import json
+import random
+
+import pandas as pd
+
+from relatorio_estatistico import relatorio_bolhas, relatorio_estacoes, exportar_relatorio
+
+def _bolhas(n=200):
+    rng = random.Random(3)
+    return [{"codigo": f"A{i:03d}", "nome": f"ESTACAO {i}", "altitude": float(rng.randint(300, 1500)),
+             "risco_index": float(rng.choice([10, 30, 45, 50, 69, 70, 85, 100])), "importancia": float(rng.randint(10, 75))}
+            for i in range(n)]
+
+def test_relatorio_igual_aos_filtros_do_dataframe():
+    dados = _bolhas()
+    df = pd.DataFrame(dados)
+    relatorio = relatorio_bolhas(dados)
+
+    assert relatorio["total"] == len(df)
+    assert relatorio["medias"]["importancia"] == round(df["importancia"].mean(), 2)
+    assert relatorio["faixas"]["risco_index"] == {
+        "baixo": len(df[df["risco_index"] < 30]),
+        "moderado": len(df[(df["risco_index"] >= 30) & (df["risco_index"] < 50)]),
+        "alto": len(df[(df["risco_index"] >= 50) & (df["risco_index"] < 70)]),
+        "critico": len(df[df["risco_index"] >= 70])}
+    alto = df[df["risco_index"] >= 70].sort_values("risco_index", ascending=False, kind="stable").head(5)
+    assert [e["codigo"] for e in relatorio["top"]["alto_risco"]] == alto["codigo"].tolist()
+    for chave in ("importancia", "altitude"):
+        assert [e["codigo"] for e in relatorio["top"][chave]] == df.nlargest(5, chave)["codigo"].tolist()
+
+def test_estacoes_e_exportacao(tmp_path):
+    estacoes = [{"CD_ESTACAO": "A1", "DC_NOME": "ALTA", "TP_ESTACAO": "Automatica", "CD_SITUACAO": "Operante", "VL_ALTITUDE": "1200"},
+                {"CD_ESTACAO": "A2", "DC_NOME": "BAIXA", "TP_ESTACAO": "Automatica", "CD_SITUACAO": "Pane", "VL_ALTITUDE": "200"},
+                {"CD_ESTACAO": "A3", "DC_NOME": "SEM ALTITUDE", "TP_ESTACAO": "Convencional", "CD_SITUACAO": "Operante", "VL_ALTITUDE": "n/d"}]
+    relatorio = relatorio_estacoes(estacoes, intervalos=2)
+    assert relatorio["contagens"]["TP_ESTACAO"] == {"Automatica": 2, "Convencional": 1}
+    assert relatorio["histogramas"]["VL_ALTITUDE"] == {"bordas": [200.0, 700.0, 1200.0], "contagens": [1, 1]}
+    assert [e["nome"] for e in relatorio["top"]["altitude"]] == ["ALTA", "BAIXA"] # inválida fica de fora
+
+    arquivo_json, arquivo_csv = exportar_relatorio(relatorio, "estacoes", str(tmp_path))
+    with open(arquivo_json, encoding="utf-8") as arquivo:
+        assert json.load(arquivo) == relatorio
+    with open(arquivo_csv, encoding="utf-8") as arquivo:
+        linhas = list(csv.DictReader(arquivo))
+    assert linhas[0] == {"secao": "resumo", "chave": "total", "posicao": "", "codigo": "", "nome": "", "valor": "3"}
+    assert {"secao": "top:altitude", "chave": "", "posicao": "1", "codigo": "A1", "nome": "ALTA", "valor": "1200.0"} in linhas
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes da saída vetorial em GeoPackage/FlatGeobuf (saida_vetorial.py)
+"""
+
+import os
+import time
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from shapely.geometry import box
+
+from saida_vetorial import escrever_saida, _valor_sqlite
+
+CAMPOS = ["NM_CODIGO", "PERIGO", "DT_COLETA", "MAX_NM_H01"]
+LINHAS = [
+    (box(0, 0, 10, 10).wkb, 1, "CRITICO", datetime(2025, 1, 15, 10, 0, tzinfo=timezone(timedelta(hours=-3))), 80.0),
+    (box(20, 20, 30, 30), 2, "BAIXO", None, None),
+]
+
+def test_geopackage_com_indice_espacial(tmp_path):
+    caminho = str(tmp_path / "saida.gpkg")
+    escrever_saida(caminho, CAMPOS, LINHAS, srid=0)
+    escrever_saida(caminho, CAMPOS, LINHAS[:1], srid=0) # sobrescreve atomicamente
+    assert os.listdir(tmp_path) == ["saida.gpkg"]
+
+    conexao = sqlite3.connect(caminho)
+    assert conexao.execute("PRAGMA application_id").fetchone()[0] == 1196444487
+    assert conexao.execute('SELECT "PERIGO", "DT_COLETA" FROM lhasa').fetchall() == [("CRITICO", "2025-01-15T13:00:00.000Z")]
+    assert conexao.execute("SELECT id FROM rtree_lhasa_geom WHERE maxx >= 5 AND minx <= 5").fetchall() == [(1,)]
+    conexao.close()
+
+    pyogrio = pytest.importorskip("pyogrio")
+    assert pyogrio.read_info(caminho)["features"] == 1
+
+@pytest.mark.skipif(not hasattr(time, "tzset"), reason="time.tzset indisponível")
+def test_data_ingenua_em_horario_local(monkeypatch):
+    monkeypatch.setenv("TZ", "America/Sao_Paulo")
+    time.tzset()
+    try:
+        assert _valor_sqlite(datetime(2025, 1, 15, 10, 0)) == "2025-01-15T13:00:00.000Z"
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+@pytest.mark.parametrize("extensao", [".gpkg", ".fgb"])
+def test_leitura_por_bbox(tmp_path, extensao):
+    pyogrio = pytest.importorskip("pyogrio")
+    caminho = str(tmp_path / ("saida" + extensao))
+    escrever_saida(caminho, CAMPOS, LINHAS, srid=4326)
+    info = pyogrio.read_info(caminho)
+    assert info["features"] == 2
+    assert info["capabilities"]["fast_spatial_filter"]
+
+    dados = pyogrio.raw.read(caminho, bbox=(15, 15, 35, 35))
+    assert list(dados[-1][1]) == ["BAIXO"]
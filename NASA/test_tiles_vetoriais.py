@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testes dos tiles vetoriais (tiles_vetoriais.py)
+"""
+
+import gzip
+import sqlite3
+
+from datetime import datetime
+
+from shapely.geometry import box
+
+from motor_shapely import ArcPyShapely
+from tiles_vetoriais import gerar_tiles, exportar_tiles, tiles_cobertos, _varint
+
+def _ler_mensagem(dados):
+    """Decodifica um nível de protobuf em [(campo, valor)]"""
+    campos, i = [], 0
+    while i < len(dados):
+        chave, deslocamento = 0, 0
+        while True:
+            byte = dados[i]; i += 1
+            chave |= (byte & 0x7F) << deslocamento; deslocamento += 7
+            if not byte & 0x80:
+                break
+        numero, tipo = chave >> 3, chave & 7
+        valor, deslocamento = 0, 0
+        while tipo in (0, 2):
+            byte = dados[i]; i += 1
+            valor |= (byte & 0x7F) << deslocamento; deslocamento += 7
+            if not byte & 0x80:
+                break
+        if tipo == 2:
+            valor, i = dados[i:i + valor], i + valor
+        elif tipo == 1:
+            valor, i = dados[i:i + 8], i + 8
+        campos.append((numero, valor))
+    return campos
+
+def test_varint():
+    assert _varint(1) == b"\x01"
+    assert _varint(300) == b"\xac\x02"
+
+def test_geracao_incremental(tmp_path):
+    destino = str(tmp_path / "perigo.mbtiles")
+    feicoes = [
+        (box(-43.5, -23.0, -43.4, -22.9), {"NM_CODIGO": 1, "PERIGO": "ALTO"}),
+        (box(-43.2, -23.0, -43.1, -22.9), {"NM_CODIGO": 2, "PERIGO": "BAIXO"}),
+    ]
+    resumo = gerar_tiles(feicoes, destino, 8, 10)
+    assert resumo["gerados"] > 0 and resumo["inalterados"] == 0
+
+    with sqlite3.connect(destino) as conexao:
+        z, x, linha, dados = conexao.execute("SELECT * FROM tiles WHERE zoom_level = 8").fetchone()
+    x0, x1, y0, y1 = tiles_cobertos((-4842000, -2621000, -4831000, -2609000), 8)
+    assert (x, (1 << z) - 1 - linha) == (x0, y0)
+
+    camada = dict(_ler_mensagem(dict(_ler_mensagem(gzip.decompress(dados)))[3]))
+    assert camada[15] == 2 and camada[1] == b"perigo" and camada[5] == 4096
+
+    assert gerar_tiles(feicoes, destino, 8, 10) == {"gerados": 0, "inalterados": resumo["gerados"], "removidos": 0}
+
+    feicoes[1] = (feicoes[1][0], {"NM_CODIGO": 2, "PERIGO": "MUITO ALTO"})
+    alterado = gerar_tiles(feicoes, destino, 8, 10)
+    assert 0 < alterado["gerados"] < resumo["gerados"]
+
+    removido = gerar_tiles(feicoes[:1], destino, 8, 10)
+    assert removido["removidos"] > 0
+
+def test_ciclo_do_nowcast_nao_regrava_tiles(tmp_path):
+    destino = str(tmp_path / "perigo.mbtiles")
+    arcpy = ArcPyShapely()
+
+    def ciclo(coleta, h01, perigo="ALTO"):
+        arcpy.carregar("perigo", [
+            {"SHAPE": box(-43.5, -23.0, -43.4, -22.9), "NM_CODIGO": 1, "TX_ESTACAO": "URCA", "DT_COLETA": coleta, "PERIGO": perigo, "MAX_NM_H01": h01},
+            {"SHAPE": box(-43.2, -23.0, -43.1, -22.9), "NM_CODIGO": 2, "TX_ESTACAO": "TIJUCA", "DT_COLETA": coleta, "PERIGO": "BAIXO", "MAX_NM_H01": 0.0}])
+        return exportar_tiles(arcpy, "perigo", destino, 8, 10, srid=4326)
+
+    primeiro = ciclo(datetime(2025, 1, 15, 10, 0), 12.0)
+    # Nova leitura (DT_COLETA e chuva) sem mudança de perigo: nenhum tile regravado
+    assert ciclo(datetime(2025, 1, 15, 10, 15), 14.5)["gerados"] == 0
+    assert 0 < ciclo(datetime(2025, 1, 15, 10, 30), 40.0, "MUITO ALTO")["gerados"] < primeiro["gerados"]
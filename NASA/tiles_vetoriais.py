@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Tiles Vetoriais (MVT) - LHASA RIO
+Gera a pirâmide de Mapbox Vector Tiles da camada de perigo em um arquivo
+MBTiles ou em um diretório z/x/y.pbf. Cada tile guarda o hash do conteúdo que o
+gerou (feições que o cobrem); tiles cujo conteúdo não mudou desde a execução
+anterior não são codificados nem gravados novamente. Da camada de perigo só vão
+para os tiles os campos de CAMPOS_TILES: DT_COLETA e os MAX_NM_* mudam a cada
+ciclo do nowcast e fariam todos os tiles serem regravados.
+"""
+
+import os
+import json
+import gzip
+import math
+import struct
+import sqlite3
+import hashlib
+import numpy as np
+import shapely
+from shapely.geometry.polygon import orient
+
+from arquivos import gravar_atomico
+
+VERSAO_CODIFICADOR = "mvt-2.1"
+EXTENT = 4096
+BUFFER = 64
+RAIO_TERRA = 6378137.0
+LIMITE_MERCATOR = math.pi * RAIO_TERRA
+LATITUDE_MAXIMA = 85.0511287798
+
+# Atributos das feições nos tiles (e no hash de cada tile): identificação e perigo
+CAMPOS_TILES = ("NM_CODIGO", "TX_ESTACAO", "PERIGO")
+
+# ---------------------------------------------------------------------------
+# Projeção
+# ---------------------------------------------------------------------------
+
+def _para_mercator(srid):
+    """Função (N,2) -> (N,2) que leva coordenadas do SRID para EPSG:3857"""
+    if srid == 3857:
+        return None
+    if srid == 4326:
+        def transformar(coordenadas):
+            lon = coordenadas[:, 0]
+            lat = coordenadas[:, 1].clip(-LATITUDE_MAXIMA, LATITUDE_MAXIMA)
+            x = RAIO_TERRA * lon * math.pi / 180.0
+            y = RAIO_TERRA * np.log(np.tan(math.pi / 4.0 + lat * math.pi / 360.0))
+            return np.column_stack([x, y])
+        return transformar
+
+    from pyproj import Transformer
+    transformador = Transformer.from_crs(srid, 3857, always_xy=True)
+    def transformar(coordenadas):
+        x, y = transformador.transform(coordenadas[:, 0], coordenadas[:, 1])
+        return np.column_stack([x, y])
+    return transformar
+
+def limites_tile(z, x, y):
+    """(min_x, min_y, max_x, max_y) do tile em EPSG:3857"""
+    tamanho = 2 * LIMITE_MERCATOR / (1 << z)
+    min_x = -LIMITE_MERCATOR + x * tamanho
+    max_y = LIMITE_MERCATOR - y * tamanho
+    return min_x, max_y - tamanho, min_x + tamanho, max_y
+
+def tiles_cobertos(limites, z):
+    """Intervalo de tiles (x0, x1, y0, y1) que cobre um retângulo em EPSG:3857"""
+    tamanho = 2 * LIMITE_MERCATOR / (1 << z)
+    maximo = (1 << z) - 1
+    x0 = min(max(int((limites[0] + LIMITE_MERCATOR) // tamanho), 0), maximo)
+    x1 = min(max(int((limites[2] + LIMITE_MERCATOR) // tamanho), 0), maximo)
+    y0 = min(max(int((LIMITE_MERCATOR - limites[3]) // tamanho), 0), maximo)
+    y1 = min(max(int((LIMITE_MERCATOR - limites[1]) // tamanho), 0), maximo)
+    return x0, x1, y0, y1
+
+# ---------------------------------------------------------------------------
+# Codificação protobuf (vector_tile.proto v2)
+# ---------------------------------------------------------------------------
+
+def _varint(valor):
+    saida = bytearray()
+    while True:
+        byte = valor & 0x7F
+        valor >>= 7
+        if valor:
+            saida.append(byte | 0x80)
+        else:
+            saida.append(byte)
+            return bytes(saida)
+
+def _zigzag(valor):
+    return (valor << 1) ^ (valor >> 63)
+
+def _campo_bytes(numero, dados):
+    return _varint((numero << 3) | 2) + _varint(len(dados)) + dados
+
+def _campo_varint(numero, valor):
+    return _varint(numero << 3) + _varint(valor)
+
+def _empacotado(numero, valores):
+    return _campo_bytes(numero, b"".join(_varint(v) for v in valores))
+
+def _valor_mvt(valor):
+    """Mensagem Value do MVT"""
+    if isinstance(valor, bool):
+        return _campo_varint(7, int(valor))
+    if isinstance(valor, int):
+        return _campo_varint(5, valor) if valor >= 0 else _campo_varint(6, _zigzag(valor))
+    if isinstance(valor, float):
+        return _varint((3 << 3) | 1) + struct.pack("<d", valor)
+    if hasattr(valor, "isoformat"):
+        valor = valor.isoformat()
+    return _campo_bytes(1, str(valor).encode("utf-8"))
+
+def _comando(identificador, contagem):
+    return (identificador & 0x7) | (contagem << 3)
+
+class _Cursor:
+    """Codifica coordenadas inteiras como deltas zigzag a partir da última posição"""
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+
+    def parametros(self, pontos):
+        saida = []
+        for x, y in pontos:
+            saida += [_zigzag(x - self.x), _zigzag(y - self.y)]
+            self.x, self.y = x, y
+        return saida
+
+def _anel(pontos):
+    """Remove pontos repetidos e o fechamento; anéis com menos de 3 pontos são descartados"""
+    limpos = []
+    for ponto in pontos:
+        if not limpos or ponto != limpos[-1]:
+            limpos.append(ponto)
+    if len(limpos) > 1 and limpos[0] == limpos[-1]:
+        limpos.pop()
+    return limpos if len(limpos) >= 3 else None
+
+def _area_tile(pontos):
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(pontos, pontos[1:] + pontos[:1]))
+
+def _geometria_mvt(geometria, para_tile):
+    """(tipo, comandos) da geometria já recortada, em coordenadas do tile"""
+    cursor = _Cursor()
+    comandos = []
+    tipo = geometria.geom_type
+
+    if tipo in ("Polygon", "MultiPolygon"):
+        for poligono in getattr(geometria, "geoms", [geometria]):
+            poligono = orient(poligono, sign=-1.0) # horário em y para cima = área positiva no tile (y para baixo)
+            exterior = _anel(para_tile(poligono.exterior.coords))
+            if exterior is None or _area_tile(exterior) <= 0:
+                continue
+            for anel in [exterior] + [_anel(para_tile(i.coords)) for i in poligono.interiors]:
+                if anel is None:
+                    continue
+                comandos += [_comando(1, 1)] + cursor.parametros(anel[:1])
+                comandos += [_comando(2, len(anel) - 1)] + cursor.parametros(anel[1:])
+                comandos += [_comando(7, 1)]
+        return 3, comandos
+
+    if tipo in ("LineString", "MultiLineString"):
+        for linha in getattr(geometria, "geoms", [geometria]):
+            pontos = para_tile(linha.coords)
+            if len(pontos) >= 2:
+                comandos += [_comando(1, 1)] + cursor.parametros(pontos[:1])
+                comandos += [_comando(2, len(pontos) - 1)] + cursor.parametros(pontos[1:])
+        return 2, comandos
+
+    pontos = [p for g in getattr(geometria, "geoms", [geometria]) for p in para_tile(g.coords)]
+    if pontos:
+        comandos += [_comando(1, len(pontos))] + cursor.parametros(pontos)
+    return 1, comandos
+
+def codificar_tile(feicoes, z, x, y, camada="perigo"):
+    """Codifica um tile MVT; feicoes: [(id, geometria em EPSG:3857, propriedades)]"""
+    min_x, min_y, max_x, max_y = limites_tile(z, x, y)
+    escala = EXTENT / (max_x - min_x)
+    folga = BUFFER / escala
+
+    def para_tile(coordenadas):
+        return [(int(round((cx - min_x) * escala)), int(round((max_y - cy) * escala))) for cx, cy in coordenadas]
+
+    chaves, valores = {}, {}
+    mensagens = []
+    for identificador, geometria, propriedades in feicoes:
+        recorte = shapely.clip_by_rect(geometria, min_x - folga, min_y - folga, max_x + folga, max_y + folga)
+        if recorte.is_empty:
+            continue
+        tipo, comandos = _geometria_mvt(recorte, para_tile)
+        if not comandos:
+            continue
+        tags = []
+        for chave, valor in propriedades.items():
+            if valor is None:
+                continue
+            codificado = _valor_mvt(valor)
+            tags += [chaves.setdefault(chave, len(chaves)), valores.setdefault(codificado, len(valores))]
+        mensagens.append(_campo_bytes(2,
+            _campo_varint(1, identificador) + _empacotado(2, tags) + _campo_varint(3, tipo) + _empacotado(4, comandos)))
+
+    if not mensagens:
+        return None
+    camada_mvt = (
+        _campo_varint(15, 2) + _campo_bytes(1, camada.encode("utf-8")) + b"".join(mensagens) +
+        b"".join(_campo_bytes(3, c.encode("utf-8")) for c in chaves) +
+        b"".join(_campo_bytes(4, v) for v in valores) + _campo_varint(5, EXTENT)
+    )
+    return _campo_bytes(3, camada_mvt)
+
+# ---------------------------------------------------------------------------
+# Arquivos de saída
+# ---------------------------------------------------------------------------
+
+class ArquivoMBTiles:
+    """MBTiles (esquema TMS, tiles gzip) com tabela auxiliar de hashes por tile"""
+
+    def __init__(self, caminho):
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self.conexao = sqlite3.connect(caminho)
+        self.conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS metadata (name TEXT, value TEXT);
+            CREATE UNIQUE INDEX IF NOT EXISTS metadata_name ON metadata (name);
+            CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+            CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);
+            CREATE TABLE IF NOT EXISTS tiles_hash (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, hash TEXT,
+                PRIMARY KEY (zoom_level, tile_column, tile_row));
+        """)
+
+    def hashes(self):
+        return {(z, x, (1 << z) - 1 - y): h for z, x, y, h in self.conexao.execute("SELECT * FROM tiles_hash")}
+
+    def gravar(self, z, x, y, dados, hash_conteudo):
+        linha = (z, x, (1 << z) - 1 - y)
+        self.conexao.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", linha + (gzip.compress(dados, mtime=0),))
+        self.conexao.execute("INSERT OR REPLACE INTO tiles_hash VALUES (?, ?, ?, ?)", linha + (hash_conteudo,))
+
+    def remover(self, z, x, y):
+        linha = (z, x, (1 << z) - 1 - y)
+        self.conexao.execute("DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", linha)
+        self.conexao.execute("DELETE FROM tiles_hash WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", linha)
+
+    def metadados(self, valores):
+        self.conexao.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?)", [(k, str(v)) for k, v in valores.items()])
+
+    def fechar(self):
+        self.conexao.commit()
+        self.conexao.close()
+
+class ArquivoDiretorio:
+    """Diretório z/x/y.pbf (sem compressão) com hashes.json e metadata.json"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        os.makedirs(caminho, exist_ok=True)
+        arquivo = os.path.join(caminho, "hashes.json")
+        self._hashes = {}
+        if os.path.exists(arquivo):
+            with open(arquivo, "r", encoding="utf-8") as entrada:
+                self._hashes = {tuple(int(p) for p in k.split("/")): h for k, h in json.load(entrada).items()}
+
+    def _arquivo(self, z, x, y):
+        return os.path.join(self.caminho, str(z), str(x), f"{y}.pbf")
+
+    def hashes(self):
+        return dict(self._hashes)
+
+    def gravar(self, z, x, y, dados, hash_conteudo):
+        gravar_atomico(self._arquivo(z, x, y), dados)
+        self._hashes[(z, x, y)] = hash_conteudo
+
+    def remover(self, z, x, y):
+        if os.path.exists(self._arquivo(z, x, y)):
+            os.remove(self._arquivo(z, x, y))
+        self._hashes.pop((z, x, y), None)
+
+    def metadados(self, valores):
+        gravar_atomico(os.path.join(self.caminho, "metadata.json"), json.dumps(valores, ensure_ascii=False))
+
+    def fechar(self):
+        conteudo = {f"{z}/{x}/{y}": h for (z, x, y), h in sorted(self._hashes.items())}
+        gravar_atomico(os.path.join(self.caminho, "hashes.json"), json.dumps(conteudo))
+
+def abrir_arquivo(destino):
+    return ArquivoMBTiles(destino) if destino.lower().endswith(".mbtiles") else ArquivoDiretorio(destino)
+
+# ---------------------------------------------------------------------------
+# Geração da pirâmide
+# ---------------------------------------------------------------------------
+
+def _hash_feicao(wkb, propriedades):
+    return hashlib.sha1(wkb + json.dumps(propriedades, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def gerar_tiles(feicoes, destino, zoom_min=9, zoom_max=14, camada="perigo", srid=4326):
+    """Gera/atualiza a pirâmide de tiles; feicoes: [(geometria Shapely ou WKB, propriedades)]"""
+    transformar = _para_mercator(srid)
+    preparadas = []
+    for geometria, propriedades in feicoes:
+        if geometria is None:
+            continue
+        if isinstance(geometria, (bytes, bytearray, memoryview)):
+            geometria = shapely.from_wkb(bytes(geometria))
+        if geometria.is_empty:
+            continue
+        hash_feicao = _hash_feicao(shapely.to_wkb(geometria), propriedades)
+        mercator = shapely.transform(geometria, transformar) if transformar else geometria
+        preparadas.append((len(preparadas) + 1, mercator, dict(propriedades), hash_feicao))
+
+    arquivo = abrir_arquivo(destino)
+    anteriores = arquivo.hashes()
+    resumo = {"gerados": 0, "inalterados": 0, "removidos": 0}
+    atuais = set()
+    try:
+        for z in range(zoom_min, zoom_max + 1):
+            tolerancia = (2 * LIMITE_MERCATOR / (1 << z)) / EXTENT / 2.0
+            conteudo = {}
+            for item in preparadas:
+                x0, x1, y0, y1 = tiles_cobertos(item[1].bounds, z)
+                for x in range(x0, x1 + 1):
+                    for y in range(y0, y1 + 1):
+                        conteudo.setdefault((z, x, y), []).append(item)
+
+            for (z, x, y), itens in conteudo.items():
+                hash_tile = hashlib.sha1((VERSAO_CODIFICADOR + camada + "".join(sorted(i[3] for i in itens))).encode("utf-8")).hexdigest()
+                if anteriores.get((z, x, y)) == hash_tile:
+                    atuais.add((z, x, y))
+                    resumo["inalterados"] += 1
+                    continue
+                dados = codificar_tile([(i, shapely.simplify(g, tolerancia), p) for i, g, p, _ in itens], z, x, y, camada)
+                if dados is None:
+                    continue
+                arquivo.gravar(z, x, y, dados, hash_tile)
+                atuais.add((z, x, y))
+                resumo["gerados"] += 1
+
+        for chave in set(anteriores) - atuais:
+            arquivo.remover(*chave)
+            resumo["removidos"] += 1
+
+        campos = sorted({c for _, _, p, _ in preparadas for c in p})
+        arquivo.metadados({
+            "name": camada, "format": "pbf", "type": "overlay", "version": VERSAO_CODIFICADOR,
+            "minzoom": zoom_min, "maxzoom": zoom_max,
+            "json": json.dumps({"vector_layers": [{"id": camada, "fields": {c: "String" for c in campos}, "minzoom": zoom_min, "maxzoom": zoom_max}]}),
+        })
+    finally:
+        arquivo.fechar()
+    return resumo
+
+def exportar_tiles(arcpy, origem, destino, zoom_min=9, zoom_max=14, camada="perigo", srid=None, campos_tiles=CAMPOS_TILES):
+    """Lê a camada com SearchCursor (SHAPE@WKB) e gera os tiles vetoriais com os
+    campos de campos_tiles que a camada tiver (None: todos os atributos)"""
+    from saida_vetorial import CAMPOS_IGNORADOS, obter_srid
+
+    campos = [c.name for c in arcpy.ListFields(origem) if c.name.upper() not in CAMPOS_IGNORADOS and c.type not in ("OID", "Geometry", "GlobalID")]
+    if campos_tiles is not None:
+        campos = [c for c in campos if c.upper() in campos_tiles]
+    with arcpy.da.SearchCursor(origem, ["SHAPE@WKB"] + campos) as cursor:
+        feicoes = [(row[0], dict(zip(campos, row[1:]))) for row in cursor]
+    if srid is None:
+        srid = obter_srid(arcpy, origem) or 4326
+    return gerar_tiles(feicoes, destino, zoom_min, zoom_max, camada, srid)
@@ -8,12 +8,10 @@
 
 import sys, os, shutil, copy, glob
 import logging
-import urllib3
 import socket
 import json, csv
 import os
 import time
-import requests
 from unidecode import unidecode
 from datetime import datetime, timedelta
 
@@ -22,8 +20,12 @@ from qgis.PyQt.QtCore import QCoreApplication
 from qgis.core import (
     QgsProcessing,
     QgsProcessingAlgorithm,
+    QgsProcessingUtils,
     QgsProcessingParameterFeatureSource,
     QgsProcessingParameterVectorDestination,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterDefinition,
     QgsProcessingParameterString,
     QgsProcessingParameterNumber,
     QgsProcessingParameterFeatureSink,
@@ -36,6 +38,15 @@ from qgis.core import (
 )
 import processing
 
+try:
+    from .limiares import obter_tabela
+    from .tiles_qgis import gerar_tiles_qgis
+    from .perfil import perfilar, MODOS as MODOS_PERFIL
+except ImportError:
+    from limiares import obter_tabela
+    from tiles_qgis import gerar_tiles_qgis
+    from perfil import perfilar, MODOS as MODOS_PERFIL
+
 # Configurar logging para QGIS
 import logging
 log = logging.getLogger(__name__)
@@ -47,8 +58,9 @@ log = logging.getLogger(__name__)
 # 3. Rate limiting para evitar sobrecarga da API
 # 4. Adaptação da estrutura de dados para formato JSON do INMET
 # 5. Configuração para SRC SIRGAS 2000 (padrão brasileiro)
-INMET_STATIONS_URL = "https://apitempo.inmet.gov.br/estacoes/T"  # Lista todas as estações automáticas
-INMET_DATA_URL = "https://apitempo.inmet.gov.br/token/estacao/{data_inicio}/{data_fim}/{codigo_estacao}/{token}"  # Dados horários por estação com token
+INMET_BASE_URL = os.environ.get("INMET_BASE_URL", "https://apitempo.inmet.gov.br/")  # pode apontar para um servidor local de testes
+INMET_STATIONS_URL = INMET_BASE_URL.rstrip("/") + "/estacoes/T"  # Lista todas as estações automáticas
+INMET_DATA_URL = INMET_BASE_URL.rstrip("/") + "/token/estacao/{data_inicio}/{data_fim}/{codigo_estacao}/{token}"  # Dados horários por estação com token
 INMET_TOKEN = "YOUR_TOKEN_HERE"  # Token de acesso à API INMET - substitua pelo token real
 
 # WORKSPACE PATH
@@ -102,6 +114,10 @@ LYR_PRC_LHASA_NOW = "RJ_LHASA_AGORA"
 
 FLD_RISCO = "PERIGO"
 
+# TABELA DE LIMIARES (limiares.json)
+MODELO_LIMIARES = "lhasa"
+CAMPOS_LIMIARES = {"h01": "NM_H01", "h24": "NM_H24", "h96": "NM_H96"}
+
 # FIELD DEFINITION
 # LYR_PZ_FLDS = ["SHAPE@JSON","NM_CODIGO","TX_ESTACAO","TX_ENDERECO"]
 LYR_PZ_FLDS = ["SHAPE@JSON","Cod","Est","Endereço"]
@@ -566,11 +582,18 @@ def loadNowData():
     del cursorIPZ
 
     return
-def loadInmetStations():
+def _urlInmet(url, base_url=None):
+    """Troca a base da URL do INMET (ex.: servidor local para testes de carga)"""
+    if not base_url:
+        return url
+    return base_url.rstrip("/") + url[len(INMET_BASE_URL.rstrip("/")):]
+
+def loadInmetStations(base_url=None):
     """Carrega lista de estações automáticas do INMET"""
+    import requests # só quando a análise roda: não pesa no carregamento do provedor
     try:
         log.info("Buscando lista de estações do INMET...")
-        response = requests.get(INMET_STATIONS_URL, timeout=30)
+        response = requests.get(_urlInmet(INMET_STATIONS_URL, base_url), timeout=30)
         
         if response.status_code == 200:
             stations = response.json()
@@ -590,13 +613,14 @@ def loadInmetStations():
         log.error(f"Erro ao decodificar JSON das estações: {e}")
         return []
 
-def loadInmetStationData(codigo_estacao, data_inicio, data_fim, token):
+def loadInmetStationData(codigo_estacao, data_inicio, data_fim, token, base_url=None):
     """Busca dados horários de uma estação específica do INMET"""
+    import requests
     try:
         # Rate limiting - pequeno intervalo entre requisições
         time.sleep(0.1)
         
-        url = INMET_DATA_URL.format(
+        url = _urlInmet(INMET_DATA_URL, base_url).format(
             data_inicio=data_inicio,
             data_fim=data_fim,
             codigo_estacao=codigo_estacao,
@@ -785,27 +809,10 @@ def doAnalysis(dataType="", startDate=None, endDate=None, startTime=None, endTim
 
     log.info("")
     log.info("#04 | CALCULANDO CAMPO DE RISCO")
-    code_block = """def NivelPerigo(susceptibilidade, h01, h24, h96):
-    if((h01 >= 50 and h01 < 70) or (h24 >= 140 and h24 < 185) or ((h96 >= 185 and h96 < 255) and (h24 >= 55 and h24 < 100))):
-        if(susceptibilidade == 1): # BAIXA
-            return "SEM PERIGO"
-        elif(susceptibilidade == 2): # MEDIA
-            return "MODERADO"
-        elif(susceptibilidade == 3): # ALTA
-            return "ALTO"
-    elif((h01 >= 70) or (h24 >= 185) or (h96 >= 255 and h24 >= 100)): 
-        if(susceptibilidade == 1): # BAIXA
-            return "SEM PERIGO"
-        elif(susceptibilidade == 2): # MEDIA
-            return "MUITO ALTO"
-        elif(susceptibilidade == 3): # ALTA
-            return "CRITICO"
-    else:
-        # SEM CHUVA
-        return "BAIXO"
-    """
-#paramos aqui 29/04/2025   
-    arcpy.CalculateField_management(LYR_PRC_B_VOLUME_VS_RISCO, "PERIGO", "NivelPerigo( !gridcode!, !NM_H01!, !NM_H24!, !NM_H96! )", "PYTHON",code_block)
+    # Limiares vêm da tabela versionada (limiares.json), compilada em tabela de consulta
+    modeloLimiares = obter_tabela().modelo(MODELO_LIMIARES)
+    code_block = modeloLimiares.gerar_code_block()
+    arcpy.CalculateField_management(LYR_PRC_B_VOLUME_VS_RISCO, "PERIGO", modeloLimiares.expressao_arcpy(CAMPOS_LIMIARES), "PYTHON", code_block)
     log.info("")
     log.info("#05 | SELECIONANDO AREAS DE PERIGO")
     arcpy.Select_analysis(LYR_PRC_B_VOLUME_VS_RISCO, LYR_PRC_C_AREAS_PERIGO, "gridcode IN (2,3)")
@@ -937,6 +944,8 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
     INPUT_DATA_ANALISE = 'INPUT_DATA_ANALISE'
     INPUT_TIPO_ANALISE = 'INPUT_TIPO_ANALISE'
     OUTPUT_RESULTADO = 'OUTPUT_RESULTADO'
+    OUTPUT_TILES = 'OUTPUT_TILES'
+    INPUT_PROFILE = 'INPUT_PROFILE'
 
     def tr(self, string):
         """Tradução de strings para internacionalização"""
@@ -1016,9 +1025,41 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
                 self.tr('Resultado da Análise de Risco')
             )
         )
+        
+        # Tiles vetoriais (opcional)
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                self.OUTPUT_TILES,
+                self.tr('Tiles Vetoriais da Camada de Perigo (MBTiles)'),
+                'MBTiles (*.mbtiles)',
+                optional=True,
+                createByDefault=False
+            )
+        )
+
+        # Perfil de execução (diagnóstico, opcional)
+        parametro_perfil = QgsProcessingParameterEnum(
+            self.INPUT_PROFILE,
+            self.tr('Perfil de Execução (--profile)'),
+            options=['Nenhum'] + list(MODOS_PERFIL),
+            defaultValue=0,
+            optional=True
+        )
+        parametro_perfil.setFlags(parametro_perfil.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(parametro_perfil)
 
     def processAlgorithm(self, parameters, context, feedback):
-        """Processar o algoritmo principal"""
+        """Processar o algoritmo principal, opcionalmente sob um perfil (cpu/mem/sample)"""
+        modo_perfil = ([None] + list(MODOS_PERFIL))[self.parameterAsEnum(parameters, self.INPUT_PROFILE, context)]
+        diretorio_perfil = os.path.dirname(self.parameterAsFileOutput(parameters, self.OUTPUT_RESULTADO, context)) or QgsProcessingUtils.tempFolder()
+        with perfilar(modo_perfil, diretorio_perfil, "LHASA_MG") as perfil:
+            resultado = self.processarAnalise(parameters, context, feedback, perfil)
+        for arquivo in perfil.arquivos:
+            feedback.pushInfo(f"Perfil gravado: {arquivo}")
+        return resultado
+
+    def processarAnalise(self, parameters, context, feedback, perfil):
+        """Etapas da análise; perfil.marcar() separa as etapas no perfil"""
         
         # Obter parâmetros
         camada_suscetibilidade = self.parameterAsSource(parameters, self.INPUT_SUSCETIBILIDADE, context)
@@ -1026,23 +1067,32 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
         data_analise = self.parameterAsString(parameters, self.INPUT_DATA_ANALISE, context)
         tipo_analise = self.parameterAsString(parameters, self.INPUT_TIPO_ANALISE, context)
         output_path = self.parameterAsFileOutput(parameters, self.OUTPUT_RESULTADO, context)
+        tiles_path = self.parameterAsFileOutput(parameters, self.OUTPUT_TILES, context)
 
         feedback.pushInfo("=== INICIANDO ANÁLISE LHASA MG ===")
         feedback.pushInfo(f"Data da análise: {data_analise}")
         feedback.pushInfo(f"Tipo de análise: {tipo_analise}")
 
+        # Recarrega a tabela de limiares se o arquivo mudou desde a última execução
+        if obter_tabela().recarregar_se_alterado():
+            feedback.pushInfo(f"Tabela de limiares recarregada (versão {obter_tabela().versao})")
+
         # Inicializar dados
+        perfil.marcar("INICIALIZANDO DADOS")
         self.initializeQgisData(feedback)
         
         # Carregar dados pluviométricos do INMET
+        perfil.marcar("CARGA DE DADOS DO INMET")
         feedback.pushInfo("Carregando dados do INMET...")
         self.loadPluviometricDataQgis(data_analise, feedback)
         
         # Associar dados de chuva às zonas pluviométricas
+        perfil.marcar("ASSOCIANDO CHUVA AS ZONAS")
         feedback.pushInfo("Associando dados de chuva às zonas...")
         zonas_com_chuva = self.associateRainDataQgis(camada_zonas, context, feedback)
         
         # Executar análise de risco
+        perfil.marcar("ANALISE DE RISCO")
         feedback.pushInfo("Executando análise de risco...")
         resultado = self.executeRiskAnalysisQgis(
             camada_suscetibilidade, 
@@ -1052,8 +1102,14 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
             feedback
         )
         
+        # Gerar tiles vetoriais (somente se a camada de perigo mudou)
+        perfil.marcar("TILES VETORIAIS")
+        if tiles_path:
+            feedback.pushInfo("Gerando tiles vetoriais...")
+            gerar_tiles_qgis(resultado, tiles_path, context, feedback)
+        
         feedback.pushInfo("=== ANÁLISE FINALIZADA COM SUCESSO ===")
-        return {self.OUTPUT_RESULTADO: resultado}
+        return {self.OUTPUT_RESULTADO: resultado, self.OUTPUT_TILES: tiles_path}
 
     def initializeQgisData(self, feedback):
         """Inicializar dados globais para QGIS"""
@@ -1191,23 +1247,7 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
         
         # 3. Calcular campo de perigo
         feedback.pushInfo("Calculando níveis de perigo...")
-        expressao_perigo = '''
-        CASE
-            WHEN ("NM_H01" >= 70) OR ("NM_H24" >= 185) OR ("NM_H96" >= 255 AND "NM_H24" >= 100) THEN
-                CASE
-                    WHEN "gridcode" = 2 THEN 'MUITO ALTO'
-                    WHEN "gridcode" = 3 THEN 'CRITICO'
-                    ELSE 'SEM PERIGO'
-                END
-            WHEN ("NM_H01" >= 50 AND "NM_H01" < 70) OR ("NM_H24" >= 140 AND "NM_H24" < 185) OR ("NM_H96" >= 185 AND "NM_H96" < 255 AND "NM_H24" >= 55 AND "NM_H24" < 100) THEN
-                CASE
-                    WHEN "gridcode" = 2 THEN 'MODERADO'
-                    WHEN "gridcode" = 3 THEN 'ALTO'
-                    ELSE 'SEM PERIGO'
-                END
-            ELSE 'BAIXO'
-        END
-        '''
+        expressao_perigo = obter_tabela().modelo(MODELO_LIMIARES).expressao_qgis(CAMPOS_LIMIARES)
         
         camada_com_perigo = processing.run("native:fieldcalculator", {
             'INPUT': intersecao,
@@ -8,7 +8,6 @@ import os
 import sys
 import json
 import time
-import requests
 from datetime import datetime, timedelta
 
 from qgis.PyQt.QtCore import QCoreApplication, QVariant
@@ -17,6 +16,9 @@ from qgis.core import (
     QgsProcessingAlgorithm,
     QgsProcessingParameterFeatureSource,
     QgsProcessingParameterVectorDestination,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterDefinition,
     QgsProcessingParameterString,
     QgsProcessingParameterNumber,
     QgsField,
@@ -30,6 +32,19 @@ from qgis.core import (
 )
 import processing
 
+try:
+    from .limiares import obter_tabela
+    from .tiles_qgis import gerar_tiles_qgis
+    from .perfil import perfilar, MODOS as MODOS_PERFIL
+except ImportError:
+    from limiares import obter_tabela
+    from tiles_qgis import gerar_tiles_qgis
+    from perfil import perfilar, MODOS as MODOS_PERFIL
+
+MODELO_LIMIARES = "chuva_24h"
+OPCOES_PERFIL = ['Nenhum'] + list(MODOS_PERFIL)
+INMET_BASE_URL = os.environ.get("INMET_BASE_URL", "https://apitempo.inmet.gov.br/")  # pode apontar para um servidor local de testes
+
 class LhasaMgAnalysis(QgsProcessingAlgorithm):
     """
     Algoritmo QGIS simplificado para análise de risco de deslizamento em Minas Gerais
@@ -103,12 +118,14 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
         )
         
         # --- NOVOS PARÂMETROS DE LIMIAR DE CHUVA (mm) ---
+        # Valores padrão vêm da tabela de limiares (limiares.json)
+        limiar_moderado, limiar_alto, limiar_critico = obter_tabela().modelo(MODELO_LIMIARES).bordas['chuva_24h']
         self.addParameter(
             QgsProcessingParameterNumber(
                 'LIMIAR_MODERADO',
                 self.tr('Limiar de Chuva para Risco MODERADO (mm)'),
                 QgsProcessingParameterNumber.Double,
-                defaultValue=50.0
+                defaultValue=limiar_moderado
             )
         )
         self.addParameter(
@@ -116,7 +133,7 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
                 'LIMIAR_ALTO',
                 self.tr('Limiar de Chuva para Risco ALTO (mm)'),
                 QgsProcessingParameterNumber.Double,
-                defaultValue=100.0
+                defaultValue=limiar_alto
             )
         )
         self.addParameter(
@@ -124,7 +141,7 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
                 'LIMIAR_CRITICO',
                 self.tr('Limiar de Chuva para Risco CRÍTICO (mm)'),
                 QgsProcessingParameterNumber.Double,
-                defaultValue=150.0
+                defaultValue=limiar_critico
             )
         )
         
@@ -135,19 +152,53 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
                 self.tr('Camada de Saída com Análise de Risco')
             )
         )
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                'OUTPUT_TILES',
+                self.tr('Tiles Vetoriais da Camada de Perigo (MBTiles)'),
+                'MBTiles (*.mbtiles)',
+                optional=True,
+                createByDefault=False
+            )
+        )
+        parametro_perfil = QgsProcessingParameterEnum(
+            'INPUT_PROFILE',
+            self.tr('Perfil de Execução (--profile)'),
+            options=OPCOES_PERFIL,
+            defaultValue=0,
+            optional=True
+        )
+        parametro_perfil.setFlags(parametro_perfil.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(parametro_perfil)
 
     def processAlgorithm(self, parameters, context, feedback):
+        # Perfil de execução opcional (cpu/mem/sample), gravado ao lado da saída
+        modo_perfil = ([None] + list(MODOS_PERFIL))[self.parameterAsEnum(parameters, 'INPUT_PROFILE', context)]
+        diretorio_perfil = os.path.dirname(self.parameterAsFileOutput(parameters, 'OUTPUT_RESULTADO', context)) or QgsProcessingUtils.tempFolder()
+        with perfilar(modo_perfil, diretorio_perfil, "LHASA_MG") as perfil:
+            resultado = self.processarAnalise(parameters, context, feedback, perfil)
+        for arquivo in perfil.arquivos:
+            feedback.pushInfo(f"Perfil gravado: {arquivo}")
+        return resultado
+
+    def processarAnalise(self, parameters, context, feedback, perfil):
         # Obter parâmetros
         camada_suscetibilidade = self.parameterAsSource(parameters, 'INPUT_SUSCETIBILIDADE', context)
         camada_estacoes = self.parameterAsVectorLayer(parameters, 'INPUT_ESTACOES_INMET', context)
         campo_codigo = self.parameterAsString(parameters, 'INPUT_CAMPO_CODIGO_ESTACAO', context)
         data_analise = self.parameterAsString(parameters, 'INPUT_DATA_ANALISE', context)
         output_path = self.parameterAsFileOutput(parameters, 'OUTPUT_RESULTADO', context)
+        tiles_path = self.parameterAsFileOutput(parameters, 'OUTPUT_TILES', context)
 
         feedback.pushInfo("=== INICIANDO ANÁLISE LHASA MG ===")
         feedback.pushInfo(f"Data da análise: {data_analise}")
 
+        # Recarrega a tabela de limiares se o arquivo mudou desde a última execução
+        if obter_tabela().recarregar_se_alterado():
+            feedback.pushInfo(f"Tabela de limiares recarregada (versão {obter_tabela().versao})")
+
         # ETAPA 1: Buscar dados de chuva
+        perfil.marcar("ETAPA 1 | BUSCA DE DADOS DO INMET")
         feedback.pushInfo("Buscando dados do INMET...")
         chuva_por_estacao = self.buscarDadosInmet(camada_estacoes, campo_codigo, data_analise, feedback)
         feedback.pushInfo(f"Dados encontrados para {len(chuva_por_estacao)} estações.")
@@ -163,10 +214,12 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
         feedback.pushInfo(f"Processadas {len(chuva_por_estacao)} estações. {estacoes_com_chuva} com chuva > 0. Total acumulado: {total_chuva:.2f} mm")
 
         # ETAPA 2: Adicionar dados de chuva à camada de pontos
+        perfil.marcar("ETAPA 2 | CHUVA NAS ESTACOES")
         feedback.pushInfo("Adicionando dados de chuva à camada de pontos...")
         estacoes_com_chuva = self.adicionarDadosChuva(camada_estacoes, chuva_por_estacao, campo_codigo, feedback)
 
         # ETAPA 3: Criar Zonas Pluviométricas
+        perfil.marcar("ETAPA 3 | ZONAS PLUVIOMETRICAS")
         feedback.pushInfo("Criando Zonas Pluviométricas (áreas de influência)...")
         zonas_pluviometricas = processing.run("native:voronoipolygons", {
             'INPUT': estacoes_com_chuva,
@@ -175,13 +228,21 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
         }, context=context, feedback=feedback)['OUTPUT']
 
         # ETAPA 4: Geoprocessamento da Análise de Risco
+        perfil.marcar("ETAPA 4 | ANALISE DE RISCO")
         feedback.pushInfo("Iniciando geoprocessamento da análise de risco...")
         resultado_final = self.executarAnaliseRisco(zonas_pluviometricas, camada_suscetibilidade, parameters, output_path, context, feedback)
 
+        # ETAPA 5: Tiles vetoriais (somente se a camada de perigo mudou)
+        perfil.marcar("ETAPA 5 | TILES VETORIAIS")
+        if tiles_path:
+            feedback.pushInfo("Gerando tiles vetoriais...")
+            gerar_tiles_qgis(resultado_final, tiles_path, context, feedback)
+
         feedback.pushInfo("--- ANÁLISE FINALIZADA COM SUCESSO ---")
-        return { 'OUTPUT_RESULTADO': resultado_final }
+        return { 'OUTPUT_RESULTADO': resultado_final, 'OUTPUT_TILES': tiles_path }
     
-    def buscarDadosInmet(self, camada_estacoes, campo_codigo, data_analise, feedback):
+    def buscarDadosInmet(self, camada_estacoes, campo_codigo, data_analise, feedback, base_url=None):
+        import requests # só quando a análise roda: não pesa no carregamento do provedor
         chuva_por_estacao = {}
         total_estacoes = camada_estacoes.featureCount()
         estacoes_processadas = 0
@@ -199,7 +260,7 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
                 if not codigo_estacao:
                     continue
 
-                url_dados = f"https://apitempo.inmet.gov.br/token/estacao/{data_analise}/{data_analise}/{codigo_estacao}/Q2MyWEhWUmxwalRSN0Z6ZXVOdmhBTTZYZHo3MEhlMTA=Cc2XHVRlpjTR7FzeuNvhAM6Xdz70He10"
+                url_dados = f"{(base_url or INMET_BASE_URL).rstrip('/')}/token/estacao/{data_analise}/{data_analise}/{codigo_estacao}/Q2MyWEhWUmxwalRSN0Z6ZXVOdmhBTTZYZHo3MEhlMTA=Cc2XHVRlpjTR7FzeuNvhAM6Xdz70He10"
                 feedback.pushInfo(f"--- Tentando URL: {url_dados}")
                 response = requests.get(url_dados, timeout=20)
                 feedback.pushInfo(f"  - Resposta para {codigo_estacao}: Código {response.status_code}")
@@ -324,16 +385,8 @@ class LhasaMgAnalysis(QgsProcessingAlgorithm):
         
         # 3. Calcular perigo com limiares dinâmicos
         feedback.pushInfo("Calculando o nível de perigo com base nos limiares definidos...")
-        expressao_perigo = f'''
-        CASE
-            WHEN "CHUVA_24H" >= {limiar_critico} AND "gridcode" = 3 THEN 'CRITICO'
-            WHEN "CHUVA_24H" >= {limiar_critico} AND "gridcode" = 2 THEN 'MUITO_ALTO'
-            WHEN "CHUVA_24H" >= {limiar_alto} AND "gridcode" = 3 THEN 'ALTO'
-            WHEN "CHUVA_24H" >= {limiar_alto} AND "gridcode" = 2 THEN 'MODERADO'
-            WHEN "CHUVA_24H" >= {limiar_moderado} AND "gridcode" = 3 THEN 'MODERADO'
-            ELSE 'BAIXO'
-        END
-        '''
+        modelo = obter_tabela().modelo(MODELO_LIMIARES).com_limites('chuva_24h', [limiar_moderado, limiar_alto, limiar_critico])
+        expressao_perigo = modelo.expressao_qgis({'chuva_24h': 'CHUVA_24H'})
         
         camada_com_perigo = processing.run("native:fieldcalculator", {
             'INPUT': intersecao,
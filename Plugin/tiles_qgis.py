@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tiles vetoriais (MVT/MBTiles) da camada de perigo no QGIS
+Gera a pirâmide com native:writevectortiles_mbtiles logo após a análise de risco.
+Cada tile tem um hash das feições que o cobrem (geometria + CAMPOS_TILES, os
+campos de perigo usados no estilo), guardado em <arquivo>.hashes.json. Os
+campos que mudam a cada execução (DT_COLETA, NM_H*) ficam fora do hash: se
+nenhum tile mudou, nada é gerado; se alguns mudaram, só as linhas desses tiles
+são trocadas no MBTiles existente (uma transação).
+"""
+
+import os
+import math
+import json
+import sqlite3
+import hashlib
+import tempfile
+
+from qgis.core import (QgsProcessingUtils, QgsVectorLayer, QgsCoordinateTransform,
+                       QgsCoordinateReferenceSystem, QgsProject)
+import processing
+
+try:
+    from .arquivos import gerar_atomico, gravar_atomico
+except ImportError:
+    from arquivos import gerar_atomico, gravar_atomico
+
+ZOOM_MIN = 6
+ZOOM_MAX = 12
+NOME_CAMADA = "perigo"
+CAMPOS_TILES = ("PERIGO",)
+LATITUDE_MAXIMA = 85.0511287798
+
+def tiles_da_caixa(oeste, sul, leste, norte, z):
+    """(x0, x1, y0, y1) dos tiles XYZ do zoom z que cobrem a caixa em graus"""
+    n = 1 << z
+
+    def coluna(lon):
+        return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+    def linha(lat):
+        lat = math.radians(max(-LATITUDE_MAXIMA, min(LATITUDE_MAXIMA, lat)))
+        return min(n - 1, max(0, int((1.0 - math.log(math.tan(lat) + 1.0 / math.cos(lat)) / math.pi) / 2.0 * n)))
+
+    return coluna(oeste), coluna(leste), linha(norte), linha(sul)
+
+def hashes_tiles(camada, zoom_min=ZOOM_MIN, zoom_max=ZOOM_MAX):
+    """{"z/x/y": hash} das feições que cobrem cada tile, independente da ordem"""
+    transformacao = QgsCoordinateTransform(camada.crs(), QgsCoordinateReferenceSystem("EPSG:4326"), QgsProject.instance())
+    indices = [i for i, campo in enumerate(camada.fields()) if campo.name().upper() in CAMPOS_TILES]
+    conteudo = {}
+    for feicao in camada.getFeatures():
+        geometria = feicao.geometry()
+        if geometria.isEmpty():
+            continue
+        atributos = feicao.attributes()
+        hash_feicao = hashlib.sha1(bytes(geometria.asWkb()))
+        hash_feicao.update(repr([atributos[i] for i in indices]).encode("utf-8"))
+        hash_feicao = hash_feicao.hexdigest()
+        caixa = transformacao.transformBoundingBox(geometria.boundingBox())
+        for z in range(zoom_min, zoom_max + 1):
+            x0, x1, y0, y1 = tiles_da_caixa(caixa.xMinimum(), caixa.yMinimum(), caixa.xMaximum(), caixa.yMaximum(), z)
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    conteudo.setdefault(f"{z}/{x}/{y}", []).append(hash_feicao)
+    cabecalho = f"{NOME_CAMADA}|{camada.crs().authid()}|"
+    return {chave: hashlib.sha1((cabecalho + "".join(sorted(hashes))).encode("utf-8")).hexdigest()
+            for chave, hashes in conteudo.items()}
+
+def _ler_hashes(arquivo):
+    try:
+        with open(arquivo, "r", encoding="utf-8") as entrada:
+            return json.load(entrada)
+    except (OSError, ValueError):
+        return None
+
+def aplicar_tiles(origem, destino, alterados):
+    """Copia de origem para destino (MBTiles) só os tiles alterados ("z/x/y"), em uma transação"""
+    conexao = sqlite3.connect(destino)
+    try:
+        conexao.execute("ATTACH DATABASE ? AS novo", (origem,))
+        with conexao:
+            for chave in alterados:
+                z, x, y = (int(parte) for parte in chave.split("/"))
+                linha = (1 << z) - 1 - y # MBTiles usa linhas TMS
+                conexao.execute("DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", (z, x, linha))
+                conexao.execute("INSERT INTO tiles SELECT * FROM novo.tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", (z, x, linha))
+            conexao.execute("DELETE FROM metadata")
+            conexao.execute("INSERT INTO metadata SELECT * FROM novo.metadata")
+    finally:
+        conexao.close()
+
+def gerar_tiles_qgis(camada, destino, context, feedback, zoom_min=ZOOM_MIN, zoom_max=ZOOM_MAX):
+    """Gera/atualiza o MBTiles da camada; retorna False quando nenhum tile mudou"""
+    if isinstance(camada, str):
+        camada = QgsProcessingUtils.mapLayerFromString(camada, context) or QgsVectorLayer(camada, NOME_CAMADA, "ogr")
+
+    arquivo_hashes = destino + ".hashes.json"
+    atuais = hashes_tiles(camada, zoom_min, zoom_max)
+    anteriores = _ler_hashes(arquivo_hashes) if os.path.exists(destino) else None
+    if anteriores is not None:
+        alterados = {chave for chave in set(atuais) | set(anteriores) if atuais.get(chave) != anteriores.get(chave)}
+        if not alterados:
+            feedback.pushInfo("Tiles vetoriais inalterados desde a última execução.")
+            return False
+
+    # O gravador do QGIS não sobrescreve arquivos: gera em temporário
+    def escrever(temporario):
+        processing.run("native:writevectortiles_mbtiles", {
+            'LAYERS': [{'layer': camada.source(), 'name': NOME_CAMADA, 'filterExpression': '', 'minZoom': -1, 'maxZoom': -1}],
+            'MIN_ZOOM': zoom_min,
+            'MAX_ZOOM': zoom_max,
+            'NAME': NOME_CAMADA,
+            'OUTPUT': temporario
+        }, context=context, feedback=feedback)
+
+    if anteriores is None:
+        gerar_atomico(destino, escrever)
+        feedback.pushInfo(f"Tiles vetoriais gerados (zoom {zoom_min}-{zoom_max}): {destino}")
+    else:
+        with tempfile.TemporaryDirectory(prefix="lhasa_tiles_", dir=os.path.dirname(os.path.abspath(destino))) as diretorio:
+            novo = os.path.join(diretorio, "novo.mbtiles")
+            escrever(novo)
+            aplicar_tiles(novo, destino, alterados)
+        feedback.pushInfo(f"Tiles vetoriais atualizados: {len(alterados)} de {len(atuais)} tiles (zoom {zoom_min}-{zoom_max}): {destino}")
+
+    gravar_atomico(arquivo_hashes, json.dumps(atuais, sort_keys=True))
+    return True